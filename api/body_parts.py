@@ -1,6 +1,7 @@
 from flask import Blueprint, jsonify, request
 from models_main import db
 from models import BodyPart
+from utils import reference_cache
 
 body_parts_bp = Blueprint('body_parts', __name__)
 
@@ -25,6 +26,7 @@ def create_body_part():
         BodyPartName=data.get('BodyPartName')
     )
     db.session.add(part)
+    reference_cache.bump_version('BodyPart')
     db.session.commit()
     return jsonify({"message": "Created", "BodyPartId": part.BodyPartId}), 201
 
@@ -34,6 +36,7 @@ def update_body_part(part_id):
     part = BodyPart.query.get_or_404(part_id)
     if 'BodyPartName' in data:
         part.BodyPartName = data['BodyPartName']
+    reference_cache.bump_version('BodyPart')
     db.session.commit()
     return jsonify({"message": "Updated"})
 
@@ -41,5 +44,6 @@ def update_body_part(part_id):
 def delete_body_part(part_id):
     part = BodyPart.query.get_or_404(part_id)
     db.session.delete(part)
+    reference_cache.bump_version('BodyPart')
     db.session.commit()
     return jsonify({"message": "Deleted"})
@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify, render_template
 from models_main import db
 from models import BodySite, BodyPart
+from utils import reference_cache
 
 body_sites_bp = Blueprint('body_sites', __name__)
 
@@ -53,6 +54,7 @@ def create_body_site():
     data = request.json or {}
     site = BodySite(SiteName=data.get('SiteName'), BodyPartId=data.get('BodyPartId'))
     db.session.add(site)
+    reference_cache.bump_version('BodySite')
     db.session.commit()
     # Return SiteId so frontend can show it in the success message
     return jsonify({"message": "Created", "SiteId": site.SiteId}), 201
@@ -65,6 +67,7 @@ def update_body_site(site_id):
         site.SiteName = data['SiteName']
     if 'BodyPartId' in data:
         site.BodyPartId = data['BodyPartId']
+    reference_cache.bump_version('BodySite')
     db.session.commit()
     return jsonify({"message": "Updated"})
 
@@ -72,6 +75,7 @@ def update_body_site(site_id):
 def delete_body_site(site_id):
     site = BodySite.query.get_or_404(site_id)
     db.session.delete(site)
+    reference_cache.bump_version('BodySite')
     db.session.commit()
     return jsonify({"message": "Deleted"})
 
@@ -1,60 +1,135 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, current_app, jsonify, request
 from datetime import datetime
 from models_main import db
-from models import PatientDepartment, Patient, Department
+from models import PatientDepartment, Patient, Department, DepartmentStats
+from utils import department_events, image_variants
+from utils.projection import Field, FieldSet, InvalidFields
 
 # Create Blueprint for department patients API routes
 dept_patients_bp = Blueprint('department_patients', __name__)
 
+def _isoformat(value):
+    return value.isoformat() if value else value
+
+
+# Row format of the department page; fields= selects a subset
+DEPARTMENT_PATIENT_FIELDS = FieldSet({
+    'PatientId': PatientDepartment.PatientId,
+    'DepartmentId': PatientDepartment.DepartmentId,
+    'Current': PatientDepartment.Current,
+    'At': Field(PatientDepartment.At, format=_isoformat),
+    'PatientAge': Patient.PatientAge,
+    'PatientAddress': Patient.PatientAddress,
+    'PatientGender': Patient.PatientGender,
+    'PatientName': Patient.PatientName,
+    'PatientPhone': Patient.PatientPhone,
+    'PatientCCCD': Patient.PatientCCCD,
+    'PatientBHYT': Patient.PatientBHYT,
+    'PatientBHYTValid': Patient.PatientBHYTValid,
+    'PatientRelative': Patient.PatientRelative,
+    'Allergy': Patient.Allergy,
+    'History': Patient.History,
+    'PatientNote': Patient.PatientNote,
+    'DepartmentName': Department.DepartmentName,
+    'DepartmentType': Department.DepartmentType,
+    # Avatar URLs instead of the image itself
+    'PatientImageUrls': Field(Patient.PatientId, Patient.PatientImageHash, format=image_variants.urls)
+})
+
+
+def department_patient_rows(department_id, patient_id=None, fields=None):
+    """Current patients of a department in the department page's row format
+    (only ``fields`` when given)"""
+    query = (
+        db.session.query(PatientDepartment)
+        .join(Patient, Patient.PatientId == PatientDepartment.PatientId)
+        .join(Department, Department.DepartmentId == PatientDepartment.DepartmentId)
+        .filter(
+            PatientDepartment.DepartmentId == department_id,
+            PatientDepartment.Current == True
+        )
+    )
+    if patient_id is not None:
+        query = query.filter(PatientDepartment.PatientId == patient_id)
+    query = DEPARTMENT_PATIENT_FIELDS.project(query, fields).order_by(PatientDepartment.At.desc())
+    
+    serialize = DEPARTMENT_PATIENT_FIELDS.serializer(fields)
+    return [serialize(row) for row in query.all()]
+
+
+def department_stats_dict(department_id):
+    """Counters shown on the department page"""
+    census = DepartmentStats.get_one(department_id)
+    if not census:
+        census = {'CurrentPatients': 0, 'TotalPatients': 0, 'RecentAdmissions': 0}
+    return {
+        'current_patients': census['CurrentPatients'],
+        'total_patients': census['TotalPatients'],
+        'recent_admissions': census['RecentAdmissions']
+    }
+
+
+def publish_patient_move(patient_id, from_department_ids, to_department_id):
+    """Queue admitted / transferred-out events for a department change.
+
+    Call after the new assignment is added and before the commit; the
+    payloads (including the department counters) are read inside the same
+    transaction.
+    """
+    to_department = Department.query.get(to_department_id)
+    for department_id in set(from_department_ids):
+        if department_id is None or department_id == to_department_id:
+            continue
+        department_events.publish(department_id, 'patient_transferred_out', {
+            'PatientId': patient_id,
+            'ToDepartmentId': to_department_id,
+            'ToDepartmentName': to_department.DepartmentName if to_department else None,
+            'stats': department_stats_dict(department_id)
+        }, patient_id)
+    rows = department_patient_rows(to_department_id, patient_id)
+    department_events.publish(to_department_id, 'patient_admitted', {
+        'patient': rows[0] if rows else {'PatientId': patient_id},
+        'stats': department_stats_dict(to_department_id)
+    }, patient_id)
+
+
+def publish_visit_created(visit):
+    """Queue a visit_created event for each current department of the patient"""
+    department_ids = [
+        department_id for (department_id,) in db.session.query(PatientDepartment.DepartmentId).filter(
+            PatientDepartment.PatientId == visit.PatientId,
+            PatientDepartment.Current == True
+        )
+    ]
+    for department_id in set(department_ids):
+        department_events.publish(department_id, 'visit_created', {
+            'PatientId': visit.PatientId,
+            'VisitId': visit.VisitId,
+            'VisitPurpose': visit.VisitPurpose,
+            'VisitTime': visit.VisitTime.isoformat() if visit.VisitTime else None
+        }, visit.PatientId)
+
+
 @dept_patients_bp.route('/department_patients/<int:department_id>', methods=['GET'])
 def get_department_patients(department_id):
-    """Get all current patients in a specific department"""
+    """Get all current patients in a specific department.
+    Optional fields param selects a subset of the patient row fields.
+    """
     try:
+        try:
+            fields = DEPARTMENT_PATIENT_FIELDS.requested()
+        except InvalidFields as e:
+            return jsonify({'error': str(e)}), 400
+        
         # Get department info first
         department = Department.query.get(department_id)
         if not department:
             return jsonify({'error': 'Department not found'}), 404
         
-                # Query current patients in the department
-        results = (
-            db.session.query(
-                PatientDepartment.PatientId,
-                PatientDepartment.DepartmentId,
-                PatientDepartment.Current,
-                PatientDepartment.At,
-                Patient.PatientAge,
-                Patient.PatientAddress,
-                Patient.PatientGender,
-                Patient.PatientName,
-                Patient.PatientPhone,
-                Patient.PatientCCCD,
-                Patient.PatientBHYT,
-                Patient.PatientBHYTValid,
-                Patient.PatientRelative,
-                Patient.Allergy,
-                Patient.History,
-                Patient.PatientNote,
-                Department.DepartmentName,
-                Department.DepartmentType
-            )
-            .join(Patient, Patient.PatientId == PatientDepartment.PatientId)
-            .join(Department, Department.DepartmentId == PatientDepartment.DepartmentId)
-            .filter(
-                PatientDepartment.DepartmentId == department_id,
-                PatientDepartment.Current == True
-            )
-            .order_by(PatientDepartment.At.desc())
-            .all()
-        )
-        
-        # Convert results to dictionaries with proper formatting
-        data = []
-        for r in results:
-            row_dict = dict(r._mapping)
-            # Ensure datetime is serializable
-            if row_dict.get('At'):
-                row_dict['At'] = row_dict['At'].isoformat()
-            data.append(row_dict)
+        # Resume point for /api/department_events/<id>, read before the list
+        # so no change made after it can be missed
+        last_event_id = department_events.last_event_id(department_id)
+        data = department_patient_rows(department_id, fields=fields)
         
         return jsonify({
             'department': {
@@ -63,13 +138,45 @@ def get_department_patients(department_id):
                 'DepartmentType': department.DepartmentType
             },
             'patients': data,
-            'count': len(data)
+            'count': len(data),
+            'last_event_id': last_event_id
         })
         
     except Exception as e:
         print(f"Error in get_department_patients: {e}")
         return jsonify({'error': f'Database error: {str(e)}'}), 500
 
+@dept_patients_bp.route('/department_events/<int:department_id>', methods=['GET'])
+def department_event_stream(department_id):
+    """Server-Sent Events stream of patient admissions, transfers and visits"""
+    try:
+        department = Department.query.get(department_id)
+        if not department:
+            return jsonify({'error': 'Department not found'}), 404
+        
+        # Browser reconnects send Last-Event-ID; the first connection passes
+        # the last_event_id returned by /api/department_patients/<id>
+        after_id = request.headers.get('Last-Event-ID', type=int)
+        if after_id is None:
+            after_id = request.args.get('last_event_id', type=int)
+        if after_id is None:
+            after_id = department_events.last_event_id(department_id)
+        
+        try:
+            body = department_events.stream(current_app._get_current_object(), department_id, after_id)
+        except department_events.StreamLimitReached as e:
+            # Every stream holds a worker thread: tell the page to poll instead
+            response = jsonify({'error': str(e), 'fallback': 'polling'})
+            response.headers['Retry-After'] = str(department_events.STREAM_RETRY_SECONDS)
+            return response, 503
+        return Response(body, mimetype='text/event-stream', headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        })
+    except Exception as e:
+        print(f"Error in department_event_stream: {e}")
+        return jsonify({'error': f'Database error: {str(e)}'}), 500
+
 @dept_patients_bp.route('/departments', methods=['GET'])
 def get_all_departments():
     """Get all departments for dropdown selection"""
@@ -90,35 +197,18 @@ def get_all_departments():
 def get_all_departments_stats():
     """Get all departments with their statistics"""
     try:
-        from models import Visit, StaffDepartment, PatientDepartment
-        
-        departments = Department.query.order_by(Department.DepartmentName).all()
-        result = []
-        
-        for dept in departments:
-            # Count current staff
-            current_staff = db.session.query(StaffDepartment).filter_by(
-                DepartmentId=dept.DepartmentId,
-                Current=True
-            ).count()
-            
-            # Count current patients
-            current_patients = db.session.query(PatientDepartment).filter_by(
-                DepartmentId=dept.DepartmentId,
-                Current=True
-            ).count()
-            
-            # Count total visits (visits no longer have direct department relationship)
-            total_visits = 0
-            
-            result.append({
-                'DepartmentId': dept.DepartmentId,
-                'DepartmentName': dept.DepartmentName,
-                'DepartmentType': dept.DepartmentType,
-                'CurrentStaff': current_staff,
-                'CurrentPatients': current_patients,
-                'TotalVisits': total_visits
-            })
+        # Staff, patient and visit counts of every department in one statement
+        result = [
+            {
+                'DepartmentId': row['DepartmentId'],
+                'DepartmentName': row['DepartmentName'],
+                'DepartmentType': row['DepartmentType'],
+                'CurrentStaff': row['CurrentStaff'],
+                'CurrentPatients': row['CurrentPatients'],
+                'TotalVisits': row['TotalVisits']
+            }
+            for row in DepartmentStats.get_all()
+        ]
         
         return jsonify({'departments': result})
     except Exception as e:
@@ -129,41 +219,8 @@ def get_all_departments_stats():
 def get_department_stats(department_id):
     """Get statistics for a specific department"""
     try:
-        # Current patients count
-        current_count = (
-            db.session.query(PatientDepartment)
-            .filter(
-                PatientDepartment.DepartmentId == department_id,
-                PatientDepartment.Current == True
-            )
-            .count()
-        )
-        
-        # Total patients ever assigned to this department
-        total_count = (
-            db.session.query(PatientDepartment)
-            .filter(PatientDepartment.DepartmentId == department_id)
-            .count()
-        )
-        
-        # Recent admissions (last 7 days)
-        from datetime import timedelta
-        week_ago = datetime.now() - timedelta(days=7)
-        recent_count = (
-            db.session.query(PatientDepartment)
-            .filter(
-                PatientDepartment.DepartmentId == department_id,
-                PatientDepartment.At >= week_ago,
-                PatientDepartment.Current == True
-            )
-            .count()
-        )
-        
-        return jsonify({
-            'current_patients': current_count,
-            'total_patients': total_count,
-            'recent_admissions': recent_count
-        })
+        # Current, total and recent (7 days) counts from the census tables
+        return jsonify(department_stats_dict(department_id))
         
     except Exception as e:
         print(f"Error in get_department_stats: {e}")
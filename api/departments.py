@@ -6,9 +6,10 @@ CRUD operations for Department management
 from flask import Blueprint, request, jsonify
 from sqlalchemy import asc
 from models_main import db
-from models import Department
+from models import Department, DepartmentStats
 from models.StaffDepartment import StaffDepartment as StaffDepartmentModel
 from models.PatientDepartment import PatientDepartment as PatientDepartmentModel
+from utils import reference_cache
 
 departments_bp = Blueprint('departments', __name__)
 
@@ -22,60 +23,29 @@ def department_to_dict(dept):
     }
 
 
+def census_to_dict(census):
+    """Department census row (DepartmentStats) in this blueprint's format"""
+    return {
+        'DepartmentId': census['DepartmentId'],
+        'DepartmentName': census['DepartmentName'],
+        'DepartmentType': census['DepartmentType'],
+        'current_staff_count': census['CurrentStaff'],
+        'current_patient_count': census['CurrentPatients'],
+        'total_visits': census['TotalVisits']
+    }
+
+
 @departments_bp.route('/departments', methods=['GET'])
 def list_departments():
     """List all departments with optional search and counts"""
     try:
-        query = db.session.query(Department)
-        
-        # Search by name if provided
+        # Search by name / filter by type if provided
         search = request.args.get('q', type=str)
-        if search:
-            query = query.filter(Department.DepartmentName.ilike(f"%{search}%"))
-        
-        # Filter by type if provided
         dept_type = request.args.get('type', type=str)
-        if dept_type:
-            query = query.filter(Department.DepartmentType == dept_type)
-        
-        departments = query.order_by(asc(Department.DepartmentName)).all()
         
-        # Get staff counts for filtered departments in one query
-        dept_ids = [dept.DepartmentId for dept in departments]
-        if dept_ids:
-            staff_counts = db.session.query(
-                StaffDepartmentModel.DepartmentId,
-                db.func.count(StaffDepartmentModel.StaffId).label('staff_count')
-            ).filter(
-                StaffDepartmentModel.DepartmentId.in_(dept_ids),
-                StaffDepartmentModel.Current == True
-            ).group_by(StaffDepartmentModel.DepartmentId).all()
-            
-            patient_counts = db.session.query(
-                PatientDepartmentModel.DepartmentId,
-                db.func.count(PatientDepartmentModel.PatientId).label('patient_count')
-            ).filter(
-                PatientDepartmentModel.DepartmentId.in_(dept_ids),
-                PatientDepartmentModel.Current == True
-            ).group_by(PatientDepartmentModel.DepartmentId).all()
-            
-            # Convert to dictionaries for easy lookup
-            staff_counts_dict = {dept_id: count for dept_id, count in staff_counts}
-            patient_counts_dict = {dept_id: count for dept_id, count in patient_counts}
-        else:
-            staff_counts_dict = {}
-            patient_counts_dict = {}
-        
-        # Build response with counts
-        data = []
-        for dept in departments:
-            dept_data = department_to_dict(dept)
-            dept_data.update({
-                'current_staff_count': staff_counts_dict.get(dept.DepartmentId, 0),
-                'current_patient_count': patient_counts_dict.get(dept.DepartmentId, 0),
-                'total_visits': 0  # Visits no longer have direct department relationship
-            })
-            data.append(dept_data)
+        # Departments with their counts in one statement
+        census = DepartmentStats.get_all(search=search, department_type=dept_type)
+        data = [census_to_dict(row) for row in census]
         
         return jsonify({'departments': data})
     except Exception as e:
@@ -87,31 +57,12 @@ def list_departments():
 def get_department(dept_id):
     """Get a specific department by ID with stats"""
     try:
-        dept = Department.query.get_or_404(dept_id)
+        # Department and its counts in one statement
+        census = DepartmentStats.get_one(dept_id)
+        if not census:
+            return jsonify({'error': 'Department not found'}), 404
         
-        # Get current staff count
-        current_staff = db.session.query(StaffDepartmentModel).filter_by(
-            DepartmentId=dept_id, 
-            Current=True
-        ).count()
-        
-        # Get current patient count
-        current_patients = db.session.query(PatientDepartmentModel).filter_by(
-            DepartmentId=dept_id, 
-            Current=True
-        ).count()
-        
-        # Get total visits (visits no longer have direct department relationship)
-        total_visits = 0
-        
-        result = department_to_dict(dept)
-        result.update({
-            'current_staff_count': current_staff,
-            'current_patient_count': current_patients,
-            'total_visits': total_visits
-        })
-        
-        return jsonify({'department': result})
+        return jsonify({'department': census_to_dict(census)})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -145,6 +96,7 @@ def create_department():
         )
         
         db.session.add(new_dept)
+        reference_cache.bump_version('Department')
         db.session.commit()
         
         return jsonify({
@@ -191,6 +143,7 @@ def update_department(dept_id):
         if 'DepartmentType' in payload:
             dept.DepartmentType = payload['DepartmentType']
         
+        reference_cache.bump_version('Department')
         db.session.commit()
         
         return jsonify({
@@ -231,6 +184,7 @@ def delete_department(dept_id):
         pass
         
         db.session.delete(dept)
+        reference_cache.bump_version('Department')
         db.session.commit()
         
         return jsonify({'message': 'Department deleted successfully'})
@@ -274,46 +228,16 @@ def get_department_staff(dept_id):
 def get_departments_stats():
     """Get statistics for all departments in one query"""
     try:
-        # Get all departments
-        departments = Department.query.order_by(Department.DepartmentName).all()
-        
-        # Get staff counts for all departments in one query
-        staff_counts = db.session.query(
-            StaffDepartmentModel.DepartmentId,
-            db.func.count(StaffDepartmentModel.StaffId).label('staff_count')
-        ).filter(
-            StaffDepartmentModel.Current == True
-        ).group_by(StaffDepartmentModel.DepartmentId).all()
-        
-        # Get patient counts for all departments in one query
-        patient_counts = db.session.query(
-            PatientDepartmentModel.DepartmentId,
-            db.func.count(PatientDepartmentModel.PatientId).label('patient_count')
-        ).filter(
-            PatientDepartmentModel.Current == True
-        ).group_by(PatientDepartmentModel.DepartmentId).all()
-        
-        # Convert to dictionaries for easy lookup
-        staff_counts_dict = {dept_id: count for dept_id, count in staff_counts}
-        patient_counts_dict = {dept_id: count for dept_id, count in patient_counts}
-        
-        # Build response with all statistics
-        departments_stats = []
-        for dept in departments:
-            dept_data = department_to_dict(dept)
-            dept_data.update({
-                'current_staff_count': staff_counts_dict.get(dept.DepartmentId, 0),
-                'current_patient_count': patient_counts_dict.get(dept.DepartmentId, 0),
-                'total_visits': 0  # Visits no longer have direct department relationship
-            })
-            departments_stats.append(dept_data)
+        # Census of all departments in one statement
+        census = DepartmentStats.get_all()
+        departments_stats = [census_to_dict(row) for row in census]
         
         return jsonify({
             'departments': departments_stats,
-            'total_departments': len(departments),
-            'total_staff': sum(staff_counts_dict.values()),
-            'total_patients': sum(patient_counts_dict.values()),
-            'total_visits': 0  # Visits no longer have direct department relationship
+            'total_departments': len(census),
+            'total_staff': sum(row['CurrentStaff'] for row in census),
+            'total_patients': sum(row['CurrentPatients'] for row in census),
+            'total_visits': sum(row['TotalVisits'] for row in census)
         })
     except Exception as e:
         db.session.rollback()
@@ -5,6 +5,7 @@ CRUD operations for Document Type management
 from flask import Blueprint, request, jsonify
 from models_main import db
 from models.DocumentType import DocumentType
+from utils import reference_cache
 
 document_types_bp = Blueprint('document_types', __name__)
 
@@ -41,6 +42,7 @@ def create_document_type():
         new_doc_type = DocumentType(DocumentTypeName=data['DocumentTypeName'])
         
         db.session.add(new_doc_type)
+        reference_cache.bump_version('DocumentType')
         db.session.commit()
         
         return jsonify({
@@ -65,6 +67,7 @@ def update_document_type(type_id):
             return jsonify({'error': 'Document type not found'}), 404
             
         document_type.DocumentTypeName = data['DocumentTypeName']
+        reference_cache.bump_version('DocumentType')
         db.session.commit()
         
         return jsonify({
@@ -85,6 +88,7 @@ def delete_document_type(type_id):
             return jsonify({'error': 'Document type not found'}), 404
             
         db.session.delete(document_type)
+        reference_cache.bump_version('DocumentType')
         db.session.commit()
         
         return jsonify({'message': 'Document type deleted successfully'})
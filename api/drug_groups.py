@@ -7,6 +7,7 @@ from flask import Blueprint, request, jsonify
 from sqlalchemy import asc, func
 from models_main import db
 from models import DrugGroup, Drug
+from utils import reference_cache
 
 drug_groups_bp = Blueprint('drug_groups', __name__)
 
@@ -80,6 +81,7 @@ def create_drug_group():
         )
         
         db.session.add(new_group)
+        reference_cache.bump_version('DrugGroup')
         db.session.commit()
         
         return jsonify({
@@ -117,6 +119,7 @@ def update_drug_group(group_id):
         if 'DrugGroupDescription' in payload:
             group.DrugGroupDescription = payload['DrugGroupDescription'].strip() or None
         
+        reference_cache.bump_version('DrugGroup')
         db.session.commit()
         
         return jsonify({
@@ -139,6 +142,7 @@ def delete_drug_group(group_id):
             return jsonify({'error': f'Không thể xóa nhóm thuốc này vì đang có {len(group.drugs)} thuốc sử dụng'}), 400
         
         db.session.delete(group)
+        reference_cache.bump_version('DrugGroup')
         db.session.commit()
         
         return jsonify({'message': 'Drug group deleted successfully'})
@@ -6,6 +6,7 @@ from flask import Blueprint, request, jsonify
 from sqlalchemy import asc
 from models_main import db
 from models import DrugTemplate, Department
+from utils import reference_cache
 
 drug_template_bp = Blueprint('drug_template', __name__)
 
@@ -89,6 +90,7 @@ def create_drug_template():
         )
         
         db.session.add(template)
+        reference_cache.bump_version('DrugTemplate')
         db.session.commit()
         
         return jsonify({
@@ -120,6 +122,7 @@ def update_drug_template(template_id):
                 return jsonify({'error': 'DrugTemplateType must be one of: BA, TD, PK, CC'}), 400
             template.DrugTemplateType = payload['DrugTemplateType']
 
+        reference_cache.bump_version('DrugTemplate')
         db.session.commit()
         
         department = Department.query.get(template.DepartmentId) if template.DepartmentId else None
@@ -140,6 +143,7 @@ def delete_drug_template(template_id):
     try:
         template = DrugTemplate.query.get_or_404(template_id)
         db.session.delete(template)
+        reference_cache.bump_version('DrugTemplate')
         db.session.commit()
         return jsonify({'message': 'Template deleted', 'DrugTemplateId': template_id})
     except Exception as e:
@@ -6,6 +6,8 @@ from flask import Blueprint, request, jsonify
 from sqlalchemy import asc
 from models_main import db
 from models import DrugTemplate, DrugTemplateDetail, Drug, DrugGroup, Department
+from utils import reference_cache
+from utils.streaming import wants_stream, iter_rows, ndjson_response
 
 drug_template_detail_bp = Blueprint('drug_template_detail', __name__)
 
@@ -102,7 +104,15 @@ def get_template_drugs(template_id):
         if formulation:
             query = query.filter(Drug.DrugFormulation.ilike(f"%{formulation}%"))
             
-        records = query.order_by(asc(Drug.DrugName)).all()
+        query = query.order_by(asc(Drug.DrugName))
+        if wants_stream():
+            # One JSON line per detail, read through a server-side cursor
+            return ndjson_response(
+                template_detail_to_dict(detail, drug, template_name, dept_name, group_name)
+                for detail, drug, group_name, template_name, dept_name in iter_rows(query)
+            )
+
+        records = query.all()
         data = [
             template_detail_to_dict(detail, drug, template_name, dept_name, group_name)
             for detail, drug, group_name, template_name, dept_name in records
@@ -147,6 +157,7 @@ def add_drug_to_template(template_id):
             DrugId=drug_id
         )
         db.session.add(detail)
+        reference_cache.bump_version('DrugTemplate')
         db.session.commit()
         
         return jsonify({'message': 'Drug added to template successfully'}), 201
@@ -168,6 +179,7 @@ def remove_drug_from_template(template_id, drug_id):
             return jsonify({'error': 'Association not found'}), 404
             
         db.session.delete(detail)
+        reference_cache.bump_version('DrugTemplate')
         db.session.commit()
         
         return jsonify({'message': 'Drug removed from template successfully'}), 200
@@ -178,7 +190,9 @@ def remove_drug_from_template(template_id, drug_id):
 
 @drug_template_detail_bp.route('/drug-template-details', methods=['GET'])
 def list_drug_template_details():
-    """List drug template details with optional filters and search."""
+    """List drug template details with optional filters and search.
+    Accept: application/x-ndjson or stream=1 streams one JSON line per detail.
+    """
     try:
         # Query with all related data
         query = db.session.query(
@@ -208,7 +222,15 @@ def list_drug_template_details():
         if q:
             query = query.filter(Drug.DrugName.ilike(f"%{q}%"))
 
-        records = query.order_by(asc(Drug.DrugName)).all()
+        query = query.order_by(asc(Drug.DrugName))
+        if wants_stream():
+            # One JSON line per detail, read through a server-side cursor
+            return ndjson_response(
+                template_detail_to_dict(detail, drug, template_name, dept_name, group_name)
+                for detail, drug, group_name, template_name, dept_name in iter_rows(query)
+            )
+
+        records = query.all()
         data = [
             template_detail_to_dict(detail, drug, template_name, dept_name, group_name) 
             for detail, drug, group_name, template_name, dept_name in records
@@ -275,6 +297,7 @@ def create_drug_template_detail():
 
         detail = DrugTemplateDetail(**{k: v for k, v in payload.items() if k in ['DrugTemplateId', 'DrugId']})
         db.session.add(detail)
+        reference_cache.bump_version('DrugTemplate')
         db.session.commit()
 
         # Get full data for response
@@ -319,6 +342,7 @@ def delete_drug_template_detail(template_id, drug_id):
         ).first_or_404()
         
         db.session.delete(detail)
+        reference_cache.bump_version('DrugTemplate')
         db.session.commit()
         
         return jsonify({'message': 'Drug template detail deleted successfully'}), 200
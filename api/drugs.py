@@ -6,6 +6,9 @@ from flask import Blueprint, request, jsonify
 from sqlalchemy import asc, text
 from models_main import db
 from models import Drug, DrugGroup
+from utils.pagination import wants_pagination, get_page_args, keyset_paginate, InvalidCursor
+from utils import reference_cache, search_index
+from utils.projection import FieldSet, InvalidFields
 
 drugs_bp = Blueprint('drugs', __name__)
 
@@ -35,6 +38,39 @@ def drug_to_dict(drug, group_name=None):
     }
 
 
+# Fields selectable with ?fields= (same names as drug_to_dict)
+DRUG_FIELDS = FieldSet({
+    'DrugId': Drug.DrugId,
+    'DrugName': Drug.DrugName,
+    'DrugChemical': Drug.DrugChemical,
+    'DrugGenericName': Drug.DrugChemical,
+    'DrugContent': Drug.DrugContent,
+    'DrugFormulation': Drug.DrugFormulation,
+    'DrugRemains': Drug.DrugRemains,
+    'DrugGroupId': Drug.DrugGroupId,
+    'DrugGroup': DrugGroup.DrugGroupName,
+    'DrugGroupName': DrugGroup.DrugGroupName,
+    'DrugTherapy': Drug.DrugTherapy,
+    'DrugRoute': Drug.DrugRoute,
+    'DrugQuantity': Drug.DrugQuantity,
+    'CountStr': Drug.CountStr,
+    'DrugAvailable': Drug.DrugAvailable,
+    'DrugPriceBHYT': Drug.DrugPriceBHYT,
+    'DrugPriceVP': Drug.DrugPriceVP,
+    'DrugNote': Drug.DrugNote,
+    'Count': Drug.Count
+})
+
+
+@reference_cache.register('drugs', depends_on=('Drug', 'DrugGroup'))
+def _load_drugs():
+    """All drugs with group names, ordered by DrugName, for the catalog cache"""
+    records = db.session.query(Drug, DrugGroup.DrugGroupName).outerjoin(
+        DrugGroup, Drug.DrugGroupId == DrugGroup.DrugGroupId
+    ).order_by(asc(Drug.DrugName)).all()
+    return [drug_to_dict(drug, group_name) for drug, group_name in records]
+
+
 @drugs_bp.route('/drugs', methods=['GET'])
 def list_drugs():
     """List drugs with optional filters and search.
@@ -43,13 +79,14 @@ def list_drugs():
       group: substring in DrugGroupId
       available: 0/1 for DrugAvailable
       formulation: substring in DrugFormulation
+      fields: comma separated subset of the drug fields (e.g. DrugId,DrugName)
+      limit, cursor: optional keyset pagination ordered by (DrugName, DrugId)
     """
     try:
-        # Query with left join to include group names
-        query = db.session.query(Drug, DrugGroup.DrugGroupName).outerjoin(
-            DrugGroup, Drug.DrugGroupId == DrugGroup.DrugGroupId
-        )
-
+        try:
+            fields = DRUG_FIELDS.requested()
+        except InvalidFields as e:
+            return jsonify({'error': str(e)}), 400
         q = request.args.get('q', type=str)
         drug_name = request.args.get('drug_name', type=str)  # Frontend parameter
         drug_group = request.args.get('group', type=str)
@@ -61,22 +98,65 @@ def list_drugs():
         search_term = drug_name or q
         group_filter = drug_group_id or drug_group
 
-        if search_term:
-            query = query.filter(
-                (Drug.DrugName.ilike(f"%{search_term}%")) | 
-                (Drug.DrugChemical.ilike(f"%{search_term}%"))
+        if wants_pagination() or search_term or formulation:
+            # Text filters run in SQL, so matching follows the column
+            # collation (case and accent folding) as before the cache
+            query = db.session.query(Drug, DrugGroup.DrugGroupName).outerjoin(
+                DrugGroup, Drug.DrugGroupId == DrugGroup.DrugGroupId
             )
+            if search_term:
+                query = query.filter(
+                    (Drug.DrugName.ilike(f"%{search_term}%")) | 
+                    (Drug.DrugChemical.ilike(f"%{search_term}%"))
+                )
+            if group_filter:
+                query = query.filter(Drug.DrugGroupId == group_filter)
+            if available in ('0', '1', 'true', 'false'):
+                is_available = available in ('1', 'true')
+                query = query.filter(Drug.DrugAvailable == is_available)
+            if formulation:
+                query = query.filter(Drug.DrugFormulation.ilike(f"%{formulation}%"))
+
+            if not wants_pagination():
+                # Full list
+                if fields:
+                    serialize = DRUG_FIELDS.serializer(fields)
+                    records = DRUG_FIELDS.project(query, fields).order_by(asc(Drug.DrugName)).all()
+                    return jsonify({'drugs': [serialize(row) for row in records]})
+                records = query.order_by(asc(Drug.DrugName)).all()
+                return jsonify({'drugs': [drug_to_dict(drug, group_name) for drug, group_name in records]})
+
+            cursor, limit = get_page_args()
+            sort_columns = [Drug.DrugName, Drug.DrugId]
+            try:
+                if fields:
+                    # Only the requested columns (plus the sort key) are selected
+                    records, next_cursor = keyset_paginate(
+                        DRUG_FIELDS.project(query, fields, keys=sort_columns), sort_columns, cursor, limit,
+                        key_func=DRUG_FIELDS.key_func(len(sort_columns))
+                    )
+                else:
+                    records, next_cursor = keyset_paginate(
+                        query, sort_columns, cursor, limit,
+                        key_func=lambda row: (row[0].DrugName, row[0].DrugId)
+                    )
+            except InvalidCursor as e:
+                return jsonify({'error': str(e)}), 400
+            if fields:
+                serialize = DRUG_FIELDS.serializer(fields)
+                data = [serialize(row) for row in records]
+            else:
+                data = [drug_to_dict(drug, group_name) for drug, group_name in records]
+            return jsonify({'drugs': data, 'next_cursor': next_cursor})
+
+        # Unfiltered list (or exact-match filters only): the cached catalog
+        data = reference_cache.get('drugs')
         if group_filter:
-            query = query.filter(Drug.DrugGroupId == group_filter)
+            data = [d for d in data if str(d['DrugGroupId']) == str(group_filter)]
         if available in ('0', '1', 'true', 'false'):
             is_available = available in ('1', 'true')
-            query = query.filter(Drug.DrugAvailable == is_available)
-        if formulation:
-            query = query.filter(Drug.DrugFormulation.ilike(f"%{formulation}%"))
-
-        records = query.order_by(asc(Drug.DrugName)).all()
-        data = [drug_to_dict(drug, group_name) for drug, group_name in records]
-        return jsonify({'drugs': data})
+            data = [d for d in data if d['DrugAvailable'] is not None and bool(d['DrugAvailable']) == is_available]
+        return jsonify({'drugs': DRUG_FIELDS.pick(data, fields)})
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -144,6 +224,8 @@ def create_drug():
         )
         
         db.session.add(drug)
+        search_index.reindex('drug', [drug.DrugId])
+        reference_cache.bump_version('Drug')
         db.session.commit()
         
         return jsonify({'drug': drug_to_dict(drug)}), 201
@@ -192,6 +274,8 @@ def update_drug(drug_id):
         if 'Count' in payload:
             drug.Count = payload['Count'].strip() or None
 
+        search_index.reindex('drug', [drug.DrugId])
+        reference_cache.bump_version('Drug')
         db.session.commit()
         return jsonify({'drug': drug_to_dict(drug)})
     except Exception as e:
@@ -205,6 +289,8 @@ def delete_drug(drug_id):
     try:
         drug = Drug.query.get_or_404(drug_id)
         db.session.delete(drug)
+        search_index.reindex('drug', [drug_id])
+        reference_cache.bump_version('Drug')
         db.session.commit()
         return jsonify({'message': 'Drug deleted', 'DrugId': drug_id})
     except Exception as e:
@@ -7,16 +7,29 @@ except Exception:
     _PANDAS_AVAILABLE = False
 from flask import Blueprint, request, jsonify, current_app, render_template
 from werkzeug.utils import secure_filename
-import tempfile
+import uuid
 
 # Import the functions from separate files
 from api.excel_functions1 import import_drugs, import_icd, import_patients
 from api.excel_functions2 import import_procedures, import_signs, import_staff
 from api.excel_functions3 import import_tests
+from utils import reference_cache, import_jobs
 
 excel_upload_bp = Blueprint('excel_upload', __name__)
 
-ALLOWED_EXTENSIONS = {'xlsx', 'xls'}
+ALLOWED_EXTENSIONS = {'xlsx', 'xls', 'csv'}
+
+# Catalog tables whose reference-cache version must be bumped after an import
+CATALOG_TABLES_BY_IMPORT = {
+    'body_parts': ('BodyPart',),
+    'body_sites': ('BodySite',),
+    'departments': ('Department',),
+    'drugs': ('Drug',),
+    'icd': ('ICD',),
+    'procedures': ('Proc',),
+    'signs': ('Sign',),
+    'tests': ('Test',),
+}
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -282,14 +295,60 @@ def generate_template(table_name):
         mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
     )
 
+def get_importer(table_name):
+    """Import function for an upload table id, or None if unsupported"""
+    return {
+        'body_parts': import_body_parts,
+        'body_sites': import_body_sites,
+        'departments': import_departments,
+        'drugs': import_drugs,
+        'icd': import_icd,
+        'patients': import_patients,
+        'procedures': import_procedures,
+        'signs': import_signs,
+        'staff': import_staff,
+        'tests': import_tests,
+    }.get(table_name)
+
+def run_import(table_name, file_path, sheet_name=0, progress=None):
+    """Stream an uploaded workbook or CSV into the table; called by the import job runner"""
+    from models_main import db
+    from utils import excel_reader
+    from utils.bulk_import import import_batches
+
+    # Rows are read and imported batch by batch, so memory stays bounded
+    result = import_batches(
+        get_importer(table_name),
+        excel_reader.iter_batches(file_path, sheet_name),
+        db,
+        progress=progress,
+        total_rows=excel_reader.estimate_rows(file_path, sheet_name)
+    )
+
+    # Invalidate cached catalogs in every worker
+    if table_name in CATALOG_TABLES_BY_IMPORT:
+        reference_cache.bump_version(*CATALOG_TABLES_BY_IMPORT[table_name])
+        db.session.commit()
+
+    return result
+
+@excel_upload_bp.record_once
+def _init_import_jobs(state):
+    import_jobs.init_app(state.app, run_import)
+
 @excel_upload_bp.route('/api/upload/excel/<string:table_name>', methods=['POST'])
 def upload_excel(table_name):
     """
-    Upload Excel file and import it to the specified database table.
+    Upload an Excel or CSV file and queue its import into the specified database table.
     Required: POST request with 'file' in form-data
-    Optional: 'sheet_name' in form-data (defaults to first sheet if not provided)
+    Optional: 'sheet_name' in form-data (defaults to first sheet if not provided; ignored for CSV)
+    Returns 202 with the job id; poll /api/upload/jobs/<job_id> for progress.
     """
-    from models_main import db
+    if not _PANDAS_AVAILABLE:
+        return jsonify({"error": "pandas not installed"}), 503
+
+    if get_importer(table_name) is None:
+        return jsonify({'error': f'Table {table_name} not supported for import'}), 400
     
     if 'file' not in request.files:
         return jsonify({'error': 'No file part'}), 400
@@ -300,336 +359,133 @@ def upload_excel(table_name):
         return jsonify({'error': 'No selected file'}), 400
     
     if file and allowed_file(file.filename):
-        # Save file to temporary location
+        # Keep the file until a worker has imported it
+        job_id = uuid.uuid4().hex
         filename = secure_filename(file.filename)
-        temp_dir = tempfile.mkdtemp()
-        temp_path = os.path.join(temp_dir, filename)
-        file.save(temp_path)
+        file_path = os.path.join(import_jobs.job_folder(current_app), f'{job_id}_{filename}')
+        file.save(file_path)
         
-        # Get sheet name if provided
-        sheet_name = request.form.get('sheet_name', 0)  # Default to first sheet if not specified
+        # Get sheet name if provided (first sheet if not specified)
+        sheet_name = request.form.get('sheet_name') or None
         
         try:
-            # Read Excel file
-            df = pd.read_excel(temp_path, sheet_name=sheet_name)
-            
-            # Handle different table types
-            if table_name == 'body_parts':
-                from models import BodyPart
-                result = import_body_parts(df, db)
-            elif table_name == 'body_sites':
-                from models import BodySite
-                result = import_body_sites(df, db)
-            elif table_name == 'departments':
-                from models import Department
-                result = import_departments(df, db)
-            elif table_name == 'drugs':
-                from models import Drug
-                result = import_drugs(df, db)
-            elif table_name == 'icd':
-                from models import ICD
-                result = import_icd(df, db)
-            elif table_name == 'patients':
-                from models import Patient
-                result = import_patients(df, db)
-            elif table_name == 'procedures':
-                from models import Proc
-                result = import_procedures(df, db)
-            elif table_name == 'signs':
-                from models import Sign
-                result = import_signs(df, db)
-            elif table_name == 'staff':
-                from models import Staff
-                result = import_staff(df, db)
-            elif table_name == 'tests':
-                from models import Test
-                result = import_tests(df, db)
-            else:
-                return jsonify({'error': f'Table {table_name} not supported for import'}), 400
-            
-            # Clean up temp file
-            os.unlink(temp_path)
-            os.rmdir(temp_dir)
-            
-            return jsonify(result)
-        
+            job = import_jobs.enqueue(table_name, file_path, file.filename, sheet_name, job_id=job_id)
+            response = job.to_dict()
+            response['status_url'] = f'/api/upload/jobs/{job.JobId}'
+            return jsonify(response), 202
         except Exception as e:
-            # Clean up temp file
             try:
-                os.unlink(temp_path)
-                os.rmdir(temp_dir)
-            except:
+                os.unlink(file_path)
+            except OSError:
                 pass
-                
             return jsonify({'error': str(e)}), 500
     
-    return jsonify({'error': 'File type not allowed. Please upload .xlsx or .xls files.'}), 400
+    return jsonify({'error': 'File type not allowed. Please upload .xlsx, .xls or .csv files.'}), 400
+
+@excel_upload_bp.route('/api/upload/jobs/<string:job_id>')
+def get_import_job(job_id):
+    """Progress (rows processed, errors so far) and final result of an import job"""
+    from models.ImportJob import ImportJob
+    try:
+        job = ImportJob.query.get(job_id)
+        if not job:
+            return jsonify({'error': 'Import job not found'}), 404
+        return jsonify(job.to_dict())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-def import_body_parts(df, db):
+@excel_upload_bp.route('/api/upload/jobs')
+def list_import_jobs():
+    """Recent import jobs, newest first.
+    Query params:
+    - status: filter by job status (queued, running, done, failed)
+    - limit: number of jobs (default 20)
+    """
+    from models.ImportJob import ImportJob
+    try:
+        query = ImportJob.query
+        status = request.args.get('status')
+        if status:
+            query = query.filter(ImportJob.Status == status)
+        limit = min(request.args.get('limit', 20, type=int), 100)
+        jobs = query.order_by(ImportJob.CreatedAt.desc(), ImportJob.JobId).limit(limit).all()
+        # The full result (with every row error) is only returned per job
+        return jsonify({'jobs': [dict(job.to_dict(), Result=None) for job in jobs]})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def import_body_parts(df, db, progress=None, lookups=None):
     """Import BodyPart data from DataFrame to database"""
-    import pandas as pd
     from models import BodyPart
-    
-    # Clean dataframe - remove empty rows and trim whitespace
-    df = df.dropna(how='all')
-    for col in df.select_dtypes(include=['object']).columns:
-        df[col] = df[col].astype(str).str.strip()
-    
-    # Define required columns
-    required_cols = ['BodyPartName']
-    
+    from utils.bulk_import import BulkImport
+
+    job = BulkImport(df, progress=progress, lookups=lookups)
+
     # Check if all required columns are present
-    if not all(col in df.columns for col in required_cols):
-        missing = [col for col in required_cols if col not in df.columns]
-        return {'error': f'Missing required columns: {", ".join(missing)}'}
-    
-    # Process data
-    total_rows = len(df)
-    imported = 0
-    updated = 0
-    skipped = 0
-    errors = []
-    
-    for idx, row in df.iterrows():
-        try:
-            # Check for missing required values
-            if pd.isna(row['BodyPartName']) or not str(row['BodyPartName']).strip():
-                errors.append(f"Error in row {idx+2}: Missing BodyPartName")
-                skipped += 1
-                continue
-            
-            # Check if BodyPartId is provided for updates
-            if 'BodyPartId' in df.columns and not pd.isna(row['BodyPartId']):
-                body_part_id = str(row['BodyPartId']).strip()
-                existing = BodyPart.query.get(body_part_id)
-                
-                if existing:
-                    # Update existing record
-                    existing.BodyPartName = row['BodyPartName']
-                    db.session.commit()  # Commit each row individually
-                    updated += 1
-                else:
-                    # Create new record with specified ID
-                    new_body_part = BodyPart(
-                        BodyPartId=body_part_id,
-                        BodyPartName=row['BodyPartName']
-                    )
-                    db.session.add(new_body_part)
-                    db.session.commit()  # Commit each row individually
-                    imported += 1
-            else:
-                # Create new record without specifying ID (auto-increment)
-                new_body_part = BodyPart(
-                    BodyPartName=row['BodyPartName']
-                )
-                db.session.add(new_body_part)
-                db.session.commit()  # Commit each row individually
-                imported += 1
-                
-        except Exception as e:
-            db.session.rollback()  # Reset session state after constraint violation
-            errors.append(f"Error in row {idx+2}: {str(e)}")
-            skipped += 1
-    
-    # Return results (no final commit needed since we commit each row)
-    return {
-        'success': True,
-        'total_rows': total_rows,
-        'imported': imported,
-        'updated': updated,
-        'skipped': skipped,
-        'errors': errors
-    }
-
-def import_body_sites(df, db):
+    error = job.missing_columns(['BodyPartName'])
+    if error:
+        return error
+
+    # Check for missing required values
+    job.require('BodyPartName')
+
+    # Rows without BodyPartId get an auto-generated ID
+    return job.upsert(db, BodyPart, {
+        'BodyPartId': job.integer('BodyPartId'),
+        'BodyPartName': job.text('BodyPartName')
+    }, key='BodyPartId')
+
+def import_body_sites(df, db, progress=None, lookups=None):
     """Import BodySite data from DataFrame to database"""
-    import pandas as pd
     from models import BodySite, BodyPart
-    
-    # Clean dataframe - remove empty rows and trim whitespace
-    df = df.dropna(how='all')
-    for col in df.select_dtypes(include=['object']).columns:
-        df[col] = df[col].astype(str).str.strip()
-    
-    # Define required columns
-    required_cols = ['SiteName', 'BodyPartId']
-    
+    from utils.bulk_import import BulkImport
+
+    job = BulkImport(df, progress=progress, lookups=lookups)
+
     # Check if all required columns are present
-    if not all(col in df.columns for col in required_cols):
-        missing = [col for col in required_cols if col not in df.columns]
-        return {'error': f'Missing required columns: {", ".join(missing)}'}
-    
-    # Process data
-    total_rows = len(df)
-    imported = 0
-    updated = 0
-    skipped = 0
-    errors = []
-    
-    for idx, row in df.iterrows():
-        try:
-            # Check for missing required values
-            if pd.isna(row['SiteName']) or not str(row['SiteName']).strip():
-                errors.append(f"Error in row {idx+2}: Missing SiteName")
-                skipped += 1
-                continue
-            
-            if pd.isna(row['BodyPartId']):
-                errors.append(f"Error in row {idx+2}: Missing BodyPartId")
-                skipped += 1
-                continue
-            
-            # Validate BodyPartId exists
-            body_part_id = str(row['BodyPartId']).strip()
-            body_part = BodyPart.query.get(body_part_id)
-            if not body_part:
-                errors.append(f"Error in row {idx+2}: BodyPartId '{body_part_id}' does not exist")
-                skipped += 1
-                continue
-            
-            # Optional fields with default values
-            site_desc = row['SiteDesc'] if 'SiteDesc' in df.columns and not pd.isna(row['SiteDesc']) else ''
-            
-            # Check if SiteId is provided for updates
-            if 'SiteId' in df.columns and not pd.isna(row['SiteId']):
-                site_id = str(row['SiteId']).strip()
-                existing = BodySite.query.get(site_id)
-                
-                if existing:
-                    # Update existing record
-                    existing.SiteName = row['SiteName']
-                    existing.SiteDesc = site_desc
-                    existing.BodyPartId = body_part_id
-                    db.session.commit()  # Commit each row individually
-                    updated += 1
-                else:
-                    # Create new record with specified ID
-                    new_site = BodySite(
-                        SiteId=site_id,
-                        SiteName=row['SiteName'],
-                        SiteDesc=site_desc,
-                        BodyPartId=body_part_id
-                    )
-                    db.session.add(new_site)
-                    db.session.commit()  # Commit each row individually
-                    imported += 1
-            else:
-                # Create new record without specifying ID (auto-increment)
-                new_site = BodySite(
-                    SiteName=row['SiteName'],
-                    SiteDesc=site_desc,
-                    BodyPartId=body_part_id
-                )
-                db.session.add(new_site)
-                db.session.commit()  # Commit each row individually
-                imported += 1
-                
-        except Exception as e:
-            db.session.rollback()  # Reset session state after constraint violation
-            errors.append(f"Error in row {idx+2}: {str(e)}")
-            skipped += 1
-    
-    # Return results (no final commit needed since we commit each row)
-    return {
-        'success': True,
-        'total_rows': total_rows,
-        'imported': imported,
-        'updated': updated,
-        'skipped': skipped,
-        'errors': errors
-    }
+    error = job.missing_columns(['SiteName', 'BodyPartId'])
+    if error:
+        return error
+
+    # Check for missing required values
+    job.require('SiteName', 'BodyPartId')
+
+    # Validate BodyPartId exists
+    body_part_ids = job.integer('BodyPartId')
+    job.must_exist(body_part_ids, BodyPart.BodyPartId, 'BodyPartId')
+
+    # Rows without SiteId get an auto-generated ID
+    return job.upsert(db, BodySite, {
+        'SiteId': job.integer('SiteId'),
+        'SiteName': job.text('SiteName'),
+        'BodyPartId': body_part_ids
+    }, key='SiteId')
         
 # Department import function
-def import_departments(df, db):
+def import_departments(df, db, progress=None, lookups=None):
     """Import Department data from DataFrame to database"""
-    import pandas as pd
     from models import Department
-    
-    # Clean dataframe - remove empty rows and trim whitespace
-    df = df.dropna(how='all')
-    for col in df.select_dtypes(include=['object']).columns:
-        df[col] = df[col].astype(str).str.strip()
-    
-    # Define required columns
-    required_cols = ['DepartmentName', 'DepartmentType']
-    
+    from utils.bulk_import import BulkImport
+
+    job = BulkImport(df, progress=progress, lookups=lookups)
+
     # Check if all required columns are present
-    if not all(col in df.columns for col in required_cols):
-        missing = [col for col in required_cols if col not in df.columns]
-        return {'error': f'Missing required columns: {", ".join(missing)}'}
-    
+    error = job.missing_columns(['DepartmentName', 'DepartmentType'])
+    if error:
+        return error
+
     # Validate DepartmentType values
     valid_types = ['Nội trú', 'Cấp cứu', 'Phòng khám']
-    invalid_types = []
-    for idx, row in df.iterrows():
-        if pd.notna(row['DepartmentType']) and row['DepartmentType'] not in valid_types:
-            invalid_types.append(f"Row {idx+2}: {row['DepartmentType']}")
-    
+    invalid_types = job.invalid_values('DepartmentType', valid_types, skip_blank=True)
     if invalid_types:
         return {'error': f'Invalid DepartmentType values. Must be one of: {", ".join(valid_types)}. Found: {", ".join(invalid_types)}'}
-    
-    # Process data
-    total_rows = len(df)
-    imported = 0
-    updated = 0
-    skipped = 0
-    errors = []
-    
-    for idx, row in df.iterrows():
-        try:
-            # Check for missing required values
-            if pd.isna(row['DepartmentName']) or not str(row['DepartmentName']).strip():
-                errors.append(f"Error in row {idx+2}: Missing DepartmentName")
-                skipped += 1
-                continue
-                
-            if pd.isna(row['DepartmentType']) or not str(row['DepartmentType']).strip():
-                errors.append(f"Error in row {idx+2}: Missing DepartmentType")
-                skipped += 1
-                continue
-            
-            # Check if DepartmentId is provided for updating
-            if 'DepartmentId' in df.columns and not pd.isna(row['DepartmentId']):
-                dept_id = str(row['DepartmentId']).strip()
-                existing = Department.query.get(dept_id)
-                
-                if existing:
-                    # Update existing record
-                    existing.DepartmentName = row['DepartmentName']
-                    existing.DepartmentType = row['DepartmentType']
-                    db.session.commit()  # Commit each row individually
-                    updated += 1
-                else:
-                    # Create new record with specified ID
-                    new_dept = Department(
-                        DepartmentId=dept_id,
-                        DepartmentName=row['DepartmentName'],
-                        DepartmentType=row['DepartmentType']
-                    )
-                    db.session.add(new_dept)
-                    db.session.commit()  # Commit each row individually
-                    imported += 1
-            else:
-                # Create new record with auto-generated ID
-                new_dept = Department(
-                    DepartmentName=row['DepartmentName'],
-                    DepartmentType=row['DepartmentType']
-                )
-                db.session.add(new_dept)
-                db.session.commit()  # Commit each row individually
-                imported += 1
-                
-        except Exception as e:
-            db.session.rollback()  # Reset session state after constraint violation
-            errors.append(f"Error in row {idx+2}: {str(e)}")
-            skipped += 1
-    
-    # Return results (no final commit needed since we commit each row)
-    return {
-        'success': True,
-        'total_rows': total_rows,
-        'imported': imported,
-        'updated': updated,
-        'skipped': skipped,
-        'errors': errors
-    }
+
+    # Check for missing required values
+    job.require('DepartmentName', 'DepartmentType')
+
+    # Rows without DepartmentId get an auto-generated ID
+    return job.upsert(db, Department, {
+        'DepartmentId': job.integer('DepartmentId'),
+        'DepartmentName': job.text('DepartmentName'),
+        'DepartmentType': job.text('DepartmentType')
+    }, key='DepartmentId')
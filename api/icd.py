@@ -0,0 +1,31 @@
+"""
+ICD API Blueprint
+Autocomplete of ICD-10 codes and names from the in-memory index
+"""
+from flask import Blueprint, request, jsonify
+from utils import icd_suggest
+
+icd_bp = Blueprint('icd', __name__)
+
+
+@icd_bp.record_once
+def _init_icd_index(state):
+    icd_suggest.init_app(state.app)
+
+
+@icd_bp.route('/icd/suggest', methods=['GET'])
+def suggest_icd():
+    """Suggest ICD codes for a code or name prefix.
+    Query params:
+      q: code prefix ("A09", "a09.0") or name words, accents optional ("tieu chay")
+      limit: maximum results (default 10, max 50)
+    """
+    try:
+        q = request.args.get('q', '', type=str)
+        limit = request.args.get('limit', icd_suggest.DEFAULT_LIMIT, type=int)
+        limit = max(1, min(limit, icd_suggest.MAX_LIMIT))
+        results = icd_suggest.suggest(q, limit)
+        return jsonify({'suggestions': results, 'count': len(results)})
+    except Exception as e:
+        print(f"Error in suggest_icd: {e}")
+        return jsonify({'error': str(e)}), 500
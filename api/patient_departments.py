@@ -1,7 +1,9 @@
 from flask import Blueprint, jsonify, request
 from datetime import datetime
 from models_main import db
-from models import PatientDepartment, Patient, Department
+from models import PatientDepartment, Patient, Department, DepartmentCensus
+from api.department_patients import publish_patient_move
+from utils import department_events
 
 # Create Blueprint for patient departments API routes
 patient_depts_bp = Blueprint('patient_departments', __name__)
@@ -102,22 +104,29 @@ def assign_patient_department(patient_id):
                 Current=True
             ).all()
             
+            now = datetime.now()
             for assignment in current_assignments:
                 assignment.Current = False
-                assignment.EndDate = datetime.now()
+                assignment.EndDate = now
             
             # Create new department assignment
             new_assignment = PatientDepartment(
                 PatientId=patient_id,
                 DepartmentId=new_department_id,
                 Current=True,
-                At=datetime.now(),
+                At=now,
                 EndDate=None,
                 Reason=reason if reason in ['DT', 'PT', 'KCK', 'CLS', 'KH'] else 'DT'
             )
             
             db.session.add(new_assignment)
+            # Keep the department census in step, in the same transaction
+            previous_departments = [assignment.DepartmentId for assignment in current_assignments]
+            DepartmentCensus.record_patient_move(previous_departments, new_department_id, now)
+            # Live updates for the department pages (utils/department_events.py)
+            publish_patient_move(patient_id, previous_departments, new_department_id)
             db.session.commit()
+            department_events.notify()
             
             return jsonify({
                 'success': True,
@@ -13,16 +13,50 @@ import datetime
 import mimetypes
 from werkzeug.utils import secure_filename
 import io
-from PIL import Image, ImageFile
-import pdf2image
-import subprocess
+from PIL import ImageFile
 import logging
+from utils import thumbnails, http_cache
+from utils.pagination import wants_pagination, get_page_args, keyset_paginate, InvalidCursor
+from utils.projection import Field, FieldSet, InvalidFields
 
 # Enable loading of truncated images
 ImageFile.LOAD_TRUNCATED_IMAGES = True
 
 patient_documents_bp = Blueprint('patient_documents', __name__)
 
+
+@patient_documents_bp.record_once
+def _init_thumbnails(state):
+    thumbnails.init_app(state.app)
+
+
+def _format_datetime(value):
+    # Same format as PatientDocuments.to_dict
+    return value.strftime('%Y-%m-%d %H:%M:%S') if value else None
+
+
+# Fields selectable with ?fields= (PatientDocuments.to_dict plus patient and type names)
+DOCUMENT_FIELDS = FieldSet({
+    'DocumentId': PatientDocuments.DocumentId,
+    'PatientId': PatientDocuments.PatientId,
+    'DocumentTypeId': PatientDocuments.DocumentTypeId,
+    'document_links': PatientDocuments.document_links,
+    'document_metadata': PatientDocuments.document_metadata,
+    'FileType': PatientDocuments.FileType,
+    'FileSize': PatientDocuments.FileSize,
+    'UploadDate': Field(PatientDocuments.UploadDate, format=_format_datetime),
+    'LastModified': Field(PatientDocuments.LastModified, format=_format_datetime),
+    'file_path': PatientDocuments.file_path,
+    'original_filename': PatientDocuments.original_filename,
+    'file_type': PatientDocuments.file_type,
+    'file_size': PatientDocuments.file_size,
+    'upload_date': Field(PatientDocuments.upload_date, format=_format_datetime),
+    'last_modified': Field(PatientDocuments.last_modified, format=_format_datetime),
+    'PatientName': Patient.PatientName,
+    'PatientAge': Patient.PatientAge,
+    'DocumentTypeName': DocumentType.DocumentTypeName
+})
+
 def get_full_document_path():
     """Get the absolute path to the documents directory"""
     # Use the application root path + the documents path
@@ -41,92 +75,18 @@ def ensure_documents_dir():
     
     return docs_path
 
-def generate_thumbnail(file_path, file_type, original_filename):
-    """Generate thumbnail for supported file types"""
+def queue_thumbnail(document):
+    """Hand a document to the background thumbnail workers"""
     docs_path = get_full_document_path()
-    thumbs_path = os.path.join(docs_path, 'thumbnails')
-    
-    # Ensure thumbnails directory exists
-    if not os.path.exists(thumbs_path):
-        os.makedirs(thumbs_path, exist_ok=True)
-    
-    # Generate thumbnail filename
-    base_name = os.path.splitext(os.path.basename(file_path))[0]
-    thumb_filename = f"{base_name}_thumb.jpg"
-    thumb_path = os.path.join(thumbs_path, thumb_filename)
-    
-    try:
-        if file_type and file_type.startswith('image/'):
-            try:
-                # Generate thumbnail for images
-                with Image.open(file_path) as img:
-                    # Convert to RGB if necessary (for PNG with transparency, etc.)
-                    if img.mode in ('RGBA', 'LA', 'P'):
-                        img = img.convert('RGB')
-                    
-                    # Create thumbnail maintaining aspect ratio
-                    img.thumbnail((200, 200), Image.Resampling.LANCZOS)
-                    img.save(thumb_path, 'JPEG', quality=85, optimize=True)
-                    
-                    return f"thumbnails/{thumb_filename}"
-            except Exception as img_error:
-                current_app.logger.error(f"Error processing image: {img_error}")
-                return None
-                
-        elif file_type and 'pdf' in file_type.lower():
-            # Generate thumbnail for PDF (first page)
-            try:
-                # Convert first page of PDF to image
-                pages = pdf2image.convert_from_path(file_path, first_page=1, last_page=1, dpi=150)
-                if pages:
-                    img = pages[0]
-                    # Convert to RGB if necessary
-                    if img.mode in ('RGBA', 'LA', 'P'):
-                        img = img.convert('RGB')
-                    
-                    # Create thumbnail
-                    img.thumbnail((200, 200), Image.Resampling.LANCZOS)
-                    img.save(thumb_path, 'JPEG', quality=85, optimize=True)
-                    
-                    return f"thumbnails/{thumb_filename}"
-            except Exception as pdf_error:
-                print(f"Error generating PDF thumbnail: {pdf_error}")
-                
-        elif file_type and any(office_type in file_type.lower() for office_type in ['word', 'excel', 'powerpoint', 'document', 'sheet', 'presentation']):
-            # For Office documents, we can try to generate a generic thumbnail
-            # or use LibreOffice headless mode if available
-            try:
-                # Try using LibreOffice to convert first page to image
-                temp_pdf = os.path.join(thumbs_path, f"{base_name}_temp.pdf")
-                result = subprocess.run([
-                    'libreoffice', '--headless', '--convert-to', 'pdf', 
-                    '--outdir', thumbs_path, file_path
-                ], capture_output=True, timeout=30)
-                
-                if result.returncode == 0 and os.path.exists(temp_pdf):
-                    # Convert the PDF to image
-                    pages = pdf2image.convert_from_path(temp_pdf, first_page=1, last_page=1, dpi=150)
-                    if pages:
-                        img = pages[0]
-                        if img.mode in ('RGBA', 'LA', 'P'):
-                            img = img.convert('RGB')
-                        img.thumbnail((200, 200), Image.Resampling.LANCZOS)
-                        img.save(thumb_path, 'JPEG', quality=85, optimize=True)
-                        
-                        # Clean up temp PDF
-                        os.remove(temp_pdf)
-                        
-                        return f"thumbnails/{thumb_filename}"
-                        
-            except Exception as office_error:
-                print(f"Error generating Office document thumbnail: {office_error}")
-        
-        # Return None if thumbnail generation is not supported or failed
-        return None
-        
-    except Exception as e:
-        current_app.logger.error(f"Error generating thumbnail for {original_filename}: {e}")
-        return None
+    thumbnails.submit(
+        current_app._get_current_object(),
+        PatientDocuments,
+        document.DocumentId,
+        os.path.join(docs_path, document.document_links['file_path']),
+        document.file_type,
+        os.path.join(docs_path, 'thumbnails'),
+        DOCUMENTS_PATH
+    )
 
 def generate_unique_filename(original_filename):
     """Generate a unique filename to avoid conflicts"""
@@ -139,11 +99,18 @@ def generate_unique_filename(original_filename):
 
 @patient_documents_bp.route('/patient_documents', methods=['GET'])
 def list_patient_documents():
-    """List all patient documents with optional filter by patient ID"""
+    """List all patient documents with optional filter by patient ID.
+    Optional limit/cursor params enable keyset pagination ordered by DocumentId.
+    Optional fields param selects a subset of the document fields.
+    """
     try:
         # Get query parameters
         patient_id = request.args.get('patient_id')
         document_type_id = request.args.get('document_type_id')
+        try:
+            fields = DOCUMENT_FIELDS.requested()
+        except InvalidFields as e:
+            return jsonify({'error': str(e)}), 400
         
         # Start with base query
         query = db.session.query(
@@ -163,19 +130,43 @@ def list_patient_documents():
         if document_type_id:
             query = query.filter(PatientDocuments.DocumentTypeId == document_type_id)
         
+        # Only the requested columns (plus the sort key) when fields is given
+        key_func = lambda row: (row[0].DocumentId,)
+        if fields:
+            query = DOCUMENT_FIELDS.project(query, fields, keys=[PatientDocuments.DocumentId])
+            key_func = DOCUMENT_FIELDS.key_func(1)
+        
         # Execute query
-        results = query.all()
+        next_cursor = None
+        if wants_pagination():
+            cursor, limit = get_page_args()
+            try:
+                results, next_cursor = keyset_paginate(
+                    query, [PatientDocuments.DocumentId], cursor, limit,
+                    key_func=key_func
+                )
+            except InvalidCursor as e:
+                return jsonify({'error': str(e)}), 400
+        else:
+            results = query.all()
         
         # Format response
-        documents = []
-        for doc, patient_name, patient_age, doc_type_name in results:
-            doc_dict = doc.to_dict()
-            doc_dict['PatientName'] = patient_name
-            doc_dict['PatientAge'] = patient_age
-            doc_dict['DocumentTypeName'] = doc_type_name
-            documents.append(doc_dict)
+        if fields:
+            serialize = DOCUMENT_FIELDS.serializer(fields)
+            documents = [serialize(row) for row in results]
+        else:
+            documents = []
+            for doc, patient_name, patient_age, doc_type_name in results:
+                doc_dict = doc.to_dict()
+                doc_dict['PatientName'] = patient_name
+                doc_dict['PatientAge'] = patient_age
+                doc_dict['DocumentTypeName'] = doc_type_name
+                documents.append(doc_dict)
             
-        return jsonify({'patient_documents': documents})
+        response = {'patient_documents': documents}
+        if wants_pagination():
+            response['next_cursor'] = next_cursor
+        return jsonify(response)
     except Exception as e:
         print(f"Error listing patient documents: {e}")
         return jsonify({'error': str(e)}), 500
@@ -189,37 +180,39 @@ def get_patient_document_thumbnail(document_id):
         if not document:
             return jsonify({'error': 'Patient document not found'}), 404
         
-        # Check if thumbnail exists
-        if not document.document_links or 'thumbnail_path' not in document.document_links:
-            # Try to generate thumbnail on-the-fly if original file exists
-            if 'file_path' in document.document_links:
-                file_path = os.path.join(get_full_document_path(), document.document_links['file_path'])
-                if os.path.exists(file_path):
-                    thumbnail_path = generate_thumbnail(file_path, document.file_type, document.original_filename)
-                    if thumbnail_path:
-                        try:
-                            # Update document with thumbnail info
-                            updated_links = dict(document.document_links) if document.document_links else {}
-                            updated_links['thumbnail_path'] = thumbnail_path
-                            updated_links['thumbnail_url'] = f"{DOCUMENTS_PATH}/{thumbnail_path}"
-                            
-                            document.document_links = updated_links
-                            db.session.commit()
-                        except Exception as db_error:
-                            current_app.logger.error(f"Database update error: {db_error}")
-                            db.session.rollback()
-                            return jsonify({'error': str(db_error)}), 500
-                    else:
-                        return jsonify({'error': 'Thumbnail not available for this file type'}), 404
-                else:
-                    return jsonify({'error': 'Original file not found'}), 404
-            else:
+        links = document.document_links or {}
+        
+        # Thumbnails are rendered in the background; serve a placeholder meanwhile
+        if 'thumbnail_path' not in links:
+            if thumbnails.is_pending(links) and not thumbnails.pending_is_stale(links):
+                return thumbnails.placeholder_response()
+            if links.get('thumbnail_unavailable') or not thumbnails.is_supported(document.file_type):
+                return jsonify({'error': 'Thumbnail not available for this file type'}), 404
+            if 'file_path' not in links:
                 return jsonify({'error': 'No thumbnail available'}), 404
+            if not os.path.exists(os.path.join(get_full_document_path(), links['file_path'])):
+                return jsonify({'error': 'Original file not found'}), 404
+            
+            # Not queued yet (older document) or left pending by a restarted worker
+            try:
+                document.document_links = thumbnails.mark_pending(links)
+                db.session.commit()
+            except Exception as db_error:
+                current_app.logger.error(f"Database update error: {db_error}")
+                db.session.rollback()
+                return jsonify({'error': str(db_error)}), 500
+            queue_thumbnail(document)
+            return thumbnails.placeholder_response()
         
         # Serve the thumbnail file
         thumbnail_path = os.path.join(get_full_document_path(), document.document_links['thumbnail_path'])
         if os.path.exists(thumbnail_path):
-            return send_file(thumbnail_path, mimetype='image/jpeg')
+            return http_cache.send_cached_file(
+                thumbnail_path,
+                etag=document.document_links.get('thumbnail_sha256'),
+                max_age=current_app.config.get('DOCUMENT_CACHE_MAX_AGE', 0),
+                mimetype='image/jpeg'
+            )
         else:
             return jsonify({'error': 'Thumbnail file not found'}), 404
             
@@ -263,8 +256,11 @@ def get_patient_document(document_id):
                 file_path = os.path.join(get_full_document_path(), doc.document_links['file_path'])
                 
                 if os.path.exists(file_path):
-                    return send_file(
+                    # Uploaded files never change: hash recorded at upload is the ETag
+                    return http_cache.send_cached_file(
                         file_path,
+                        etag=doc.document_links.get('sha256'),
+                        max_age=current_app.config.get('DOCUMENT_CACHE_MAX_AGE', 0),
                         as_attachment=True,
                         download_name=doc.original_filename or os.path.basename(file_path),
                         mimetype=doc.file_type or 'application/octet-stream'
@@ -357,19 +353,16 @@ def upload_patient_document():
         # Determine file type
         file_type = file.content_type or mimetypes.guess_type(file.filename)[0] or 'application/octet-stream'
         
-        # Generate thumbnail if supported
-        thumbnail_path = generate_thumbnail(file_path, file_type, file.filename)
-        
         # Create document links JSON
         document_links = {
             'file_path': unique_filename,
+            'sha256': http_cache.sha256_file(file_path),  # ETag for downloads
             'url': f"{DOCUMENTS_PATH}/{unique_filename}"
         }
         
-        # Add thumbnail path if generated
-        if thumbnail_path:
-            document_links['thumbnail_path'] = thumbnail_path
-            document_links['thumbnail_url'] = f"{DOCUMENTS_PATH}/{thumbnail_path}"
+        # Thumbnail is rendered in the background once the record exists
+        if thumbnails.is_supported(file_type):
+            document_links = thumbnails.mark_pending(document_links)
         
         # Create metadata JSON
         metadata_value = {
@@ -403,6 +396,9 @@ def upload_patient_document():
             db.session.rollback()
             return jsonify({'error': f'Failed to save document record: {str(db_error)}'}), 500
         
+        if thumbnails.is_pending(new_document.document_links):
+            queue_thumbnail(new_document)
+        
         # Format response
         doc_dict = new_document.to_dict()
         doc_dict['PatientName'] = patient.PatientName
@@ -1,45 +1,132 @@
-from flask import Blueprint, jsonify, send_file, Response, request
+from flask import Blueprint, jsonify, send_file, request
 from models_main import db
 from models import Patient
+from utils import image_store, image_variants, image_processing, http_cache
 import base64
 import io
 from PIL import Image
-import tempfile
 
 # Create Blueprint for patient images API routes
 patient_images_bp = Blueprint('patient_images', __name__)
 
+# Versioned URLs (?v=<hash>) always serve the same bytes
+VERSIONED_MAX_AGE = 365 * 24 * 3600
+
+def release_image(image_hash):
+    """Remove a stored image once no patient references it any more.
+
+    Runs after the caller committed. The count and the delete hold the hash's
+    reference lock, so an upload of the same content (which reuses the file)
+    either commits its reference before the count or stores the file again
+    after the delete.
+    """
+    if not image_hash:
+        return
+    try:
+        with image_store.reference_lock(image_hash):
+            # End the caller's transaction so the count sees every commit made
+            # before the lock was taken
+            db.session.commit()
+            if not Patient.query.filter_by(PatientImageHash=image_hash).count():
+                image_variants.delete(image_hash)
+                image_store.delete(image_hash)
+            db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error releasing patient image {image_hash}: {e}")
+
 @patient_images_bp.route('/patient/image/<patient_id>', methods=['GET'])
 def get_patient_image(patient_id):
-    """Get patient image as binary data or base64 encoded string"""
+    """Get patient image as binary data or base64 encoded string
+    
+    Query params:
+    - size: pixels (64, 200, 800); serves the smallest variant at least that large
+    - format: 'base64' for JSON, 'webp' or 'jpeg' to force the variant format
+      (default: WebP when the browser accepts it)
+    - v: content version from PatientImageUrls; makes the response cacheable for a year
+    """
     try:
-        # Query the patient image
-        patient = Patient.query.get(patient_id)
+        # Query the patient image; whether a legacy BLOB exists is read in the
+        # same statement, without loading the deferred column
+        row = db.session.query(Patient, Patient.PatientImage.isnot(None)).filter(
+            Patient.PatientId == patient_id
+        ).first()
         
-        if not patient:
+        if not row:
             return jsonify({'error': 'Patient not found'}), 404
+        patient, has_legacy_image = row
             
-        if not patient.PatientImage:
+        # Images live in the content-addressed store; rows not yet drained by
+        # tools/migrate_patient_images.py still carry the legacy BLOB, which
+        # is served read-only
+        image_path = None
+        image_data = None
+        if patient.PatientImageHash and image_store.exists(patient.PatientImageHash):
+            image_path = image_store.path_for(patient.PatientImageHash)
+        elif not patient.PatientImageHash and has_legacy_image:
+            image_data = patient.PatientImage  # deferred column, loaded on demand
+        
+        if not image_path and not image_data:
             return jsonify({'error': 'No image available for this patient'}), 404
         
         # Check if base64 format is requested
         format_type = request.args.get('format', 'binary')
         
+        # Resized variant; legacy BLOB rows only have the original
+        size = image_variants.pick_size(request.args.get('size')) if image_path else None
+        image_format = 'jpeg'
+        negotiated = False
+        if size:
+            if format_type != 'base64':
+                image_format = image_variants.pick_format(format_type, request.accept_mimetypes)
+                negotiated = format_type not in image_variants.FORMATS
+            image_path = image_variants.ensure(patient.PatientImageHash, size, image_format)
+        
+        # The content hash is the ETag: a revalidation is answered from the
+        # row alone. The photo can be replaced at the same URL, so browsers
+        # revalidate every time (Cache-Control: no-cache) unless the URL
+        # carries the content version.
+        etag = None
+        max_age = 0
+        if image_path:
+            etag = f"{patient.PatientImageHash}-{size}.{image_format}" if size else patient.PatientImageHash
+            version = request.args.get('v')
+            if version and patient.PatientImageHash.startswith(version):
+                max_age = VERSIONED_MAX_AGE
+        elif image_data:
+            # Legacy BLOB: same strong ETag as once it is in the store
+            etag = image_store.content_hash(image_data)
+        last_modified = http_cache.file_mtime(image_path) if image_path else None
+        if format_type != 'base64':
+            cached = http_cache.not_modified(etag, last_modified, max_age)
+            if cached:
+                if negotiated:
+                    cached.vary.add('Accept')
+                return cached
+        
         if format_type == 'base64':
             # Return base64 encoded image
-            encoded_image = base64.b64encode(patient.PatientImage).decode('utf-8')
+            if image_path:
+                with open(image_path, 'rb') as f:
+                    image_data = f.read()
+            encoded_image = base64.b64encode(image_data).decode('utf-8')
             return jsonify({
                 'patient_id': patient_id,
                 'image': encoded_image
             })
         else:
-            # Return binary image
-            return send_file(
-                io.BytesIO(patient.PatientImage),
-                mimetype='image/jpeg',  # Assuming images are stored as JPEG
+            # Return binary image (streamed from disk when stored as a file)
+            response = send_file(
+                image_path or io.BytesIO(image_data),
+                mimetype=image_variants.mimetype(image_format),  # originals are stored as JPEG
                 as_attachment=False,
-                download_name=f'patient_{patient_id}.jpg'
+                download_name=f'patient_{patient_id}.{image_variants.FORMATS[image_format][0]}',
+                conditional=False,
+                etag=False
             )
+            if negotiated:
+                response.vary.add('Accept')
+            return http_cache.set_headers(response, etag, last_modified, max_age)
             
     except Exception as e:
         print(f"Error in get_patient_image: {e}")
@@ -75,16 +162,8 @@ def upload_patient_image(patient_id):
         try:
             print(f"Processing image for patient {patient_id}, original size: {size_mb:.2f}MB")
             
-            # Create an image object from bytes
-            img = Image.open(io.BytesIO(image_data))
-            
-            # Get original dimensions
-            original_width, original_height = img.size
-            print(f"Original image dimensions: {original_width}x{original_height}")
-            
-            # Determine if we need to resize based on dimensions and file size
+            # Determine the largest stored dimensions
             max_size = (800, 800)  # Reduced max dimensions for better performance
-            resize_needed = (original_width > max_size[0] or original_height > max_size[1])
             
             # More aggressive optimization for larger files
             quality = 80  # Default quality
@@ -93,21 +172,15 @@ def upload_patient_image(patient_id):
             elif size_mb > 0.8:
                 quality = 75  # Medium compression for large files
                 
-            # Apply resizing if needed
-            if resize_needed:
-                print(f"Resizing image from {original_width}x{original_height} to fit within {max_size}")
-                img.thumbnail(max_size, Image.LANCZOS)
-                print(f"New dimensions after resize: {img.width}x{img.height}")
+            # Decode at reduced scale (JPEG draft + reduce), upright, RGB on white
+            with Image.open(io.BytesIO(image_data)) as original:
+                original_width, original_height = original.size
+                upright = image_processing.exif_orientation(original) == 1
+            img = image_processing.load_image(io.BytesIO(image_data), max_size)
+            print(f"Decoded {original_width}x{original_height} image to {img.width}x{img.height}")
             
             # Standardize format to JPEG for consistent handling
             output_format = 'JPEG'
-            if img.mode == 'RGBA':
-                # Convert transparent images to RGB with white background
-                background = Image.new('RGB', img.size, (255, 255, 255))
-                background.paste(img, mask=img.split()[3])  # 3 is the alpha channel
-                img = background
-            elif img.mode != 'RGB':
-                img = img.convert('RGB')
             
             # Create a BytesIO object for the optimized image
             optimized_buffer = io.BytesIO()
@@ -118,9 +191,9 @@ def upload_patient_image(patient_id):
             optimized_buffer.seek(0)
             optimized_data = optimized_buffer.getvalue()
             
-            # Use the optimized data if it's actually smaller
+            # Use the optimized data if it's actually smaller (or had to be rotated upright)
             new_size_mb = len(optimized_data) / (1024 * 1024)
-            if len(optimized_data) < len(image_data):
+            if len(optimized_data) < len(image_data) or not upright:
                 image_data = optimized_data
                 print(f"Optimized image for patient {patient_id}, new size: {new_size_mb:.2f}MB (saved {size_mb - new_size_mb:.2f}MB)")
             else:
@@ -128,16 +201,32 @@ def upload_patient_image(patient_id):
         except Exception as e:
             print(f"Error optimizing image: {e}. Using original.")
         
-        # Save image data to database
-        patient.PatientImage = image_data
+        # Save image to the image store; the row keeps only its hash. The
+        # file may already exist for another patient, so storing it and
+        # committing the reference must not interleave with release_image
+        old_hash = patient.PatientImageHash
+        new_hash = image_store.content_hash(image_data)
+        with image_store.reference_lock(new_hash):
+            patient.PatientImageHash = image_store.put(image_data)
+            patient.PatientImage = None
+            
+            # Avatar/list/full-size variants in JPEG and WebP
+            try:
+                image_variants.generate(patient.PatientImageHash, image_data)
+            except Exception as e:
+                print(f"Error generating image variants for patient {patient_id}: {e}. They will be generated on first request.")
+            
+            # Commit the changes
+            db.session.commit()
         
-        # Commit the changes
-        db.session.commit()
+        if old_hash != patient.PatientImageHash:
+            release_image(old_hash)
         
         return jsonify({
             'success': True,
             'message': f'Image for patient {patient_id} has been updated',
-            'size': f'{size_mb:.2f}MB'
+            'size': f'{size_mb:.2f}MB',
+            'PatientImageUrls': image_variants.urls(patient_id, patient.PatientImageHash)
         })
         
     except Exception as e:
@@ -155,11 +244,15 @@ def delete_patient_image(patient_id):
             return jsonify({'error': 'Patient not found'}), 404
             
         # Set image to None
+        old_hash = patient.PatientImageHash
+        patient.PatientImageHash = None
         patient.PatientImage = None
         
         # Commit the changes
         db.session.commit()
         
+        release_image(old_hash)
+        
         return jsonify({
             'success': True,
             'message': f'Image for patient {patient_id} has been deleted'
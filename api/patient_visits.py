@@ -4,9 +4,11 @@ Retrieve and manage visits for a specific patient
 """
 from flask import Blueprint, jsonify, request
 from datetime import datetime
-from sqlalchemy import desc, asc
+from sqlalchemy import desc
 from models_main import db
-from models import Patient, Visit, Department, Staff, VisitDiagnosis, PatientDepartment, VisitStaff
+from models import Patient, Visit, Staff, VisitDiagnosis, VisitStaff, VisitLoader, DepartmentCensus
+from api.department_patients import publish_visit_created
+from utils import department_events
 
 patient_visits_bp = Blueprint('patient_visits', __name__)
 
@@ -19,55 +21,8 @@ def get_patient_visits(patient_id):
         if not patient:
             return jsonify({'error': 'Patient not found'}), 404
         
-        # Query visits with related data
-        results = (
-            db.session.query(
-                Visit.VisitId,
-                Visit.PatientId, 
-                Visit.VisitPurpose,
-                Visit.VisitTime
-            )
-            .filter(Visit.PatientId == patient_id)
-            .order_by(desc(Visit.VisitTime))
-            .all()
-        )
-        
-        # Convert results to dictionaries and get related data
-        visits_data = []
-        for r in results:
-            row_dict = dict(r._mapping)
-            
-            # Format datetime for JSON serialization
-            if row_dict.get('VisitTime'):
-                if hasattr(row_dict['VisitTime'], 'isoformat'):
-                    row_dict['VisitTime'] = row_dict['VisitTime'].isoformat()
-                else:
-                    row_dict['VisitTime'] = str(row_dict['VisitTime'])
-            
-            # Get staff information for this visit
-            visit_staff = VisitStaff.query.filter_by(VisitId=row_dict['VisitId']).all()
-            staff_info = []
-            for vs in visit_staff:
-                staff = Staff.query.get(vs.StaffId)
-                if staff:
-                    staff_info.append({
-                        'StaffId': staff.StaffId,
-                        'StaffName': staff.StaffName,
-                        'StaffRole': staff.StaffRole
-                    })
-            
-            row_dict['staff'] = staff_info
-            
-            # Get diagnoses for each visit
-            diagnoses = VisitDiagnosis.query.filter_by(VisitId=row_dict['VisitId']).all()
-            row_dict['diagnoses'] = [
-                {
-                    'ICDCode': d.ICDCode,
-                    'ActualDiagnosis': d.ActualDiagnosis
-                } for d in diagnoses
-            ]
-            
-            visits_data.append(row_dict)
+        # Load visits, staff and diagnoses in a fixed number of queries
+        visits_data = VisitLoader.load_patient_visits(patient_id)
         
         return jsonify({
             'patient': {
@@ -156,49 +111,12 @@ def get_patient_latest_visit(patient_id):
         if not patient:
             return jsonify({'error': 'Patient not found'}), 404
         
-        # Get latest visit
-        latest_visit = (
-            db.session.query(Visit)
-            .filter(Visit.PatientId == patient_id)
-            .order_by(desc(Visit.VisitTime))
-            .first()
-        )
+        # Get latest visit with its staff and diagnoses
+        visit_data = VisitLoader.load_latest_visit(patient_id)
         
-        if not latest_visit:
+        if not visit_data:
             return jsonify({'error': 'No visits found for this patient'}), 404
         
-        visit_data = latest_visit.to_dict()
-        
-        # Get staff information for this visit
-        visit_staff = VisitStaff.query.filter_by(VisitId=latest_visit.VisitId).all()
-        staff_info = []
-        for vs in visit_staff:
-            staff = Staff.query.get(vs.StaffId)
-            if staff:
-                staff_info.append({
-                    'StaffId': staff.StaffId,
-                    'StaffName': staff.StaffName,
-                    'StaffRole': staff.StaffRole
-                })
-        
-        visit_data['staff'] = staff_info
-        
-        # Format datetime for JSON serialization
-        if visit_data.get('VisitTime'):
-            if hasattr(visit_data['VisitTime'], 'isoformat'):
-                visit_data['VisitTime'] = visit_data['VisitTime'].isoformat()
-            else:
-                visit_data['VisitTime'] = str(visit_data['VisitTime'])
-        
-        # Get diagnoses for the visit
-        diagnoses = VisitDiagnosis.query.filter_by(VisitId=visit_data['VisitId']).all()
-        visit_data['diagnoses'] = [
-            {
-                'ICDCode': d.ICDCode,
-                'ActualDiagnosis': d.ActualDiagnosis
-            } for d in diagnoses
-        ]
-        
         return jsonify({
             'patient': {
                 'PatientId': patient.PatientId,
@@ -253,7 +171,11 @@ def create_patient_visit(patient_id):
             visit_staff = VisitStaff(VisitId=new_visit.VisitId, StaffId=staff_id)
             db.session.add(visit_staff)
         
+        # Department visit counters and live update for the patient's department pages
+        DepartmentCensus.record_visit(patient_id, new_visit.VisitTime)
+        publish_visit_created(new_visit)
         db.session.commit()
+        department_events.notify()
         
         # Add diagnosis if provided
         if 'diagnosis' in payload and payload['diagnosis']:
@@ -5,35 +5,106 @@ CRUD operations for Patient management
 from flask import Blueprint, request, jsonify
 from sqlalchemy import asc, text
 from models_main import db
-from models import Patient
+from models import Patient, PatientChart
+from utils.pagination import wants_pagination, get_page_args, keyset_paginate, InvalidCursor
+from utils import image_variants, patient_duplicates
+from utils.streaming import wants_stream, iter_rows, ndjson_response
 
 patients_bp = Blueprint('patients', __name__)
 
+def _patient_list_item(patient):
+    """Row format of /api/patients (a Patient or a row of PATIENT_LIST_COLUMNS)"""
+    return {
+        'PatientId': patient.PatientId,
+        'PatientName': patient.PatientName,
+        'PatientGender': patient.PatientGender,
+        'PatientAge': patient.PatientAge,
+        'PatientAddress': patient.PatientAddress,
+        'PatientPhone': patient.PatientPhone,
+        'PatientBHYT': patient.PatientBHYT,
+        'PatientImageUrls': image_variants.urls(patient.PatientId, patient.PatientImageHash)
+    }
+
+
+PATIENT_LIST_COLUMNS = (
+    Patient.PatientId, Patient.PatientName, Patient.PatientGender, Patient.PatientAge,
+    Patient.PatientAddress, Patient.PatientPhone, Patient.PatientBHYT, Patient.PatientImageHash
+)
+
 @patients_bp.route('/patients', methods=['GET'])
 def list_patients():
-    """List all patients"""
+    """List all patients.
+    Query params (optional, enable keyset pagination ordered by PatientId):
+      limit: page size
+      cursor: opaque next_cursor from the previous page
+    With Accept: application/x-ndjson or stream=1 every patient is streamed
+    as one JSON line, ordered by PatientId.
+    """
     try:
-        # Query all patients
-        patients = Patient.query.all()
+        if wants_stream():
+            rows = iter_rows(db.session.query(*PATIENT_LIST_COLUMNS).order_by(Patient.PatientId))
+            return ndjson_response(_patient_list_item(row) for row in rows)
+        
+        next_cursor = None
+        if wants_pagination():
+            cursor, limit = get_page_args()
+            try:
+                patients, next_cursor = keyset_paginate(Patient.query, [Patient.PatientId], cursor, limit)
+            except InvalidCursor as e:
+                return jsonify({'error': str(e)}), 400
+        else:
+            # Query all patients
+            patients = Patient.query.all()
         
         # Convert to dict
-        patients_data = []
-        for patient in patients:
-            patients_data.append({
-                'PatientId': patient.PatientId,
-                'PatientName': patient.PatientName,
-                'PatientGender': patient.PatientGender,
-                'PatientAge': patient.PatientAge,
-                'PatientAddress': patient.PatientAddress,
-                'PatientPhone': patient.PatientPhone,
-                'PatientBHYT': patient.PatientBHYT
-            })
+        patients_data = [_patient_list_item(patient) for patient in patients]
             
-        return jsonify({'patients': patients_data})
+        response = {'patients': patients_data}
+        if wants_pagination():
+            response['next_cursor'] = next_cursor
+        return jsonify(response)
     except Exception as e:
         print(f"Error listing patients: {e}")
         return jsonify({'error': str(e)}), 500
 
+# Registration details accepted by /patients/duplicates instead of a patient_id
+DUPLICATE_CHECK_FIELDS = (
+    'PatientName', 'PatientGender', 'PatientAge', 'PatientAddress',
+    'PatientPhone', 'PatientCCCD', 'PatientBHYT'
+)
+
+@patients_bp.route('/patients/duplicates', methods=['GET'])
+def find_duplicate_patients():
+    """Likely duplicates of a patient, compared within shared blocking keys.
+    Query params:
+      patient_id: an existing patient, or instead the details of a patient
+                  about to be registered (PatientName, PatientAge, PatientGender,
+                  PatientAddress, PatientPhone, PatientCCCD, PatientBHYT)
+      min_score: 0-1 (default 0.55)
+      limit: maximum results (default 20, max 100)
+    """
+    try:
+        min_score = request.args.get('min_score', patient_duplicates.MIN_SCORE, type=float)
+        limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+
+        patient_id = request.args.get('patient_id', type=str)
+        if patient_id:
+            patient = Patient.query.get(patient_id)
+            if not patient:
+                return jsonify({'error': 'Patient not found'}), 404
+        else:
+            details = {field: request.args.get(field, type=str) for field in DUPLICATE_CHECK_FIELDS}
+            if not any(details.values()):
+                return jsonify({'error': 'patient_id or patient details are required'}), 400
+            # Transient, never added to the session
+            patient = Patient(**details)
+
+        duplicates = patient_duplicates.find_duplicates(patient, min_score, limit)
+        return jsonify({'duplicates': duplicates, 'count': len(duplicates)})
+    except Exception as e:
+        print(f"Error finding duplicate patients: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @patients_bp.route('/patients/<string:patient_id>', methods=['GET'])
 def get_patient(patient_id):
     """Get a specific patient by ID"""
@@ -54,10 +125,33 @@ def get_patient(patient_id):
             'PatientBHYTValid': patient.PatientBHYTValid,
             'PatientNote': patient.PatientNote,
             'Allergy': patient.Allergy,
-            'History': patient.History
+            'History': patient.History,
+            'PatientImageUrls': image_variants.urls(patient.PatientId, patient.PatientImageHash)
         }
             
         return jsonify({'patient': patient_data})
     except Exception as e:
         print(f"Error getting patient: {e}")
         return jsonify({'error': str(e)}), 500
+
+@patients_bp.route('/patients/<string:patient_id>/chart', methods=['GET'])
+def get_patient_chart(patient_id):
+    """Patient chart in one round trip.
+    Query params (optional):
+      include: comma separated sections - departments, visits, summary,
+               documents (default: all); the patient itself is always included
+    """
+    try:
+        try:
+            include = PatientChart.parse_include(request.args.get('include', type=str))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        chart = PatientChart.load(patient_id, include)
+        if chart is None:
+            return jsonify({'error': 'Patient not found'}), 404
+        
+        return jsonify(chart)
+    except Exception as e:
+        print(f"Error getting patient chart: {e}")
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,50 @@
+"""
+Search API Blueprint
+Diacritic-insensitive prefix search over patients, drugs and signs
+"""
+from flask import Blueprint, request, jsonify
+from utils import search_index
+
+search_bp = Blueprint('search', __name__)
+
+
+def _search(entity_name, result_key):
+    q = request.args.get('q', '', type=str)
+    limit = request.args.get('limit', search_index.DEFAULT_LIMIT, type=int)
+    limit = max(1, min(limit, search_index.MAX_LIMIT))
+    results = search_index.search(entity_name, q, limit)
+    return jsonify({result_key: results, 'count': len(results)})
+
+
+@search_bp.route('/search/patients', methods=['GET'])
+def search_patients():
+    """Search patients by name, PatientId, phone, CCCD or BHYT.
+    Query params:
+      q: words to match, accents optional ("nguyen van" finds "Nguyễn Văn")
+      limit: maximum results (default 20, max 100)
+    """
+    try:
+        return _search('patient', 'patients')
+    except Exception as e:
+        print(f"Error in search_patients: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@search_bp.route('/search/drugs', methods=['GET'])
+def search_drugs():
+    """Search drugs by name, active ingredient or DrugId (q, limit as for patients)"""
+    try:
+        return _search('drug', 'drugs')
+    except Exception as e:
+        print(f"Error in search_drugs: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@search_bp.route('/search/signs', methods=['GET'])
+def search_signs():
+    """Search signs by description (q, limit as for patients)"""
+    try:
+        return _search('sign', 'signs')
+    except Exception as e:
+        print(f"Error in search_signs: {e}")
+        return jsonify({'error': str(e)}), 500
@@ -6,6 +6,7 @@ from flask import Blueprint, request, jsonify
 from sqlalchemy import asc
 from models_main import db
 from models import SignTemplate, Department
+from utils import reference_cache
 
 sign_template_bp = Blueprint('sign_template', __name__)
 
@@ -89,6 +90,7 @@ def create_sign_template():
         )
         
         db.session.add(template)
+        reference_cache.bump_version('SignTemplate')
         db.session.commit()
         
         return jsonify({
@@ -120,6 +122,7 @@ def update_sign_template(template_id):
                 return jsonify({'error': 'SignTemplateType must be one of: BA, TD, PK, CC'}), 400
             template.SignTemplateType = payload['SignTemplateType']
 
+        reference_cache.bump_version('SignTemplate')
         db.session.commit()
         
         department = Department.query.get(template.DepartmentId) if template.DepartmentId else None
@@ -140,6 +143,7 @@ def delete_sign_template(template_id):
     try:
         template = SignTemplate.query.get_or_404(template_id)
         db.session.delete(template)
+        reference_cache.bump_version('SignTemplate')
         db.session.commit()
         return jsonify({'message': 'Template deleted', 'SignTemplateId': template_id})
     except Exception as e:
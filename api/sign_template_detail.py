@@ -6,6 +6,7 @@ from flask import Blueprint, request, jsonify
 from sqlalchemy import asc
 from models_main import db
 from models import SignTemplate, SignTemplateDetail, Sign, BodySystem
+from utils import reference_cache
 
 sign_template_detail_bp = Blueprint('sign_template_detail', __name__)
 
@@ -92,6 +93,7 @@ def add_sign_to_template(template_id):
         )
         
         db.session.add(detail)
+        reference_cache.bump_version('SignTemplate')
         db.session.commit()
         
         return jsonify({'message': 'Sign added to template successfully'})
@@ -113,6 +115,7 @@ def remove_sign_from_template(template_id, sign_id):
         ).first_or_404()
         
         db.session.delete(detail)
+        reference_cache.bump_version('SignTemplate')
         db.session.commit()
         
         return jsonify({
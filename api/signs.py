@@ -2,6 +2,8 @@ from flask import Blueprint, request, jsonify
 from sqlalchemy import asc
 from models_main import db
 from models import Sign, BodySystem
+from utils.pagination import wants_pagination, get_page_args, keyset_paginate, InvalidCursor
+from utils import reference_cache, search_index
 
 signs_bp = Blueprint('signs', __name__)
 
@@ -17,6 +19,13 @@ def sign_to_dict(sign, system_name=None):
 	}
 
 
+@reference_cache.register('signs', depends_on=('Sign', 'BodySystem'))
+def _load_signs():
+	"""All signs with system names, ordered by SignDesc, for the catalog cache"""
+	records = db.session.query(Sign, BodySystem.SystemName).join(BodySystem).order_by(asc(Sign.SignDesc)).all()
+	return [sign_to_dict(s, sys_name) for s, sys_name in records]
+
+
 @signs_bp.route('/signs', methods=['GET'])
 def list_signs():
 	"""List signs with optional filters and search.
@@ -25,26 +34,49 @@ def list_signs():
 	  type: 0/1 for SignType
 	  system_id: int BodySystem.SystemId
 	  speciality: substring in Speciality
+	  limit, cursor: optional keyset pagination ordered by (SignDesc, SignId)
 	"""
 	try:
-		query = db.session.query(Sign, BodySystem.SystemName).join(BodySystem)
-
 		q = request.args.get('q', type=str)
 		sign_type = request.args.get('type', type=str)
 		system_id = request.args.get('system_id', type=int)
 		speciality = request.args.get('speciality', type=str)
 
-		if q:
-			query = query.filter(Sign.SignDesc.ilike(f"%{q}%"))
+		if wants_pagination() or q or speciality:
+			# Text filters run in SQL, so matching follows the column
+			# collation (case and accent folding) as before the cache
+			query = db.session.query(Sign, BodySystem.SystemName).join(BodySystem)
+			if q:
+				query = query.filter(Sign.SignDesc.ilike(f"%{q}%"))
+			if sign_type in ('0', '1'):
+				query = query.filter(Sign.SignType == (sign_type == '1'))
+			if system_id:
+				query = query.filter(Sign.SystemId == system_id)
+			if speciality:
+				query = query.filter(Sign.Speciality.ilike(f"%{speciality}%"))
+
+			if not wants_pagination():
+				# Full list
+				records = query.order_by(asc(Sign.SignDesc)).all()
+				return jsonify({'signs': [sign_to_dict(s, sys_name) for s, sys_name in records]})
+
+			cursor, limit = get_page_args()
+			try:
+				records, next_cursor = keyset_paginate(
+					query, [Sign.SignDesc, Sign.SignId], cursor, limit,
+					key_func=lambda row: (row[0].SignDesc, row[0].SignId)
+				)
+			except InvalidCursor as e:
+				return jsonify({'error': str(e)}), 400
+			data = [sign_to_dict(s, sys_name) for s, sys_name in records]
+			return jsonify({'signs': data, 'next_cursor': next_cursor})
+
+		# Unfiltered list (or exact-match filters only): the cached catalog
+		data = reference_cache.get('signs')
 		if sign_type in ('0', '1'):
-			query = query.filter(Sign.SignType == (sign_type == '1'))
+			data = [d for d in data if d['SignType'] == int(sign_type)]
 		if system_id:
-			query = query.filter(Sign.SystemId == system_id)
-		if speciality:
-			query = query.filter(Sign.Speciality.ilike(f"%{speciality}%"))
-
-		records = query.order_by(asc(Sign.SignDesc)).all()
-		data = [sign_to_dict(s, sys_name) for s, sys_name in records]
+			data = [d for d in data if d['SystemId'] == system_id]
 		return jsonify({'signs': data})
 	except Exception as e:
 		db.session.rollback()
@@ -77,6 +109,9 @@ def create_sign():
 			Speciality=payload.get('Speciality', '').strip() or None
 		)
 		db.session.add(sign)
+		db.session.flush()  # Get the SignId
+		search_index.reindex('sign', [sign.SignId])
+		reference_cache.bump_version('Sign')
 		db.session.commit()
 		system = BodySystem.query.get(sign.SystemId)
 		return jsonify({'sign': sign_to_dict(sign, system.SystemName if system else None)}), 201
@@ -101,6 +136,8 @@ def update_sign(sign_id):
 			speciality_val = payload.get('Speciality')
 			sign.Speciality = speciality_val.strip() if speciality_val else None
 
+		search_index.reindex('sign', [sign.SignId])
+		reference_cache.bump_version('Sign')
 		db.session.commit()
 		system = BodySystem.query.get(sign.SystemId)
 		return jsonify({'sign': sign_to_dict(sign, system.SystemName if system else None)})
@@ -114,6 +151,8 @@ def delete_sign(sign_id):
 	try:
 		sign = Sign.query.get_or_404(sign_id)
 		db.session.delete(sign)
+		search_index.reindex('sign', [sign_id])
+		reference_cache.bump_version('Sign')
 		db.session.commit()
 		return jsonify({'message': 'Deleted', 'SignId': sign_id})
 	except Exception as e:
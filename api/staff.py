@@ -7,52 +7,84 @@ from models_main import db
 from models.Staff import Staff
 from models.Department import Department
 from models.StaffDepartment import StaffDepartment
-from sqlalchemy import desc
+from models.DepartmentCensus import DepartmentCensus
+from sqlalchemy import desc, and_
 from datetime import datetime
+from utils.pagination import wants_pagination, get_page_args, keyset_paginate, InvalidCursor
 
 staff_bp = Blueprint('staff_bp', __name__)
 
 @staff_bp.route('/staff', methods=['GET'])
 def get_all_staff():
-    """Get all staff members with their current department"""
+    """Get all staff members with their current department.
+    Query params:
+      department_id: only staff currently assigned to this department
+      limit, cursor: optional keyset pagination ordered by StaffId
+    """
     try:
         # Get query parameters
         department_id = request.args.get('department_id', type=int)
         
-        staff_list = Staff.query.all()
-        result = []
+        # Available staff joined to their current department in one query
+        query = db.session.query(
+            Staff,
+            StaffDepartment.DepartmentId,
+            StaffDepartment.Position,
+            Department.DepartmentName
+        ).join(
+            StaffDepartment,
+            and_(StaffDepartment.StaffId == Staff.StaffId, StaffDepartment.Current == True)
+        ).join(
+            Department, Department.DepartmentId == StaffDepartment.DepartmentId
+        ).filter(Staff.StaffAvailable == True)
         
-        for staff in staff_list:
-            # Only include available staff
-            if not staff.StaffAvailable:
-                continue
-                
-            staff_dict = staff.to_dict()
-            current_dept_assignment = StaffDepartment.query.filter_by(
-                StaffId=staff.StaffId, 
-                Current=True
-            ).first()
-            
-            if current_dept_assignment:
-                department = Department.query.get(current_dept_assignment.DepartmentId)
-                staff_dict['DepartmentId'] = department.DepartmentId
-                staff_dict['DepartmentName'] = department.DepartmentName
-                staff_dict['Position'] = current_dept_assignment.Position
-                
-                # Filter by department if specified
-                if department_id and current_dept_assignment.DepartmentId != department_id:
-                    continue
-            else:
-                staff_dict['DepartmentId'] = None
-                staff_dict['DepartmentName'] = None
-                staff_dict['Position'] = None
-                
-                # Skip staff without department if filtering by department
+        # Filter by department if specified
+        if department_id:
+            query = query.filter(StaffDepartment.DepartmentId == department_id)
+        
+        next_cursor = None
+        if wants_pagination():
+            # Page over distinct staff ids (a staff member may have several
+            # current assignments, i.e. several joined rows), then load the
+            # rows of that page
+            current = db.session.query(StaffDepartment.StaffId).filter(
+                StaffDepartment.StaffId == Staff.StaffId, StaffDepartment.Current == True
+            )
+            if department_id:
+                current = current.filter(StaffDepartment.DepartmentId == department_id)
+            staff_ids = db.session.query(Staff.StaffId).filter(
+                Staff.StaffAvailable == True, current.exists()
+            )
+            cursor, limit = get_page_args()
+            try:
+                page, next_cursor = keyset_paginate(staff_ids, [Staff.StaffId], cursor, limit)
+            except InvalidCursor as e:
+                return jsonify({'error': str(e)}), 400
+            query = query.filter(Staff.StaffId.in_([row.StaffId for row in page]))
+        rows = query.order_by(Staff.StaffId, StaffDepartment.id).all()
+        
+        result = []
+        seen = set()
+        for staff, dept_id, position, dept_name in rows:
+            if staff.StaffId in seen:
                 continue
-                
-            result.append(staff_dict)
-            
-        return jsonify({'staff': result})
+            seen.add(staff.StaffId)
+            result.append({
+                'StaffId': staff.StaffId,
+                'StaffName': staff.StaffName,
+                'StaffRole': staff.StaffRole,
+                'StaffAvailable': staff.StaffAvailable,
+                'CurrentDepartmentId': dept_id,
+                'CurrentDepartmentName': dept_name,
+                'DepartmentId': dept_id,
+                'DepartmentName': dept_name,
+                'Position': position
+            })
+        
+        response = {'staff': result}
+        if wants_pagination():
+            response['next_cursor'] = next_cursor
+        return jsonify(response)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -120,6 +152,7 @@ def create_staff():
                 Position=data.get('Position')
             )
             db.session.add(dept_assignment)
+            DepartmentCensus.record_staff_move([], department_id)
             
         db.session.commit()
         return jsonify({'message': 'Staff created successfully', 'staffId': new_staff.StaffId}), 201
@@ -167,6 +200,10 @@ def update_staff(staff_id):
                     Position=data.get('Position', current_assignment.Position if current_assignment else None)
                 )
                 db.session.add(new_assignment)
+                DepartmentCensus.record_staff_move(
+                    [current_assignment.DepartmentId] if current_assignment else [],
+                    data['DepartmentId']
+                )
             # If position changed but department is the same
             elif current_assignment and 'Position' in data and current_assignment.Position != data['Position']:
                 current_assignment.Position = data['Position']
@@ -186,7 +223,12 @@ def delete_staff(staff_id):
             return jsonify({'error': 'Staff not found'}), 404
             
         # Delete all department assignments
+        current_departments = [
+            assignment.DepartmentId
+            for assignment in StaffDepartment.query.filter_by(StaffId=staff_id, Current=True)
+        ]
         StaffDepartment.query.filter_by(StaffId=staff_id).delete()
+        DepartmentCensus.record_staff_move(current_departments)
         
         # Delete the staff
         db.session.delete(staff)
@@ -283,6 +325,10 @@ def assign_department(staff_id):
         )
         
         db.session.add(new_assignment)
+        DepartmentCensus.record_staff_move(
+            [current_assignment.DepartmentId] if current_assignment else [],
+            department_id
+        )
         db.session.commit()
         
         return jsonify({
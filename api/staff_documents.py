@@ -12,16 +12,21 @@ import datetime
 import mimetypes
 from werkzeug.utils import secure_filename
 import io
-from PIL import Image, ImageFile
-import pdf2image
-import subprocess
+from PIL import ImageFile
 import logging
+from utils import thumbnails, http_cache
 
 # Enable loading of truncated images
 ImageFile.LOAD_TRUNCATED_IMAGES = True
 
 staff_documents_bp = Blueprint('staff_documents', __name__)
 
+
+@staff_documents_bp.record_once
+def _init_thumbnails(state):
+    thumbnails.init_app(state.app)
+
+
 # Path to store staff document files
 STAFF_DOCUMENTS_PATH = '/static/staff_documents'
 
@@ -43,92 +48,18 @@ def ensure_staff_documents_dir():
     
     return docs_path
 
-def generate_thumbnail(file_path, file_type, original_filename):
-    """Generate thumbnail for supported file types"""
+def queue_thumbnail(document):
+    """Hand a document to the background thumbnail workers"""
     docs_path = get_full_staff_documents_path()
-    thumbs_path = os.path.join(docs_path, 'thumbnails')
-    
-    # Ensure thumbnails directory exists
-    if not os.path.exists(thumbs_path):
-        os.makedirs(thumbs_path, exist_ok=True)
-    
-    # Generate thumbnail filename
-    base_name = os.path.splitext(os.path.basename(file_path))[0]
-    thumb_filename = f"{base_name}_thumb.jpg"
-    thumb_path = os.path.join(thumbs_path, thumb_filename)
-    
-    try:
-        if file_type and file_type.startswith('image/'):
-            try:
-                # Generate thumbnail for images
-                with Image.open(file_path) as img:
-                    # Convert to RGB if necessary (for PNG with transparency, etc.)
-                    if img.mode in ('RGBA', 'LA', 'P'):
-                        img = img.convert('RGB')
-                    
-                    # Create thumbnail maintaining aspect ratio
-                    img.thumbnail((200, 200), Image.Resampling.LANCZOS)
-                    img.save(thumb_path, 'JPEG', quality=85, optimize=True)
-                    
-                    return f"thumbnails/{thumb_filename}"
-            except Exception as img_error:
-                current_app.logger.error(f"Error processing image: {img_error}")
-                return None
-                
-        elif file_type and 'pdf' in file_type.lower():
-            # Generate thumbnail for PDF (first page)
-            try:
-                # Convert first page of PDF to image
-                pages = pdf2image.convert_from_path(file_path, first_page=1, last_page=1, dpi=150)
-                if pages:
-                    img = pages[0]
-                    # Convert to RGB if necessary
-                    if img.mode in ('RGBA', 'LA', 'P'):
-                        img = img.convert('RGB')
-                    
-                    # Create thumbnail
-                    img.thumbnail((200, 200), Image.Resampling.LANCZOS)
-                    img.save(thumb_path, 'JPEG', quality=85, optimize=True)
-                    
-                    return f"thumbnails/{thumb_filename}"
-            except Exception as pdf_error:
-                print(f"Error generating PDF thumbnail: {pdf_error}")
-                
-        elif file_type and any(office_type in file_type.lower() for office_type in ['word', 'excel', 'powerpoint', 'document', 'sheet', 'presentation']):
-            # For Office documents, we can try to generate a generic thumbnail
-            # or use LibreOffice headless mode if available
-            try:
-                # Try using LibreOffice to convert first page to image
-                temp_pdf = os.path.join(thumbs_path, f"{base_name}_temp.pdf")
-                result = subprocess.run([
-                    'libreoffice', '--headless', '--convert-to', 'pdf', 
-                    '--outdir', thumbs_path, file_path
-                ], capture_output=True, timeout=30)
-                
-                if result.returncode == 0 and os.path.exists(temp_pdf):
-                    # Convert the PDF to image
-                    pages = pdf2image.convert_from_path(temp_pdf, first_page=1, last_page=1, dpi=150)
-                    if pages:
-                        img = pages[0]
-                        if img.mode in ('RGBA', 'LA', 'P'):
-                            img = img.convert('RGB')
-                        img.thumbnail((200, 200), Image.Resampling.LANCZOS)
-                        img.save(thumb_path, 'JPEG', quality=85, optimize=True)
-                        
-                        # Clean up temp PDF
-                        os.remove(temp_pdf)
-                        
-                        return f"thumbnails/{thumb_filename}"
-                        
-            except Exception as office_error:
-                print(f"Error generating Office document thumbnail: {office_error}")
-        
-        # Return None if thumbnail generation is not supported or failed
-        return None
-        
-    except Exception as e:
-        current_app.logger.error(f"Error generating thumbnail for {original_filename}: {e}")
-        return None
+    thumbnails.submit(
+        current_app._get_current_object(),
+        StaffDocuments,
+        document.DocumentId,
+        os.path.join(docs_path, document.document_links['file_path']),
+        document.file_type,
+        os.path.join(docs_path, 'thumbnails'),
+        STAFF_DOCUMENTS_PATH
+    )
 
 def generate_unique_filename(original_filename):
     """Generate a unique filename to avoid conflicts"""
@@ -191,37 +122,39 @@ def get_staff_document_thumbnail(document_id):
         if not document:
             return jsonify({'error': 'Staff document not found'}), 404
         
-        # Check if thumbnail exists
-        if not document.document_links or 'thumbnail_path' not in document.document_links:
-            # Try to generate thumbnail on-the-fly if original file exists
-            if 'file_path' in document.document_links:
-                file_path = os.path.join(get_full_staff_documents_path(), document.document_links['file_path'])
-                if os.path.exists(file_path):
-                    thumbnail_path = generate_thumbnail(file_path, document.file_type, document.original_filename)
-                    if thumbnail_path:
-                        try:
-                            # Update document with thumbnail info
-                            updated_links = dict(document.document_links) if document.document_links else {}
-                            updated_links['thumbnail_path'] = thumbnail_path
-                            updated_links['thumbnail_url'] = f"{STAFF_DOCUMENTS_PATH}/{thumbnail_path}"
-                            
-                            document.document_links = updated_links
-                            db.session.commit()
-                        except Exception as db_error:
-                            current_app.logger.error(f"Database update error: {db_error}")
-                            db.session.rollback()
-                            return jsonify({'error': str(db_error)}), 500
-                    else:
-                        return jsonify({'error': 'Thumbnail not available for this file type'}), 404
-                else:
-                    return jsonify({'error': 'Original file not found'}), 404
-            else:
+        links = document.document_links or {}
+        
+        # Thumbnails are rendered in the background; serve a placeholder meanwhile
+        if 'thumbnail_path' not in links:
+            if thumbnails.is_pending(links) and not thumbnails.pending_is_stale(links):
+                return thumbnails.placeholder_response()
+            if links.get('thumbnail_unavailable') or not thumbnails.is_supported(document.file_type):
+                return jsonify({'error': 'Thumbnail not available for this file type'}), 404
+            if 'file_path' not in links:
                 return jsonify({'error': 'No thumbnail available'}), 404
+            if not os.path.exists(os.path.join(get_full_staff_documents_path(), links['file_path'])):
+                return jsonify({'error': 'Original file not found'}), 404
+            
+            # Not queued yet (older document) or left pending by a restarted worker
+            try:
+                document.document_links = thumbnails.mark_pending(links)
+                db.session.commit()
+            except Exception as db_error:
+                current_app.logger.error(f"Database update error: {db_error}")
+                db.session.rollback()
+                return jsonify({'error': str(db_error)}), 500
+            queue_thumbnail(document)
+            return thumbnails.placeholder_response()
         
         # Serve the thumbnail file
         thumbnail_path = os.path.join(get_full_staff_documents_path(), document.document_links['thumbnail_path'])
         if os.path.exists(thumbnail_path):
-            return send_file(thumbnail_path, mimetype='image/jpeg')
+            return http_cache.send_cached_file(
+                thumbnail_path,
+                etag=document.document_links.get('thumbnail_sha256'),
+                max_age=current_app.config.get('DOCUMENT_CACHE_MAX_AGE', 0),
+                mimetype='image/jpeg'
+            )
         else:
             return jsonify({'error': 'Thumbnail file not found'}), 404
             
@@ -265,8 +198,11 @@ def get_staff_document(document_id):
                 file_path = os.path.join(get_full_staff_documents_path(), doc.document_links['file_path'])
                 
                 if os.path.exists(file_path):
-                    return send_file(
+                    # Uploaded files never change: hash recorded at upload is the ETag
+                    return http_cache.send_cached_file(
                         file_path,
+                        etag=doc.document_links.get('sha256'),
+                        max_age=current_app.config.get('DOCUMENT_CACHE_MAX_AGE', 0),
                         as_attachment=True,
                         download_name=doc.original_filename or os.path.basename(file_path),
                         mimetype=doc.file_type or 'application/octet-stream'
@@ -359,19 +295,16 @@ def upload_staff_document():
         # Determine file type
         file_type = file.content_type or mimetypes.guess_type(file.filename)[0] or 'application/octet-stream'
         
-        # Generate thumbnail if supported
-        thumbnail_path = generate_thumbnail(file_path, file_type, file.filename)
-        
         # Create document links JSON
         document_links = {
             'file_path': unique_filename,
+            'sha256': http_cache.sha256_file(file_path),  # ETag for downloads
             'url': f"{STAFF_DOCUMENTS_PATH}/{unique_filename}"
         }
         
-        # Add thumbnail path if generated
-        if thumbnail_path:
-            document_links['thumbnail_path'] = thumbnail_path
-            document_links['thumbnail_url'] = f"{STAFF_DOCUMENTS_PATH}/{thumbnail_path}"
+        # Thumbnail is rendered in the background once the record exists
+        if thumbnails.is_supported(file_type):
+            document_links = thumbnails.mark_pending(document_links)
         
         # Create metadata JSON
         metadata_value = {
@@ -405,6 +338,9 @@ def upload_staff_document():
             db.session.rollback()
             return jsonify({'error': f'Failed to save document record: {str(db_error)}'}), 500
         
+        if thumbnails.is_pending(new_document.document_links):
+            queue_thumbnail(new_document)
+        
         # Format response
         doc_dict = new_document.to_dict()
         doc_dict['StaffName'] = staff.StaffName
@@ -0,0 +1,116 @@
+"""
+Template Bundles API Blueprint
+All sign and drug templates of a department, with their items, in one
+precomputed response
+
+The bundles of every department are built together from five queries and
+kept serialized in the reference cache, together with the SHA-256 of the
+body as ETag. Template CRUD bumps the SignTemplate / DrugTemplate catalog
+versions (and sign, drug, group and department edits theirs), so every
+worker rebuilds the bundles after a change; an unchanged bundle keeps its
+ETag across rebuilds and revalidations are answered with 304.
+"""
+import hashlib
+
+from flask import Blueprint, current_app, jsonify
+from sqlalchemy import asc
+
+from models_main import db
+from models import (Department, Sign, BodySystem, Drug, DrugGroup,
+                    SignTemplate, SignTemplateDetail, DrugTemplate, DrugTemplateDetail)
+from api.sign_template import sign_template_to_dict
+from api.sign_template_detail import template_sign_to_dict
+from api.drug_template import drug_template_to_dict
+from api.drug_template_detail import template_detail_to_dict
+from utils import http_cache, reference_cache
+from utils.serialization import dumps
+
+template_bundles_bp = Blueprint('template_bundles', __name__)
+
+
+def _group_by(rows, key):
+    groups = {}
+    for row in rows:
+        groups.setdefault(key(row), []).append(row)
+    return groups
+
+
+@reference_cache.register('template_bundles', depends_on=(
+    'SignTemplate', 'DrugTemplate', 'Sign', 'BodySystem', 'Drug', 'DrugGroup', 'Department'
+))
+def _load_bundles():
+    """{DepartmentId: (JSON body, ETag)} for every department"""
+    departments = db.session.query(Department.DepartmentId, Department.DepartmentName).all()
+
+    sign_templates = _group_by(
+        SignTemplate.query.order_by(asc(SignTemplate.SignTemplateName)).all(),
+        lambda template: template.DepartmentId
+    )
+    signs = _group_by(
+        db.session.query(SignTemplateDetail.SignTemplateId, Sign, BodySystem.SystemName).join(
+            Sign, SignTemplateDetail.SignId == Sign.SignId
+        ).outerjoin(
+            BodySystem, Sign.SystemId == BodySystem.SystemId
+        ).order_by(SignTemplateDetail.id).all(),
+        lambda row: row[0]
+    )
+    drug_templates = _group_by(
+        DrugTemplate.query.order_by(asc(DrugTemplate.DrugTemplateName)).all(),
+        lambda template: template.DepartmentId
+    )
+    drugs = _group_by(
+        db.session.query(DrugTemplateDetail, Drug, DrugGroup.DrugGroupName).join(
+            Drug, DrugTemplateDetail.DrugId == Drug.DrugId
+        ).outerjoin(
+            DrugGroup, Drug.DrugGroupId == DrugGroup.DrugGroupId
+        ).order_by(asc(Drug.DrugName)).all(),
+        lambda row: row[0].DrugTemplateId
+    )
+
+    bundles = {}
+    for department_id, department_name in departments:
+        bundle = {
+            'DepartmentId': department_id,
+            'DepartmentName': department_name,
+            'sign_templates': [
+                dict(sign_template_to_dict(template, department_name), signs=[
+                    template_sign_to_dict(sign, system_name)
+                    for _, sign, system_name in signs.get(template.SignTemplateId, [])
+                ])
+                for template in sign_templates.get(department_id, [])
+            ],
+            'drug_templates': [
+                dict(drug_template_to_dict(template, department_name), drugs=[
+                    template_detail_to_dict(detail, drug, template.DrugTemplateName,
+                                            department_name, group_name)
+                    for detail, drug, group_name in drugs.get(template.DrugTemplateId, [])
+                ])
+                for template in drug_templates.get(department_id, [])
+            ],
+        }
+        body = dumps(bundle).encode('utf-8')
+        bundles[department_id] = (body, hashlib.sha256(body).hexdigest())
+    return bundles
+
+
+@template_bundles_bp.route('/departments/<int:department_id>/template-bundle', methods=['GET'])
+def get_template_bundle(department_id):
+    """All sign and drug templates of a department with their signs / drugs.
+    Served from the template bundle cache with a content-hash ETag; send
+    If-None-Match to get 304 while the templates are unchanged.
+    """
+    try:
+        bundle = reference_cache.get('template_bundles').get(department_id)
+        if bundle is None:
+            return jsonify({'error': 'Department not found'}), 404
+
+        body, etag = bundle
+        cached = http_cache.not_modified(etag)
+        if cached:
+            return cached
+        response = current_app.response_class(body, mimetype='application/json')
+        return http_cache.set_headers(response, etag)
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error in get_template_bundle: {e}")
+        return jsonify({'error': str(e)}), 500
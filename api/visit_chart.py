@@ -0,0 +1,387 @@
+"""
+Visit Chart API Blueprint
+Bulk charting of a visit: signs, drug orders, tests, procedures and images
+in one request and one transaction, and sign / drug templates applied to
+one or many visits with one INSERT ... SELECT per table
+"""
+from datetime import datetime
+
+from flask import Blueprint, request, jsonify
+from sqlalchemy import exists, insert, literal, select, true
+from sqlalchemy import types as sqltypes
+
+from models_main import db
+from models import (Visit, Staff, Drug, VisitSign, VisitDrug, VisitTest, VisitProc, VisitImage,
+                    SignTemplate, SignTemplateDetail, DrugTemplate, DrugTemplateDetail)
+from utils import reference_cache
+
+visit_chart_bp = Blueprint('visit_chart', __name__)
+
+MAX_CHART_ITEMS = 500
+MAX_TEMPLATE_VISITS = 500
+
+
+class ChartSection:
+    """One list of a chart payload and the Visit* table it is written to"""
+
+    def __init__(self, model, required=(), catalogs=None, staff=(), exclude=()):
+        self.model = model
+        self.required = required
+        # field -> (catalog table, key column), checked against the reference cache
+        self.catalogs = catalogs or {}
+        # fields holding a StaffId
+        self.staff = staff
+        table = model.__table__
+        self.columns = {
+            column.name: column for column in table.columns
+            if not column.primary_key and column.name != 'VisitId' and column.name not in exclude
+        }
+        self.defaults = {
+            name: column.default.arg if column.default is not None and column.default.is_scalar else None
+            for name, column in self.columns.items()
+        }
+        self.primary_key = table.primary_key.columns[0].name
+
+
+CHART_SECTIONS = {
+    'signs': ChartSection(VisitSign, required=('SignId',), catalogs={
+        'SignId': ('Sign', 'SignId'),
+        'BodySiteId': ('BodySite', 'SiteId'),
+    }),
+    'drugs': ChartSection(VisitDrug, required=('DrugId',), catalogs={
+        'DrugId': ('Drug', 'DrugId'),
+    }),
+    'tests': ChartSection(VisitTest, required=('TestId',), catalogs={
+        'TestId': ('Test', 'TestId'),
+    }, staff=('TestStaffId',)),
+    'procedures': ChartSection(VisitProc, required=('ProcId',), catalogs={
+        'ProcId': ('Proc', 'ProcId'),
+    }, staff=('ProcStaffId',)),
+    # Image files go through the upload endpoints; the chart links them by URL
+    'images': ChartSection(VisitImage, required=('ImageUrl',), exclude=('ImageData', 'CreatedAt')),
+}
+
+
+def _coerce(column, value):
+    """Value for ``column`` from a JSON value; raises ValueError when invalid"""
+    if value is None:
+        return None
+    column_type = column.type
+    if isinstance(column_type, sqltypes.Enum):
+        if value not in column_type.enums:
+            raise ValueError(f"must be one of: {', '.join(column_type.enums)}")
+        return value
+    if isinstance(column_type, sqltypes.DateTime):
+        if not isinstance(value, str):
+            raise ValueError('must be an ISO datetime')
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if isinstance(column_type, sqltypes.Boolean):
+        if value not in (True, False, 0, 1):
+            raise ValueError('must be true or false')
+        return bool(value)
+    if isinstance(column_type, sqltypes.Integer):
+        # int() would silently truncate 1.9 to 1; only whole numbers pass
+        if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+            raise ValueError('must be an integer')
+        return int(value)
+    if isinstance(column_type, sqltypes.Float):
+        if isinstance(value, bool):
+            raise ValueError('must be a number')
+        return float(value)
+    if isinstance(column_type, sqltypes.String):
+        value = str(value)
+        if column_type.length and len(value) > column_type.length:
+            raise ValueError(f"longer than {column_type.length} characters")
+        return value
+    return value
+
+
+def _parse_items(section_name, section, items, visit_id, errors):
+    """Column dicts for the items of one section; problems go to ``errors``"""
+    if not isinstance(items, list):
+        errors.append(f"{section_name} must be a list")
+        return []
+    rows = []
+    for position, item in enumerate(items):
+        where = f"{section_name}[{position}]"
+        if not isinstance(item, dict):
+            errors.append(f"{where} must be an object")
+            continue
+        unknown = sorted(set(item) - set(section.columns))
+        if unknown:
+            errors.append(f"{where}: unknown field(s) {', '.join(unknown)}")
+            continue
+        missing = [field for field in section.required if item.get(field) in (None, '')]
+        if missing:
+            errors.append(f"{where}: missing {', '.join(missing)}")
+            continue
+        # Every row of a section carries the same columns (omitted ones get
+        # their default), so the section is written as one multi-row INSERT
+        row = {'VisitId': visit_id}
+        row.update(section.defaults)
+        for field, value in item.items():
+            try:
+                row[field] = _coerce(section.columns[field], value)
+            except (TypeError, ValueError) as e:
+                errors.append(f"{where}.{field}: {e}")
+        rows.append((where, row))
+    return rows
+
+
+def _check_references(parsed, errors):
+    """Check catalog keys against the reference cache and StaffIds with one query"""
+    catalog_keys = {}
+    staff_refs = []
+    for section_name, rows in parsed.items():
+        section = CHART_SECTIONS[section_name]
+        for where, row in rows:
+            for field, (table_name, key) in section.catalogs.items():
+                value = row.get(field)
+                if value is None:
+                    continue
+                if (table_name, key) not in catalog_keys:
+                    catalog_keys[(table_name, key)] = reference_cache.catalog_keys(table_name, key)
+                if value not in catalog_keys[(table_name, key)]:
+                    errors.append(f"{where}.{field}: {table_name} {value} not found")
+            for field in section.staff:
+                if row.get(field) is not None:
+                    staff_refs.append((where, field, row[field]))
+
+    if staff_refs:
+        staff_ids = {staff_id for _, _, staff_id in staff_refs}
+        existing = {
+            row[0] for row in db.session.query(Staff.StaffId).filter(Staff.StaffId.in_(staff_ids))
+        }
+        for where, field, staff_id in staff_refs:
+            if staff_id not in existing:
+                errors.append(f"{where}.{field}: Staff {staff_id} not found")
+
+
+def _insert_rows(section, rows):
+    """Insert ``rows`` and return the persisted model instances, in order"""
+    model = section.model
+    if db.session.get_bind().dialect.insert_executemany_returning:
+        # Multi-row INSERT ... RETURNING (SQLAlchemy insertmanyvalues). The
+        # auto-increment keys of one statement ascend in VALUES order, so
+        # sorting by key restores the payload order; asking for
+        # sort_by_parameter_order would fall back to one INSERT per row on
+        # dialects without insert sentinels (SQLite).
+        objects = db.session.scalars(insert(model).returning(model), rows).all()
+        return sorted(objects, key=lambda obj: getattr(obj, section.primary_key))
+    objects = [model(**row) for row in rows]
+    db.session.add_all(objects)
+    db.session.flush()
+    return objects
+
+
+@visit_chart_bp.route('/visits/<int:visit_id>/chart', methods=['POST'])
+def chart_visit(visit_id):
+    """Add signs, drug orders, tests, procedures and images to a visit at once.
+    Body: {"signs": [...], "drugs": [...], "tests": [...], "procedures": [...],
+           "images": [...]} - every list optional, items are VisitSign /
+           VisitDrug / VisitTest / VisitProc / VisitImage fields without
+           VisitId, e.g. {"SignId": 12, "SignValue": "Có"},
+           {"DrugId": "PARA500", "DrugQuantity": 2, "DrugTimes": "sáng, chiều"}
+    All items are validated first (catalog keys through the reference cache);
+    any error rejects the whole chart with 400. Returns the persisted rows.
+    """
+    try:
+        payload = request.get_json(force=True) or {}
+        if not isinstance(payload, dict):
+            return jsonify({'error': 'Chart must be a JSON object'}), 400
+        unknown = sorted(set(payload) - set(CHART_SECTIONS))
+        if unknown:
+            return jsonify({'error': f"Unknown chart section(s): {', '.join(unknown)}. "
+                                     f"Available: {', '.join(CHART_SECTIONS)}"}), 400
+        if sum(len(items) for items in payload.values() if isinstance(items, list)) > MAX_CHART_ITEMS:
+            return jsonify({'error': f'A chart may hold at most {MAX_CHART_ITEMS} items'}), 400
+
+        if not db.session.query(Visit.VisitId).filter(Visit.VisitId == visit_id).first():
+            return jsonify({'error': 'Visit not found'}), 404
+
+        errors = []
+        parsed = {
+            section_name: _parse_items(section_name, CHART_SECTIONS[section_name], items, visit_id, errors)
+            for section_name, items in payload.items()
+        }
+        if not errors:
+            _check_references(parsed, errors)
+        if errors:
+            return jsonify({'error': 'Invalid chart', 'errors': errors}), 400
+
+        result = {'VisitId': visit_id}
+        count = 0
+        for section_name, rows in parsed.items():
+            if not rows:
+                result[section_name] = []
+                continue
+            objects = _insert_rows(CHART_SECTIONS[section_name], [row for _, row in rows])
+            # Serialized before the commit expires them
+            result[section_name] = [obj.to_dict() for obj in objects]
+            count += len(objects)
+        db.session.commit()
+
+        result['count'] = count
+        return jsonify(result), 201
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error in chart_visit: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+def _template_values(section, key, values, name, errors):
+    """Column values given to every row a template adds (``sign_defaults`` /
+    ``drug_defaults``), on top of the column defaults"""
+    row = {field: value for field, value in section.defaults.items() if field != key}
+    if values is None:
+        return row
+    if not isinstance(values, dict):
+        errors.append(f"{name} must be an object")
+        return row
+    unknown = sorted(field for field in values if field not in row)
+    if unknown:
+        errors.append(f"{name}: unknown field(s) {', '.join(unknown)}")
+        return row
+    for field, value in values.items():
+        try:
+            row[field] = _coerce(section.columns[field], value)
+        except (TypeError, ValueError) as e:
+            errors.append(f"{name}.{field}: {e}")
+    return row
+
+
+def _id_list(payload, name, errors):
+    ids = payload.get(name) or []
+    if not isinstance(ids, list) or not all(isinstance(id_, int) and not isinstance(id_, bool) for id_ in ids):
+        errors.append(f"{name} must be a list of integers")
+        return []
+    return list(dict.fromkeys(ids))
+
+
+def _missing_ids(column, ids):
+    found = {row[0] for row in db.session.query(column).filter(column.in_(ids))} if ids else set()
+    return [id_ for id_ in ids if id_ not in found]
+
+
+def _insert_from_templates(section, key, detail, template_key, template_ids, visit_ids,
+                           values, per_row=None, joins=()):
+    """``INSERT INTO Visit<X> (...) SELECT DISTINCT`` one row per visit and
+    template item, skipping items already on the visit. Returns the row count."""
+    model = section.model
+    detail_key = getattr(detail, key)
+    columns = {'VisitId': Visit.VisitId, key: detail_key}
+    for field, value in values.items():
+        columns[field] = literal(value, type_=section.columns[field].type)
+    columns.update(per_row or {})
+
+    already_charted = exists().where(model.VisitId == Visit.VisitId, getattr(model, key) == detail_key)
+    query = select(*[column.label(field) for field, column in columns.items()]).select_from(Visit).join(
+        detail, true()
+    )
+    for target, on_clause in joins:
+        query = query.outerjoin(target, on_clause)
+    query = query.where(
+        Visit.VisitId.in_(visit_ids),
+        getattr(detail, template_key).in_(template_ids),
+        detail_key.isnot(None),
+        ~already_charted
+    ).distinct()
+
+    result = db.session.execute(insert(model).from_select(list(columns), query))
+    return result.rowcount
+
+
+def _apply_templates(visit_ids, payload):
+    """Apply the templates of ``payload`` to ``visit_ids``; returns
+    ``(response, status)``"""
+    errors = []
+    sign_template_ids = _id_list(payload, 'sign_template_ids', errors)
+    drug_template_ids = _id_list(payload, 'drug_template_ids', errors)
+    sign_values = _template_values(CHART_SECTIONS['signs'], 'SignId', payload.get('sign_defaults'),
+                                   'sign_defaults', errors)
+    drug_values = _template_values(CHART_SECTIONS['drugs'], 'DrugId', payload.get('drug_defaults'),
+                                   'drug_defaults', errors)
+    if not errors and not sign_template_ids and not drug_template_ids:
+        errors.append('sign_template_ids or drug_template_ids is required')
+    if errors:
+        return {'error': 'Invalid template request', 'errors': errors}, 400
+
+    missing_visits = _missing_ids(Visit.VisitId, visit_ids)
+    if missing_visits:
+        return {'error': f"Visit(s) not found: {', '.join(map(str, missing_visits))}"}, 404
+    missing_signs = _missing_ids(SignTemplate.SignTemplateId, sign_template_ids)
+    if missing_signs:
+        return {'error': f"Sign template(s) not found: {', '.join(map(str, missing_signs))}"}, 404
+    missing_drugs = _missing_ids(DrugTemplate.DrugTemplateId, drug_template_ids)
+    if missing_drugs:
+        return {'error': f"Drug template(s) not found: {', '.join(map(str, missing_drugs))}"}, 404
+
+    signs = drugs = 0
+    if sign_template_ids:
+        signs = _insert_from_templates(
+            CHART_SECTIONS['signs'], 'SignId', SignTemplateDetail, 'SignTemplateId',
+            sign_template_ids, visit_ids, sign_values
+        )
+    if drug_template_ids:
+        per_row = {}
+        if 'DrugRoute' not in (payload.get('drug_defaults') or {}):
+            # Each drug's own route unless the request sets one
+            per_row['DrugRoute'] = Drug.DrugRoute
+            drug_values.pop('DrugRoute', None)
+        drugs = _insert_from_templates(
+            CHART_SECTIONS['drugs'], 'DrugId', DrugTemplateDetail, 'DrugTemplateId',
+            drug_template_ids, visit_ids, drug_values,
+            per_row=per_row, joins=[(Drug, Drug.DrugId == DrugTemplateDetail.DrugId)]
+        )
+    db.session.commit()
+    return {'signs': signs, 'drugs': drugs, 'count': signs + drugs}, 201
+
+
+@visit_chart_bp.route('/visits/<int:visit_id>/apply-template', methods=['POST'])
+def apply_template(visit_id):
+    """Add the signs / drugs of one or more templates to a visit.
+    Body: {"sign_template_ids": [1, 2], "drug_template_ids": [3],
+           "sign_defaults": {"SignValue": "BT"},          (optional)
+           "drug_defaults": {"DrugTimes": "sáng", "DrugQuantity": 1}}  (optional)
+    Items already on the visit (same SignId / DrugId) are skipped; drugs take
+    their route from the drug catalog unless drug_defaults sets DrugRoute.
+    Returns the number of rows added per table.
+    """
+    try:
+        payload = request.get_json(force=True) or {}
+        if not isinstance(payload, dict):
+            return jsonify({'error': 'Request must be a JSON object'}), 400
+        response, status = _apply_templates([visit_id], payload)
+        if status == 201:
+            response['VisitId'] = visit_id
+        return jsonify(response), status
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error in apply_template: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@visit_chart_bp.route('/visits/apply-template', methods=['POST'])
+def apply_template_to_visits():
+    """Apply templates to many visits at once (e.g. a department's morning round).
+    Body: as /visits/<id>/apply-template, plus "visit_ids": [...] (at most 500).
+    One INSERT ... SELECT per table whatever the number of visits and templates.
+    """
+    try:
+        payload = request.get_json(force=True) or {}
+        if not isinstance(payload, dict):
+            return jsonify({'error': 'Request must be a JSON object'}), 400
+        errors = []
+        visit_ids = _id_list(payload, 'visit_ids', errors)
+        if errors or not visit_ids:
+            return jsonify({'error': 'visit_ids must be a non-empty list of integers'}), 400
+        if len(visit_ids) > MAX_TEMPLATE_VISITS:
+            return jsonify({'error': f'At most {MAX_TEMPLATE_VISITS} visits per request'}), 400
+        response, status = _apply_templates(visit_ids, payload)
+        if status == 201:
+            response['VisitIds'] = visit_ids
+        return jsonify(response), status
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error in apply_template_to_visits: {e}")
+        return jsonify({'error': str(e)}), 500
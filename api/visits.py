@@ -5,8 +5,9 @@ Basic CRUD operations for Visit management
 from flask import Blueprint, request, jsonify
 from sqlalchemy import asc, desc, text
 from models_main import db
-from models import Visit, Patient, Department, Staff, VisitStaff
+from models import Visit, Patient, Department, Staff, VisitStaff, VisitLoader, DepartmentCensus
 from datetime import datetime
+from utils.pagination import get_page_args, keyset_paginate, InvalidCursor
 
 visits_bp = Blueprint('visits', __name__)
 
@@ -33,7 +34,8 @@ def list_visits():
       date_from: filter visits from date (YYYY-MM-DD)
       date_to: filter visits to date (YYYY-MM-DD)
       limit: limit number of results (default 100)
-      offset: offset for pagination
+      cursor: opaque next_cursor from the previous page (keyset pagination)
+      offset: legacy offset pagination, used only when no cursor is given
     """
     try:
         # Base query with joins for related data
@@ -68,24 +70,37 @@ def list_visits():
                 return jsonify({'error': 'Invalid date_to format. Use YYYY-MM-DD'}), 400
         
         # Pagination
-        limit = min(request.args.get('limit', 100, type=int), 1000)  # Max 1000 records
+        cursor, limit = get_page_args(default_limit=100)
         offset = request.args.get('offset', 0, type=int)
         
         # Order by most recent visits first
-        query = query.order_by(desc(Visit.VisitTime), desc(Visit.VisitId))
-        
-        # Apply pagination
-        records = query.offset(offset).limit(limit).all()
-        
-        # Convert to dictionaries and get staff information
+        if offset and not cursor:
+            records = (
+                query.order_by(desc(Visit.VisitTime), desc(Visit.VisitId))
+                .offset(offset).limit(limit).all()
+            )
+            next_cursor = None
+        else:
+            try:
+                records, next_cursor = keyset_paginate(
+                    query, [Visit.VisitTime, Visit.VisitId], cursor, limit,
+                    descending=True,
+                    key_func=lambda row: (row[0].VisitTime, row[0].VisitId)
+                )
+            except InvalidCursor as e:
+                return jsonify({'error': str(e)}), 400
+        
+        # Load staff for the whole page in one query instead of per visit
+        staff_map = VisitLoader.staff_by_visit([visit.VisitId for visit, _ in records])
+        
+        # Convert to dictionaries with staff information
         data = []
         for visit, patient_name in records:
-            # Get staff names for this visit
-            staff_names = [vs.staff.StaffName for vs in visit.visit_staff if vs.staff]
+            staff_names = [s['StaffName'] for s in staff_map.get(visit.VisitId, [])]
             visit_data = visit_to_dict(visit, patient_name, staff_names)
             data.append(visit_data)
         
-        return jsonify({'visits': data})
+        return jsonify({'visits': data, 'next_cursor': next_cursor})
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -165,6 +180,7 @@ def create_visit():
             visit_staff = VisitStaff(VisitId=visit.VisitId, StaffId=staff_id)
             db.session.add(visit_staff)
         
+        DepartmentCensus.record_visit(visit.PatientId, visit.VisitTime)
         db.session.commit()
         
         # Return the created visit with related data
@@ -193,9 +209,14 @@ def update_visit(visit_id):
             visit.VisitPurpose = payload['VisitPurpose']
         if 'VisitTime' in payload and payload['VisitTime']:
             try:
-                visit.VisitTime = datetime.fromisoformat(payload['VisitTime'].replace('Z', '+00:00'))
+                visit_time = datetime.fromisoformat(payload['VisitTime'].replace('Z', '+00:00'))
             except ValueError:
                 return jsonify({'error': 'Invalid VisitTime format. Use ISO format'}), 400
+            if visit_time != visit.VisitTime:
+                # The visit may now fall in another department's stay
+                DepartmentCensus.record_visit(visit.PatientId, visit.VisitTime, -1)
+                visit.VisitTime = visit_time
+                DepartmentCensus.record_visit(visit.PatientId, visit.VisitTime)
         
         # Update staff associations if provided
         if 'StaffIds' in payload:
@@ -242,6 +263,7 @@ def delete_visit(visit_id):
     """Delete a visit and all related records"""
     try:
         visit = Visit.query.get_or_404(visit_id)
+        DepartmentCensus.record_visit(visit.PatientId, visit.VisitTime, -1)
         db.session.delete(visit)
         db.session.commit()
         
@@ -5,6 +5,7 @@ Handles environment variables and application settings
 
 import os
 import logging
+import tempfile
 from datetime import timedelta
 from pathlib import Path
 
@@ -42,6 +43,37 @@ class Config:
     ITEMS_PER_PAGE = int(os.getenv('ITEMS_PER_PAGE', 20))
     MAX_CONTENT_LENGTH = int(os.getenv('MAX_CONTENT_LENGTH', 25 * 1024 * 1024))  # 25MB
     
+    # Background Excel import jobs (utils/import_jobs.py)
+    IMPORT_JOB_FOLDER = os.getenv('IMPORT_JOB_FOLDER', os.path.join(tempfile.gettempdir(), 'his_import_jobs'))
+    IMPORT_WORKER_THREADS = int(os.getenv('IMPORT_WORKER_THREADS', 0))  # per web process; 0 = tools/import_worker.py only
+    IMPORT_JOB_POLL_SECONDS = int(os.getenv('IMPORT_JOB_POLL_SECONDS', 5))
+    IMPORT_JOB_STALE_SECONDS = int(os.getenv('IMPORT_JOB_STALE_SECONDS', 600))
+    
+    # Background document thumbnails (utils/thumbnails.py), per process
+    THUMBNAIL_WORKERS = int(os.getenv('THUMBNAIL_WORKERS', 2))
+    THUMBNAIL_QUEUE_LIMIT = int(os.getenv('THUMBNAIL_QUEUE_LIMIT', 100))
+    
+    # LibreOffice conversion pool (utils/office_converter.py), shared by all
+    # workers on the host; uses UNO when python3-uno is importable
+    OFFICE_BINARY = os.getenv('OFFICE_BINARY', 'libreoffice')
+    OFFICE_POOL_SIZE = int(os.getenv('OFFICE_POOL_SIZE', 1))
+    OFFICE_CONVERT_TIMEOUT = int(os.getenv('OFFICE_CONVERT_TIMEOUT', 30))
+    OFFICE_RECYCLE_AFTER = int(os.getenv('OFFICE_RECYCLE_AFTER', 50))
+    OFFICE_WORK_DIR = os.getenv('OFFICE_WORK_DIR', os.path.join(tempfile.gettempdir(), 'his_office'))
+    
+    # Content-addressed patient image store (utils/image_store.py)
+    PATIENT_IMAGE_STORE = os.getenv('PATIENT_IMAGE_STORE', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'patient_images'))
+    
+    # HTTP caching of document files and thumbnails (utils/http_cache.py), seconds
+    DOCUMENT_CACHE_MAX_AGE = int(os.getenv('DOCUMENT_CACHE_MAX_AGE', 86400))
+    
+    # Server-Sent Events for department pages (utils/department_events.py)
+    DEPARTMENT_EVENT_POLL_SECONDS = float(os.getenv('DEPARTMENT_EVENT_POLL_SECONDS', 1))
+    DEPARTMENT_EVENT_STREAM_SECONDS = int(os.getenv('DEPARTMENT_EVENT_STREAM_SECONDS', 300))
+    DEPARTMENT_EVENT_RETENTION_HOURS = int(os.getenv('DEPARTMENT_EVENT_RETENTION_HOURS', 24))
+    # Open streams per worker; each holds a gthread thread (keep below GUNICORN_THREADS)
+    DEPARTMENT_EVENT_MAX_STREAMS = int(os.getenv('DEPARTMENT_EVENT_MAX_STREAMS', 8))
+    
     # Static File Versioning (configurable via environment variable)
     STATIC_VERSION = os.getenv('STATIC_VERSION', '1.5')
     
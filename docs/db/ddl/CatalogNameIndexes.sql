@@ -0,0 +1,10 @@
+-- examdb.Drug / examdb.Sign migration: name indexes for keyset pagination
+-- /api/drugs and /api/signs page (limit / cursor) in (DrugName, DrugId) and
+-- (SignDesc, SignId) order; InnoDB secondary indexes carry the primary key,
+-- so these serve both the ORDER BY and the cursor range of every page.
+
+ALTER TABLE `Drug`
+  ADD KEY `Drug_DrugName_IDX` (`DrugName`);
+
+ALTER TABLE `Sign`
+  ADD KEY `Sign_SignDesc_IDX` (`SignDesc`);
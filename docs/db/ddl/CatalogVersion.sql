@@ -0,0 +1,27 @@
+-- examdb.CatalogVersion definition
+-- Per-table version counters for the in-process reference-data cache
+-- (utils/reference_cache.py). Every write path of a catalog table bumps
+-- its row; each gunicorn worker compares versions to decide when to reload.
+
+CREATE TABLE `CatalogVersion` (
+  `TableName` varchar(64) NOT NULL,
+  `Version` bigint(20) NOT NULL DEFAULT 0,
+  `UpdatedAt` datetime DEFAULT current_timestamp() ON UPDATE current_timestamp(),
+  PRIMARY KEY (`TableName`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+INSERT IGNORE INTO `CatalogVersion` (`TableName`, `Version`) VALUES
+  ('Drug', 0),
+  ('DrugGroup', 0),
+  ('ICD', 0),
+  ('Sign', 0),
+  ('BodySystem', 0),
+  ('BodyPart', 0),
+  ('BodySite', 0),
+  ('Department', 0),
+  ('DocumentType', 0),
+  ('StaffDocumentType', 0),
+  ('Test', 0),
+  ('Proc', 0),
+  ('SignTemplate', 0),
+  ('DrugTemplate', 0);
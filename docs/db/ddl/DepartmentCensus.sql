@@ -0,0 +1,32 @@
+-- examdb.DepartmentCensus / DepartmentCensusDay definitions
+-- Materialized department counters (models/DepartmentCensus.py). The
+-- patient and staff assignment endpoints update them in the same
+-- transaction as the assignment, so the department statistics endpoints
+-- read one row per department instead of aggregating PatientDepartment,
+-- StaffDepartment and Visit on every poll. TotalVisits is maintained by the
+-- visit create/update/delete endpoints.
+-- A department without a row is recounted on its first assignment change
+-- (and aggregated on read until then), so the tables may start empty.
+-- Fill (and later check) them from the assignment tables with:
+--   python tools/department_census.py rebuild
+--   python tools/department_census.py verify
+
+CREATE TABLE `DepartmentCensus` (
+  `DepartmentId` smallint(6) NOT NULL,
+  `CurrentPatients` int(11) NOT NULL DEFAULT 0,
+  `CurrentStaff` int(11) NOT NULL DEFAULT 0,
+  `TotalAdmissions` int(11) NOT NULL DEFAULT 0,
+  `TotalVisits` int(11) NOT NULL DEFAULT 0,
+  `UpdatedAt` datetime DEFAULT current_timestamp() ON UPDATE current_timestamp(),
+  PRIMARY KEY (`DepartmentId`),
+  CONSTRAINT `DepartmentCensus_Department_FK` FOREIGN KEY (`DepartmentId`) REFERENCES `Department` (`DepartmentId`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+CREATE TABLE `DepartmentCensusDay` (
+  `DepartmentId` smallint(6) NOT NULL,
+  `Day` date NOT NULL,
+  `Admissions` int(11) NOT NULL DEFAULT 0,
+  `Discharges` int(11) NOT NULL DEFAULT 0,
+  PRIMARY KEY (`DepartmentId`,`Day`),
+  CONSTRAINT `DepartmentCensusDay_Department_FK` FOREIGN KEY (`DepartmentId`) REFERENCES `Department` (`DepartmentId`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
@@ -0,0 +1,19 @@
+-- examdb.DepartmentEvent definition
+-- Outbox of department changes (patient admitted / transferred out, visit
+-- created) streamed to the department pages over Server-Sent Events
+-- (utils/department_events.py). Rows are written in the same transaction
+-- as the change; one poller thread per gunicorn worker reads new rows and
+-- fans them out to that worker's open streams. Rows older than
+-- DEPARTMENT_EVENT_RETENTION_HOURS are pruned by the pollers.
+
+CREATE TABLE `DepartmentEvent` (
+  `EventId` bigint(20) NOT NULL AUTO_INCREMENT,
+  `DepartmentId` smallint(6) NOT NULL,
+  `EventType` varchar(32) NOT NULL,
+  `PatientId` varchar(10) DEFAULT NULL,
+  `Payload` longtext CHARACTER SET utf8mb4 COLLATE utf8mb4_bin DEFAULT NULL CHECK (json_valid(`Payload`)),
+  `CreatedAt` datetime DEFAULT current_timestamp(),
+  PRIMARY KEY (`EventId`),
+  KEY `DepartmentEvent_Department_IDX` (`DepartmentId`,`EventId`),
+  KEY `DepartmentEvent_CreatedAt_IDX` (`CreatedAt`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
@@ -0,0 +1,26 @@
+-- examdb.ImportJob definition
+-- Queue of Excel imports run outside the HTTP request by the background job
+-- runner (utils/import_jobs.py). Workers claim a queued row with a
+-- conditional UPDATE and report progress on it while the import runs.
+
+CREATE TABLE `ImportJob` (
+  `JobId` varchar(32) NOT NULL,
+  `TableName` varchar(50) NOT NULL,
+  `FileName` varchar(255) DEFAULT NULL,
+  `FilePath` varchar(500) NOT NULL,
+  `SheetName` varchar(100) DEFAULT NULL,
+  `Status` enum('queued','running','done','failed') NOT NULL DEFAULT 'queued',
+  `Attempts` smallint(6) NOT NULL DEFAULT 0,
+  `WorkerId` varchar(100) DEFAULT NULL,
+  `TotalRows` int(11) DEFAULT 0,
+  `ProcessedRows` int(11) DEFAULT 0,
+  `ErrorCount` int(11) DEFAULT 0,
+  `Result` longtext CHARACTER SET utf8mb4 COLLATE utf8mb4_bin DEFAULT NULL CHECK (json_valid(`Result`)),
+  `Error` text DEFAULT NULL,
+  `CreatedAt` datetime DEFAULT current_timestamp(),
+  `StartedAt` datetime DEFAULT NULL,
+  `FinishedAt` datetime DEFAULT NULL,
+  `UpdatedAt` datetime DEFAULT current_timestamp(),
+  PRIMARY KEY (`JobId`),
+  KEY `ImportJob_Status_IDX` (`Status`,`CreatedAt`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
@@ -0,0 +1,15 @@
+-- examdb.PatientBlockKey definition
+-- Blocking keys for duplicate-patient detection (utils/patient_duplicates.py)
+-- behind /api/patients/duplicates and tools/patient_duplicates.py report.
+-- Each patient has a few keys - normalized CCCD, BHYT person number, phone,
+-- accent-stripped name + birth year, family + given name + birth year - and
+-- only patients sharing a key are compared, so detection stays near-linear.
+-- Rows are written with the patient data (Excel imports); populate or
+-- repair with tools/patient_duplicates.py reindex.
+
+CREATE TABLE `PatientBlockKey` (
+  `BlockKey` varchar(120) NOT NULL,
+  `PatientId` varchar(10) NOT NULL,
+  PRIMARY KEY (`BlockKey`,`PatientId`),
+  KEY `PatientBlockKey_PatientId_IDX` (`PatientId`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_bin;
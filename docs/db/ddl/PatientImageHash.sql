@@ -0,0 +1,7 @@
+-- examdb.Patient migration: patient images move to the filesystem
+-- Images live in a content-addressed store (utils/image_store.py) keyed by
+-- SHA-256; the Patient row keeps only the hash. Run
+-- tools/migrate_patient_images.py afterwards to drain the PatientImage BLOBs.
+
+ALTER TABLE `Patient`
+  ADD COLUMN `PatientImageHash` char(64) DEFAULT NULL COMMENT 'SHA-256 của ảnh trong kho ảnh' AFTER `PatientImage`;
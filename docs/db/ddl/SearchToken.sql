@@ -0,0 +1,18 @@
+-- examdb.SearchToken definition
+-- Diacritic-insensitive search index (utils/search_index.py) behind
+-- /api/search/patients, /api/search/drugs and /api/search/signs. One row per
+-- accent-stripped, lowercased word of the indexed fields (patient name,
+-- phone, CCCD, BHYT; drug name and active ingredient; sign description), so
+-- "nguyen van" matches "Nguyễn Văn" through prefix range scans of the
+-- primary key. The second index joins the other words of a query.
+-- Rows are written in the same transaction as the indexed data (API writes
+-- and Excel imports); populate or repair with
+-- tools/search_index.py rebuild.
+
+CREATE TABLE `SearchToken` (
+  `Entity` varchar(16) NOT NULL,
+  `Token` varchar(64) NOT NULL,
+  `EntityId` varchar(50) NOT NULL,
+  PRIMARY KEY (`Entity`,`Token`,`EntityId`),
+  KEY `SearchToken_EntityId_IDX` (`Entity`,`EntityId`,`Token`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_bin;
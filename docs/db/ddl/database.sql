@@ -66,6 +66,7 @@ CREATE TABLE `Patient` (
   `Allergy` varchar(255) DEFAULT '' COMMENT 'Tiền sử dị ứng',
   `History` text DEFAULT NULL COMMENT 'Tiền sử bệnh',
   `PatientImage` longblob DEFAULT NULL COMMENT 'Hình ảnh bệnh nhân',
+  `PatientImageHash` char(64) DEFAULT NULL COMMENT 'SHA-256 của ảnh trong kho ảnh',
   `PatientNote` varchar(100) DEFAULT '' COMMENT 'Ghi chú về bệnh nhân',
   `PatientPhone` varchar(20) DEFAULT NULL,
   `PatientCCCD` varchar(20) DEFAULT NULL,
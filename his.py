@@ -9,6 +9,8 @@ db = models_main.db
 # Import models individually to avoid circular imports
 from models.DocumentType import DocumentType
 from models.PatientsWithDepartment import PatientsWithDepartment
+from utils.streaming import wants_stream, ndjson_response
+from utils.serialization import columns_to_dict
 
 from api.department_patients import dept_patients_bp
 from api.body_sites import body_sites_bp
@@ -22,6 +24,7 @@ from api.drug_template import drug_template_bp
 from api.drug_template_detail import drug_template_detail_bp
 from api.drug_groups import drug_groups_bp
 from api.visits import visits_bp
+from api.visit_chart import visit_chart_bp
 from api.patient_visits import patient_visits_bp
 from api.v2_endpoints import v2_bp
 from api.patient_images import patient_images_bp
@@ -32,6 +35,9 @@ from api.staff import staff_bp
 from api.staff_documents import staff_documents_bp
 from api.patient_departments import patient_depts_bp
 from api.departments import departments_bp
+from api.template_bundles import template_bundles_bp
+from api.search import search_bp
+from api.icd import icd_bp
 
 config_name = 'development'
 app = create_app(config_name)
@@ -42,25 +48,8 @@ bp = Blueprint('api', __name__)
 # Generic API route generator for all ORM models
 def model_to_dict(obj):
     """Convert SQLAlchemy model to dictionary with proper serialization"""
-    result = {}
-    for c in obj.__table__.columns:
-        value = getattr(obj, c.name)
-        if value is not None:
-            # Handle different data types
-            if isinstance(value, datetime):
-                result[c.name] = value.isoformat()
-            elif isinstance(value, bytes):
-                # Convert bytes to string (for text fields stored as bytes)
-                try:
-                    result[c.name] = value.decode('utf-8')
-                except UnicodeDecodeError:
-                    # If it's binary data, convert to base64 or skip
-                    result[c.name] = str(value)
-            else:
-                result[c.name] = value
-        else:
-            result[c.name] = None
-    return result
+    # Serializer compiled once per model from its column metadata
+    return columns_to_dict(obj, isoformat=True)
 
 def register_model_api(model, route_name):
     @bp.route(f"/{route_name}", methods=['GET'], endpoint=f"get_all_{route_name}")
@@ -104,6 +93,11 @@ def register_model_api(model, route_name):
 def get_all_patients_with_department():
     try:
         department_id = request.args.get('department_id')
+        if wants_stream():
+            # One JSON line per patient, read through a server-side cursor
+            if department_id:
+                return ndjson_response(PatientsWithDepartment.iter_by_department(department_id))
+            return ndjson_response(PatientsWithDepartment.iter_all_with_departments())
         if department_id:
             # Get patients for specific department
             patients_data = PatientsWithDepartment.get_by_department(department_id)
@@ -128,6 +122,7 @@ app.register_blueprint(drug_template_bp, url_prefix='/api')
 app.register_blueprint(drug_template_detail_bp, url_prefix='/api')
 app.register_blueprint(drug_groups_bp, url_prefix='/api')
 app.register_blueprint(visits_bp, url_prefix='/api')
+app.register_blueprint(visit_chart_bp, url_prefix='/api')
 app.register_blueprint(patient_visits_bp, url_prefix='/api')
 app.register_blueprint(patient_images_bp, url_prefix='/api')
 app.register_blueprint(document_types_bp, url_prefix='/api')
@@ -137,6 +132,9 @@ app.register_blueprint(staff_bp, url_prefix='/api')
 app.register_blueprint(staff_documents_bp, url_prefix='/api')
 app.register_blueprint(patient_depts_bp, url_prefix='/api')
 app.register_blueprint(departments_bp, url_prefix='/api')
+app.register_blueprint(template_bundles_bp, url_prefix='/api')
+app.register_blueprint(search_bp, url_prefix='/api')
+app.register_blueprint(icd_bp, url_prefix='/api')
 app.register_blueprint(v2_bp, url_prefix='/api/v2')
 
 # Add UI routes
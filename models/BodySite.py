@@ -3,6 +3,7 @@ BodySite Model
 """
 
 from models_main import db
+from utils.serialization import columns_to_dict
 
 class BodySite(db.Model):
     __tablename__ = 'BodySite'
@@ -16,4 +17,4 @@ class BodySite(db.Model):
         
     def to_dict(self):
         """Convert object to dictionary for JSON serialization"""
-        return {column.name: getattr(self, column.name) for column in self.__table__.columns}
+        return columns_to_dict(self)
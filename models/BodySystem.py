@@ -3,6 +3,7 @@ BodySystem Model
 """
 
 from models_main import db
+from utils.serialization import columns_to_dict
 
 class BodySystem(db.Model):
     __tablename__ = 'BodySystem'
@@ -18,4 +19,4 @@ class BodySystem(db.Model):
         
     def to_dict(self):
         """Convert object to dictionary for JSON serialization"""
-        return {column.name: getattr(self, column.name) for column in self.__table__.columns}
+        return columns_to_dict(self)
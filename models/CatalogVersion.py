@@ -0,0 +1,20 @@
+"""
+CatalogVersion Model - per-table version counters for the reference-data cache
+"""
+
+from models_main import db
+from utils.serialization import columns_to_dict
+
+class CatalogVersion(db.Model):
+    __tablename__ = 'CatalogVersion'
+
+    TableName = db.Column(db.String(64), primary_key=True)
+    Version = db.Column(db.BigInteger, nullable=False, default=0)
+    UpdatedAt = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
+
+    def __repr__(self):
+        return f'<CatalogVersion {self.TableName}: {self.Version}>'
+
+    def to_dict(self):
+        """Convert object to dictionary for JSON serialization"""
+        return columns_to_dict(self, isoformat=True)
@@ -3,6 +3,7 @@ Department Model
 """
 
 from models_main import db
+from utils.serialization import columns_to_dict
 
 class Department(db.Model):
     __tablename__ = 'Department'
@@ -43,8 +44,4 @@ class Department(db.Model):
         
     def to_dict(self):
         """Convert object to dictionary for JSON serialization"""
-        return {
-            'DepartmentId': self.DepartmentId,
-            'DepartmentName': self.DepartmentName,
-            'DepartmentType': self.DepartmentType
-        }
+        return columns_to_dict(self)
@@ -0,0 +1,306 @@
+"""
+DepartmentCensus Models - materialized per-department counters
+
+DepartmentCensus keeps the current patient/staff counts and the number of
+admissions and visits ever made in each department; DepartmentCensusDay
+keeps the admissions and discharges of each department per calendar day.
+Both are maintained by the assignment and visit endpoints inside their own
+transaction (see ``record_patient_move`` / ``record_staff_move`` /
+``record_visit``) and can be rebuilt from PatientDepartment, StaffDepartment
+and Visit with tools/department_census.py. A department's missing row is
+recounted on its first change, and counters are clamped at zero.
+"""
+
+from datetime import datetime
+
+from models_main import db
+from utils.serialization import columns_to_dict
+
+# Dialects with a native single-statement upsert
+UPSERT_DIALECTS = ('mysql', 'mariadb', 'sqlite', 'postgresql')
+
+TOTAL_COLUMNS = ('CurrentPatients', 'CurrentStaff', 'TotalAdmissions', 'TotalVisits')
+DAY_COLUMNS = ('Admissions', 'Discharges')
+
+
+class DepartmentCensus(db.Model):
+    __tablename__ = 'DepartmentCensus'
+
+    DepartmentId = db.Column(db.SmallInteger, db.ForeignKey('Department.DepartmentId'), primary_key=True)
+    CurrentPatients = db.Column(db.Integer, nullable=False, default=0)
+    CurrentStaff = db.Column(db.Integer, nullable=False, default=0)
+    TotalAdmissions = db.Column(db.Integer, nullable=False, default=0)
+    TotalVisits = db.Column(db.Integer, nullable=False, default=0)
+    UpdatedAt = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
+
+    def __repr__(self):
+        return f'<DepartmentCensus {self.DepartmentId}: {self.CurrentPatients} patients, {self.CurrentStaff} staff>'
+
+    def to_dict(self):
+        """Convert object to dictionary for JSON serialization"""
+        return columns_to_dict(self, isoformat=True)
+
+    @staticmethod
+    def _increment(table, key, deltas, assign=None, initial=None):
+        """Add ``deltas`` to the row identified by ``key`` (and set the
+        ``assign`` values), creating the row if missing.
+
+        A new row starts from ``initial`` (a recount that already includes
+        this transaction's change) when given, else from the deltas. Counters
+        never go below zero. One native upsert where available, so two
+        transactions creating the same row cannot collide; update-then-insert
+        elsewhere.
+        """
+        dialect = db.session.get_bind().dialect.name
+        assign = assign or {}
+        if initial is None:
+            initial = {c: max(v, 0) for c, v in deltas.items()}
+        values = {**key, **initial, **assign}
+        changes = {
+            **{c: db.case((table.c[c] + v < 0, 0), else_=table.c[c] + v) if v < 0 else table.c[c] + v
+               for c, v in deltas.items()},
+            **assign
+        }
+        if dialect in UPSERT_DIALECTS:
+            if dialect in ('mysql', 'mariadb'):
+                from sqlalchemy.dialects.mysql import insert
+                stmt = insert(table).values(values).on_duplicate_key_update(changes)
+            else:
+                if dialect == 'sqlite':
+                    from sqlalchemy.dialects.sqlite import insert
+                else:
+                    from sqlalchemy.dialects.postgresql import insert
+                stmt = insert(table).values(values).on_conflict_do_update(
+                    index_elements=list(key), set_=changes
+                )
+            db.session.execute(stmt)
+            return
+
+        condition = db.and_(*(table.c[c] == v for c, v in key.items()))
+        updated = db.session.execute(table.update().where(condition).values(changes)).rowcount
+        if not updated:
+            db.session.execute(table.insert().values(values))
+
+    @classmethod
+    def _apply(cls, changes, at=None):
+        """Apply {department_id: {counter: delta}} in the caller's transaction.
+
+        A department without a census row yet (tables created empty, or a
+        department never counted) gets its row and daily history recounted
+        from the assignment tables, after flushing the caller's change, so
+        the first move after deploy does not start from zero. Departments
+        are updated in id order so concurrent transfers between the same
+        departments lock the rows in the same order.
+        """
+        day = (at or datetime.now()).date()
+        db.session.flush()
+        counted = {
+            department_id for (department_id,) in db.session.query(cls.DepartmentId)
+            .filter(cls.DepartmentId.in_(list(changes)))
+        }
+        missing = [department_id for department_id in changes if department_id not in counted]
+        totals, days = cls.compute(missing) if missing else ({}, {})
+
+        for department_id in sorted(changes):
+            delta = changes[department_id]
+            census = {
+                column: delta[name]
+                for name, column in (('patients', 'CurrentPatients'), ('staff', 'CurrentStaff'),
+                                     ('admissions', 'TotalAdmissions'), ('visits', 'TotalVisits'))
+                if delta.get(name)
+            }
+            daily = {
+                column: delta[name]
+                for name, column in (('admissions', 'Admissions'), ('discharges', 'Discharges'))
+                if delta.get(name)
+            }
+
+            if department_id not in counted:
+                # Recounted rows; a row created meanwhile by another
+                # transaction (which could not see this change) gets the delta
+                cls._increment(
+                    cls.__table__,
+                    {'DepartmentId': department_id},
+                    {**dict.fromkeys(TOTAL_COLUMNS, 0), **census},
+                    assign={'UpdatedAt': datetime.now()},
+                    initial=totals.get(department_id, dict.fromkeys(TOTAL_COLUMNS, 0))
+                )
+                for (day_department_id, counted_day), values in days.items():
+                    if day_department_id == department_id:
+                        cls._increment(
+                            DepartmentCensusDay.__table__,
+                            {'DepartmentId': department_id, 'Day': counted_day},
+                            {**dict.fromkeys(DAY_COLUMNS, 0), **(daily if counted_day == day else {})},
+                            initial=values
+                        )
+                continue
+
+            if census:
+                cls._increment(
+                    cls.__table__,
+                    {'DepartmentId': department_id},
+                    census,
+                    assign={'UpdatedAt': datetime.now()}
+                )
+            if daily:
+                cls._increment(
+                    DepartmentCensusDay.__table__,
+                    {'DepartmentId': department_id, 'Day': day},
+                    daily
+                )
+
+    @classmethod
+    def record_patient_move(cls, from_department_ids, to_department_id, at=None):
+        """Count a patient leaving ``from_department_ids`` (their current
+        assignments, ended at ``at``) and admitted to ``to_department_id``.
+        Call before ``db.session.commit()`` of the assignment."""
+        changes = {}
+        for department_id in from_department_ids:
+            if department_id is None:
+                continue
+            delta = changes.setdefault(department_id, {})
+            delta['patients'] = delta.get('patients', 0) - 1
+            delta['discharges'] = delta.get('discharges', 0) + 1
+        if to_department_id is not None:
+            delta = changes.setdefault(to_department_id, {})
+            delta['patients'] = delta.get('patients', 0) + 1
+            delta['admissions'] = delta.get('admissions', 0) + 1
+        cls._apply(changes, at)
+
+    @classmethod
+    def record_staff_move(cls, from_department_ids, to_department_id=None):
+        """Count staff leaving ``from_department_ids`` (current assignments
+        ended or deleted) and joining ``to_department_id``. Call before
+        ``db.session.commit()`` of the assignment."""
+        changes = {}
+        for department_id in from_department_ids:
+            if department_id is None:
+                continue
+            delta = changes.setdefault(department_id, {})
+            delta['staff'] = delta.get('staff', 0) - 1
+        if to_department_id is not None:
+            delta = changes.setdefault(to_department_id, {})
+            delta['staff'] = delta.get('staff', 0) + 1
+        cls._apply(changes)
+
+    @staticmethod
+    def visit_departments(patient_id, visit_time):
+        """Departments a visit at ``visit_time`` counts for: those the patient
+        was assigned to then (At <= VisitTime < EndDate, open-ended for the
+        current assignment)"""
+        from models.PatientDepartment import PatientDepartment
+
+        if visit_time is None:
+            return []
+        return sorted({
+            department_id for (department_id,) in db.session.query(PatientDepartment.DepartmentId).filter(
+                PatientDepartment.PatientId == patient_id,
+                PatientDepartment.DepartmentId.isnot(None),
+                PatientDepartment.At <= visit_time,
+                db.or_(
+                    PatientDepartment.EndDate > visit_time,
+                    db.and_(PatientDepartment.EndDate.is_(None), PatientDepartment.Current == True)
+                )
+            )
+        })
+
+    @classmethod
+    def record_visit(cls, patient_id, visit_time, count=1):
+        """Count a visit created (``count=1``) or deleted (``count=-1``) for
+        the departments the patient was in at ``visit_time``. Call before
+        ``db.session.commit()``; when a visit is deleted, before the delete
+        is flushed."""
+        department_ids = cls.visit_departments(patient_id, visit_time)
+        if department_ids:
+            cls._apply({department_id: {'visits': count} for department_id in department_ids})
+
+    @classmethod
+    def compute(cls, department_ids=None):
+        """Recompute both tables (or the rows of ``department_ids``) from the
+        assignment tables.
+
+        Returns ({department_id: {CurrentPatients, CurrentStaff, TotalAdmissions, TotalVisits}},
+        {(department_id, day): {Admissions, Discharges}}), departments without
+        any assignment omitted.
+        """
+        from models.PatientDepartment import PatientDepartment
+        from models.StaffDepartment import StaffDepartment
+        from models.Visit import Visit
+
+        def count_if(condition):
+            return db.func.coalesce(db.func.sum(db.case((condition, 1), else_=0)), 0)
+
+        def only(query, column):
+            return query.filter(column.in_(department_ids)) if department_ids is not None else query
+
+        totals = {}
+        for department_id, current, admissions in only(db.session.query(
+            PatientDepartment.DepartmentId,
+            count_if(PatientDepartment.Current == True),
+            db.func.count(PatientDepartment.id)
+        ).filter(PatientDepartment.DepartmentId.isnot(None)), PatientDepartment.DepartmentId
+        ).group_by(PatientDepartment.DepartmentId):
+            totals[department_id] = {
+                **dict.fromkeys(TOTAL_COLUMNS, 0), 'CurrentPatients': int(current), 'TotalAdmissions': int(admissions)
+            }
+        for department_id, current in only(db.session.query(
+            StaffDepartment.DepartmentId,
+            count_if(StaffDepartment.Current == True)
+        ), StaffDepartment.DepartmentId).group_by(StaffDepartment.DepartmentId):
+            totals.setdefault(department_id, dict.fromkeys(TOTAL_COLUMNS, 0))['CurrentStaff'] = int(current)
+        # Same rule as visit_departments: a visit counts for the departments
+        # the patient was assigned to at VisitTime
+        for department_id, visits in only(db.session.query(
+            PatientDepartment.DepartmentId,
+            db.func.count(db.distinct(Visit.VisitId))
+        ).join(
+            Visit,
+            db.and_(
+                Visit.PatientId == PatientDepartment.PatientId,
+                Visit.VisitTime >= PatientDepartment.At,
+                db.or_(
+                    Visit.VisitTime < PatientDepartment.EndDate,
+                    db.and_(PatientDepartment.EndDate.is_(None), PatientDepartment.Current == True)
+                )
+            )
+        ).filter(PatientDepartment.DepartmentId.isnot(None)), PatientDepartment.DepartmentId
+        ).group_by(PatientDepartment.DepartmentId):
+            totals.setdefault(department_id, dict.fromkeys(TOTAL_COLUMNS, 0))['TotalVisits'] = int(visits)
+
+        days = {}
+        for column, counter in ((PatientDepartment.At, 'Admissions'), (PatientDepartment.EndDate, 'Discharges')):
+            day = db.func.date(column)
+            rows = only(db.session.query(
+                PatientDepartment.DepartmentId, day, db.func.count(PatientDepartment.id)
+            ).filter(
+                PatientDepartment.DepartmentId.isnot(None), column.isnot(None)
+            ), PatientDepartment.DepartmentId).group_by(PatientDepartment.DepartmentId, day)
+            for department_id, value, count in rows:
+                # DATE() comes back as a string on SQLite
+                if isinstance(value, str):
+                    value = datetime.strptime(value[:10], '%Y-%m-%d').date()
+                elif isinstance(value, datetime):
+                    value = value.date()
+                days.setdefault((department_id, value), {'Admissions': 0, 'Discharges': 0})[counter] = int(count)
+        return totals, days
+
+
+class DepartmentCensusDay(db.Model):
+    __tablename__ = 'DepartmentCensusDay'
+
+    DepartmentId = db.Column(db.SmallInteger, db.ForeignKey('Department.DepartmentId'), primary_key=True)
+    Day = db.Column(db.Date, primary_key=True)
+    Admissions = db.Column(db.Integer, nullable=False, default=0)
+    Discharges = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<DepartmentCensusDay {self.DepartmentId} {self.Day}: +{self.Admissions} -{self.Discharges}>'
+
+    def to_dict(self):
+        """Convert object to dictionary for JSON serialization"""
+        return {
+            'DepartmentId': self.DepartmentId,
+            'Day': self.Day.isoformat() if self.Day else None,
+            'Admissions': self.Admissions,
+            'Discharges': self.Discharges
+        }
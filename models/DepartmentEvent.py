@@ -0,0 +1,28 @@
+"""
+DepartmentEvent Model - outbox of department changes pushed to browsers over SSE
+"""
+
+from models_main import db
+from utils.serialization import columns_to_dict
+
+class DepartmentEvent(db.Model):
+    __tablename__ = 'DepartmentEvent'
+
+    EventId = db.Column(db.BigInteger, primary_key=True, autoincrement=True)
+    DepartmentId = db.Column(db.SmallInteger, nullable=False)
+    EventType = db.Column(db.String(32), nullable=False)
+    PatientId = db.Column(db.String(10))
+    Payload = db.Column(db.JSON)
+    CreatedAt = db.Column(db.DateTime, default=db.func.current_timestamp())
+
+    __table_args__ = (
+        db.Index('DepartmentEvent_Department_IDX', 'DepartmentId', 'EventId'),
+        db.Index('DepartmentEvent_CreatedAt_IDX', 'CreatedAt'),
+    )
+
+    def __repr__(self):
+        return f'<DepartmentEvent {self.EventId}: {self.EventType} in {self.DepartmentId}>'
+
+    def to_dict(self):
+        """Convert object to dictionary for JSON serialization"""
+        return columns_to_dict(self, isoformat=True)
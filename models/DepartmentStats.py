@@ -0,0 +1,130 @@
+"""
+DepartmentStats Service Class
+"""
+
+from datetime import date, timedelta
+
+from models_main import db
+
+RECENT_ADMISSION_DAYS = 7
+
+
+class DepartmentStats:
+    """
+    Service class returning the department census in a single statement.
+
+    Every figure comes from the materialized DepartmentCensus row of each
+    department (a primary-key join) and recent admissions from the last
+    7 DepartmentCensusDay rows, so the read cost is O(departments) and does
+    not grow with the assignment or visit history. A department that has no
+    census row yet is aggregated from the assignment tables instead.
+
+    Figures per department:
+      CurrentStaff      staff currently assigned
+      CurrentPatients   patients currently assigned
+      TotalPatients     patient assignments ever made (admissions)
+      RecentAdmissions  admissions made in the last 7 calendar days (today
+                        included), whether or not the patient is still in the
+                        department; before the census tables this counted
+                        current assignments made in the last 7x24 hours
+      TotalVisits       visits made while the patient was assigned to the
+                        department (At <= VisitTime < EndDate, open-ended
+                        for the current assignment)
+    """
+
+    @classmethod
+    def _query(cls, department_id=None, search=None, department_type=None):
+        from models.Department import Department
+        from models.DepartmentCensus import DepartmentCensus, DepartmentCensusDay
+
+        first_day = date.today() - timedelta(days=RECENT_ADMISSION_DAYS - 1)
+        recent = db.session.query(
+            DepartmentCensusDay.DepartmentId.label('DepartmentId'),
+            db.func.sum(DepartmentCensusDay.Admissions).label('RecentAdmissions')
+        ).filter(DepartmentCensusDay.Day >= first_day)
+
+        departments = db.session.query(Department)
+        if search:
+            departments = departments.filter(Department.DepartmentName.ilike(f"%{search}%"))
+        if department_type:
+            departments = departments.filter(Department.DepartmentType == department_type)
+        if department_id is not None:
+            departments = departments.filter(Department.DepartmentId == department_id)
+            recent = recent.filter(DepartmentCensusDay.DepartmentId == department_id)
+        recent = recent.group_by(DepartmentCensusDay.DepartmentId).subquery()
+
+        columns = [
+            Department.DepartmentId,
+            Department.DepartmentName,
+            Department.DepartmentType,
+            db.func.coalesce(DepartmentCensus.CurrentStaff, 0).label('CurrentStaff'),
+            db.func.coalesce(DepartmentCensus.CurrentPatients, 0).label('CurrentPatients'),
+            db.func.coalesce(DepartmentCensus.TotalAdmissions, 0).label('TotalPatients'),
+            db.func.coalesce(DepartmentCensus.TotalVisits, 0).label('TotalVisits'),
+            db.func.coalesce(recent.c.RecentAdmissions, 0).label('RecentAdmissions'),
+            DepartmentCensus.DepartmentId.label('CensusDepartmentId')
+        ]
+
+        query = (
+            departments
+            .with_entities(*columns)
+            .outerjoin(DepartmentCensus, DepartmentCensus.DepartmentId == Department.DepartmentId)
+            .outerjoin(recent, recent.c.DepartmentId == Department.DepartmentId)
+        )
+        return query.order_by(Department.DepartmentName)
+
+    @staticmethod
+    def _to_dict(row):
+        census = {
+            'DepartmentId': row.DepartmentId,
+            'DepartmentName': row.DepartmentName,
+            'DepartmentType': row.DepartmentType,
+            'CurrentStaff': max(int(row.CurrentStaff), 0),
+            'CurrentPatients': max(int(row.CurrentPatients), 0),
+            'TotalPatients': max(int(row.TotalPatients), 0),
+            'RecentAdmissions': max(int(row.RecentAdmissions), 0),
+            'TotalVisits': max(int(row.TotalVisits), 0)
+        }
+        return census
+
+    @classmethod
+    def _census(cls, rows):
+        """Dicts of ``rows``. Departments without a DepartmentCensus row yet
+        (empty tables after deploy, never moved since) are counted from the
+        assignment tables instead of reading as zero; their row is created by
+        the next assignment or by tools/department_census.py rebuild."""
+        from models.DepartmentCensus import DepartmentCensus
+
+        results = [cls._to_dict(row) for row in rows]
+        missing = [row.DepartmentId for row in rows if row.CensusDepartmentId is None]
+        if not missing:
+            return results
+
+        totals, days = DepartmentCensus.compute(missing)
+        first_day = date.today() - timedelta(days=RECENT_ADMISSION_DAYS - 1)
+        for census in results:
+            department_id = census['DepartmentId']
+            if department_id not in missing:
+                continue
+            counted = totals.get(department_id, {})
+            census['CurrentStaff'] = counted.get('CurrentStaff', 0)
+            census['CurrentPatients'] = counted.get('CurrentPatients', 0)
+            census['TotalPatients'] = counted.get('TotalAdmissions', 0)
+            census['TotalVisits'] = counted.get('TotalVisits', 0)
+            census['RecentAdmissions'] = sum(
+                values['Admissions'] for (day_department_id, day), values in days.items()
+                if day_department_id == department_id and day >= first_day
+            )
+        return results
+
+    @classmethod
+    def get_all(cls, search=None, department_type=None):
+        """Census of every department (optionally filtered by name/type), sorted by name"""
+        query = cls._query(search=search, department_type=department_type)
+        return cls._census(query.all())
+
+    @classmethod
+    def get_one(cls, department_id):
+        """Census of one department, None if it does not exist"""
+        row = cls._query(department_id).first()
+        return cls._census([row])[0] if row else None
@@ -9,6 +9,7 @@ if parent_dir not in sys.path:
     sys.path.insert(0, parent_dir)
 
 from models_main import db
+from utils.serialization import columns_to_dict
 
 class DocumentType(db.Model):
     __tablename__ = 'DocumentType'
@@ -23,7 +24,4 @@ class DocumentType(db.Model):
     
     def to_dict(self):
         """Convert DocumentType to dictionary"""
-        return {
-            'DocumentTypeId': self.DocumentTypeId,
-            'DocumentTypeName': self.DocumentTypeName
-        }
+        return columns_to_dict(self)
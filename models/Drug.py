@@ -3,6 +3,7 @@ Drug Model
 """
 
 from models_main import db
+from utils.serialization import columns_to_dict
 
 class Drug(db.Model):
     __tablename__ = 'Drug'
@@ -23,10 +24,15 @@ class Drug(db.Model):
     DrugPriceVP = db.Column(db.Integer, default=0)
     DrugNote = db.Column(db.String(100), default='')
     Count = db.Column(db.String(50))
+
+    # Keyset pagination of /api/drugs sorts on (DrugName, DrugId)
+    __table_args__ = (
+        db.Index('Drug_DrugName_IDX', 'DrugName'),
+    )
     
     def __repr__(self):
         return f'<Drug {self.DrugName}>'
         
     def to_dict(self):
         """Convert object to dictionary for JSON serialization"""
-        return {column.name: getattr(self, column.name) for column in self.__table__.columns}
+        return columns_to_dict(self)
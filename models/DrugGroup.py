@@ -3,6 +3,7 @@ DrugGroup Model
 """
 
 from models_main import db
+from utils.serialization import columns_to_dict
 
 class DrugGroup(db.Model):
     __tablename__ = 'DrugGroup'
@@ -19,4 +20,4 @@ class DrugGroup(db.Model):
         
     def to_dict(self):
         """Convert object to dictionary for JSON serialization"""
-        return {column.name: getattr(self, column.name) for column in self.__table__.columns}
+        return columns_to_dict(self)
@@ -3,6 +3,7 @@ DrugTemplateDetail Model
 """
 
 from models_main import db
+from utils.serialization import columns_to_dict
 
 class DrugTemplateDetail(db.Model):
     __tablename__ = 'DrugTemplateDetail'
@@ -13,4 +14,4 @@ class DrugTemplateDetail(db.Model):
     
     def to_dict(self):
         """Convert object to dictionary for JSON serialization"""
-        return {column.name: getattr(self, column.name) for column in self.__table__.columns}
+        return columns_to_dict(self)
@@ -3,6 +3,7 @@ ICD Model
 """
 
 from models_main import db
+from utils.serialization import columns_to_dict
 
 class ICD(db.Model):
     __tablename__ = 'ICD'
@@ -16,4 +17,4 @@ class ICD(db.Model):
         
     def to_dict(self):
         """Convert object to dictionary for JSON serialization"""
-        return {column.name: getattr(self, column.name) for column in self.__table__.columns}
+        return columns_to_dict(self)
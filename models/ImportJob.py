@@ -0,0 +1,36 @@
+"""
+ImportJob Model - queued Excel imports run by the background job runner
+"""
+
+from models_main import db
+from utils.serialization import columns_to_dict
+
+class ImportJob(db.Model):
+    __tablename__ = 'ImportJob'
+
+    JobId = db.Column(db.String(32), primary_key=True)
+    TableName = db.Column(db.String(50), nullable=False)
+    FileName = db.Column(db.String(255))
+    FilePath = db.Column(db.String(500), nullable=False)
+    SheetName = db.Column(db.String(100))
+    Status = db.Column(db.Enum('queued', 'running', 'done', 'failed', name='import_job_status'),
+                       nullable=False, default='queued')
+    Attempts = db.Column(db.SmallInteger, nullable=False, default=0)
+    WorkerId = db.Column(db.String(100))
+    TotalRows = db.Column(db.Integer, default=0)
+    ProcessedRows = db.Column(db.Integer, default=0)
+    ErrorCount = db.Column(db.Integer, default=0)
+    Result = db.Column(db.JSON)
+    Error = db.Column(db.Text)
+    CreatedAt = db.Column(db.DateTime, default=db.func.current_timestamp())
+    StartedAt = db.Column(db.DateTime)
+    FinishedAt = db.Column(db.DateTime)
+    UpdatedAt = db.Column(db.DateTime, default=db.func.current_timestamp())
+
+    def __repr__(self):
+        return f'<ImportJob {self.JobId}: {self.TableName} {self.Status}>'
+
+    def to_dict(self):
+        """Convert object to dictionary for JSON serialization"""
+        # The upload path stays on the server
+        return columns_to_dict(self, exclude=('FilePath',), isoformat=True)
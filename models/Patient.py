@@ -3,6 +3,7 @@ Patient Model
 """
 
 from models_main import db
+from utils.serialization import columns_to_dict
 
 class Patient(db.Model):
     __tablename__ = 'Patient'
@@ -14,7 +15,11 @@ class Patient(db.Model):
     PatientAddress = db.Column(db.String(255))
     Allergy = db.Column(db.String(255), default='')
     History = db.Column(db.Text)
-    PatientImage = db.Column(db.LargeBinary, default=None)
+    # Legacy BLOB, drained by tools/migrate_patient_images.py; deferred so that
+    # patient queries never load it
+    PatientImage = db.deferred(db.Column(db.LargeBinary, default=None))
+    # SHA-256 of the image in the content-addressed store (utils/image_store.py)
+    PatientImageHash = db.Column(db.String(64), default=None)
     PatientNote = db.Column(db.String(100), default='')
     # Adding missing fields from schema
     PatientPhone = db.Column(db.String(20))
@@ -32,18 +37,4 @@ class Patient(db.Model):
         
     def to_dict(self):
         """Convert object to dictionary for JSON serialization"""
-        return {
-            'PatientId': self.PatientId,
-            'PatientName': self.PatientName,
-            'PatientGender': self.PatientGender,
-            'PatientAge': self.PatientAge,
-            'PatientAddress': self.PatientAddress,
-            'Allergy': self.Allergy,
-            'History': self.History,
-            'PatientNote': self.PatientNote,
-            'PatientPhone': self.PatientPhone,
-            'PatientCCCD': self.PatientCCCD,
-            'PatientBHYT': self.PatientBHYT,
-            'PatientBHYTValid': self.PatientBHYTValid,
-            'PatientRelative': self.PatientRelative
-        }
+        return columns_to_dict(self, exclude=('PatientImageHash',))
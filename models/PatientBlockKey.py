@@ -0,0 +1,25 @@
+"""
+PatientBlockKey Model - blocking keys for duplicate-patient detection
+"""
+
+from models_main import db
+from utils.serialization import columns_to_dict
+
+class PatientBlockKey(db.Model):
+    __tablename__ = 'PatientBlockKey'
+
+    # 'cccd:...', 'bhyt:...', 'phone:...', 'name:...' or 'short:...'
+    # (utils/patient_duplicates.py blocking_keys)
+    BlockKey = db.Column(db.String(120), primary_key=True)
+    PatientId = db.Column(db.String(10), primary_key=True)
+
+    __table_args__ = (
+        db.Index('PatientBlockKey_PatientId_IDX', 'PatientId'),
+    )
+
+    def __repr__(self):
+        return f'<PatientBlockKey {self.PatientId}: {self.BlockKey}>'
+
+    def to_dict(self):
+        """Convert object to dictionary for JSON serialization"""
+        return columns_to_dict(self)
@@ -0,0 +1,289 @@
+"""
+PatientChart Service Class
+"""
+
+from collections import defaultdict
+
+from models_main import db
+from models.VisitLoader import VisitLoader
+
+SECTIONS = ('departments', 'visits', 'summary', 'documents')
+
+
+class BatchLoader:
+    """
+    DataLoader-style resolver: sections register the keys they will need
+    (``want``) while their own rows are loaded, and the first ``get`` of an
+    entity type loads every registered key of that type with one IN query.
+    Each entity type is therefore read at most once per chart, however many
+    sections and rows refer to it.
+    """
+
+    def __init__(self, batch_functions):
+        self._batch_functions = batch_functions
+        self._pending = defaultdict(set)
+        self._loaded = defaultdict(dict)
+
+    def want(self, kind, keys):
+        loaded = self._loaded[kind]
+        self._pending[kind].update(key for key in keys if key is not None and key not in loaded)
+
+    def get(self, kind, key):
+        if self._pending.get(kind):
+            keys = self._pending.pop(kind)
+            self._loaded[kind].update(self._batch_functions[kind](list(keys)))
+        return self._loaded[kind].get(key)
+
+
+def _load_staff(staff_ids):
+    from models.Staff import Staff
+    rows = db.session.query(Staff.StaffId, Staff.StaffName, Staff.StaffRole).filter(
+        Staff.StaffId.in_(staff_ids)).all()
+    return {row.StaffId: {'StaffId': row.StaffId, 'StaffName': row.StaffName, 'StaffRole': row.StaffRole}
+            for row in rows}
+
+
+def _load_icd(codes):
+    from models.ICD import ICD
+    rows = db.session.query(ICD.ICDCode, ICD.ICDName).filter(ICD.ICDCode.in_(codes)).all()
+    return {row.ICDCode: row.ICDName for row in rows}
+
+
+def _load_departments(department_ids):
+    from models.Department import Department
+    rows = db.session.query(
+        Department.DepartmentId, Department.DepartmentName, Department.DepartmentType
+    ).filter(Department.DepartmentId.in_(department_ids)).all()
+    return {row.DepartmentId: {'DepartmentName': row.DepartmentName, 'DepartmentType': row.DepartmentType}
+            for row in rows}
+
+
+def _load_document_types(type_ids):
+    from models.DocumentType import DocumentType
+    rows = db.session.query(DocumentType.DocumentTypeId, DocumentType.DocumentTypeName).filter(
+        DocumentType.DocumentTypeId.in_(type_ids)).all()
+    return {row.DocumentTypeId: row.DocumentTypeName for row in rows}
+
+
+BATCH_FUNCTIONS = {
+    'staff': _load_staff,
+    'icd': _load_icd,
+    'department': _load_departments,
+    'document_type': _load_document_types,
+}
+
+
+class PatientChart:
+    """
+    Service class assembling everything the patient screens show - patient,
+    department history, visits with staff and diagnoses, visit summary and
+    documents - for ``/api/patients/<id>/chart``.
+
+    Loading happens in two passes: each requested section reads its own
+    rows (one query per table, no joins to lookup tables) and registers the
+    staff ids, ICD codes, department ids and document type ids it refers
+    to; then the sections are assembled through a shared ``BatchLoader``,
+    which reads each of those entity types once. A full chart costs about
+    ten statements regardless of the number of visits or documents.
+
+    Section formats match the standalone endpoints they replace.
+    """
+
+    @staticmethod
+    def parse_include(value):
+        """Sections named in ``include=`` (comma separated; empty = all).
+        Raises ValueError for unknown names."""
+        if not value:
+            return list(SECTIONS)
+        names = [name.strip() for name in value.split(',') if name.strip()]
+        unknown = [name for name in names if name not in SECTIONS]
+        if unknown:
+            raise ValueError(f"Unknown chart section(s): {', '.join(unknown)}. "
+                             f"Available: {', '.join(SECTIONS)}")
+        return names
+
+    @staticmethod
+    def _patient(patient_id):
+        from models.Patient import Patient
+        from utils import image_variants
+
+        row = db.session.query(
+            Patient.PatientId, Patient.PatientName, Patient.PatientGender, Patient.PatientAge,
+            Patient.PatientAddress, Patient.PatientPhone, Patient.PatientCCCD, Patient.PatientBHYT,
+            Patient.PatientBHYTValid, Patient.PatientRelative, Patient.PatientNote, Patient.Allergy,
+            Patient.History, Patient.PatientImageHash
+        ).filter(Patient.PatientId == patient_id).first()
+        if row is None:
+            return None
+        patient = dict(row._mapping)
+        patient['PatientImageUrls'] = image_variants.urls(row.PatientId, patient.pop('PatientImageHash'))
+        return patient
+
+    @staticmethod
+    def _departments(patient_id, loader):
+        from models.PatientDepartment import PatientDepartment
+
+        rows = (
+            db.session.query(
+                PatientDepartment.id,
+                PatientDepartment.PatientId,
+                PatientDepartment.DepartmentId,
+                PatientDepartment.Current,
+                PatientDepartment.At.label('StartDate'),
+                PatientDepartment.EndDate,
+                PatientDepartment.Reason
+            )
+            .filter(PatientDepartment.PatientId == patient_id)
+            .order_by(PatientDepartment.At.desc())
+            .all()
+        )
+        loader.want('department', [row.DepartmentId for row in rows])
+
+        def assemble():
+            departments = []
+            for row in rows:
+                department = loader.get('department', row.DepartmentId)
+                if department is None:
+                    # Same rows as the inner join of /api/patients/<id>/departments
+                    continue
+                row_dict = dict(row._mapping)
+                row_dict['StartDate'] = row_dict['StartDate'].isoformat() if row_dict['StartDate'] else None
+                row_dict['EndDate'] = row_dict['EndDate'].isoformat() if row_dict['EndDate'] else None
+                row_dict.update(department)
+                departments.append(row_dict)
+            return departments
+        return assemble
+
+    @staticmethod
+    def _visit_rows(patient_id):
+        from models.Visit import Visit
+
+        rows = (
+            db.session.query(Visit.VisitId, Visit.PatientId, Visit.VisitPurpose, Visit.VisitTime)
+            .filter(Visit.PatientId == patient_id)
+            .order_by(Visit.VisitTime.desc(), Visit.VisitId.desc())
+            .all()
+        )
+        return [
+            {
+                'VisitId': row.VisitId,
+                'PatientId': row.PatientId,
+                'VisitPurpose': row.VisitPurpose,
+                'VisitTime': VisitLoader.format_time(row.VisitTime)
+            }
+            for row in rows
+        ]
+
+    @staticmethod
+    def _visits(visit_rows, loader):
+        from models.Visit import VisitStaff
+        from models.VisitDiagnosis import VisitDiagnosis
+
+        visit_ids = [visit['VisitId'] for visit in visit_rows]
+        staff_rows = diagnosis_rows = []
+        if visit_ids:
+            staff_rows = (
+                db.session.query(VisitStaff.VisitId, VisitStaff.StaffId)
+                .filter(VisitStaff.VisitId.in_(visit_ids))
+                .order_by(VisitStaff.id)
+                .all()
+            )
+            diagnosis_rows = (
+                db.session.query(VisitDiagnosis.VisitId, VisitDiagnosis.ICDCode, VisitDiagnosis.ActualDiagnosis)
+                .filter(VisitDiagnosis.VisitId.in_(visit_ids))
+                .order_by(VisitDiagnosis.id)
+                .all()
+            )
+        loader.want('staff', [row.StaffId for row in staff_rows])
+        loader.want('icd', [row.ICDCode for row in diagnosis_rows])
+
+        def assemble():
+            staff_by_visit = defaultdict(list)
+            for row in staff_rows:
+                staff = loader.get('staff', row.StaffId)
+                if staff is not None:
+                    staff_by_visit[row.VisitId].append(staff)
+            diagnoses_by_visit = defaultdict(list)
+            for row in diagnosis_rows:
+                diagnoses_by_visit[row.VisitId].append({
+                    'ICDCode': row.ICDCode,
+                    'ICDName': loader.get('icd', row.ICDCode),
+                    'ActualDiagnosis': row.ActualDiagnosis
+                })
+            return [
+                {
+                    **visit,
+                    'staff': staff_by_visit.get(visit['VisitId'], []),
+                    'diagnoses': diagnoses_by_visit.get(visit['VisitId'], [])
+                }
+                for visit in visit_rows
+            ]
+        return assemble
+
+    @staticmethod
+    def _summary(visit_rows):
+        """Same figures as /api/patient_visits/<id>/summary, from the visit rows"""
+        counts = defaultdict(int)
+        for visit in visit_rows:
+            counts[visit['VisitPurpose']] += 1
+        latest = visit_rows[0] if visit_rows else None
+        return {
+            'total_visits': len(visit_rows),
+            'purpose_breakdown': [
+                {'purpose': purpose or 'Không xác định', 'count': count}
+                for purpose, count in sorted(counts.items(), key=lambda item: -item[1])
+            ],
+            'latest_visit': {
+                'VisitId': latest['VisitId'],
+                'VisitTime': latest['VisitTime'],
+                'VisitPurpose': latest['VisitPurpose']
+            } if latest else None
+        }
+
+    @staticmethod
+    def _documents(patient, loader):
+        from models.PatientDocuments import PatientDocuments
+
+        documents = PatientDocuments.query.filter(PatientDocuments.PatientId == patient['PatientId']).all()
+        loader.want('document_type', [document.DocumentTypeId for document in documents])
+
+        def assemble():
+            result = []
+            for document in documents:
+                doc_dict = document.to_dict()
+                doc_dict['PatientName'] = patient['PatientName']
+                doc_dict['PatientAge'] = patient['PatientAge']
+                doc_dict['DocumentTypeName'] = loader.get('document_type', document.DocumentTypeId)
+                result.append(doc_dict)
+            return result
+        return assemble
+
+    @classmethod
+    def load(cls, patient_id, include=None):
+        """Chart of a patient with the requested sections, None if the patient does not exist"""
+        include = list(SECTIONS) if include is None else include
+        patient = cls._patient(patient_id)
+        if patient is None:
+            return None
+
+        loader = BatchLoader(BATCH_FUNCTIONS)
+        builders = {}
+
+        # Pass 1: each section reads its own rows and registers its keys
+        if 'departments' in include:
+            builders['departments'] = cls._departments(patient_id, loader)
+        if 'visits' in include or 'summary' in include:
+            visit_rows = cls._visit_rows(patient_id)
+            if 'visits' in include:
+                builders['visits'] = cls._visits(visit_rows, loader)
+            if 'summary' in include:
+                summary = cls._summary(visit_rows)
+                builders['summary'] = lambda: summary
+        if 'documents' in include:
+            builders['documents'] = cls._documents(patient, loader)
+
+        # Pass 2: assemble, each referenced entity type loaded once
+        chart = {'patient': patient}
+        for name in include:
+            chart[name] = builders[name]()
+        return chart
@@ -3,6 +3,7 @@ PatientDepartment Model
 """
 
 from models_main import db
+from utils.serialization import columns_to_dict
 from datetime import datetime
 
 class PatientDepartment(db.Model):
@@ -22,4 +23,4 @@ class PatientDepartment(db.Model):
         
     def to_dict(self):
         """Convert object to dictionary for JSON serialization"""
-        return {column.name: getattr(self, column.name) for column in self.__table__.columns}
+        return columns_to_dict(self)
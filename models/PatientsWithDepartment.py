@@ -4,116 +4,263 @@ PatientsWithDepartment Service Class
 
 from models_main import db
 
+# Dialects that support ROW_NUMBER() OVER (...) window functions
+WINDOW_FUNCTION_DIALECTS = ('mysql', 'mariadb', 'postgresql')
+
 class PatientsWithDepartment:
     """
     Service class that provides patient information with department details
     Uses relationships to fetch department names instead of IDs
     Not a direct ORM model to avoid table conflicts
+
+    All lookups are set-based: a constant number of queries regardless of
+    the number of patients or assignments, with rows grouped in Python.
     """
-    
+
+    @staticmethod
+    def _patient_columns():
+        """Patient columns used in the output (never the PatientImage BLOB)"""
+        from models.Patient import Patient
+        return (
+            Patient.PatientId,
+            Patient.PatientName,
+            Patient.PatientAge,
+            Patient.PatientGender,
+            Patient.PatientAddress,
+            Patient.Allergy,
+            Patient.History,
+            Patient.PatientNote,
+            Patient.PatientImageHash
+        )
+
+    @classmethod
+    def _latest_assignments(cls, department_id=None):
+        """Subquery with the latest PatientDepartment row per patient.
+
+        Uses ROW_NUMBER() on MySQL/MariaDB; other dialects (SQLite) fall back
+        to a portable MAX(At) GROUP BY join. The fallback may return more than
+        one row per patient when two assignments share the same At, so callers
+        keep the first row per PatientId.
+        """
+        from models.PatientDepartment import PatientDepartment
+
+        dialect = db.session.get_bind().dialect.name
+        if dialect in WINDOW_FUNCTION_DIALECTS:
+            ranked = db.session.query(
+                PatientDepartment.PatientId,
+                PatientDepartment.DepartmentId,
+                PatientDepartment.At,
+                db.func.row_number().over(
+                    partition_by=PatientDepartment.PatientId,
+                    order_by=(PatientDepartment.At.desc(), PatientDepartment.id.desc())
+                ).label('rn')
+            )
+            if department_id is not None:
+                ranked = ranked.filter(PatientDepartment.DepartmentId == department_id)
+            ranked = ranked.subquery()
+            return (
+                db.session.query(ranked.c.PatientId, ranked.c.DepartmentId, ranked.c.At)
+                .filter(ranked.c.rn == 1)
+                .subquery()
+            )
+
+        latest = db.session.query(
+            PatientDepartment.PatientId,
+            db.func.max(PatientDepartment.At).label('At')
+        )
+        if department_id is not None:
+            latest = latest.filter(PatientDepartment.DepartmentId == department_id)
+        latest = latest.group_by(PatientDepartment.PatientId).subquery()
+
+        query = db.session.query(
+            PatientDepartment.PatientId,
+            PatientDepartment.DepartmentId,
+            PatientDepartment.At
+        ).join(
+            latest,
+            db.and_(
+                PatientDepartment.PatientId == latest.c.PatientId,
+                PatientDepartment.At == latest.c.At
+            )
+        )
+        if department_id is not None:
+            query = query.filter(PatientDepartment.DepartmentId == department_id)
+        return query.subquery()
+
+    @staticmethod
+    def _format_assigned_date(value):
+        return value.strftime('%Y-%m-%d %H:%M:%S') if value else None
+
+    @classmethod
+    def _all_with_departments_query(cls):
+        """Patients with their latest assignment, sorted by name"""
+        from models.Patient import Patient
+        from models.Department import Department
+
+        latest = cls._latest_assignments()
+        return (
+            db.session.query(
+                *cls._patient_columns(),
+                Department.DepartmentName.label('CurrentDepartment'),
+                latest.c.At.label('LatestAt')
+            )
+            .outerjoin(latest, latest.c.PatientId == Patient.PatientId)
+            .outerjoin(Department, Department.DepartmentId == latest.c.DepartmentId)
+            .order_by(Patient.PatientName, Patient.PatientId)
+        )
+
+    @classmethod
+    def _history(cls, patient_ids=None):
+        """Assignment history per PatientId, newest first (all patients when ``patient_ids`` is None)"""
+        from models.Department import Department
+        from models.PatientDepartment import PatientDepartment
+
+        query = (
+            db.session.query(
+                PatientDepartment.PatientId,
+                PatientDepartment.At,
+                Department.DepartmentName
+            )
+            .outerjoin(Department, Department.DepartmentId == PatientDepartment.DepartmentId)
+        )
+        if patient_ids is not None:
+            query = query.filter(PatientDepartment.PatientId.in_(patient_ids))
+        history_rows = query.order_by(
+            PatientDepartment.PatientId, PatientDepartment.At.desc(), PatientDepartment.id.desc()
+        ).all()
+
+        history = {}
+        for h in history_rows:
+            history.setdefault(h.PatientId, []).append({
+                'DepartmentName': h.DepartmentName if h.DepartmentName else 'Unknown',
+                'AssignedDate': cls._format_assigned_date(h.At)
+            })
+        return history
+
+    @staticmethod
+    def _all_with_departments_dict(row, history):
+        from utils.image_variants import urls as image_urls
+        return {
+            'PatientId': row.PatientId,
+            'PatientName': row.PatientName,
+            'PatientAge': row.PatientAge,
+            'PatientGender': row.PatientGender,
+            'PatientAddress': row.PatientAddress,
+            'Allergy': row.Allergy,
+            'History': row.History,
+            'PatientNote': row.PatientNote,
+            'PatientImageUrls': image_urls(row.PatientId, row.PatientImageHash),
+            'CurrentDepartment': row.CurrentDepartment,
+            'AllDepartments': history.get(row.PatientId, []),
+            'At': row.LatestAt.isoformat() if row.LatestAt else None
+        }
+
     @classmethod
     def get_all_with_departments(cls):
         """Get all patients with their department information, sorted by name"""
         try:
-            # Import here to avoid circular imports
-            from models.Patient import Patient
-            from models.Department import Department
-            from models.PatientDepartment import PatientDepartment
-            
-            patients = Patient.query.order_by(Patient.PatientName).all()
+            # Query 1: patients with their latest assignment
+            rows = cls._all_with_departments_query().all()
+            # Query 2: full assignment history for every patient
+            history = cls._history()
+
             result = []
-            
-            for patient in patients:
-                # Get the most recent department assignment
-                latest_assignment = PatientDepartment.query.filter_by(
-                    PatientId=patient.PatientId
-                ).order_by(PatientDepartment.At.desc()).first()
-                
-                current_department = None
-                if latest_assignment:
-                    department = Department.query.get(latest_assignment.DepartmentId)
-                    current_department = department.DepartmentName if department else None
-                
-                # Get all department assignments
-                all_assignments = PatientDepartment.query.filter_by(
-                    PatientId=patient.PatientId
-                ).order_by(PatientDepartment.At.desc()).all()
-                
-                all_departments = []
-                for assignment in all_assignments:
-                    department = Department.query.get(assignment.DepartmentId)
-                    all_departments.append({
-                        'DepartmentName': department.DepartmentName if department else 'Unknown',
-                        'AssignedDate': assignment.At.strftime('%Y-%m-%d %H:%M:%S') if assignment.At else None
-                    })
-                
-                patient_data = {
-                    'PatientId': patient.PatientId,
-                    'PatientName': patient.PatientName,
-                    'PatientAge': patient.PatientAge,
-                    'PatientGender': patient.PatientGender,
-                    'PatientAddress': patient.PatientAddress,
-                    'Allergy': patient.Allergy,
-                    'History': patient.History,
-                    'PatientNote': patient.PatientNote,
-                    'CurrentDepartment': current_department,
-                    'AllDepartments': all_departments,
-                    'At': latest_assignment.At.isoformat() if latest_assignment and latest_assignment.At else None
-                }
-                result.append(patient_data)
-            
+            seen = set()
+            for row in rows:
+                if row.PatientId in seen:
+                    continue
+                seen.add(row.PatientId)
+                result.append(cls._all_with_departments_dict(row, history))
+
             return result
         except Exception as e:
             print(f"Error in get_all_with_departments: {e}")
             return []
-    
+
+    @classmethod
+    def iter_all_with_departments(cls, batch_size=1000):
+        """Same rows as ``get_all_with_departments``, streamed: patients are
+        read through a server-side cursor and the history is loaded per batch.
+        Errors are raised, not swallowed."""
+        from utils.streaming import iter_partitions
+
+        last_id = None
+        for partition in iter_partitions(cls._all_with_departments_query(), batch_size):
+            history = cls._history(list({row.PatientId for row in partition}))
+            for row in partition:
+                # Duplicates of the MAX(At) fallback are adjacent (sorted by name, id)
+                if row.PatientId == last_id:
+                    continue
+                last_id = row.PatientId
+                yield cls._all_with_departments_dict(row, history)
+
+    @classmethod
+    def _by_department_query(cls, department_id):
+        """Patients ever assigned to a department with their latest assignment there"""
+        from models.Patient import Patient
+
+        latest = cls._latest_assignments(department_id)
+        return (
+            db.session.query(*cls._patient_columns(), latest.c.At.label('AssignedAt'))
+            .join(latest, latest.c.PatientId == Patient.PatientId)
+            .order_by(Patient.PatientName, Patient.PatientId)
+        )
+
+    @staticmethod
+    def _department_name(department_id):
+        from models.Department import Department
+        # Department info is the same for every row, look it up once
+        department = Department.query.get(department_id)
+        return department.DepartmentName if department else 'Unknown'
+
+    @classmethod
+    def _by_department_dict(cls, row, department_name):
+        from utils.image_variants import urls as image_urls
+        return {
+            'PatientId': row.PatientId,
+            'PatientName': row.PatientName,
+            'PatientAge': row.PatientAge,
+            'PatientGender': row.PatientGender,
+            'PatientAddress': row.PatientAddress,
+            'Allergy': row.Allergy,
+            'History': row.History,
+            'PatientNote': row.PatientNote,
+            'PatientImageUrls': image_urls(row.PatientId, row.PatientImageHash),
+            'CurrentDepartment': department_name,
+            'AssignedDate': cls._format_assigned_date(row.AssignedAt),
+            'At': row.AssignedAt.isoformat() if row.AssignedAt else None
+        }
+
     @classmethod
     def get_by_department(cls, department_id):
         """Get patients in a specific department"""
         try:
-            # Import here to avoid circular imports
-            from models.Patient import Patient
-            from models.Department import Department
-            from models.PatientDepartment import PatientDepartment
-            
-            # Get patient IDs that are assigned to this department
-            patient_assignments = PatientDepartment.query.filter_by(DepartmentId=department_id).all()
-            patient_ids = [assignment.PatientId for assignment in patient_assignments]
-            
-            if not patient_ids:
-                return []
-            
-            # Get patients with these IDs
-            patients = Patient.query.filter(Patient.PatientId.in_(patient_ids)).order_by(Patient.PatientName).all()
+            department_name = cls._department_name(department_id)
+            rows = cls._by_department_query(department_id).all()
+
             result = []
-            
-            for patient in patients:
-                # Get department info
-                department = Department.query.get(department_id)
-                department_name = department.DepartmentName if department else 'Unknown'
-                
-                # Get assignment date for this department
-                assignment = PatientDepartment.query.filter_by(
-                    PatientId=patient.PatientId,
-                    DepartmentId=department_id
-                ).order_by(PatientDepartment.At.desc()).first()
-                
-                patient_data = {
-                    'PatientId': patient.PatientId,
-                    'PatientName': patient.PatientName,
-                    'PatientAge': patient.PatientAge,
-                    'PatientGender': patient.PatientGender,
-                    'PatientAddress': patient.PatientAddress,
-                    'Allergy': patient.Allergy,
-                    'History': patient.History,
-                    'PatientNote': patient.PatientNote,
-                    'CurrentDepartment': department_name,
-                    'AssignedDate': assignment.At.strftime('%Y-%m-%d %H:%M:%S') if assignment and assignment.At else None,
-                    'At': assignment.At.isoformat() if assignment and assignment.At else None
-                }
-                result.append(patient_data)
-            
+            seen = set()
+            for row in rows:
+                if row.PatientId in seen:
+                    continue
+                seen.add(row.PatientId)
+                result.append(cls._by_department_dict(row, department_name))
+
             return result
         except Exception as e:
             print(f"Error in get_by_department: {e}")
             return []
+
+    @classmethod
+    def iter_by_department(cls, department_id, batch_size=1000):
+        """Same rows as ``get_by_department``, streamed through a server-side
+        cursor. Errors are raised, not swallowed."""
+        from utils.streaming import iter_rows
+
+        department_name = cls._department_name(department_id)
+        last_id = None
+        for row in iter_rows(cls._by_department_query(department_id), batch_size):
+            if row.PatientId == last_id:
+                continue
+            last_id = row.PatientId
+            yield cls._by_department_dict(row, department_name)
@@ -3,6 +3,7 @@ Proc Model
 """
 
 from models_main import db
+from utils.serialization import columns_to_dict
 
 class Proc(db.Model):
     __tablename__ = 'Proc'
@@ -21,4 +22,4 @@ class Proc(db.Model):
         
     def to_dict(self):
         """Convert object to dictionary for JSON serialization"""
-        return {column.name: getattr(self, column.name) for column in self.__table__.columns}
+        return columns_to_dict(self)
@@ -0,0 +1,26 @@
+"""
+SearchToken Model - diacritic-insensitive search index for patients, drugs and signs
+"""
+
+from models_main import db
+from utils.serialization import columns_to_dict
+
+class SearchToken(db.Model):
+    __tablename__ = 'SearchToken'
+
+    # 'patient', 'drug' or 'sign' (utils/search_index.py ENTITIES)
+    Entity = db.Column(db.String(16), primary_key=True)
+    # Accent-stripped, lowercased word (or compacted identifier)
+    Token = db.Column(db.String(64), primary_key=True)
+    EntityId = db.Column(db.String(50), primary_key=True)
+
+    __table_args__ = (
+        db.Index('SearchToken_EntityId_IDX', 'Entity', 'EntityId', 'Token'),
+    )
+
+    def __repr__(self):
+        return f'<SearchToken {self.Entity} {self.EntityId}: {self.Token}>'
+
+    def to_dict(self):
+        """Convert object to dictionary for JSON serialization"""
+        return columns_to_dict(self)
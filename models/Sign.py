@@ -3,6 +3,7 @@ Sign Model
 """
 
 from models_main import db
+from utils.serialization import columns_to_dict
 
 class Sign(db.Model):
     __tablename__ = 'Sign'
@@ -12,10 +13,15 @@ class Sign(db.Model):
     SignType = db.Column(db.Boolean, default=False)  # 0: cơ năng, 1: thực thể
     SystemId = db.Column(db.Integer, db.ForeignKey('BodySystem.SystemId'), nullable=False)
     Speciality = db.Column(db.String(100))
+
+    # Keyset pagination of /api/signs sorts on (SignDesc, SignId)
+    __table_args__ = (
+        db.Index('Sign_SignDesc_IDX', 'SignDesc'),
+    )
     
     def __repr__(self):
         return f'<Sign {self.SignDesc}>'
         
     def to_dict(self):
         """Convert object to dictionary for JSON serialization"""
-        return {column.name: getattr(self, column.name) for column in self.__table__.columns}
+        return columns_to_dict(self)
@@ -3,6 +3,7 @@ SignTemplateDetail Model
 """
 
 from models_main import db
+from utils.serialization import columns_to_dict
 
 class SignTemplateDetail(db.Model):
     __tablename__ = 'SignTemplateDetail'
@@ -13,4 +14,4 @@ class SignTemplateDetail(db.Model):
     
     def to_dict(self):
         """Convert object to dictionary for JSON serialization"""
-        return {column.name: getattr(self, column.name) for column in self.__table__.columns}
+        return columns_to_dict(self)
@@ -3,6 +3,7 @@ StaffDepartment Model - Association model between Staff and Department
 """
 
 from models_main import db
+from utils.serialization import columns_to_dict
 
 class StaffDepartment(db.Model):
     __tablename__ = 'StaffDepartment'
@@ -20,10 +21,4 @@ class StaffDepartment(db.Model):
     
     def to_dict(self):
         """Convert object to dictionary for JSON serialization"""
-        return {
-            'id': self.id,
-            'StaffId': self.StaffId,
-            'DepartmentId': self.DepartmentId,
-            'Current': self.Current,
-            'Position': self.Position
-        }
+        return columns_to_dict(self)
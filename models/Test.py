@@ -3,6 +3,7 @@ Test Model
 """
 
 from models_main import db
+from utils.serialization import columns_to_dict
 
 class Test(db.Model):
     __tablename__ = 'Test'
@@ -22,4 +23,4 @@ class Test(db.Model):
         
     def to_dict(self):
         """Convert object to dictionary for JSON serialization"""
-        return {column.name: getattr(self, column.name) for column in self.__table__.columns}
+        return columns_to_dict(self)
@@ -3,6 +3,7 @@ TestTemplate Model
 """
 
 from models_main import db
+from utils.serialization import columns_to_dict
 
 class TestTemplate(db.Model):
     __tablename__ = 'TestTemplate'
@@ -14,4 +15,4 @@ class TestTemplate(db.Model):
     
     def to_dict(self):
         """Convert object to dictionary for JSON serialization"""
-        return {column.name: getattr(self, column.name) for column in self.__table__.columns}
+        return columns_to_dict(self)
@@ -3,6 +3,7 @@ Visit Model
 """
 
 from models_main import db
+from utils.serialization import columns_to_dict
 from datetime import datetime
 
 class Visit(db.Model):
@@ -33,25 +34,7 @@ class Visit(db.Model):
     
     def to_dict(self):
         """Convert Visit to dictionary for JSON serialization"""
-        # Handle VisitTime safely - it might be a string or datetime
-        visit_time = None
-        if self.VisitTime:
-            print(f"DEBUG: VisitTime type: {type(self.VisitTime)}, value: {self.VisitTime}")
-            try:
-                if hasattr(self.VisitTime, 'isoformat'):
-                    visit_time = self.VisitTime.isoformat()
-                else:
-                    visit_time = str(self.VisitTime)
-            except Exception as e:
-                print(f"DEBUG: Error formatting VisitTime: {e}")
-                visit_time = str(self.VisitTime)
-        
-        return {
-            'VisitId': self.VisitId,
-            'PatientId': self.PatientId,
-            'VisitPurpose': self.VisitPurpose,
-            'VisitTime': visit_time
-        }
+        return columns_to_dict(self, isoformat=True)
     
     def __repr__(self):
         return f'<Visit {self.VisitId}: {self.PatientId} - {self.VisitPurpose}>'
@@ -70,11 +53,7 @@ class VisitStaff(db.Model):
     
     def to_dict(self):
         """Convert VisitStaff to dictionary for JSON serialization"""
-        return {
-            'id': self.id,
-            'VisitId': self.VisitId,
-            'StaffId': self.StaffId
-        }
+        return columns_to_dict(self)
     
     def __repr__(self):
         return f'<VisitStaff {self.VisitId}:{self.StaffId}>'
@@ -3,6 +3,7 @@ VisitDiagnosis Model
 """
 
 from models_main import db
+from utils.serialization import columns_to_dict
 
 class VisitDiagnosis(db.Model):
     __tablename__ = 'VisitDiagnosis'
@@ -15,10 +16,4 @@ class VisitDiagnosis(db.Model):
     
     def to_dict(self):
         """Convert VisitDiagnosis to dictionary for JSON serialization"""
-        return {
-            'id': self.id,
-            'VisitId': self.VisitId,
-            'ICDCode': self.ICDCode,
-            'ActualDiagnosis': self.ActualDiagnosis,
-            'DiseaseType': self.DiseaseType
-        }
+        return columns_to_dict(self)
@@ -3,6 +3,7 @@ VisitDocuments Model
 """
 
 from models_main import db
+from utils.serialization import columns_to_dict
 from sqlalchemy import JSON
 
 class VisitDocuments(db.Model):
@@ -16,4 +17,4 @@ class VisitDocuments(db.Model):
     
     def to_dict(self):
         """Convert object to dictionary for JSON serialization"""
-        return {column.name: getattr(self, column.name) for column in self.__table__.columns}
+        return columns_to_dict(self)
@@ -3,6 +3,7 @@ VisitDrug Model
 """
 
 from models_main import db
+from utils.serialization import columns_to_dict
 from datetime import datetime
 
 class VisitDrug(db.Model):
@@ -21,15 +22,4 @@ class VisitDrug(db.Model):
     
     def to_dict(self):
         """Convert VisitDrug to dictionary for JSON serialization"""
-        return {
-            'id': self.id,
-            'VisitId': self.VisitId,
-            'DrugId': self.DrugId,
-            'DrugRoute': self.DrugRoute,
-            'DrugQuantity': self.DrugQuantity,
-            'DrugTimes': self.DrugTimes,
-            'DrugAtTime': self.DrugAtTime.isoformat() if self.DrugAtTime else None,
-            'Note': self.Note,
-            'DrugStatus': self.DrugStatus,
-            'IsCustom': self.IsCustom
-        }
+        return columns_to_dict(self, isoformat=True)
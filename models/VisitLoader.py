@@ -0,0 +1,123 @@
+"""
+VisitLoader Service Class
+"""
+
+from models_main import db
+
+class VisitLoader:
+    """
+    Service class that loads visits together with their staff and diagnoses
+    using a fixed number of queries (one per entity type, IN-list on VisitId)
+    instead of one query per visit. Responses are assembled in memory.
+    """
+
+    @staticmethod
+    def format_time(value):
+        """Format a VisitTime value for JSON serialization"""
+        if value is None:
+            return None
+        if hasattr(value, 'isoformat'):
+            return value.isoformat()
+        return str(value)
+
+    @classmethod
+    def staff_by_visit(cls, visit_ids):
+        """Return {VisitId: [staff dict, ...]} for the given visits in one query"""
+        from models.Visit import VisitStaff
+        from models.Staff import Staff
+
+        result = {visit_id: [] for visit_id in visit_ids}
+        if not visit_ids:
+            return result
+
+        rows = (
+            db.session.query(
+                VisitStaff.VisitId,
+                Staff.StaffId,
+                Staff.StaffName,
+                Staff.StaffRole
+            )
+            .join(Staff, VisitStaff.StaffId == Staff.StaffId)
+            .filter(VisitStaff.VisitId.in_(visit_ids))
+            .order_by(VisitStaff.id)
+            .all()
+        )
+        for row in rows:
+            result[row.VisitId].append({
+                'StaffId': row.StaffId,
+                'StaffName': row.StaffName,
+                'StaffRole': row.StaffRole
+            })
+        return result
+
+    @classmethod
+    def diagnoses_by_visit(cls, visit_ids):
+        """Return {VisitId: [diagnosis dict, ...]} for the given visits in one query"""
+        from models.VisitDiagnosis import VisitDiagnosis
+
+        result = {visit_id: [] for visit_id in visit_ids}
+        if not visit_ids:
+            return result
+
+        rows = (
+            db.session.query(
+                VisitDiagnosis.VisitId,
+                VisitDiagnosis.ICDCode,
+                VisitDiagnosis.ActualDiagnosis
+            )
+            .filter(VisitDiagnosis.VisitId.in_(visit_ids))
+            .order_by(VisitDiagnosis.id)
+            .all()
+        )
+        for row in rows:
+            result[row.VisitId].append({
+                'ICDCode': row.ICDCode,
+                'ActualDiagnosis': row.ActualDiagnosis
+            })
+        return result
+
+    @classmethod
+    def attach_details(cls, visits_data):
+        """Add 'staff' and 'diagnoses' lists to each visit dict (two queries total)"""
+        visit_ids = [v['VisitId'] for v in visits_data]
+        staff_map = cls.staff_by_visit(visit_ids)
+        diagnoses_map = cls.diagnoses_by_visit(visit_ids)
+        for visit_data in visits_data:
+            visit_data['staff'] = staff_map.get(visit_data['VisitId'], [])
+            visit_data['diagnoses'] = diagnoses_map.get(visit_data['VisitId'], [])
+        return visits_data
+
+    @classmethod
+    def _visit_query(cls, patient_id):
+        from models.Visit import Visit
+
+        return (
+            db.session.query(
+                Visit.VisitId,
+                Visit.PatientId,
+                Visit.VisitPurpose,
+                Visit.VisitTime
+            )
+            .filter(Visit.PatientId == patient_id)
+            .order_by(Visit.VisitTime.desc(), Visit.VisitId.desc())
+        )
+
+    @classmethod
+    def _row_to_dict(cls, row):
+        row_dict = dict(row._mapping)
+        row_dict['VisitTime'] = cls.format_time(row_dict.get('VisitTime'))
+        return row_dict
+
+    @classmethod
+    def load_patient_visits(cls, patient_id):
+        """Get all visits of a patient with staff and diagnoses (three queries)"""
+        visits_data = [cls._row_to_dict(r) for r in cls._visit_query(patient_id).all()]
+        return cls.attach_details(visits_data)
+
+    @classmethod
+    def load_latest_visit(cls, patient_id):
+        """Get the most recent visit of a patient with staff and diagnoses, or None"""
+        row = cls._visit_query(patient_id).first()
+        if row is None:
+            return None
+        return cls.attach_details([cls._row_to_dict(row)])[0]
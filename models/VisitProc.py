@@ -3,6 +3,7 @@ VisitProc Model
 """
 
 from models_main import db
+from utils.serialization import columns_to_dict
 from datetime import datetime
 
 class VisitProc(db.Model):
@@ -18,4 +19,4 @@ class VisitProc(db.Model):
     
     def to_dict(self):
         """Convert object to dictionary for JSON serialization"""
-        return {column.name: getattr(self, column.name) for column in self.__table__.columns}
+        return columns_to_dict(self)
@@ -42,6 +42,27 @@ from .SignTemplateDetail import SignTemplateDetail
 # Document and service models
 from .PatientDocuments import PatientDocuments
 from .PatientsWithDepartment import PatientsWithDepartment
+from .VisitLoader import VisitLoader
+from .DepartmentStats import DepartmentStats
+from .PatientChart import PatientChart
+
+# Materialized department counters
+from .DepartmentCensus import DepartmentCensus, DepartmentCensusDay
+
+# Department change outbox for Server-Sent Events
+from .DepartmentEvent import DepartmentEvent
+
+# Reference-data cache version counters
+from .CatalogVersion import CatalogVersion
+
+# Background Excel import queue
+from .ImportJob import ImportJob
+
+# Diacritic-insensitive search index
+from .SearchToken import SearchToken
+
+# Duplicate-patient blocking keys
+from .PatientBlockKey import PatientBlockKey
 
 # Make all models available at package level
 __all__ = [
@@ -59,5 +80,24 @@ __all__ = [
     'SignTemplate', 'SignTemplateDetail',
     
     # Document and service models
-    'PatientDocuments', 'PatientsWithDepartment'
+    'PatientDocuments', 'PatientsWithDepartment', 'VisitLoader', 'DepartmentStats',
+    'PatientChart',
+
+    # Materialized department counters
+    'DepartmentCensus', 'DepartmentCensusDay',
+
+    # Department change outbox for Server-Sent Events
+    'DepartmentEvent',
+
+    # Reference-data cache version counters
+    'CatalogVersion',
+
+    # Background Excel import queue
+    'ImportJob',
+
+    # Diacritic-insensitive search index
+    'SearchToken',
+
+    # Duplicate-patient blocking keys
+    'PatientBlockKey'
 ]
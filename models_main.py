@@ -30,6 +30,10 @@ def create_app(config_name=None):
     app.config.from_object(config[config_name])
     config[config_name].init_app(app)
     
+    # jsonify through the fast JSON provider (orjson when installed)
+    from utils.serialization import JSONProvider
+    app.json = JSONProvider(app)
+    
     # Initialize database with app
     db.init_app(app)
     
@@ -74,6 +78,18 @@ def create_app(config_name=None):
         from models.StaffDocuments import StaffDocuments, StaffDocumentType
         # Staff-related models
         from models.StaffDepartment import StaffDepartment
+        # Reference-data cache version counters
+        from models.CatalogVersion import CatalogVersion
+        # Background Excel import queue
+        from models.ImportJob import ImportJob
+        # Materialized department counters
+        from models.DepartmentCensus import DepartmentCensus, DepartmentCensusDay
+        # Department change outbox for Server-Sent Events
+        from models.DepartmentEvent import DepartmentEvent
+        # Diacritic-insensitive search index
+        from models.SearchToken import SearchToken
+        # Duplicate-patient blocking keys
+        from models.PatientBlockKey import PatientBlockKey
     
     # Register static versioning filter for cache management
     try:
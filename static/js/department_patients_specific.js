@@ -181,6 +181,9 @@ $(document).ready(function() {
                 updateDepartmentHeader(patientsResponse.department);
                 updateStatistics(statsResponse);
                 initializePatientsTable(patientsResponse.patients);
+                
+                // Changes after this list arrive as events
+                connectDepartmentEvents(patientsResponse.last_event_id || 0);
             } else {
                 // All patients view
                 if (!patientsResponse.patients_with_department) {
@@ -320,6 +323,20 @@ $(document).ready(function() {
         });
     }
     
+    function withDaysAdmitted(patient) {
+        if (patient.At) {
+            const admissionDate = new Date(patient.At);
+            const today = new Date();
+            const daysDiff = Math.floor((today - admissionDate) / (1000 * 60 * 60 * 24));
+            // Add 1 to the calculated days to show actual days in hospital
+            patient.DaysAdmitted = daysDiff + 1;
+        } else {
+            // For patients without admission date, show as "N/A"
+            patient.DaysAdmitted = null;
+        }
+        return patient;
+    }
+    
     function initializePatientsTable(patients, departments = []) {
         console.log('Initializing table with', patients.length, 'patients');
         
@@ -335,19 +352,7 @@ $(document).ready(function() {
         });
         
         // Calculate days since admission for each patient
-        const processedPatients = patients.map(patient => {
-            if (patient.At) {
-                const admissionDate = new Date(patient.At);
-                const today = new Date();
-                const daysDiff = Math.floor((today - admissionDate) / (1000 * 60 * 60 * 24));
-                // Add 1 to the calculated days to show actual days in hospital
-                patient.DaysAdmitted = daysDiff + 1;
-            } else {
-                // For patients without admission date, show as "N/A"
-                patient.DaysAdmitted = null;
-            }
-            return patient;
-        });
+        const processedPatients = patients.map(withDaysAdmitted);
         
         patientsTable = $('#department-patients-table').DataTable({
             data: processedPatients,
@@ -741,7 +746,7 @@ $(document).ready(function() {
                 
                 if (portraitDocument) {
                     // Load the document thumbnail
-                    const thumbnailUrl = `/api/patient_documents/${portraitDocument.DocumentId}/thumbnail?t=${new Date().getTime()}`;
+                    const thumbnailUrl = `/api/patient_documents/${portraitDocument.DocumentId}/thumbnail`;
                     $('#modal-patient-image').attr('src', thumbnailUrl).css('opacity', '1');
                 } else {
                     // No portrait found, use default image
@@ -833,11 +838,120 @@ $(document).ready(function() {
         editPatient(patientId);
     };
     
-    // Auto-refresh every 5 minutes
-    setInterval(function() {
-        console.log('Auto-refreshing department data...');
-        loadDepartmentData();
-    }, 5 * 60 * 1000);
+    // Live updates: the department view applies admissions, transfers and
+    // visits pushed by /api/department_events/<id> instead of reloading the
+    // whole list; the all-patients view (and browsers without EventSource)
+    // keeps the periodic reload
+    let departmentEvents = null;
+    let eventsFallbackTimer = null;
+    const EVENTS_FALLBACK_POLL_MS = 60 * 1000;
+    const EVENTS_RETRY_MS = 5 * 60 * 1000;
+    
+    function pollUntilEventsReconnect() {
+        // The server refused the stream (503: every worker thread it allows
+        // for streams is busy) or it failed for good: reload the list
+        // periodically, then try the stream again
+        if (eventsFallbackTimer) {
+            return;
+        }
+        console.log('Department events unavailable, polling instead');
+        const started = Date.now();
+        eventsFallbackTimer = setInterval(function() {
+            if (Date.now() - started >= EVENTS_RETRY_MS) {
+                clearInterval(eventsFallbackTimer);
+                eventsFallbackTimer = null;
+            }
+            // loadDepartmentData reconnects the stream once polling has stopped
+            loadDepartmentData();
+        }, EVENTS_FALLBACK_POLL_MS);
+    }
+    
+    function connectDepartmentEvents(lastEventId) {
+        if (!window.EventSource || eventsFallbackTimer) {
+            return;
+        }
+        if (departmentEvents) {
+            departmentEvents.close();
+        }
+        
+        departmentEvents = new EventSource(`/api/department_events/${DEPARTMENT_ID}?last_event_id=${lastEventId}`);
+        departmentEvents.onerror = function() {
+            // Network errors reconnect on their own; an HTTP error closes the source
+            if (departmentEvents && departmentEvents.readyState === EventSource.CLOSED) {
+                departmentEvents = null;
+                pollUntilEventsReconnect();
+            }
+        };
+        departmentEvents.addEventListener('patient_admitted', function(e) {
+            applyPatientAdmitted(JSON.parse(e.data));
+        });
+        departmentEvents.addEventListener('patient_transferred_out', function(e) {
+            applyPatientTransferredOut(JSON.parse(e.data));
+        });
+        departmentEvents.addEventListener('visit_created', function(e) {
+            applyVisitCreated(JSON.parse(e.data));
+        });
+        departmentEvents.addEventListener('reset', function() {
+            // Too many missed events to replay: reload the list once
+            departmentEvents.close();
+            departmentEvents = null;
+            loadDepartmentData();
+        });
+    }
+    
+    function findPatientRow(patientId) {
+        return patientsTable.rows(function(idx, data) {
+            return data.PatientId === patientId;
+        });
+    }
+    
+    function applyPatientAdmitted(event) {
+        if (!patientsTable || !event.patient) {
+            return;
+        }
+        // Replace rather than duplicate if the row is already shown
+        findPatientRow(event.patient.PatientId).remove();
+        patientsTable.row.add(withDaysAdmitted(event.patient)).draw(false);
+        loadPatientThumbnails();
+        updateStatistics(event.stats || {});
+        updateLastUpdated();
+        showDataSections();
+        showAlert(`Bệnh nhân ${event.patient.PatientName || event.patient.PatientId} vào khoa`, 'info');
+    }
+    
+    function applyPatientTransferredOut(event) {
+        if (!patientsTable) {
+            return;
+        }
+        findPatientRow(event.PatientId).remove();
+        patientsTable.draw(false);
+        updateStatistics(event.stats || {});
+        updateLastUpdated();
+        const destination = event.ToDepartmentName ? ` sang ${event.ToDepartmentName}` : '';
+        showAlert(`Bệnh nhân ${event.PatientId} đã chuyển khoa${destination}`, 'info');
+    }
+    
+    function applyVisitCreated(event) {
+        if (!patientsTable) {
+            return;
+        }
+        const row = findPatientRow(event.PatientId);
+        if (row.count() === 0) {
+            return;
+        }
+        const $row = $(row.nodes()).addClass('table-info');
+        setTimeout(() => $row.removeClass('table-info'), 5000);
+        updateLastUpdated();
+        showAlert(`Lượt khám mới cho bệnh nhân ${row.data()[0].PatientName || event.PatientId}`, 'info');
+    }
+    
+    if (!(DEPARTMENT_ID && DEPARTMENT_ID !== 'null') || !window.EventSource) {
+        // Auto-refresh every 5 minutes
+        setInterval(function() {
+            console.log('Auto-refreshing department data...');
+            loadDepartmentData();
+        }, 5 * 60 * 1000);
+    }
     
     // Function to load all patient thumbnails in the table using documents API
     function loadPatientThumbnails() {
@@ -874,7 +988,7 @@ $(document).ready(function() {
                     if (portraitDocument) {
                         // Load the document thumbnail
                         console.log(`Found portrait document ${portraitDocument.DocumentId} for patient ${patientId}`);
-                        const thumbnailUrl = `/api/patient_documents/${portraitDocument.DocumentId}/thumbnail?t=${new Date().getTime()}`;
+                        const thumbnailUrl = `/api/patient_documents/${portraitDocument.DocumentId}/thumbnail`;
                         $img.attr('src', thumbnailUrl);
                     } else {
                         // No portrait found, set default image explicitly
@@ -14,6 +14,12 @@ const PatientImageUtils = (function() {
         apiEndpoint: '/api/patient/image',
         defaultImage: '/static/images/default-patient.png',
         uploadEndpoint: '/api/patient/image',
+        // Server-side variant (px) requested for each display size
+        variantSizes: {
+            thumbnail: 64,
+            profile: 200,
+            fullsize: 800
+        },
         imageStyles: {
             thumbnail: {
                 width: '40px',
@@ -89,15 +95,20 @@ const PatientImageUtils = (function() {
             return;
         }
 
-        const imageUrl = `${config.apiEndpoint}/${patientId}`;
+        // Request the smallest variant that fits the element's display size
+        const sizeClass = Object.keys(config.variantSizes).find(size => $img.hasClass(size));
+        const imageUrl = sizeClass
+            ? `${config.apiEndpoint}/${patientId}?size=${config.variantSizes[sizeClass]}`
+            : `${config.apiEndpoint}/${patientId}`;
         
         // Create a new Image object to check if the image exists
         const imageChecker = new Image();
         
         // Define what happens on successful load
         imageChecker.onload = function() {
-            // Add cache-busting parameter to avoid browser caching
-            $img.attr('src', `${imageUrl}?t=${new Date().getTime()}`);
+            // Same URL as the check: served from the browser cache, which
+            // the server revalidates by ETag (304) on the next page render
+            $img.attr('src', imageUrl);
             
             // Call success callback if provided
             if (typeof onSuccess === 'function') {
@@ -116,8 +127,8 @@ const PatientImageUtils = (function() {
             }
         };
         
-        // Start loading the image (with cache-busting to ensure fresh check)
-        imageChecker.src = `${imageUrl}?check=${new Date().getTime()}`;
+        // Start loading the image (Cache-Control: no-cache keeps it fresh)
+        imageChecker.src = imageUrl;
     }
 
     /**
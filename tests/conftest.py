@@ -0,0 +1,56 @@
+"""
+Shared pytest fixtures: the application on a throwaway SQLite database,
+and a counter of the SQL statements it sends.
+
+    python -m pytest -q
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+from sqlalchemy import BigInteger, SmallInteger, event
+from sqlalchemy.ext.compiler import compiles
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# config.py reads these when it is imported
+_DB_DIR = tempfile.mkdtemp(prefix='his_tests_')
+os.environ.setdefault('DB_CONNECTION_STRING', f"sqlite:///{os.path.join(_DB_DIR, 'his.db')}")
+os.environ.setdefault('TEST_DB_CONNECTION_STRING', os.environ['DB_CONNECTION_STRING'])
+os.environ.setdefault('SECRET_KEY', 'test-secret-key')
+os.environ.setdefault('LOG_FILE', os.path.join(_DB_DIR, 'his.log'))
+
+from models_main import create_app, db  # noqa: E402
+
+
+# SQLite only auto-increments INTEGER PRIMARY KEY columns
+@compiles(BigInteger, 'sqlite')
+@compiles(SmallInteger, 'sqlite')
+def _integer(type_, compiler, **kw):
+    return 'INTEGER'
+
+
+@pytest.fixture
+def app():
+    """A fresh app (blueprints are registered by the tests) on empty tables"""
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def query_counter(app):
+    """{'count': n} - statements sent since the last reset (``counter['count'] = 0``)"""
+    counter = {'count': 0}
+
+    def count(*args, **kwargs):
+        counter['count'] += 1
+
+    event.listen(db.engine, 'before_cursor_execute', count)
+    yield counter
+    event.remove(db.engine, 'before_cursor_execute', count)
@@ -0,0 +1,111 @@
+"""
+DepartmentCensus: rows missing after deploy are recounted, never negative
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from models_main import db
+from models import Department, Patient, PatientDepartment, DepartmentCensus, Staff
+
+
+@pytest.fixture
+def client(app):
+    from api.patient_departments import patient_depts_bp
+    from api.department_patients import dept_patients_bp
+    from api.patient_visits import patient_visits_bp
+    from api.visits import visits_bp
+
+    app.register_blueprint(patient_depts_bp, url_prefix='/api')
+    app.register_blueprint(dept_patients_bp, url_prefix='/api')
+    app.register_blueprint(patient_visits_bp, url_prefix='/api')
+    app.register_blueprint(visits_bp, url_prefix='/api')
+    now = datetime.now()
+    db.session.add_all([
+        Department(DepartmentId=1, DepartmentName='Khoa Nội', DepartmentType='Nội trú'),
+        Department(DepartmentId=2, DepartmentName='Khoa Ngoại', DepartmentType='Nội trú'),
+        Patient(PatientId='P1', PatientName='Bệnh nhân 1'),
+        Patient(PatientId='P2', PatientName='Bệnh nhân 2'),
+        Staff(StaffId=1, StaffName='Bác sĩ A', StaffRole='Bác sĩ'),
+    ])
+    db.session.flush()
+    # History from before the census tables existed: they start empty
+    db.session.add_all([
+        PatientDepartment(PatientId='P1', DepartmentId=1, Current=True, At=now - timedelta(days=3)),
+        PatientDepartment(PatientId='P2', DepartmentId=1, Current=True, At=now - timedelta(days=30)),
+    ])
+    db.session.commit()
+    return app.test_client()
+
+
+def stats(client, department_id):
+    response = client.get(f'/api/department_stats/{department_id}')
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_reads_recount_departments_without_census_row(client):
+    assert DepartmentCensus.query.count() == 0
+    census = stats(client, 1)
+    assert (census['current_patients'], census['total_patients'], census['recent_admissions']) == (2, 2, 1)
+
+
+def test_first_transfer_after_deploy_starts_from_recount(client):
+    response = client.post('/api/patients/P1/department', json={'DepartmentId': 2})
+    assert response.status_code == 200
+
+    source, target = stats(client, 1), stats(client, 2)
+    assert source['current_patients'] == 1
+    assert source['total_patients'] == 2
+    assert target['current_patients'] == 1
+    assert target['recent_admissions'] == 1
+    assert DepartmentCensus.query.get(1).CurrentPatients == 1
+
+    # Later moves apply deltas to the recounted rows
+    client.post('/api/patients/P1/department', json={'DepartmentId': 1})
+    assert stats(client, 1)['current_patients'] == 2
+    assert stats(client, 2)['current_patients'] == 0
+
+
+def test_counts_never_go_negative(client):
+    db.session.add(DepartmentCensus(DepartmentId=1, CurrentPatients=0, CurrentStaff=0, TotalAdmissions=0))
+    db.session.commit()
+
+    client.post('/api/patients/P1/department', json={'DepartmentId': 2})
+    assert DepartmentCensus.query.get(1).CurrentPatients == 0
+    assert stats(client, 1)['current_patients'] == 0
+
+
+def department_visits(client):
+    departments = client.get('/api/departments/stats').get_json()['departments']
+    return {row['DepartmentId']: row['TotalVisits'] for row in departments}
+
+
+def test_total_visits_is_a_counter(client):
+    # Creates the census rows of both departments
+    client.post('/api/patients/P2/department', json={'DepartmentId': 2})
+    response = client.post('/api/patient_visits/P1/create', json={'StaffIds': [1], 'VisitPurpose': 'Thường quy'})
+    assert response.status_code in (200, 201)
+    visit_id = response.get_json()['visit']['VisitId']
+    assert department_visits(client) == {1: 1, 2: 0}
+
+    # Moved back in time, before P1 was admitted: it no longer counts
+    client.put(f'/api/visits/{visit_id}', json={'VisitTime': '2020-01-01T08:00:00'})
+    assert department_visits(client) == {1: 0, 2: 0}
+    client.put(f'/api/visits/{visit_id}', json={'VisitTime': datetime.now().isoformat()})
+    client.delete(f'/api/visits/{visit_id}')
+    assert department_visits(client) == {1: 0, 2: 0}
+    totals, _ = DepartmentCensus.compute()
+    assert {row.DepartmentId: row.TotalVisits for row in DepartmentCensus.query} == \
+        {department_id: values['TotalVisits'] for department_id, values in totals.items()}
+
+    # The dashboard reads counters only, never the Visit table
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        department_visits(client)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    assert statements and not any('FROM "Visit"' in s or 'JOIN "Visit"' in s for s in statements)
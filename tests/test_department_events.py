@@ -0,0 +1,44 @@
+"""
+Department event streams: a worker caps its open streams
+"""
+import pytest
+
+from models_main import db
+from models import Department
+from utils import department_events
+
+
+@pytest.fixture
+def client(app):
+    from api.department_patients import dept_patients_bp
+
+    app.register_blueprint(dept_patients_bp, url_prefix='/api')
+    app.config['DEPARTMENT_EVENT_MAX_STREAMS'] = 1
+    db.session.add(Department(DepartmentId=1, DepartmentName='Khoa Nội', DepartmentType='Nội trú'))
+    db.session.commit()
+    # Fresh broadcaster bound to this app, as in a newly forked worker
+    department_events._reset_after_fork()
+    yield app.test_client()
+    department_events._reset_after_fork()
+
+
+def test_streams_beyond_limit_get_503_with_polling_fallback(client):
+    first = client.get('/api/department_events/1', buffered=False)
+    assert first.status_code == 200
+
+    refused = client.get('/api/department_events/1', buffered=False)
+    assert refused.status_code == 503
+    assert refused.get_json()['fallback'] == 'polling'
+    assert refused.headers['Retry-After']
+
+    # Closing a stream frees its slot
+    first.close()
+    second = client.get('/api/department_events/1', buffered=False)
+    assert second.status_code == 200
+    second.close()
+
+
+def test_broadcaster_is_not_started_before_first_stream(client):
+    assert department_events._broadcaster is None
+    client.get('/api/department_events/1', buffered=False).close()
+    assert department_events._broadcaster is not None
@@ -0,0 +1,79 @@
+"""
+ICD autocomplete: code prefixes, accent-free name words, rebuilt after the ICD version bump
+"""
+import pytest
+from flask import g
+
+from models_main import db
+from models import ICD
+from utils import reference_cache
+from utils.icd_suggest import ICDIndex
+
+ROWS = [
+    ('A09', 'Tiêu chảy và viêm dạ dày ruột', 'A00-A09'),
+    ('A09.0', 'Tiêu chảy nhiễm khuẩn', 'A00-A09'),
+    ('A01', 'Thương hàn và phó thương hàn', 'A00-A09'),
+    ('J18', 'Viêm phổi, không xác định tác nhân', 'J09-J18'),
+    ('J45', 'Hen phế quản', 'J40-J47'),
+]
+
+
+@pytest.fixture
+def client(app):
+    from api.icd import icd_bp
+
+    app.register_blueprint(icd_bp, url_prefix='/api')
+    db.session.add_all([ICD(ICDCode=code, ICDName=name, ICDGroup=group) for code, name, group in ROWS])
+    db.session.commit()
+    reference_cache.invalidate('ICD')
+    return app.test_client()
+
+
+def codes(entries):
+    return [entry['ICDCode'] for entry in entries]
+
+
+def test_code_prefix():
+    index = ICDIndex(ROWS)
+    assert codes(index.suggest('A09')) == ['A09', 'A09.0']
+    assert codes(index.suggest('a09.')) == ['A09', 'A09.0']
+    assert codes(index.suggest('A090')) == ['A09.0']
+    assert codes(index.suggest('a0', limit=2)) == ['A01', 'A09']
+
+
+def test_name_words_without_accents():
+    index = ICDIndex(ROWS)
+    assert codes(index.suggest('tieu chay')) == ['A09', 'A09.0']
+    assert codes(index.suggest('chay nhiem')) == ['A09.0']
+    assert codes(index.suggest('VIÊM PH')) == ['J18']
+    # Every word starts a word of the name, in any order
+    assert codes(index.suggest('phe hen')) == ['J45']
+    assert codes(index.suggest('viem')) == ['A09', 'J18']
+    assert index.suggest('ieu') == []
+
+
+def suggest(client, q):
+    # Requests share the fixture's app context; start each with fresh versions
+    g.pop('_catalog_versions', None)
+    response = client.get('/api/icd/suggest', query_string={'q': q})
+    assert response.status_code == 200
+    return codes(response.get_json()['suggestions'])
+
+
+def test_index_is_rebuilt_after_the_icd_version_bump(client, query_counter):
+    assert suggest(client, 'hen') == ['J45']
+    query_counter['count'] = 0
+    assert suggest(client, 'j4') == ['J45']
+    # Only the version check
+    assert query_counter['count'] == 1
+
+    db.session.add(ICD(ICDCode='J46', ICDName='Hen ác tính', ICDGroup='J40-J47'))
+    db.session.commit()
+    # Not bumped: the index still serves the old rows
+    assert suggest(client, 'hen') == ['J45']
+
+    reference_cache.bump_version('ICD')
+    db.session.commit()
+    assert suggest(client, 'hen') == ['J45', 'J46']
+    assert suggest(client, 'hen ac') == ['J46']
+    assert suggest(client, '') == []
@@ -0,0 +1,106 @@
+"""
+Excel import jobs: one claim per job, stale jobs requeued, progress polled
+"""
+import io
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from models_main import db
+from models import ICD
+from models.ImportJob import ImportJob
+from utils import import_jobs
+
+
+@pytest.fixture
+def client(app, tmp_path):
+    from api.excel_upload import excel_upload_bp
+
+    app.register_blueprint(excel_upload_bp)
+    app.config['IMPORT_JOB_FOLDER'] = str(tmp_path / 'import_jobs')
+    return app.test_client()
+
+
+def queue_job(job_id, tmp_path, **values):
+    job = import_jobs.enqueue('icd', str(tmp_path / f'{job_id}.csv'), f'{job_id}.csv', job_id=job_id)
+    if values:
+        ImportJob.query.filter_by(JobId=job_id).update(values)
+        db.session.commit()
+    return job
+
+
+def test_a_queued_job_is_claimed_once(client, tmp_path):
+    queue_job('job1', tmp_path)
+
+    job = import_jobs.claim_next_job('worker-a')
+    assert (job.JobId, job.Status, job.WorkerId, job.Attempts) == ('job1', 'running', 'worker-a', 1)
+    assert import_jobs.claim_next_job('worker-b') is None
+
+
+def test_claim_loses_the_race_to_another_worker(client, tmp_path):
+    queue_job('job1', tmp_path)
+
+    # Another worker claims the job between our SELECT and our UPDATE
+    def race(conn, cursor, statement, *args):
+        if statement.startswith('UPDATE "ImportJob"') and '"WorkerId"=?' in statement and '"Attempts"=(' in statement:
+            cursor.connection.execute(
+                "UPDATE \"ImportJob\" SET \"Status\" = 'running', \"WorkerId\" = 'worker-b'")
+
+    event.listen(db.engine, 'before_cursor_execute', race)
+    try:
+        assert import_jobs.claim_next_job('worker-a') is None
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', race)
+    db.session.expire_all()
+    job = db.session.get(ImportJob, 'job1')
+    assert (job.WorkerId, job.Attempts) == ('worker-b', 0)
+
+
+def test_stale_running_job_is_requeued_then_failed(client, tmp_path):
+    long_ago = datetime.now() - timedelta(hours=1)
+    queue_job('job1', tmp_path, Status='running', WorkerId='dead', Attempts=1, UpdatedAt=long_ago)
+    queue_job('job2', tmp_path, Status='running', WorkerId='dead',
+              Attempts=import_jobs.MAX_ATTEMPTS, UpdatedAt=long_ago)
+    queue_job('job3', tmp_path, Status='running', WorkerId='alive', Attempts=1)
+
+    job = import_jobs.claim_next_job('worker-a', stale_seconds=600)
+    assert (job.JobId, job.Attempts) == ('job1', 2)
+
+    db.session.expire_all()
+    failed = db.session.get(ImportJob, 'job2')
+    assert (failed.Status, failed.Error) == ('failed', 'Import worker stopped')
+    # A job with a recent heartbeat is left to its worker
+    assert db.session.get(ImportJob, 'job3').WorkerId == 'alive'
+
+
+def test_upload_returns_202_and_job_reports_progress_and_result(client):
+    csv = 'ICDCode,ICDName\nA00,Bệnh tả\nA01,Thương hàn\nA02,\n'
+    response = client.post('/api/upload/excel/icd', data={
+        'file': (io.BytesIO(csv.encode('utf-8')), 'icd.csv'),
+    }, content_type='multipart/form-data')
+    assert response.status_code == 202
+    queued = response.get_json()
+    assert queued['Status'] == 'queued'
+    assert 'FilePath' not in queued
+    status_url = queued['status_url']
+    assert status_url == f"/api/upload/jobs/{queued['JobId']}"
+
+    # IMPORT_WORKER_THREADS is 0 in tests: run the job as the worker would
+    job = import_jobs.claim_next_job('worker-a')
+    assert client.get(status_url).get_json()['Status'] == 'running'
+    import_jobs.run_job(job)
+
+    done = client.get(status_url).get_json()
+    assert done['Status'] == 'done'
+    assert (done['TotalRows'], done['ProcessedRows'], done['ErrorCount']) == (3, 3, 1)
+    result = done['Result']
+    assert (result['imported'], result['updated'], result['skipped']) == (2, 0, 1)
+    assert len(result['errors']) == 1
+    assert done['FinishedAt']
+    assert sorted(code for (code,) in db.session.query(ICD.ICDCode)) == ['A00', 'A01']
+
+    # The listing leaves the per-row errors out
+    listed = client.get('/api/upload/jobs').get_json()['jobs']
+    assert [(job['JobId'], job['Result']) for job in listed] == [(queued['JobId'], None)]
+    assert client.get('/api/upload/jobs/missing').status_code == 404
@@ -0,0 +1,82 @@
+"""
+Keyset pagination (utils/pagination.py) over nullable sort columns and
+joined rows: walking every page returns every row exactly once
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from models_main import db
+from models import Patient, Visit, Drug, Staff, Department, StaffDepartment
+
+
+def walk(client, url, key, id_field, limit):
+    """Ids of every row of every page, and the page sizes"""
+    ids, sizes, cursor = [], [], None
+    separator = '&' if '?' in url else '?'
+    for _ in range(100):
+        page_url = f"{url}{separator}limit={limit}" + (f"&cursor={cursor}" if cursor else '')
+        body = client.get(page_url).get_json()
+        ids.extend(row[id_field] for row in body[key])
+        sizes.append(len(body[key]))
+        cursor = body['next_cursor']
+        if cursor is None:
+            return ids, sizes
+    raise AssertionError(f"{url} did not reach its last page")
+
+
+@pytest.fixture
+def client(app):
+    from api.visits import visits_bp
+    from api.drugs import drugs_bp
+    from api.staff import staff_bp
+
+    for blueprint in (visits_bp, drugs_bp, staff_bp):
+        app.register_blueprint(blueprint, url_prefix='/api')
+    return app.test_client()
+
+
+def test_visits_with_null_visit_time(client):
+    db.session.add(Patient(PatientId='P1', PatientName='Patient'))
+    start = datetime(2025, 1, 1, 8, 0)
+    for number in range(1, 13):
+        # Two visits share each VisitTime
+        db.session.add(Visit(VisitId=number, PatientId='P1', VisitTime=start + timedelta(hours=number // 2)))
+    db.session.flush()
+    # Every third visit has no VisitTime (the column default fills in None on insert)
+    Visit.query.filter(Visit.VisitId % 3 == 0).update({'VisitTime': None})
+    db.session.commit()
+
+    for limit in (1, 2, 5):
+        ids, _ = walk(client, '/api/visits', 'visits', 'VisitId', limit)
+        assert sorted(ids) == list(range(1, 13))
+        # NULL VisitTime last, newest first otherwise
+        assert ids[-4:] == [12, 9, 6, 3]
+
+
+def test_drugs_with_null_names(client):
+    names = ['Paracetamol', None, 'Amoxicillin', None, 'Paracetamol', 'Zinc', None]
+    db.session.add_all([Drug(DrugId=f'D{number}', DrugName=name) for number, name in enumerate(names)])
+    db.session.commit()
+
+    for limit in (1, 2, 3):
+        ids, _ = walk(client, '/api/drugs', 'drugs', 'DrugId', limit)
+        assert ids == ['D1', 'D3', 'D6', 'D2', 'D0', 'D4', 'D5']
+
+
+def test_staff_pages_are_full_with_several_current_assignments(client):
+    db.session.add_all([Department(DepartmentId=1, DepartmentName='Nội'),
+                        Department(DepartmentId=2, DepartmentName='Ngoại')])
+    for staff_id in range(1, 8):
+        db.session.add(Staff(StaffId=staff_id, StaffName=f'Staff {staff_id}', StaffAvailable=True))
+        db.session.add(StaffDepartment(StaffId=staff_id, DepartmentId=1, Current=True))
+        if staff_id % 2:
+            db.session.add(StaffDepartment(StaffId=staff_id, DepartmentId=2, Current=True))
+    db.session.commit()
+
+    ids, sizes = walk(client, '/api/staff', 'staff', 'StaffId', 3)
+    assert ids == list(range(1, 8))
+    assert sizes == [3, 3, 1]
+
+    ids, _ = walk(client, '/api/staff?department_id=2', 'staff', 'StaffId', 2)
+    assert ids == [1, 3, 5, 7]
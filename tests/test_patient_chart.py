@@ -0,0 +1,90 @@
+"""
+PatientChart: the whole chart in a fixed number of statements
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from models_main import db
+from models import (Department, DocumentType, ICD, Patient, PatientDepartment, PatientDocuments,
+                    Staff, Visit, VisitDiagnosis, VisitStaff)
+
+
+def add_patient(patient_id, count):
+    """A patient with ``count`` of each: visits (two staff and two diagnoses
+    apiece), department stays and documents"""
+    db.session.add(Patient(PatientId=patient_id, PatientName=f'Patient {patient_id}'))
+    db.session.flush()
+    start = datetime(2025, 1, 1, 8, 0)
+    for number in range(count):
+        visit = Visit(PatientId=patient_id, VisitPurpose='Thường quy',
+                      VisitTime=start + timedelta(hours=number))
+        db.session.add(visit)
+        db.session.flush()
+        for staff_id in (1, 2):
+            db.session.add(VisitStaff(VisitId=visit.VisitId, StaffId=staff_id))
+        for code in ('A09', 'J18'):
+            db.session.add(VisitDiagnosis(VisitId=visit.VisitId, ICDCode=code, ActualDiagnosis=code))
+        db.session.add_all([
+            PatientDepartment(PatientId=patient_id, DepartmentId=1 + number % 2,
+                              Current=number == count - 1, At=start + timedelta(days=number)),
+            PatientDocuments(PatientId=patient_id, DocumentTypeId=1 + number % 2,
+                             document_links=[f'/documents/{patient_id}/{number}.pdf']),
+        ])
+    db.session.commit()
+
+
+@pytest.fixture
+def client(app):
+    from api.patients import patients_bp
+
+    app.register_blueprint(patients_bp, url_prefix='/api')
+    db.session.add_all([
+        Staff(StaffId=1, StaffName='Bác sĩ A', StaffRole='Bác sĩ'),
+        Staff(StaffId=2, StaffName='Điều dưỡng B', StaffRole='Điều dưỡng'),
+        ICD(ICDCode='A09', ICDName='Tiêu chảy'),
+        ICD(ICDCode='J18', ICDName='Viêm phổi'),
+        Department(DepartmentId=1, DepartmentName='Khoa Nội', DepartmentType='Nội trú'),
+        Department(DepartmentId=2, DepartmentName='Khoa Ngoại', DepartmentType='Nội trú'),
+        DocumentType(DocumentTypeId=1, DocumentTypeName='Xét nghiệm'),
+        DocumentType(DocumentTypeId=2, DocumentTypeName='X-quang'),
+    ])
+    db.session.commit()
+    add_patient('P1', 1)
+    add_patient('P50', 50)
+    return app.test_client()
+
+
+def chart(client, query_counter, patient_id, include=None):
+    db.session.expire_all()
+    query_counter['count'] = 0
+    query = {'include': include} if include else {}
+    response = client.get(f'/api/patients/{patient_id}/chart', query_string=query)
+    assert response.status_code == 200
+    return query_counter['count'], response.get_json()
+
+
+def test_statement_count_does_not_grow_with_visits(client, query_counter):
+    one, chart_one = chart(client, query_counter, 'P1')
+    many, chart_many = chart(client, query_counter, 'P50')
+
+    # Patient, departments, visits, visit staff, diagnoses, documents, then
+    # departments, staff, ICD codes and document types once each
+    assert one == many == 10
+    assert len(chart_many['visits']) == len(chart_many['departments']) == len(chart_many['documents']) == 50
+    assert chart_many['summary']['total_visits'] == 50
+
+    latest = chart_many['visits'][0]
+    assert [staff['StaffName'] for staff in latest['staff']] == ['Bác sĩ A', 'Điều dưỡng B']
+    assert [diagnosis['ICDName'] for diagnosis in latest['diagnoses']] == ['Tiêu chảy', 'Viêm phổi']
+    assert {row['DepartmentName'] for row in chart_many['departments']} == {'Khoa Nội', 'Khoa Ngoại'}
+    assert {row['DocumentTypeName'] for row in chart_many['documents']} == {'Xét nghiệm', 'X-quang'}
+
+
+def test_sections_are_loaded_only_when_included(client, query_counter):
+    count, result = chart(client, query_counter, 'P50', include='summary')
+    assert set(result) == {'patient', 'summary'}
+    # Patient and visit rows
+    assert count == 2
+    assert client.get('/api/patients/P50/chart?include=billing').status_code == 400
+    assert client.get('/api/patients/P404/chart').status_code == 404
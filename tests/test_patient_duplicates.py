@@ -0,0 +1,78 @@
+"""
+Duplicate-patient detection: blocking keys, birth years, similarity, candidate pairs
+"""
+from datetime import date
+
+from models_main import db
+from models import Patient
+from utils import patient_duplicates
+from utils.patient_duplicates import birth_years, blocking_keys, similarity
+
+
+AN = dict(PatientName='Nguyễn Văn An', PatientAge='1985', PatientGender='Nam',
+          PatientPhone='+84 912 345 678', PatientCCCD='001085012345',
+          PatientBHYT='DN4010123456789', PatientAddress='12 Lê Lợi, Huế')
+
+
+def test_blocking_keys():
+    assert blocking_keys(Patient(**AN)) == {
+        'cccd:001085012345',
+        'bhyt:0123456789',            # the benefit category prefix is dropped
+        'phone:0912345678',           # +84 rewritten to 0
+        'name:nguyen van an:1985',
+        'short:nguyen an:1985',
+    }
+    # An omitted middle name still shares the short key
+    assert blocking_keys(Patient(PatientName='Nguyen An', PatientAge='15/03/1985')) == {
+        'name:nguyen an:1985', 'short:nguyen an:1985',
+    }
+    # Names need a birth year; implausible identifiers are left out
+    assert blocking_keys(Patient(PatientName='Trần Bình', PatientCCCD='12345', PatientPhone='115')) == set()
+
+
+def test_birth_years():
+    today = date(2025, 6, 1)
+    assert birth_years('1985', today) == (1985,)
+    assert birth_years('15/03/1985', today) == (1985,)
+    # An age: birthday passed this year or not
+    assert birth_years('40', today) == (1984, 1985)
+    assert birth_years('40 tuổi', today) == (1984, 1985)
+    assert birth_years('18 tháng', today) == (2023, 2024)
+    assert birth_years('200', today) == ()
+    assert birth_years('không rõ', today) == ()
+    assert birth_years(None, today) == ()
+
+
+def test_similarity():
+    registered_again = Patient(PatientName='Nguyen An', PatientAge='15/03/1985', PatientGender='Nam',
+                               PatientPhone='0912345678', PatientBHYT='HC4010123456789',
+                               PatientAddress='12 Le Loi Hue')
+    assert similarity(Patient(**AN), registered_again) == \
+        (1.0, ['similar name', 'same BHYT', 'same Phone', 'same birth year', 'similar address'])
+
+    # Same name, but another CCCD, birth year and gender
+    namesake = Patient(PatientName='Nguyễn Văn An', PatientAge='1960', PatientGender='Nữ',
+                       PatientCCCD='001060099999')
+    assert similarity(Patient(**AN), namesake) == (0.0, ['same name'])
+
+    score, reasons = similarity(Patient(PatientName='Lê Thị Hoa'), Patient(PatientName='Le Thi Hoa'))
+    assert (score, reasons) == (patient_duplicates.NAME_WEIGHT, ['same name'])
+
+
+def test_each_candidate_pair_is_yielded_once(app):
+    db.session.add_all([
+        Patient(PatientId='P1', **AN),
+        # Shares phone, BHYT and short name with P1
+        Patient(PatientId='P2', PatientName='Nguyễn An', PatientAge='1985',
+                PatientPhone='0912345678', PatientBHYT='HC4010123456789'),
+        # Shares only the phone
+        Patient(PatientId='P3', PatientName='Trần Văn Bình', PatientPhone='0912 345 678'),
+        Patient(PatientId='P4', PatientName='Lê Thị Hoa', PatientAge='1990'),
+    ])
+    patient_duplicates.reindex(['P1', 'P2', 'P3', 'P4'])
+    db.session.commit()
+
+    pairs = list(patient_duplicates.candidate_pairs())
+    assert sorted(pairs) == [('P1', 'P2'), ('P1', 'P3'), ('P2', 'P3')]
+    # Blocks above the size limit are skipped
+    assert list(patient_duplicates.candidate_pairs(max_block_size=2)) == [('P1', 'P2')]
@@ -0,0 +1,90 @@
+"""
+Patient images: legacy BLOB rows and the content-addressed, shared store
+"""
+import io
+import os
+
+import pytest
+from PIL import Image
+
+from models_main import db
+from models import Patient
+from utils import image_store, image_variants
+
+
+def jpeg(color):
+    buffer = io.BytesIO()
+    Image.new('RGB', (40, 40), color).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def client(app, tmp_path):
+    from api.patient_images import patient_images_bp
+
+    app.register_blueprint(patient_images_bp, url_prefix='/api')
+    app.config['PATIENT_IMAGE_STORE'] = str(tmp_path / 'patient_images')
+    db.session.add_all([
+        Patient(PatientId='P1', PatientName='Bệnh nhân 1', PatientImage=jpeg('blue')),
+        Patient(PatientId='P2', PatientName='Bệnh nhân 2'),
+        Patient(PatientId='P3', PatientName='Bệnh nhân 3'),
+    ])
+    db.session.commit()
+    return app.test_client()
+
+
+def test_patient_without_photo_costs_one_statement(client, query_counter):
+    db.session.expire_all()
+    query_counter['count'] = 0
+    assert client.get('/api/patient/image/P2').status_code == 404
+    assert query_counter['count'] == 1
+
+
+def test_legacy_blob_is_served_read_only_with_etag(client):
+    response = client.get('/api/patient/image/P1')
+    assert response.status_code == 200
+    assert response.data == jpeg('blue')
+    etag = response.headers['ETag']
+
+    assert client.get('/api/patient/image/P1', headers={'If-None-Match': etag}).status_code == 304
+
+    # The GET neither moved the BLOB nor wrote the store
+    db.session.expire_all()
+    patient = db.session.get(Patient, 'P1')
+    assert patient.PatientImageHash is None
+    assert patient.PatientImage == jpeg('blue')
+
+
+def upload(client, patient_id, data):
+    response = client.post(f'/api/patient/image/{patient_id}', data={
+        'image': (io.BytesIO(data), 'photo.jpg'),
+    }, content_type='multipart/form-data')
+    assert response.status_code == 200
+    db.session.expire_all()
+    return db.session.get(Patient, patient_id).PatientImageHash
+
+
+def stored_files(image_hash):
+    return [image_store.path_for(image_hash)] + [
+        image_variants.variant_path(image_hash, size, image_format)
+        for size in image_variants.VARIANT_SIZES
+        for image_format in image_variants.FORMATS
+    ]
+
+
+def test_identical_photos_share_one_file_until_the_last_reference(client):
+    shared = upload(client, 'P2', jpeg('red'))
+    assert upload(client, 'P3', jpeg('red')) == shared
+    assert all(os.path.exists(path) for path in stored_files(shared))
+
+    # Replacing one patient's photo keeps the file the other still uses
+    replacement = upload(client, 'P2', jpeg('green'))
+    assert replacement != shared
+    assert all(os.path.exists(path) for path in stored_files(shared))
+    assert client.get('/api/patient/image/P3').status_code == 200
+
+    # Releasing the last reference deletes the original and its variants
+    assert client.delete('/api/patient/image/P3').status_code == 200
+    assert not any(os.path.exists(path) for path in stored_files(shared))
+    assert all(os.path.exists(path) for path in stored_files(replacement))
+    assert client.get('/api/patient/image/P3').status_code == 404
@@ -0,0 +1,95 @@
+"""
+Sparse fieldsets: ?fields= selects only the named columns, unknown names are a 400
+"""
+import pytest
+from flask import g
+from sqlalchemy import event
+
+from models_main import db
+from models import Drug, DrugGroup
+from utils import reference_cache
+from utils.projection import Field, FieldSet, InvalidFields
+
+
+@pytest.fixture
+def client(app):
+    from api.drugs import drugs_bp
+
+    app.register_blueprint(drugs_bp, url_prefix='/api')
+    db.session.add(DrugGroup(DrugGroupId=1, DrugGroupName='Giảm đau'))
+    db.session.add_all([
+        Drug(DrugId='D1', DrugName='Paracetamol 500mg', DrugChemical='Paracetamol', DrugGroupId=1),
+        Drug(DrugId='D2', DrugName='Efferalgan', DrugChemical='Paracetamol', DrugGroupId=1),
+        Drug(DrugId='D3', DrugName='Amoxicillin', DrugChemical='Amoxicillin'),
+    ])
+    db.session.commit()
+    reference_cache.invalidate('Drug', 'DrugGroup')
+    return app.test_client()
+
+
+def get(client, url):
+    # Requests share the fixture's app context; start each with fresh versions
+    g.pop('_catalog_versions', None)
+    return client.get(url)
+
+
+@pytest.mark.parametrize('url', [
+    '/api/drugs?fields=DrugName,DrugId',                 # cached catalog
+    '/api/drugs?q=a&fields=DrugName,DrugId',             # filtered in SQL
+    '/api/drugs?limit=10&fields=DrugName,DrugId',        # keyset pages
+])
+def test_only_requested_fields_are_returned(client, url):
+    response = get(client, url)
+    assert response.status_code == 200
+    drugs = response.get_json()['drugs']
+    # Declaration order, whatever the order requested
+    assert [list(drug) for drug in drugs] == [['DrugId', 'DrugName']] * 3
+    assert [drug['DrugId'] for drug in drugs] == ['D3', 'D2', 'D1']
+
+
+def test_projected_rows_match_the_full_records(client):
+    full = get(client, '/api/drugs?q=a').get_json()['drugs']
+    names = ['DrugId', 'DrugName', 'DrugChemical', 'DrugGroupName']
+    projected = get(client, f"/api/drugs?q=a&fields={','.join(names)}").get_json()['drugs']
+    assert projected == [{name: drug[name] for name in names} for drug in full]
+
+
+def test_projection_selects_only_the_requested_columns(client):
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        get(client, '/api/drugs?q=para&fields=DrugId')
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    assert statements[-1].split('FROM')[0].strip() == 'SELECT "Drug"."DrugId" AS "Drug_DrugId"'
+
+
+def test_unknown_fields_are_rejected(client):
+    for url in ('/api/drugs?fields=DrugId,Price', '/api/drugs?q=a&fields=Price',
+                '/api/drugs?limit=5&fields=Price'):
+        response = get(client, url)
+        assert response.status_code == 400
+        assert response.get_json()['error'].startswith('Unknown field(s): Price. Available: DrugId,')
+
+
+def test_fieldset_formats_and_shares_columns(app):
+    fields = FieldSet({
+        'DrugId': Drug.DrugId,
+        'DrugGenericName': Drug.DrugChemical,
+        'Chemical': Drug.DrugChemical,
+        'Label': Field(Drug.DrugId, Drug.DrugName, format=lambda id_, name: f'{id_} - {name}'),
+    })
+    assert fields.parse(None) is None and fields.parse(' , ') is None
+    with pytest.raises(InvalidFields):
+        fields.parse('DrugId,Nope')
+
+    names = fields.parse('Label,Chemical,DrugGenericName')
+    db.session.add(Drug(DrugId='D1', DrugName='Paracetamol', DrugChemical='Acetaminophen'))
+    db.session.commit()
+    query = fields.project(db.session.query(Drug), names)
+    # An aliased column is selected once
+    assert len(query.statement.selected_columns) == 3
+    assert [fields.serializer(names)(row) for row in query] == [
+        {'DrugGenericName': 'Acetaminophen', 'Chemical': 'Acetaminophen', 'Label': 'D1 - Paracetamol'}
+    ]
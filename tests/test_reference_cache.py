@@ -0,0 +1,60 @@
+"""
+Catalog lists served from the reference cache (utils/reference_cache.py)
+"""
+import pytest
+from flask import g
+
+from models_main import db
+from models import Drug, DrugGroup
+from utils import reference_cache
+
+
+@pytest.fixture
+def client(app):
+    from api.drugs import drugs_bp
+
+    app.register_blueprint(drugs_bp, url_prefix='/api')
+    db.session.add(DrugGroup(DrugGroupId=1, DrugGroupName='Giảm đau'))
+    db.session.add_all([
+        Drug(DrugId='D1', DrugName='Paracetamol 500mg', DrugChemical='Paracetamol', DrugGroupId=1),
+        Drug(DrugId='D2', DrugName='Efferalgan', DrugChemical='PARACETAMOL', DrugGroupId=1),
+        Drug(DrugId='D3', DrugName='Amoxicillin', DrugChemical='Amoxicillin'),
+    ])
+    db.session.commit()
+    reference_cache.invalidate('Drug', 'DrugGroup')
+    return app.test_client()
+
+
+def get_drugs(client, url):
+    # Requests share the fixture's app context; start each with fresh versions
+    g.pop('_catalog_versions', None)
+    return client.get(url).get_json()['drugs']
+
+
+def test_unfiltered_list_is_served_from_cache(client, query_counter):
+    get_drugs(client, '/api/drugs')
+    query_counter['count'] = 0
+    drugs = get_drugs(client, '/api/drugs')
+
+    assert [d['DrugId'] for d in drugs] == ['D3', 'D2', 'D1']
+    # Only the version check
+    assert query_counter['count'] == 1
+    assert [d['DrugId'] for d in get_drugs(client, '/api/drugs?group=1')] == ['D2', 'D1']
+
+
+def test_text_search_runs_in_sql(client, query_counter):
+    get_drugs(client, '/api/drugs')
+    query_counter['count'] = 0
+    drugs = get_drugs(client, '/api/drugs?q=paracetamol')
+
+    assert [d['DrugId'] for d in drugs] == ['D2', 'D1']
+    # The filtered query, no version check
+    assert query_counter['count'] == 1
+
+
+def test_writes_invalidate_the_cached_list(client):
+    get_drugs(client, '/api/drugs')
+    client.put('/api/drugs/D3', json={'DrugName': 'Amoxicillin 250mg'})
+
+    drugs = get_drugs(client, '/api/drugs')
+    assert drugs[0]['DrugName'] == 'Amoxicillin 250mg'
@@ -0,0 +1,90 @@
+"""
+Search index: accent-free prefix search, kept in step by the drug and sign endpoints
+"""
+import pytest
+
+from models_main import db
+from models import BodySystem, Drug, Patient
+from utils import search_index
+
+
+@pytest.fixture
+def client(app):
+    from api.drugs import drugs_bp
+    from api.signs import signs_bp
+    from api.search import search_bp
+
+    for blueprint in (drugs_bp, signs_bp, search_bp):
+        app.register_blueprint(blueprint, url_prefix='/api')
+    db.session.add_all([
+        BodySystem(SystemId=1, SystemName='Hô hấp'),
+        Patient(PatientId='P1', PatientName='Nguyễn Văn An', PatientPhone='0912 345 678'),
+        Patient(PatientId='P2', PatientName='Nguyễn Thị Bình'),
+        Patient(PatientId='P3', PatientName='Trần Văn Nguyên'),
+    ])
+    db.session.commit()
+    search_index.rebuild('patient')
+    return app.test_client()
+
+
+def found(client, path, q, key):
+    response = client.get(f'/api/search/{path}', query_string={'q': q})
+    assert response.status_code == 200
+    return [row[key] for row in response.get_json()[path]]
+
+
+def test_accents_are_optional(client):
+    assert found(client, 'patients', 'nguyen van an', 'PatientId') == ['P1']
+    assert found(client, 'patients', 'NGUYỄN VĂN AN', 'PatientId') == ['P1']
+    assert found(client, 'patients', 'binh', 'PatientId') == ['P2']
+    # Identifiers match without their separators
+    assert found(client, 'patients', '0912345678', 'PatientId') == ['P1']
+
+
+def test_every_word_matches_a_word_prefix(client):
+    assert sorted(found(client, 'patients', 'nguy', 'PatientId')) == ['P1', 'P2', 'P3']
+    assert sorted(found(client, 'patients', 'ng va', 'PatientId')) == ['P1', 'P3']
+    assert found(client, 'patients', 'va tr', 'PatientId') == ['P3']
+    # Words match from their start only
+    assert found(client, 'patients', 'guyen', 'PatientId') == []
+    assert found(client, 'patients', '', 'PatientId') == []
+
+
+def test_limit_counts_entities_not_matching_words(client):
+    # Each drug matches "para" through six words of its own
+    db.session.add_all([
+        Drug(DrugId=f'D{i}', DrugName=' '.join(f'Para{i}{suffix}' for suffix in 'abcdef'))
+        for i in range(5)
+    ])
+    search_index.reindex('drug', [f'D{i}' for i in range(5)])
+    db.session.commit()
+
+    assert search_index.search_ids('drug', 'para', limit=3) == ['D0', 'D1', 'D2']
+    assert search_index.search_ids('drug', 'para') == [f'D{i}' for i in range(5)]
+
+
+def test_drug_writes_reindex(client):
+    client.post('/api/drugs', json={'DrugId': 'D1', 'DrugName': 'Paracetamol 500mg',
+                                    'DrugChemical': 'Acetaminophen'})
+    assert found(client, 'drugs', 'par 500', 'DrugId') == ['D1']
+    assert found(client, 'drugs', 'acet', 'DrugId') == ['D1']
+
+    client.put('/api/drugs/D1', json={'DrugName': 'Efferalgan 500mg'})
+    assert found(client, 'drugs', 'par 500', 'DrugId') == []
+    assert found(client, 'drugs', 'efferalgan', 'DrugId') == ['D1']
+
+    client.delete('/api/drugs/D1')
+    assert found(client, 'drugs', 'efferalgan', 'DrugId') == []
+
+
+def test_sign_writes_reindex(client):
+    response = client.post('/api/signs', json={'SignDesc': 'Khó thở', 'SignType': 0, 'SystemId': 1})
+    sign_id = response.get_json()['sign']['SignId']
+    assert found(client, 'signs', 'kho tho', 'SignId') == [sign_id]
+
+    client.put(f'/api/signs/{sign_id}', json={'SignDesc': 'Ho khan'})
+    assert found(client, 'signs', 'kho', 'SignId') == []
+    assert found(client, 'signs', 'ho khan', 'SignId') == [sign_id]
+
+    client.delete(f'/api/signs/{sign_id}')
+    assert found(client, 'signs', 'ho', 'SignId') == []
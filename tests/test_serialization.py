@@ -0,0 +1,75 @@
+"""
+Compiled serializers produce what the column-by-column to_dict did
+"""
+import json
+from datetime import datetime
+
+from models_main import db
+from models import Drug, Patient, Visit
+from utils.serialization import compile_serializer, dumps
+
+
+def plain_to_dict(obj, exclude=(), isoformat=False):
+    """The column loop the models used before serializers were compiled"""
+    result = {}
+    for column in obj.__table__.columns:
+        if column.name in exclude:
+            continue
+        value = getattr(obj, column.name)
+        if isoformat and hasattr(value, 'isoformat'):
+            value = value.isoformat()
+        result[column.name] = value
+    return result
+
+
+def encoded(app, value):
+    return json.loads(app.json.dumps(value))
+
+
+def test_serializer_matches_column_loop(app):
+    db.session.add_all([
+        Patient(PatientId='P1', PatientName='Nguyễn Văn An'),
+        Drug(DrugId='PARA500', DrugName='Paracetamol 500mg', DrugAvailable=True, DrugPriceBHYT=1500),
+    ])
+    db.session.commit()
+    drug = db.session.get(Drug, 'PARA500')
+
+    serialize = compile_serializer(Drug)
+    assert serialize(drug) == plain_to_dict(drug)
+    assert list(serialize(drug)) == [column.name for column in Drug.__table__.columns]
+    # Expired attributes are loaded, as getattr would
+    db.session.expire(drug)
+    assert serialize(drug) == drug.to_dict() == plain_to_dict(drug)
+
+
+def test_datetimes(app):
+    db.session.add(Patient(PatientId='P1', PatientName='Nguyễn Văn An'))
+    db.session.flush()
+    visit = Visit(PatientId='P1', VisitPurpose='Thường quy', VisitTime=datetime(2025, 1, 7, 8, 30, 15, 250))
+    db.session.add(visit)
+    db.session.commit()
+
+    # Visit formats its times as ISO 8601
+    assert visit.to_dict()['VisitTime'] == '2025-01-07T08:30:15.000250'
+    assert visit.to_dict() == plain_to_dict(visit, isoformat=True)
+
+    # Left to the encoder, datetimes become HTTP dates as with Flask's default provider
+    raw = compile_serializer(Visit)(visit)
+    assert raw['VisitTime'] == visit.VisitTime
+    assert encoded(app, raw) == encoded(app, plain_to_dict(visit))
+    assert encoded(app, raw)['VisitTime'] == 'Tue, 07 Jan 2025 08:30:15 GMT'
+    assert json.loads(dumps(raw)) == encoded(app, raw)
+
+
+def test_deferred_and_excluded_columns_are_skipped(app):
+    db.session.add(Patient(PatientId='P1', PatientName='Nguyễn Văn An', PatientImage=b'\xff\xd8',
+                           PatientImageHash='ab' * 32))
+    db.session.commit()
+    db.session.expire_all()
+    patient = db.session.get(Patient, 'P1')
+
+    result = patient.to_dict()
+    assert 'PatientImage' not in result and 'PatientImageHash' not in result
+    assert result == plain_to_dict(patient, exclude=('PatientImage', 'PatientImageHash'))
+    # Serializing did not load the BLOB
+    assert 'PatientImage' not in patient.__dict__
@@ -0,0 +1,74 @@
+"""
+NDJSON streams: the same records as the JSON list, one per line
+"""
+import json
+
+import pytest
+
+from models_main import db
+from models import Department, Drug, DrugGroup, DrugTemplate, DrugTemplateDetail, Patient
+from utils import streaming
+
+
+@pytest.fixture
+def client(app, monkeypatch):
+    from api.patients import patients_bp
+    from api.drug_template_detail import drug_template_detail_bp
+
+    app.register_blueprint(patients_bp, url_prefix='/api')
+    app.register_blueprint(drug_template_detail_bp, url_prefix='/api')
+    # Several response chunks for a few rows
+    monkeypatch.setattr(streaming, 'FLUSH_ROWS', 3)
+    db.session.add_all([
+        Patient(PatientId=f'P{number:02d}', PatientName=f'Bệnh nhân {number}', PatientGender='Nữ',
+                PatientImageHash='ab' * 32 if number % 3 == 0 else None)
+        for number in range(10)
+    ])
+    db.session.add_all([
+        Department(DepartmentId=1, DepartmentName='Khoa Nội', DepartmentType='Nội trú'),
+        DrugGroup(DrugGroupId=1, DrugGroupName='Giảm đau'),
+        Drug(DrugId='D1', DrugName='Paracetamol 500mg', DrugGroupId=1),
+        Drug(DrugId='D2', DrugName='Amoxicillin'),
+        DrugTemplate(DrugTemplateId=1, DrugTemplateName='Hạ sốt', DepartmentId=1),
+    ])
+    db.session.flush()
+    db.session.add_all([DrugTemplateDetail(DrugTemplateId=1, DrugId='D1'),
+                        DrugTemplateDetail(DrugTemplateId=1, DrugId='D2')])
+    db.session.commit()
+    return app.test_client()
+
+
+def ndjson(response):
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    body = response.get_data(as_text=True)
+    assert body.endswith('\n')
+    return [json.loads(line) for line in body.splitlines()]
+
+
+def test_patient_stream_matches_the_json_list(client):
+    listed = client.get('/api/patients').get_json()['patients']
+    assert len(listed) == 10
+
+    assert ndjson(client.get('/api/patients?stream=1')) == listed
+    assert ndjson(client.get('/api/patients', headers={'Accept': 'application/x-ndjson'})) == listed
+    # Browsers' */* keeps the JSON body
+    assert client.get('/api/patients', headers={'Accept': '*/*'}).mimetype == 'application/json'
+
+
+def test_template_detail_stream_matches_the_json_list(client):
+    listed = client.get('/api/drug-template-details').get_json()['drug_template_details']
+    assert [detail['DrugId'] for detail in listed] == ['D2', 'D1']
+
+    assert ndjson(client.get('/api/drug-template-details?stream=1')) == listed
+    assert ndjson(client.get('/api/drug-template-details?stream=1&q=para')) == listed[1:]
+
+
+def test_error_while_streaming_is_the_last_line(app):
+    def records():
+        yield {'PatientId': 'P1'}
+        raise RuntimeError('connection lost')
+
+    with app.test_request_context('/api/patients?stream=1'):
+        lines = ndjson(streaming.ndjson_response(records()))
+    assert lines == [{'PatientId': 'P1'}, {'error': 'connection lost'}]
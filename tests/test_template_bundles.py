@@ -0,0 +1,88 @@
+"""
+Template bundles: content-hash ETag, 304 while unchanged, new ETag after template CRUD
+"""
+import pytest
+from flask import g
+
+from models_main import db
+from models import BodySystem, Department, Drug, Sign
+from utils import reference_cache
+
+
+@pytest.fixture
+def client(app):
+    from api.template_bundles import template_bundles_bp
+    from api.sign_template import sign_template_bp
+    from api.sign_template_detail import sign_template_detail_bp
+    from api.drug_template import drug_template_bp
+    from api.drug_template_detail import drug_template_detail_bp
+
+    for blueprint in (template_bundles_bp, sign_template_bp, sign_template_detail_bp,
+                      drug_template_bp, drug_template_detail_bp):
+        app.register_blueprint(blueprint, url_prefix='/api')
+    db.session.add_all([
+        Department(DepartmentId=1, DepartmentName='Khoa Nội', DepartmentType='Nội trú'),
+        Department(DepartmentId=2, DepartmentName='Khoa Ngoại', DepartmentType='Nội trú'),
+        BodySystem(SystemId=1, SystemName='Hô hấp'),
+        Sign(SignId=1, SignDesc='Khó thở', SignType=False, SystemId=1),
+        Drug(DrugId='D1', DrugName='Paracetamol 500mg'),
+    ])
+    db.session.commit()
+    reference_cache.invalidate()
+    return app.test_client()
+
+
+def get_bundle(client, department_id=1, etag=None):
+    # Requests share the fixture's app context; start each with fresh versions
+    g.pop('_catalog_versions', None)
+    headers = {'If-None-Match': etag} if etag else {}
+    return client.get(f'/api/departments/{department_id}/template-bundle', headers=headers)
+
+
+def test_matching_etag_gets_304(client):
+    response = get_bundle(client)
+    assert response.status_code == 200
+    assert response.get_json() == {'DepartmentId': 1, 'DepartmentName': 'Khoa Nội',
+                                   'sign_templates': [], 'drug_templates': []}
+    etag = response.headers['ETag']
+
+    revalidated = get_bundle(client, etag=etag)
+    assert revalidated.status_code == 304
+    assert revalidated.data == b''
+    assert get_bundle(client, etag='"other"').status_code == 200
+    assert get_bundle(client, department_id=99).status_code == 404
+
+
+def test_template_crud_changes_the_etag(client):
+    etags = [get_bundle(client).headers['ETag']]
+    other_etag = get_bundle(client, department_id=2).headers['ETag']
+
+    def changed():
+        response = get_bundle(client, etag=etags[-1])
+        assert response.status_code == 200
+        etags.append(response.headers['ETag'])
+        return response.get_json()
+
+    sign_template = client.post('/api/sign-templates', json={
+        'SignTemplateName': 'Khám hô hấp', 'DepartmentId': 1, 'SignTemplateType': 'BA'
+    }).get_json()['sign_template']['SignTemplateId']
+    assert [t['SignTemplateName'] for t in changed()['sign_templates']] == ['Khám hô hấp']
+
+    client.post(f'/api/sign-templates/{sign_template}/signs', json={'SignId': 1})
+    assert [s['SignId'] for s in changed()['sign_templates'][0]['signs']] == [1]
+
+    drug_template = client.post('/api/drug-templates', json={
+        'DrugTemplateName': 'Hạ sốt', 'DepartmentId': 1, 'DrugTemplateType': 'BA'
+    }).get_json()['drug_template']['DrugTemplateId']
+    client.post(f'/api/drug-templates/{drug_template}/drugs', json={'DrugId': 'D1'})
+    assert [d['DrugId'] for d in changed()['drug_templates'][0]['drugs']] == ['D1']
+
+    client.delete(f'/api/drug-templates/{drug_template}/drugs/D1')
+    assert changed()['drug_templates'][0]['drugs'] == []
+
+    client.put(f'/api/sign-templates/{sign_template}', json={'SignTemplateName': 'Khám phổi'})
+    assert changed()['sign_templates'][0]['SignTemplateName'] == 'Khám phổi'
+
+    assert len(set(etags)) == len(etags)
+    # Another department's bundle is rebuilt but keeps its ETag
+    assert get_bundle(client, department_id=2, etag=other_etag).status_code == 304
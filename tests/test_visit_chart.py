@@ -0,0 +1,132 @@
+"""
+Visit chart: validation of posted items and applying sign / drug templates
+"""
+import pytest
+
+from models_main import db
+from models import (BodySystem, Drug, DrugTemplate, DrugTemplateDetail, Patient, Sign,
+                    SignTemplate, SignTemplateDetail, Visit, VisitDrug, VisitSign)
+
+
+@pytest.fixture
+def client(app):
+    from api.visit_chart import visit_chart_bp
+
+    app.register_blueprint(visit_chart_bp, url_prefix='/api')
+    db.session.add(Patient(PatientId='P1', PatientName='Bệnh nhân 1'))
+    db.session.flush()
+    visit = Visit(PatientId='P1', VisitPurpose='Thường quy')
+    db.session.add(visit)
+    db.session.commit()
+    client = app.test_client()
+    client.visit_id = visit.VisitId
+    return client
+
+
+def test_fractional_integer_is_rejected(client):
+    response = client.post(f'/api/visits/{client.visit_id}/chart', json={
+        'drugs': [{'DrugId': 'PARA500', 'DrugQuantity': 1.9}],
+        'signs': [{'SignId': 1.5}],
+    })
+    assert response.status_code == 400
+    errors = response.get_json()['errors']
+    assert any('SignId: must be an integer' in error for error in errors)
+    # DrugQuantity is a Float column
+    assert not any('DrugQuantity' in error for error in errors)
+
+
+@pytest.fixture
+def templates(client):
+    """Sign template 1 (signs 1, 2), drug templates 1 (D1, D2) and 2 (D2,
+    D3), and a second visit of the patient"""
+    db.session.add_all([
+        BodySystem(SystemId=1, SystemName='Hô hấp'),
+        Sign(SignId=1, SignDesc='Ho', SignType=False, SystemId=1),
+        Sign(SignId=2, SignDesc='Khó thở', SignType=False, SystemId=1),
+        Drug(DrugId='D1', DrugName='Paracetamol 500mg', DrugRoute='Uống'),
+        Drug(DrugId='D2', DrugName='Ceftriaxon 1g', DrugRoute='Tiêm tĩnh mạch'),
+        Drug(DrugId='D3', DrugName='Salbutamol'),
+        SignTemplate(SignTemplateId=1, SignTemplateName='Hô hấp', DepartmentId=1),
+        DrugTemplate(DrugTemplateId=1, DrugTemplateName='Viêm phổi', DepartmentId=1),
+        DrugTemplate(DrugTemplateId=2, DrugTemplateName='Hen', DepartmentId=1),
+    ])
+    db.session.flush()
+    db.session.add_all([
+        SignTemplateDetail(SignTemplateId=1, SignId=1),
+        SignTemplateDetail(SignTemplateId=1, SignId=2),
+        DrugTemplateDetail(DrugTemplateId=1, DrugId='D1'),
+        DrugTemplateDetail(DrugTemplateId=1, DrugId='D2'),
+        DrugTemplateDetail(DrugTemplateId=2, DrugId='D2'),
+        DrugTemplateDetail(DrugTemplateId=2, DrugId='D3'),
+    ])
+    second = Visit(PatientId='P1', VisitPurpose='Thường quy')
+    db.session.add(second)
+    db.session.commit()
+    return [client.visit_id, second.VisitId]
+
+
+def charted_drugs(visit_id):
+    rows = VisitDrug.query.filter_by(VisitId=visit_id).order_by(VisitDrug.DrugId)
+    return [(row.DrugId, row.DrugRoute) for row in rows]
+
+
+def test_template_items_already_on_the_visit_are_skipped(client, templates):
+    visit_id = client.visit_id
+    db.session.add_all([VisitSign(VisitId=visit_id, SignId=2, SignValue='Nhiều'),
+                        VisitDrug(VisitId=visit_id, DrugId='D2', DrugRoute='Tiêm bắp')])
+    db.session.commit()
+
+    # D2 is in both drug templates: added once at most
+    response = client.post(f'/api/visits/{visit_id}/apply-template', json={
+        'sign_template_ids': [1], 'drug_template_ids': [1, 2],
+    })
+    assert response.status_code == 201
+    assert response.get_json() == {'signs': 1, 'drugs': 2, 'count': 3, 'VisitId': visit_id}
+
+    signs = VisitSign.query.filter_by(VisitId=visit_id).order_by(VisitSign.SignId)
+    assert [(row.SignId, row.SignValue) for row in signs] == [(1, 'BT'), (2, 'Nhiều')]
+    # Drugs take the catalog route; the charted D2 keeps its own
+    assert charted_drugs(visit_id) == [('D1', 'Uống'), ('D2', 'Tiêm bắp'), ('D3', None)]
+
+    # Applying again adds nothing
+    again = client.post(f'/api/visits/{visit_id}/apply-template', json={'drug_template_ids': [1, 2]})
+    assert again.get_json()['count'] == 0
+
+
+def test_requested_route_overrides_the_catalog(client, templates):
+    response = client.post(f'/api/visits/{client.visit_id}/apply-template', json={
+        'drug_template_ids': [1], 'drug_defaults': {'DrugRoute': 'Truyền', 'DrugQuantity': 2},
+    })
+    assert response.status_code == 201
+    assert charted_drugs(client.visit_id) == [('D1', 'Truyền'), ('D2', 'Truyền')]
+    assert {row.DrugQuantity for row in VisitDrug.query} == {2}
+
+
+def test_templates_are_applied_to_many_visits(client, templates):
+    db.session.add(VisitDrug(VisitId=templates[1], DrugId='D1', DrugRoute='Uống'))
+    db.session.commit()
+
+    response = client.post('/api/visits/apply-template', json={
+        'visit_ids': templates, 'sign_template_ids': [1], 'drug_template_ids': [1],
+    })
+    assert response.status_code == 201
+    assert response.get_json() == {'signs': 4, 'drugs': 3, 'count': 7, 'VisitIds': templates}
+    for visit_id in templates:
+        assert charted_drugs(visit_id) == [('D1', 'Uống'), ('D2', 'Tiêm tĩnh mạch')]
+        assert VisitSign.query.filter_by(VisitId=visit_id).count() == 2
+
+
+def test_unknown_templates_and_visits_are_404(client, templates):
+    def apply(url, **payload):
+        response = client.post(url, json=payload)
+        return response.status_code, response.get_json()['error']
+
+    assert apply('/api/visits/999/apply-template', sign_template_ids=[1]) == \
+        (404, 'Visit(s) not found: 999')
+    assert apply('/api/visits/apply-template', visit_ids=templates + [999], drug_template_ids=[1]) == \
+        (404, 'Visit(s) not found: 999')
+    assert apply(f'/api/visits/{client.visit_id}/apply-template', sign_template_ids=[1, 7]) == \
+        (404, 'Sign template(s) not found: 7')
+    assert apply(f'/api/visits/{client.visit_id}/apply-template', drug_template_ids=[8]) == \
+        (404, 'Drug template(s) not found: 8')
+    assert VisitSign.query.count() == VisitDrug.query.count() == 0
@@ -0,0 +1,89 @@
+"""
+VisitLoader: visits, staff and diagnoses in a fixed number of queries
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from models_main import db
+from models import Patient, Visit, VisitStaff, Staff, VisitDiagnosis, ICD, VisitLoader
+
+
+def add_visits(patient_id, count):
+    """``count`` visits of a new patient, each with two staff and two diagnoses"""
+    db.session.add(Patient(PatientId=patient_id, PatientName=f'Patient {patient_id}'))
+    db.session.flush()
+    start = datetime(2025, 1, 1, 8, 0)
+    for number in range(count):
+        visit = Visit(PatientId=patient_id, VisitPurpose='Thường quy',
+                      VisitTime=start + timedelta(hours=number))
+        db.session.add(visit)
+        db.session.flush()
+        for staff_id in (1, 2):
+            db.session.add(VisitStaff(VisitId=visit.VisitId, StaffId=staff_id))
+        for code in ('A09', 'J18'):
+            db.session.add(VisitDiagnosis(VisitId=visit.VisitId, ICDCode=code, ActualDiagnosis=code))
+    db.session.commit()
+
+
+@pytest.fixture
+def client(app):
+    from api.patient_visits import patient_visits_bp
+    from api.visits import visits_bp
+
+    app.register_blueprint(patient_visits_bp, url_prefix='/api')
+    app.register_blueprint(visits_bp, url_prefix='/api')
+    db.session.add_all([
+        Staff(StaffId=1, StaffName='Bác sĩ A', StaffRole='Bác sĩ'),
+        Staff(StaffId=2, StaffName='Điều dưỡng B', StaffRole='Điều dưỡng'),
+        ICD(ICDCode='A09', ICDName='Tiêu chảy'),
+        ICD(ICDCode='J18', ICDName='Viêm phổi'),
+    ])
+    db.session.commit()
+    add_visits('P1', 1)
+    add_visits('P50', 50)
+    return app.test_client()
+
+
+def statements(query_counter, load):
+    db.session.expire_all()
+    query_counter['count'] = 0
+    result = load()
+    return query_counter['count'], result
+
+
+def test_load_patient_visits_query_count_is_constant(client, query_counter):
+    one, visits_one = statements(query_counter, lambda: VisitLoader.load_patient_visits('P1'))
+    many, visits_many = statements(query_counter, lambda: VisitLoader.load_patient_visits('P50'))
+
+    assert one == many == 3
+    assert len(visits_one) == 1 and len(visits_many) == 50
+    assert all(len(v['staff']) == 2 and len(v['diagnoses']) == 2 for v in visits_many)
+    assert [s['StaffName'] for s in visits_many[0]['staff']] == ['Bác sĩ A', 'Điều dưỡng B']
+
+
+def test_patient_visits_endpoint_query_count_is_constant(client, query_counter):
+    one, response_one = statements(query_counter, lambda: client.get('/api/patient_visits/P1'))
+    many, response_many = statements(query_counter, lambda: client.get('/api/patient_visits/P50'))
+
+    assert response_one.status_code == response_many.status_code == 200
+    assert len(response_many.get_json()['visits']) == 50
+    assert one == many
+
+
+def test_latest_visit(client, query_counter):
+    count, response = statements(query_counter, lambda: client.get('/api/patient_visits/P50/latest'))
+
+    visit = response.get_json()['visit']
+    assert visit['VisitTime'].startswith('2025-01-03T09:00')
+    assert len(visit['staff']) == 2 and len(visit['diagnoses']) == 2
+    assert count == statements(query_counter, lambda: client.get('/api/patient_visits/P1/latest'))[0]
+
+
+def test_list_visits_query_count_is_constant(client, query_counter):
+    one, response_one = statements(query_counter, lambda: client.get('/api/visits?patient_id=P1'))
+    many, response_many = statements(query_counter, lambda: client.get('/api/visits?patient_id=P50'))
+
+    assert len(response_one.get_json()['visits']) == 1
+    assert len(response_many.get_json()['visits']) == 50
+    assert one == many
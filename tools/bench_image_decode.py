@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: decoding phone photos for uploads (800 px) and thumbnails (200 px).
+
+Compares, per photo and target size:
+  full      Image.open + full decode + LANCZOS resize (no draft, no reduce)
+  previous  what upload_patient_image / generate_thumbnail did before:
+            Image.thumbnail(LANCZOS) with Pillow's default reducing_gap
+  fast      utils.image_processing.load_image (draft + reduce + LANCZOS,
+            EXIF orientation)
+
+Each case runs in a fresh process so that peak RSS (whole process,
+including the interpreter and the compressed file) is its own.
+
+    python tools/bench_image_decode.py                 # synthetic 12 MP photos
+    python tools/bench_image_decode.py IMG_0001.jpg ...
+"""
+
+import io
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+REPEAT = 5
+TARGETS = (800, 200)
+METHODS = ('full', 'previous', 'fast')
+
+
+def _peak_rss_mb():
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _decode(method, data, target):
+    from PIL import Image
+    from utils import image_processing
+
+    box = (target, target)
+    if method == 'full':
+        img = Image.open(io.BytesIO(data))
+        img.load()
+        img = img.convert('RGB')
+        img.thumbnail(box, Image.Resampling.LANCZOS, reducing_gap=None)
+    elif method == 'previous':
+        img = Image.open(io.BytesIO(data))
+        img.thumbnail(box, Image.Resampling.LANCZOS)
+        img = img.convert('RGB')
+    else:
+        img = image_processing.load_image(io.BytesIO(data), box)
+    return img.size
+
+
+def _run_case(method, path, target, queue):
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    timings = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        size = _decode(method, data, target)
+        timings.append(time.perf_counter() - start)
+    queue.put((min(timings) * 1000, _peak_rss_mb(), size))
+
+
+def measure(method, path, target):
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=_run_case, args=(method, path, target, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def synthetic_photos(directory):
+    """12 MP JPEGs shaped like phone photos (landscape, and portrait via EXIF)"""
+    from PIL import Image
+
+    width, height = 4032, 3024
+    gradient = Image.linear_gradient('L').resize((width, height))
+    noise = Image.effect_noise((width, height), 40)
+    photo = Image.merge('RGB', (gradient, noise, gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT)))
+
+    landscape = os.path.join(directory, 'phone_landscape_12mp.jpg')
+    photo.save(landscape, 'JPEG', quality=90)
+
+    portrait = os.path.join(directory, 'phone_portrait_exif6_12mp.jpg')
+    exif = Image.Exif()
+    exif[0x0112] = 6  # stored sideways, displayed rotated 90 degrees
+    photo.save(portrait, 'JPEG', quality=90, exif=exif)
+    return [landscape, portrait]
+
+
+def main(paths):
+    with tempfile.TemporaryDirectory() as directory:
+        if not paths:
+            print("Generating synthetic 12 MP photos...")
+            paths = synthetic_photos(directory)
+
+        print(f"{'photo':36} {'target':>6} {'method':>9} {'time ms':>9} {'peak RSS MB':>12}  output")
+        for path in paths:
+            name = os.path.basename(path)[:36]
+            for target in TARGETS:
+                for method in METHODS:
+                    elapsed, rss, size = measure(method, path, target)
+                    print(f"{name:36} {target:>6} {method:>9} {elapsed:>9.1f} {rss:>12.1f}  {size[0]}x{size[1]}")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
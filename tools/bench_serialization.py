@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: turning 10k-row model lists into a JSON response body.
+
+Compares, per model:
+  previous  what list endpoints did before: reflective to_dict
+            ({c.name: getattr(...)} over __table__.columns, the same walk
+            as his.py:model_to_dict) + Flask's default JSON provider
+            (stdlib json, sort_keys)
+  compiled  utils.serialization: columns_to_dict (serializer compiled
+            from the column metadata) + JSONProvider (orjson when
+            installed, sort_keys)
+
+Rows are transient model instances built in memory, so no query is run
+(the app is still created, so the usual environment variables are
+needed); the times are to_dict, encode and both, best of REPEAT runs.
+
+    python tools/bench_serialization.py
+    python tools/bench_serialization.py --rows 50000
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+REPEAT = 5
+
+
+def reflective_to_dict(obj):
+    # The previous per-model to_dict, with the datetime handling of model_to_dict
+    result = {}
+    for c in obj.__table__.columns:
+        value = getattr(obj, c.name)
+        result[c.name] = value.isoformat() if isinstance(value, datetime) else value
+    return result
+
+
+def sample_rows(rows):
+    from models import Drug, PatientDepartment, Visit
+
+    now = datetime(2025, 1, 1, 8, 30)
+    return {
+        'Drug': [
+            Drug(DrugId=f'D{i:06d}', DrugName=f'Paracetamol {i}', DrugChemical='Paracetamol',
+                 DrugContent='500mg', DrugFormulation='Viên nén', DrugRemains=i % 300,
+                 DrugGroupId=i % 20, DrugTherapy='Giảm đau, hạ sốt', DrugRoute='Uống',
+                 DrugQuantity='Viên', CountStr='viên', DrugAvailable=True,
+                 DrugPriceBHYT=1500, DrugPriceVP=2000, DrugNote=None, Count=1)
+            for i in range(rows)
+        ],
+        'Visit': [
+            Visit(VisitId=i, PatientId=f'P{i % 5000:05d}', VisitPurpose='Thường quy',
+                  VisitTime=now + timedelta(minutes=i))
+            for i in range(rows)
+        ],
+        'PatientDepartment': [
+            PatientDepartment(id=i, PatientId=f'P{i:05d}', DepartmentId=i % 30, Current=i % 4 == 0,
+                              At=now + timedelta(minutes=i), EndDate=None, Reason='DT')
+            for i in range(rows)
+        ],
+    }
+
+
+def best(function):
+    timings = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000, result
+
+
+def measure(to_dict, provider, objects):
+    convert_ms, records = best(lambda: [to_dict(obj) for obj in objects])
+    encode_ms, body = best(lambda: provider.dumps({'rows': records}))
+    return convert_ms, encode_ms, len(body.encode('utf-8'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--rows', type=int, default=10000, help='rows per list (default 10000)')
+    args = parser.parse_args()
+
+    from flask.json.provider import DefaultJSONProvider
+    from his import app
+    from utils import serialization
+    from utils.serialization import JSONProvider, columns_to_dict
+
+    methods = {
+        'previous': (reflective_to_dict, DefaultJSONProvider(app)),
+        'compiled': (columns_to_dict, JSONProvider(app)),
+    }
+
+    with app.app_context():
+        lists = sample_rows(args.rows)
+        encoder = 'orjson' if serialization.orjson is not None else 'json'
+        print(f"{args.rows} rows per list, compiled path encodes with {encoder}")
+        print(f"{'model':18} {'method':>9} {'to_dict ms':>11} {'encode ms':>10} {'total ms':>9} {'bytes':>9}")
+        for model, objects in lists.items():
+            for method, (to_dict, provider) in methods.items():
+                convert_ms, encode_ms, size = measure(to_dict, provider, objects)
+                print(f"{model:18} {method:>9} {convert_ms:>11.1f} {encode_ms:>10.1f} "
+                      f"{convert_ms + encode_ms:>9.1f} {size:>9}")
+
+
+if __name__ == '__main__':
+    main()
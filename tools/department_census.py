@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Rebuild or verify the materialized department census.
+
+DepartmentCensus / DepartmentCensusDay (docs/db/ddl/DepartmentCensus.sql)
+are kept up to date by the assignment endpoints. `rebuild` recomputes both
+tables from PatientDepartment, StaffDepartment and Visit in one transaction (run it
+after any manual edit of the assignment tables; departments without a row,
+e.g. right after the tables are created, are recounted automatically); `verify` recomputes them and reports every difference without
+writing, exiting with status 1 when they disagree.
+
+    /root/his/venv/bin/python tools/department_census.py rebuild
+    /root/his/venv/bin/python tools/department_census.py verify
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from his import app
+from models_main import db
+from models import DepartmentCensus, DepartmentCensusDay
+from models.DepartmentCensus import TOTAL_COLUMNS, DAY_COLUMNS
+
+
+def rebuild():
+    """Replace both tables with recomputed values; returns (departments, days)"""
+    totals, days = DepartmentCensus.compute()
+    db.session.query(DepartmentCensusDay).delete(synchronize_session=False)
+    db.session.query(DepartmentCensus).delete(synchronize_session=False)
+    if totals:
+        db.session.execute(
+            DepartmentCensus.__table__.insert(),
+            [{'DepartmentId': department_id, **values} for department_id, values in totals.items()]
+        )
+    if days:
+        db.session.execute(
+            DepartmentCensusDay.__table__.insert(),
+            [{'DepartmentId': department_id, 'Day': day, **values}
+             for (department_id, day), values in days.items()]
+        )
+    db.session.commit()
+    return len(totals), len(days)
+
+
+def verify():
+    """List of human-readable differences between the tables and a recount"""
+    totals, days = DepartmentCensus.compute()
+    differences = []
+
+    stored = {row.DepartmentId: row for row in db.session.query(DepartmentCensus)}
+    for department_id in sorted(set(totals) | set(stored)):
+        expected = totals.get(department_id, dict.fromkeys(TOTAL_COLUMNS, 0))
+        row = stored.get(department_id)
+        for column in TOTAL_COLUMNS:
+            actual = getattr(row, column) if row else 0
+            if actual != expected[column]:
+                differences.append(f"Department {department_id} {column}: stored {actual}, expected {expected[column]}")
+
+    stored_days = {(row.DepartmentId, row.Day): row for row in db.session.query(DepartmentCensusDay)}
+    for key in sorted(set(days) | set(stored_days)):
+        expected = days.get(key, dict.fromkeys(DAY_COLUMNS, 0))
+        row = stored_days.get(key)
+        for column in DAY_COLUMNS:
+            actual = getattr(row, column) if row else 0
+            if actual != expected[column]:
+                differences.append(f"Department {key[0]} {key[1]} {column}: stored {actual}, expected {expected[column]}")
+    return differences
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Rebuild or verify the DepartmentCensus tables')
+    parser.add_argument('command', choices=('rebuild', 'verify'))
+    args = parser.parse_args()
+
+    with app.app_context():
+        try:
+            if args.command == 'rebuild':
+                department_count, day_count = rebuild()
+                print(f"Rebuilt census of {department_count} departments ({day_count} daily rows)")
+            else:
+                differences = verify()
+                for difference in differences:
+                    print(f"  {difference}")
+                if differences:
+                    print(f"Census differs from the assignment tables in {len(differences)} values; "
+                          f"run 'department_census.py rebuild'")
+                    sys.exit(1)
+                print("Census matches the assignment tables")
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error in department census {args.command}: {e}")
+            sys.exit(1)
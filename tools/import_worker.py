@@ -0,0 +1,21 @@
+#!/usr/bin/env python3
+"""
+Run Excel import jobs in a dedicated process.
+
+Imports never run inside gunicorn workers (IMPORT_WORKER_THREADS=0, the
+default); his-import-worker.service runs this next to his.service:
+
+    /root/his/venv/bin/python tools/import_worker.py
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from his import app
+from utils import import_jobs
+
+if __name__ == '__main__':
+    print("Import worker started, waiting for jobs...")
+    import_jobs.run_forever(app)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Drain Patient.PatientImage BLOBs into the content-addressed image store.
+
+Run once after docs/db/ddl/PatientImageHash.sql. Each image is written to
+PATIENT_IMAGE_STORE (utils/image_store.py), its SHA-256 is stored in
+PatientImageHash, its resized variants (utils/image_variants.py) are
+built and the BLOB is cleared. Safe to re-run: only rows that
+still carry a BLOB are processed, and storing the same bytes twice is a
+no-op.
+
+    /root/his/venv/bin/python tools/migrate_patient_images.py [--batch-size 50] [--dry-run] [--keep-blob]
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from his import app
+from models_main import db
+from models import Patient
+from utils import image_store, image_variants
+
+
+def migrate(batch_size=50, dry_run=False, keep_blob=False):
+    """Move BLOBs to the store in batches; returns (migrated, bytes_moved)"""
+    migrated = 0
+    bytes_moved = 0
+    last_id = ''
+
+    while True:
+        # Walk the primary key so each batch only loads `batch_size` BLOBs
+        query = (
+            db.session.query(Patient.PatientId, Patient.PatientImage)
+            .filter(Patient.PatientImage.isnot(None), Patient.PatientId > last_id)
+            .order_by(Patient.PatientId)
+            .limit(batch_size)
+        )
+        if keep_blob:
+            query = query.filter(Patient.PatientImageHash.is_(None))
+        rows = query.all()
+        if not rows:
+            break
+        stored = []
+
+        for patient_id, image_data in rows:
+            last_id = patient_id
+            if not image_data:
+                continue
+            bytes_moved += len(image_data)
+            migrated += 1
+            if dry_run:
+                continue
+
+            image_hash = image_store.put(image_data)
+            stored.append((image_hash, image_data))
+            try:
+                image_variants.generate(image_hash, image_data)
+            except Exception as e:
+                # Served from the original; variants are retried on first request
+                print(f"  Could not build variants for patient {patient_id}: {e}")
+            values = {'PatientImageHash': image_hash}
+            if not keep_blob:
+                values['PatientImage'] = None
+            db.session.query(Patient).filter(Patient.PatientId == patient_id).update(
+                values, synchronize_session=False)
+
+        if dry_run:
+            db.session.rollback()
+        else:
+            db.session.commit()
+            # A web worker may have released a shared file between put() and
+            # the commit; the rows are committed now, so store it again
+            for image_hash, image_data in stored:
+                with image_store.reference_lock(image_hash):
+                    image_store.put(image_data)
+        print(f"  ... {migrated} images ({bytes_moved / (1024 * 1024):.1f}MB), last PatientId {last_id}")
+
+    return migrated, bytes_moved
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Move patient images from the database to the image store')
+    parser.add_argument('--batch-size', type=int, default=50, help='BLOBs loaded per transaction')
+    parser.add_argument('--dry-run', action='store_true', help='Only count what would be moved')
+    parser.add_argument('--keep-blob', action='store_true', help='Set the hash but leave the BLOB in place')
+    args = parser.parse_args()
+
+    with app.app_context():
+        print(f"Image store: {app.config['PATIENT_IMAGE_STORE']}")
+        try:
+            count, size = migrate(args.batch_size, args.dry_run, args.keep_blob)
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error migrating patient images: {e}")
+            sys.exit(1)
+        action = 'Would move' if args.dry_run else 'Moved'
+        print(f"{action} {count} patient images ({size / (1024 * 1024):.1f}MB)")
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Duplicate-patient blocking keys and the registry-wide duplicate report.
+
+The Excel patient import keeps PatientBlockKey (docs/db/ddl/PatientBlockKey.sql)
+up to date. Run `reindex` once after creating the table, and after any
+write that bypasses the application. `report` compares the patients of
+every shared block (utils/patient_duplicates.py) and writes the likely
+duplicate pairs, best first, as CSV.
+
+    /root/his/venv/bin/python tools/patient_duplicates.py reindex
+    /root/his/venv/bin/python tools/patient_duplicates.py report --output duplicates.csv
+    /root/his/venv/bin/python tools/patient_duplicates.py report --min-score 0.7
+"""
+
+import argparse
+import csv
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from his import app
+from models_main import db
+from utils import patient_duplicates
+
+REPORT_FIELDS = ('PatientId', 'PatientName', 'PatientGender', 'PatientAge',
+                 'PatientPhone', 'PatientCCCD', 'PatientBHYT', 'PatientAddress')
+
+
+def write_report(matches, output):
+    writer = csv.writer(output)
+    writer.writerow(['Score', 'Reasons']
+                    + [f'{field}1' for field in REPORT_FIELDS]
+                    + [f'{field}2' for field in REPORT_FIELDS])
+    for score, reasons, patient_a, patient_b in matches:
+        writer.writerow([score, '; '.join(reasons)]
+                        + [getattr(patient_a, field) for field in REPORT_FIELDS]
+                        + [getattr(patient_b, field) for field in REPORT_FIELDS])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Duplicate-patient detection')
+    parser.add_argument('command', choices=('reindex', 'report'))
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--min-score', type=float, default=patient_duplicates.MIN_SCORE,
+                        help=f'report pairs scoring at least this (default {patient_duplicates.MIN_SCORE})')
+    parser.add_argument('--output', help='CSV file for the report (default: stdout)')
+    args = parser.parse_args()
+
+    with app.app_context():
+        try:
+            if args.command == 'reindex':
+                count = patient_duplicates.rebuild(
+                    args.batch_size,
+                    progress=lambda done: print(f"  {done} patients", end='\r', file=sys.stderr)
+                )
+                print(f"Indexed {count} patients")
+            else:
+                matches = patient_duplicates.report(
+                    args.min_score, args.batch_size,
+                    progress=lambda done: print(f"  {done} pairs compared", end='\r', file=sys.stderr)
+                )
+                if args.output:
+                    with open(args.output, 'w', newline='', encoding='utf-8') as output:
+                        write_report(matches, output)
+                else:
+                    write_report(matches, sys.stdout)
+                print(f"{len(matches)} likely duplicate pairs", file=sys.stderr)
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error in patient duplicates {args.command}: {e}")
+            sys.exit(1)
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Rebuild the diacritic-insensitive search index (SearchToken).
+
+API writes and Excel imports keep SearchToken (docs/db/ddl/SearchToken.sql)
+up to date. Run `rebuild` once after creating the table to index the
+existing patients, drugs and signs, and after any write that bypasses the
+application (manual SQL, restored dumps). Rows are reindexed in batches,
+each committed on its own, so searches keep working during a rebuild.
+
+    /root/his/venv/bin/python tools/search_index.py rebuild
+    /root/his/venv/bin/python tools/search_index.py rebuild patient --batch-size 10000
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from his import app
+from models_main import db
+from utils import search_index
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Rebuild the SearchToken search index')
+    parser.add_argument('command', choices=('rebuild',))
+    parser.add_argument('entities', nargs='*',
+                        help=f"entities to rebuild: {', '.join(search_index.ENTITIES)} (default: all)")
+    parser.add_argument('--batch-size', type=int, default=5000)
+    args = parser.parse_args()
+    unknown = [name for name in args.entities if name not in search_index.ENTITIES]
+    if unknown:
+        parser.error(f"unknown entities: {', '.join(unknown)}")
+
+    with app.app_context():
+        for entity_name in args.entities or list(search_index.ENTITIES):
+            try:
+                count = search_index.rebuild(
+                    entity_name, args.batch_size,
+                    progress=lambda done: print(f"  {entity_name}: {done} rows", end='\r')
+                )
+                print(f"Indexed {count} {entity_name} rows")
+            except Exception as e:
+                db.session.rollback()
+                print(f"Error in search index {args.command} of {entity_name}: {e}")
+                sys.exit(1)
@@ -0,0 +1,316 @@
+"""
+Shared engine for the Excel importers.
+
+Validation runs column-wise on the whole DataFrame; every row that fails a
+check is skipped with an ``Error in row N: ...`` message (N is the Excel
+row number, header = row 1). Existing primary keys are prefetched with one
+IN query per ``KEY_QUERY_SIZE`` keys so imported/updated counts need no
+per-row lookup, and valid rows are written in chunks with the dialect's
+native upsert:
+
+    MySQL/MariaDB   INSERT ... ON DUPLICATE KEY UPDATE
+    SQLite/Postgres INSERT ... ON CONFLICT (pk) DO UPDATE
+
+Each chunk is its own transaction, which also updates the search index
+(utils/search_index.py) and duplicate-patient blocking keys
+(utils/patient_duplicates.py) of the rows it wrote. When a chunk fails
+(e.g. a value too long for its column) it is retried row by row inside
+savepoints so that only the offending rows are reported and skipped.
+
+An optional ``progress(processed_rows, total_rows, error_count)`` callback
+is called once validation is done and after every chunk; the background
+import jobs use it to report progress.
+
+Usage:
+    job = BulkImport(df)
+    error = job.missing_columns(['ICDCode', 'ICDName'])
+    if error:
+        return error
+    job.require('ICDCode', 'ICDName')
+    return job.upsert(db, ICD, {
+        'ICDCode': job.text('ICDCode'),
+        'ICDName': job.text('ICDName'),
+        'ICDGroup': job.text('ICDGroup'),
+    }, key='ICDCode')
+"""
+import pandas as pd
+
+DEFAULT_CHUNK_SIZE = 500
+
+# Keys per IN (...) list when prefetching existing primary keys
+KEY_QUERY_SIZE = 1000
+
+TRUE_STRINGS = ('true', 'yes', '1', 't', 'y')
+
+UPSERT_DIALECTS = ('mysql', 'mariadb', 'sqlite', 'postgresql')
+
+
+def clean_frame(df):
+    """Drop empty rows and trim text cells, keeping blanks as missing values"""
+    df = df.dropna(how='all').copy()
+    for col in df.select_dtypes(include=['object', 'string']).columns:
+        stripped = df[col].astype(str).str.strip()
+        df[col] = stripped.where(df[col].notna() & (stripped != ''), None)
+    return df
+
+
+def _as_text(value):
+    """Render a cell as text; integral floats read by Excel lose their '.0'"""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+class BulkImport:
+    """Vectorized validation and chunked upsert of one DataFrame into one table"""
+
+    def __init__(self, df, chunk_size=DEFAULT_CHUNK_SIZE, progress=None, lookups=None):
+        self.df = clean_frame(df)
+        self.chunk_size = chunk_size
+        self.progress = progress
+        # Foreign-key sets, shared between the batches of one streamed file
+        self.lookups = lookups if lookups is not None else {}
+        self.total_rows = len(self.df)
+        self.valid = pd.Series(True, index=self.df.index)
+        self.errors = {}
+
+    # -- validation -------------------------------------------------------
+
+    def missing_columns(self, required_cols):
+        """Error result when required columns are absent, else None"""
+        missing = [col for col in required_cols if col not in self.df.columns]
+        if missing:
+            return {'error': f'Missing required columns: {", ".join(missing)}'}
+        return None
+
+    def reject(self, mask, message):
+        """Skip still-valid rows selected by ``mask``.
+
+        ``message`` is a string or a callable receiving the row index.
+        """
+        mask = mask.reindex(self.df.index, fill_value=False) & self.valid
+        for idx in self.df.index[mask]:
+            self.errors[idx] = message(idx) if callable(message) else message
+        self.valid &= ~mask
+
+    def blank(self, col):
+        """Mask of rows without a value in ``col`` (all rows if the column is absent)"""
+        if col not in self.df.columns:
+            return pd.Series(True, index=self.df.index)
+        return self.df[col].isna()
+
+    def require(self, *cols):
+        """Skip rows with a missing value in any of the given columns"""
+        for col in cols:
+            self.reject(self.blank(col), f"Missing {col}")
+
+    def invalid_values(self, col, valid_values, skip_blank=False):
+        """List of ``Row N: value`` entries whose value is not allowed"""
+        series = self.df[col]
+        mask = ~series.isin(valid_values)
+        if skip_blank:
+            mask &= series.notna()
+        return [f"Row {idx+2}: {series[idx]}" for idx in self.df.index[mask]]
+
+    def must_exist(self, values, column, label):
+        """Skip rows whose (non-null) value is not a key of ``column``'s table"""
+        from models_main import db
+        lookup_key = str(column)
+        if lookup_key not in self.lookups:
+            self.lookups[lookup_key] = {row[0] for row in db.session.query(column).all()}
+        existing = self.lookups[lookup_key]
+        mask = values.notna() & ~values.isin(existing)
+        self.reject(mask, lambda idx: f"{label} {values[idx]} does not exist")
+
+    # -- typed column accessors ------------------------------------------
+
+    def text(self, col, default=''):
+        """Column as text, ``default`` where blank or absent"""
+        if col not in self.df.columns:
+            return pd.Series(default, index=self.df.index, dtype=object)
+        series = self.df[col]
+        return series.map(_as_text, na_action='ignore').astype(object).where(series.notna(), default)
+
+    def integer(self, col, default=None):
+        """Column as integers; rows holding non-numeric values are skipped"""
+        if col not in self.df.columns:
+            return pd.Series(default, index=self.df.index, dtype=object)
+        series = self.df[col]
+        numeric = pd.to_numeric(series, errors='coerce')
+        self.reject(
+            series.notna() & numeric.isna(),
+            lambda idx: f"Invalid {col} value: {series[idx]}"
+        )
+        result = numeric.dropna().astype('int64').astype(object)
+        return result.reindex(self.df.index).where(numeric.notna(), default)
+
+    def boolean(self, col, default):
+        """Column as booleans: numbers by truthiness, text by TRUE_STRINGS"""
+        if col not in self.df.columns:
+            return pd.Series(default, index=self.df.index, dtype=object)
+        series = self.df[col]
+        numeric = pd.to_numeric(series, errors='coerce')
+        from_text = series.astype(str).str.strip().str.lower().isin(TRUE_STRINGS)
+        result = from_text.where(numeric.isna(), numeric.fillna(0) != 0)
+        return result.astype(object).where(series.notna(), default)
+
+    # -- writing ----------------------------------------------------------
+
+    def _report(self, processed_rows):
+        if self.progress is not None:
+            self.progress(processed_rows, self.total_rows, len(self.errors))
+
+    def _records(self, values):
+        """Valid rows as (row index, dict of plain Python values)"""
+        frame = pd.DataFrame(values, index=self.df.index)[self.valid].astype(object)
+        frame = frame.where(frame.notna(), None)
+        return list(zip(frame.index, frame.to_dict('records')))
+
+    @staticmethod
+    def _upsert_statement(db, table, key, update_cols):
+        dialect = db.session.get_bind().dialect.name
+        if dialect in ('mysql', 'mariadb'):
+            from sqlalchemy.dialects.mysql import insert
+            stmt = insert(table)
+            cols = update_cols or [key]
+            return stmt.on_duplicate_key_update({c: stmt.inserted[c] for c in cols})
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(table)
+        if not update_cols:
+            return stmt.on_conflict_do_nothing(index_elements=[key])
+        return stmt.on_conflict_do_update(
+            index_elements=[key],
+            set_={c: stmt.excluded[c] for c in update_cols}
+        )
+
+    def _write(self, db, model, rows, key):
+        """Write rows: upsert those carrying a key, plain insert for the rest"""
+        table = model.__table__
+        keyed = [row for row in rows if key and row.get(key) is not None]
+        unkeyed = [row for row in rows if not (key and row.get(key) is not None)]
+
+        if keyed:
+            if db.session.get_bind().dialect.name in UPSERT_DIALECTS:
+                update_cols = [c for c in keyed[0] if c != key]
+                db.session.execute(self._upsert_statement(db, table, key, update_cols), keyed)
+            else:
+                for row in keyed:
+                    db.session.merge(model(**row))
+        if unkeyed:
+            # Leave the key out so the database assigns it
+            db.session.execute(
+                table.insert(),
+                [{c: v for c, v in row.items() if c != key} for row in unkeyed]
+            )
+
+        # Keep the search index (patients, drugs, signs) and the duplicate-patient
+        # blocking keys in step, same transaction
+        from utils import patient_duplicates, search_index
+        written = [row[key] for row in keyed]
+        search_index.reindex_written(model, written, generated_keys=bool(unkeyed))
+        patient_duplicates.reindex_written(model, written, generated_keys=bool(unkeyed))
+
+    def upsert(self, db, model, values, key=None):
+        """Insert or update every valid row and return the import summary.
+
+        Args:
+            db: SQLAlchemy handle
+            model: target model class
+            values: column name -> Series (aligned with the DataFrame)
+            key: primary-key column name; rows whose key is blank are
+                inserted with a database-generated key
+        """
+        records = self._records(values)
+
+        # Existing keys in IN (...) batches, instead of a lookup per row
+        existing = set()
+        if key:
+            key_column = getattr(model, key)
+            keys = list({row[key] for _, row in records if row.get(key) is not None})
+            for start in range(0, len(keys), KEY_QUERY_SIZE):
+                rows = db.session.query(key_column).filter(
+                    key_column.in_(keys[start:start + KEY_QUERY_SIZE])
+                ).all()
+                existing.update(row[0] for row in rows)
+
+        # A key seen earlier in the file counts as an update, as it would
+        # have been had the rows been written one at a time
+        is_update = {}
+        for idx, row in records:
+            row_key = row.get(key) if key else None
+            is_update[idx] = row_key is not None and row_key in existing
+            if row_key is not None:
+                existing.add(row_key)
+
+        # Rows rejected by validation count as processed
+        rejected = self.total_rows - len(records)
+        self._report(rejected)
+
+        written = []
+        for start in range(0, len(records), self.chunk_size):
+            chunk = records[start:start + self.chunk_size]
+            try:
+                self._write(db, model, [row for _, row in chunk], key)
+                db.session.commit()
+                written.extend(idx for idx, _ in chunk)
+            except Exception as e:
+                db.session.rollback()
+                print(f"Bulk import chunk failed, retrying row by row: {e}")
+                for idx, row in chunk:
+                    try:
+                        with db.session.begin_nested():
+                            self._write(db, model, [row], key)
+                        written.append(idx)
+                    except Exception as row_error:
+                        # Report the driver message without the SQL statement
+                        self.errors[idx] = str(getattr(row_error, 'orig', row_error))
+                db.session.commit()
+            self._report(rejected + start + len(chunk))
+
+        imported = sum(1 for idx in written if not is_update[idx])
+        updated = len(written) - imported
+        return {
+            'success': True,
+            'total_rows': self.total_rows,
+            'imported': imported,
+            'updated': updated,
+            'skipped': self.total_rows - len(written),
+            'errors': [f"Error in row {idx+2}: {self.errors[idx]}" for idx in sorted(self.errors)]
+        }
+
+
+def import_batches(importer, batches, db, progress=None, total_rows=None):
+    """Run an importer over a stream of DataFrame batches and merge the results.
+
+    Batches keep their absolute row index so error row numbers match the
+    file. A whole-batch error (missing column, invalid enum value) stops the
+    import; rows of earlier batches stay imported and the error says so.
+    """
+    summary = {'success': True, 'total_rows': 0, 'imported': 0, 'updated': 0, 'skipped': 0, 'errors': []}
+    lookups = {}
+
+    for df in batches:
+        done_rows = summary['total_rows']
+        done_errors = len(summary['errors'])
+
+        def batch_progress(processed_rows, batch_rows, error_count):
+            if progress is not None:
+                progress(done_rows + processed_rows,
+                         max(total_rows or 0, done_rows + batch_rows),
+                         done_errors + error_count)
+
+        result = importer(df, db, progress=batch_progress, lookups=lookups)
+        if 'error' in result:
+            if not done_rows:
+                return result
+            return dict(summary, success=False,
+                        error=f"{result['error']} (the first {done_rows} rows were already imported)")
+
+        for field in ('total_rows', 'imported', 'updated', 'skipped'):
+            summary[field] += result[field]
+        summary['errors'].extend(result['errors'])
+
+    return summary
@@ -0,0 +1,318 @@
+"""
+Department event stream (Server-Sent Events).
+
+Endpoints that change a department's patient list call ``publish`` before
+their ``db.session.commit()``: the event is a ``DepartmentEvent`` row, so it
+becomes visible exactly when the change commits and is never sent for a
+rolled-back change.
+
+Each gunicorn worker runs one broadcaster thread. Nothing starts at import
+or app creation, which ``--preload`` runs in the master: the first stream a
+worker serves starts it, and a forked child drops any state inherited from
+its parent (``_reset_after_fork``). It polls
+the table for rows newer than the last one it saw every
+``DEPARTMENT_EVENT_POLL_SECONDS`` - one query per worker, whatever the
+number of open pages - and fans them out to the in-process queues of that
+worker's subscribers. ``notify()`` wakes the local poller right after a
+commit, so pages served by the same worker see the change at once.
+
+Streams carry the event id; on reconnect the browser sends
+``Last-Event-ID`` and the missed events are replayed from the table. A
+stream ends after ``DEPARTMENT_EVENT_STREAM_SECONDS`` so a long-lived page
+never pins a worker thread, and the browser reconnects on its own.
+
+Every open stream holds one gthread thread, so a worker accepts at most
+``DEPARTMENT_EVENT_MAX_STREAMS`` of them (keep it below ``GUNICORN_THREADS``
+so ordinary requests still get threads). Beyond that ``stream`` raises
+``StreamLimitReached``; the endpoint answers 503 and the page falls back to
+polling the patient list.
+"""
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+
+from werkzeug.wsgi import ClosingIterator
+
+from models_main import db
+from utils.serialization import dumps
+
+DEFAULT_POLL_SECONDS = 1
+DEFAULT_STREAM_SECONDS = 300
+DEFAULT_RETENTION_HOURS = 24
+DEFAULT_MAX_STREAMS = 8
+HEARTBEAT_SECONDS = 15
+RECONNECT_MILLISECONDS = 2000
+# Retry-After of a refused stream; the page polls meanwhile
+STREAM_RETRY_SECONDS = 300
+REPLAY_LIMIT = 500
+POLL_BATCH_SIZE = 500
+SUBSCRIBER_QUEUE_SIZE = 200
+PRUNE_EVERY_SECONDS = 600
+GAP_SECONDS = 30
+
+_broadcaster = None
+_broadcaster_pid = None
+_start_lock = threading.Lock()
+_wakeup = threading.Event()
+
+
+class StreamLimitReached(Exception):
+    """Raised when this worker already serves its maximum of open streams"""
+
+
+def _reset_after_fork():
+    """Forget a parent's broadcaster: its thread does not exist in the child"""
+    global _broadcaster, _broadcaster_pid, _start_lock, _wakeup
+    _broadcaster = None
+    _broadcaster_pid = None
+    _start_lock = threading.Lock()
+    _wakeup = threading.Event()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def publish(department_id, event_type, data, patient_id=None):
+    """Record an event in the caller's transaction (delivered once it commits)"""
+    from models.DepartmentEvent import DepartmentEvent
+    db.session.add(DepartmentEvent(
+        DepartmentId=department_id,
+        EventType=event_type,
+        PatientId=patient_id,
+        Payload=data
+    ))
+
+
+def notify():
+    """Wake this process's broadcaster after a commit that published events"""
+    _wakeup.set()
+
+
+def last_event_id(department_id):
+    """Id of the newest event of a department (0 if none), to resume a stream from"""
+    from models.DepartmentEvent import DepartmentEvent
+    value = db.session.query(db.func.max(DepartmentEvent.EventId)).filter(
+        DepartmentEvent.DepartmentId == department_id
+    ).scalar()
+    return value or 0
+
+
+def events_after(department_id, event_id, limit=REPLAY_LIMIT):
+    """Events of a department newer than ``event_id``, oldest first"""
+    from models.DepartmentEvent import DepartmentEvent
+    return (
+        DepartmentEvent.query
+        .filter(DepartmentEvent.DepartmentId == department_id, DepartmentEvent.EventId > event_id)
+        .order_by(DepartmentEvent.EventId)
+        .limit(limit)
+        .all()
+    )
+
+
+def format_event(event_id, event_type, data):
+    """One SSE message (without an id line when ``event_id`` is None)"""
+    payload = dumps(data)
+    id_line = f"id: {event_id}\n" if event_id is not None else ''
+    return f"{id_line}event: {event_type}\ndata: {payload}\n\n"
+
+
+class Subscription:
+    """Queue of (event_id, event_type, data) for one open stream"""
+
+    def __init__(self, department_id):
+        self.department_id = department_id
+        self.queue = queue.Queue(SUBSCRIBER_QUEUE_SIZE)
+        # Set when the consumer fell behind and events were dropped
+        self.overflowed = False
+
+    def deliver(self, item):
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            self.overflowed = True
+
+
+class _Broadcaster:
+    """Polls DepartmentEvent and fans new rows out to local subscriptions"""
+
+    def __init__(self, app):
+        self.app = app
+        self.poll_seconds = app.config.get('DEPARTMENT_EVENT_POLL_SECONDS', DEFAULT_POLL_SECONDS)
+        self.retention_hours = app.config.get('DEPARTMENT_EVENT_RETENTION_HOURS', DEFAULT_RETENTION_HOURS)
+        self.max_streams = app.config.get('DEPARTMENT_EVENT_MAX_STREAMS', DEFAULT_MAX_STREAMS)
+        self.lock = threading.Lock()
+        self.subscriptions = {}
+        self.open_streams = 0
+        self.last_id = None
+        # EventId -> when it was delivered, for the commit-order look-back
+        self.recent = {}
+        self.last_prune = 0
+        thread = threading.Thread(target=self._run, name='department-events', daemon=True)
+        thread.start()
+
+    def subscribe(self, department_id):
+        subscription = Subscription(department_id)
+        with self.lock:
+            if self.open_streams >= self.max_streams:
+                raise StreamLimitReached(
+                    f'{self.open_streams} department event streams already open in this worker')
+            self.open_streams += 1
+            self.subscriptions.setdefault(department_id, set()).add(subscription)
+        _wakeup.set()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscribers = self.subscriptions.get(subscription.department_id)
+            if subscribers is not None and subscription in subscribers:
+                self.open_streams -= 1
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self.subscriptions[subscription.department_id]
+
+    def _poll(self):
+        from models.DepartmentEvent import DepartmentEvent
+
+        with self.lock:
+            idle = not self.subscriptions
+        if idle:
+            # Nobody listening: skip the query and start from the tip next time
+            self.last_id = None
+            self.recent.clear()
+            return
+
+        if self.last_id is None:
+            self.last_id = db.session.query(db.func.max(DepartmentEvent.EventId)).scalar() or 0
+            return
+
+        # Ids are assigned at INSERT but become visible at COMMIT, so a lower
+        # id can appear after a higher one: re-read from the oldest id
+        # delivered in the last GAP_SECONDS and skip those already sent.
+        now = time.monotonic()
+        for event_id in [i for i, seen in self.recent.items() if now - seen > GAP_SECONDS]:
+            del self.recent[event_id]
+        cursor = min(self.recent) - 1 if self.recent else self.last_id
+
+        while True:
+            rows = (
+                db.session.query(
+                    DepartmentEvent.EventId, DepartmentEvent.DepartmentId,
+                    DepartmentEvent.EventType, DepartmentEvent.Payload
+                )
+                .filter(DepartmentEvent.EventId > cursor)
+                .order_by(DepartmentEvent.EventId)
+                .limit(POLL_BATCH_SIZE)
+                .all()
+            )
+            for event_id, department_id, event_type, payload in rows:
+                cursor = event_id
+                if event_id in self.recent:
+                    continue
+                self.recent[event_id] = now
+                self.last_id = max(self.last_id, event_id)
+                with self.lock:
+                    subscribers = list(self.subscriptions.get(department_id, ()))
+                for subscription in subscribers:
+                    subscription.deliver((event_id, event_type, payload))
+            if len(rows) < POLL_BATCH_SIZE:
+                break
+
+    def _prune(self):
+        from models.DepartmentEvent import DepartmentEvent
+        if time.monotonic() - self.last_prune < PRUNE_EVERY_SECONDS:
+            return
+        self.last_prune = time.monotonic()
+        cutoff = datetime.now() - timedelta(hours=self.retention_hours)
+        db.session.query(DepartmentEvent).filter(
+            DepartmentEvent.CreatedAt < cutoff
+        ).delete(synchronize_session=False)
+        db.session.commit()
+
+    def _run(self):
+        with self.app.app_context():
+            while True:
+                try:
+                    self._poll()
+                    # End the read transaction so the next poll sees new commits
+                    db.session.rollback()
+                    self._prune()
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Error in department event broadcaster: {e}")
+                finally:
+                    db.session.remove()
+                _wakeup.wait(self.poll_seconds)
+                _wakeup.clear()
+
+
+def get_broadcaster(app):
+    """This process's broadcaster, started on first use"""
+    global _broadcaster, _broadcaster_pid
+    with _start_lock:
+        if _broadcaster is None or _broadcaster_pid != os.getpid():
+            _broadcaster = _Broadcaster(app)
+            _broadcaster_pid = os.getpid()
+        return _broadcaster
+
+
+def stream(app, department_id, after_id):
+    """SSE response body for one department.
+
+    Subscribes first, then replays the events newer than ``after_id`` from
+    the table, so nothing committed in between is lost; events already sent
+    are skipped when they arrive again through the queue. The request's
+    database session is released before streaming starts. Raises
+    ``StreamLimitReached`` when the worker has no stream slot left.
+    """
+    broadcaster = get_broadcaster(app)
+    subscription = broadcaster.subscribe(department_id)
+    try:
+        missed = events_after(department_id, after_id, REPLAY_LIMIT + 1)
+        replay = [(row.EventId, row.EventType, row.Payload) for row in missed[:REPLAY_LIMIT]]
+        too_far_behind = len(missed) > REPLAY_LIMIT
+    except Exception:
+        broadcaster.unsubscribe(subscription)
+        raise
+    finally:
+        db.session.remove()
+
+    stream_seconds = app.config.get('DEPARTMENT_EVENT_STREAM_SECONDS', DEFAULT_STREAM_SECONDS)
+
+    def generate():
+        sent_ids = set()
+        deadline = time.monotonic() + stream_seconds
+        try:
+            yield f"retry: {RECONNECT_MILLISECONDS}\n\n"
+            if too_far_behind:
+                # More missed than we replay: the page reloads the full list
+                yield format_event(None, 'reset', {})
+                return
+            for event_id, event_type, data in replay:
+                sent_ids.add(event_id)
+                yield format_event(event_id, event_type, data)
+
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                try:
+                    event_id, event_type, data = subscription.queue.get(
+                        timeout=min(HEARTBEAT_SECONDS, remaining))
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                if subscription.overflowed:
+                    # Dropped events: end the stream, the reconnect replays them
+                    return
+                if event_id in sent_ids:
+                    continue
+                sent_ids.add(event_id)
+                yield format_event(event_id, event_type, data)
+        finally:
+            broadcaster.unsubscribe(subscription)
+
+    # A generator closed before its first item never runs its finally block;
+    # ClosingIterator frees the stream slot however the response ends
+    return ClosingIterator(generate(), [lambda: broadcaster.unsubscribe(subscription)])
@@ -0,0 +1,102 @@
+"""
+Streaming readers for uploaded spreadsheets.
+
+``iter_batches`` yields the sheet as DataFrames of at most ``batch_rows``
+rows, so an import never holds more than one batch in memory:
+
+- .xlsx is read with openpyxl in read-only mode, row by row
+- .csv is read with pandas in chunks (UTF-8, BOM allowed) - the fast path
+- legacy .xls has no streaming reader and is loaded whole, then sliced
+
+The first row is the header. Each batch keeps the file's absolute row index
+(data row 0 = spreadsheet row 2), like ``pd.read_excel`` would.
+"""
+import pandas as pd
+
+DEFAULT_BATCH_ROWS = 2000
+
+
+def file_extension(file_path):
+    return file_path.rsplit('.', 1)[-1].lower() if '.' in file_path else ''
+
+
+def _header(values):
+    return [
+        str(value).strip() if value is not None else f'Unnamed: {i}'
+        for i, value in enumerate(values)
+    ]
+
+
+def _xlsx_batches(file_path, sheet_name, batch_rows):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        if isinstance(sheet_name, int):
+            sheet = workbook.worksheets[sheet_name]
+        else:
+            sheet = workbook[sheet_name]
+
+        rows = sheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = _header(header)
+
+        batch = []
+        start = 0
+        for row in rows:
+            # Read-only rows are as long as the widest row of the sheet
+            batch.append(row[:len(columns)])
+            if len(batch) == batch_rows:
+                yield pd.DataFrame(batch, columns=columns, index=range(start, start + len(batch)))
+                start += len(batch)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=columns, index=range(start, start + len(batch)))
+    finally:
+        workbook.close()
+
+
+def _csv_batches(file_path, batch_rows):
+    # Keep every cell as text; the importers convert types per column
+    reader = pd.read_csv(file_path, chunksize=batch_rows, dtype=str, encoding='utf-8-sig')
+    with reader:
+        for chunk in reader:
+            yield chunk
+
+
+def _xls_batches(file_path, sheet_name, batch_rows):
+    df = pd.read_excel(file_path, sheet_name=sheet_name)
+    for start in range(0, len(df), batch_rows):
+        yield df.iloc[start:start + batch_rows]
+
+
+def iter_batches(file_path, sheet_name=0, batch_rows=DEFAULT_BATCH_ROWS):
+    """Yield the sheet (or CSV file) as DataFrames of at most ``batch_rows`` rows"""
+    extension = file_extension(file_path)
+    if extension == 'csv':
+        return _csv_batches(file_path, batch_rows)
+    if extension == 'xls':
+        return _xls_batches(file_path, sheet_name, batch_rows)
+    return _xlsx_batches(file_path, sheet_name, batch_rows)
+
+
+def estimate_rows(file_path, sheet_name=0):
+    """Cheap data-row count for progress reporting; None when unknown"""
+    try:
+        extension = file_extension(file_path)
+        if extension == 'csv':
+            with open(file_path, 'rb') as f:
+                return max(sum(1 for _ in f) - 1, 0)
+        if extension == 'xlsx':
+            from openpyxl import load_workbook
+            workbook = load_workbook(file_path, read_only=True)
+            try:
+                sheet = workbook.worksheets[sheet_name] if isinstance(sheet_name, int) else workbook[sheet_name]
+                return sheet.max_row - 1 if sheet.max_row else None
+            finally:
+                workbook.close()
+    except Exception as e:
+        print(f"Cannot estimate rows of {file_path}: {e}")
+    return None
@@ -0,0 +1,103 @@
+"""
+HTTP conditional caching for images and document files.
+
+ETags are the SHA-256 of the content, computed once when the file is stored
+(``PatientImageHash``, ``document_links['sha256']``,
+``document_links['thumbnail_sha256']``), so a revalidation is answered with
+``304 Not Modified`` from the row alone, before the file is opened.
+
+Usage:
+    return http_cache.send_cached_file(path, etag, max_age, mimetype='image/jpeg')
+
+or, when the body is not a plain file:
+    cached = http_cache.not_modified(etag, last_modified, max_age)
+    if cached:
+        return cached
+    response = send_file(..., conditional=False, etag=False)
+    return http_cache.set_headers(response, etag, last_modified, max_age)
+
+Responses are ``private`` (patient data must not land in shared caches).
+``max_age=0`` makes the browser revalidate every time, which is what a
+resource replaced in place at the same URL (a patient photo) needs.
+"""
+import hashlib
+import os
+from datetime import datetime, timezone
+
+from flask import Response, request, send_file
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def sha256_file(path):
+    """SHA-256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_mtime(path):
+    """Modification time of a file as an aware datetime, None if missing"""
+    try:
+        return datetime.fromtimestamp(int(os.path.getmtime(path)), tz=timezone.utc)
+    except OSError:
+        return None
+
+
+def _as_utc(value):
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        # Naive DB timestamps are server local time
+        value = value.astimezone()
+    return value.astimezone(timezone.utc).replace(microsecond=0)
+
+
+def cache_control(max_age):
+    if max_age:
+        return f'private, max-age={max_age}'
+    return 'private, no-cache'
+
+
+def set_headers(response, etag=None, last_modified=None, max_age=0):
+    """Attach validators and Cache-Control to a response"""
+    if etag:
+        response.set_etag(etag)
+    last_modified = _as_utc(last_modified)
+    if last_modified:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = cache_control(max_age)
+    return response
+
+
+def is_fresh(etag=None, last_modified=None):
+    """True when the client's copy matches (If-None-Match wins over If-Modified-Since)"""
+    if request.if_none_match:
+        return bool(etag) and request.if_none_match.contains(etag)
+    last_modified = _as_utc(last_modified)
+    if last_modified and request.if_modified_since:
+        return last_modified <= request.if_modified_since
+    return False
+
+
+def not_modified(etag=None, last_modified=None, max_age=0):
+    """A 304 response when the client's copy is current, otherwise None"""
+    if request.method not in ('GET', 'HEAD') or not is_fresh(etag, last_modified):
+        return None
+    return set_headers(Response(status=304), etag, last_modified, max_age)
+
+
+def send_cached_file(path, etag=None, max_age=0, **kwargs):
+    """send_file with content-hash ETag, Last-Modified from the file and a 304 shortcut.
+
+    Files stored before hashes were recorded (etag None) still revalidate
+    through If-Modified-Since.
+    """
+    last_modified = file_mtime(path)
+    cached = not_modified(etag, last_modified, max_age)
+    if cached:
+        return cached
+    response = send_file(path, conditional=False, etag=False, **kwargs)
+    return set_headers(response, etag, last_modified, max_age)
@@ -0,0 +1,142 @@
+"""
+In-memory ICD-10 autocomplete.
+
+Every worker keeps a prefix index of the ``ICD`` table, built from one
+query and held by the reference cache (``icd_suggest`` view, depending on
+the ``ICD`` catalog version): importing ICD codes bumps the version, and
+each worker rebuilds its index on its next lookup. ``init_app`` builds it on
+the first request of each process, so the first keystroke does not pay for it.
+
+The index is two sorted key arrays with a parallel array of row numbers -
+a flattened trie, answered with ``bisect``:
+
+    codes   compact codes: ``A09.0`` -> ``a090``
+    words   accent-folded name words: ``Tiêu chảy`` -> ``tieu``, ``chay``
+
+A query is looked up as a code prefix first (``a09``, ``A09.``) and then
+as name words, every word having to start a word of the name (``tieu ch``
+finds ``Tiêu chảy``), accents optional. A lookup is a binary search plus a
+walk over at most the matching keys; no query is sent to the database
+besides the reference cache version check.
+"""
+import os
+from array import array
+from bisect import bisect_left
+
+from models_main import db
+from utils import reference_cache
+from utils.search_index import MAX_QUERY_TOKENS, compact, words
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+_warmed_pid = None
+
+
+def _upper_bound(prefix):
+    """Smallest key after every key starting with ``prefix`` (keys are [0-9a-z])"""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+class ICDIndex:
+    """Prefix index over ICD rows ``(ICDCode, ICDName, ICDGroup)``"""
+
+    def __init__(self, rows):
+        rows = sorted(rows, key=lambda row: row[0])
+        self.entries = [
+            {'ICDCode': code, 'ICDName': name, 'ICDGroup': group}
+            for code, name, group in rows
+        ]
+        # Name words of each entry, to check the other words of a query
+        self.tokens = [tuple(set(words(name))) for _, name, _ in rows]
+
+        code_keys = sorted(
+            (compact(code), index) for index, (code, _, _) in enumerate(rows)
+        )
+        word_keys = sorted(
+            (word, index) for index, tokens in enumerate(self.tokens) for word in tokens
+        )
+        self.code_keys = [key for key, _ in code_keys]
+        self.code_refs = array('I', (index for _, index in code_keys))
+        self.word_keys = [key for key, _ in word_keys]
+        self.word_refs = array('I', (index for _, index in word_keys))
+
+    def __len__(self):
+        return len(self.entries)
+
+    @staticmethod
+    def _range(keys, prefix):
+        return bisect_left(keys, prefix), bisect_left(keys, _upper_bound(prefix))
+
+    def suggest(self, query, limit=DEFAULT_LIMIT):
+        """Up to ``limit`` entries matching ``query``: code matches (by code),
+        then name matches (by matched word, then code)"""
+        results = []
+        seen = set()
+
+        code = compact(query)
+        if code:
+            start, end = self._range(self.code_keys, code)
+            for index in self.code_refs[start:min(end, start + limit)]:
+                seen.add(index)
+                results.append(self.entries[index])
+
+        terms = sorted(set(words(query)), key=len, reverse=True)[:MAX_QUERY_TOKENS]
+        if not terms or len(results) >= limit:
+            return results
+
+        # Walk the narrowest word range; the other words must prefix a word of the name
+        (start, end), first = min(
+            ((self._range(self.word_keys, term), term) for term in terms),
+            key=lambda item: item[0][1] - item[0][0]
+        )
+        others = [term for term in terms if term != first]
+        for position in range(start, end):
+            index = self.word_refs[position]
+            if index in seen:
+                continue
+            if others and not all(
+                any(token.startswith(term) for token in self.tokens[index]) for term in others
+            ):
+                continue
+            seen.add(index)
+            results.append(self.entries[index])
+            if len(results) >= limit:
+                break
+        return results
+
+
+@reference_cache.register('icd_suggest', depends_on=('ICD',))
+def _load_index():
+    from models import ICD
+    rows = db.session.query(ICD.ICDCode, ICD.ICDName, ICD.ICDGroup).all()
+    return ICDIndex(rows)
+
+
+def index():
+    """The ICD index of this worker, rebuilt when the ICD catalog changed"""
+    return reference_cache.get('icd_suggest')
+
+
+def suggest(query, limit=DEFAULT_LIMIT):
+    """ICD entries (dicts) matching ``query``, see ``ICDIndex.suggest``"""
+    if not query or not query.strip():
+        return []
+    return index().suggest(query, limit)
+
+
+def init_app(app):
+    """Build the index on the first request of each worker process (workers
+    may be forked after the app is created, so not at import time)"""
+
+    @app.before_request
+    def _warm_icd_index():
+        global _warmed_pid
+        if _warmed_pid == os.getpid():
+            return
+        _warmed_pid = os.getpid()
+        try:
+            index()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error building ICD index: {e}")
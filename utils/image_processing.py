@@ -0,0 +1,90 @@
+"""
+Image decoding for uploads, thumbnails and variants.
+
+``load_image(source, max_size)`` returns an RGB image that fits in
+``max_size`` while decoding as little of the source as possible:
+
+1. JPEG draft mode: libjpeg decodes directly at 1/2, 1/4 or 1/8 scale
+   (never below the target size), so a 12 MP phone photo is never expanded
+   to full resolution in memory. The scaled IDCT is itself a proper
+   downscale, so no extra headroom is kept here.
+2. ``Image.reduce`` by an integer factor for the remaining coarse step,
+   down to ``REDUCING_GAP`` times the target (cheap box averaging; the only
+   coarse step for PNG and other formats).
+3. A final LANCZOS resize.
+4. EXIF orientation applied to the small image, so portrait phone photos
+   are stored upright.
+
+Alpha is flattened onto white, palette/CMYK images become RGB.
+"""
+from PIL import Image
+
+ORIENTATION_TAG = 0x0112
+REDUCING_GAP = 2
+
+# EXIF orientation -> transposition that makes the image upright
+ORIENTATION_TRANSPOSE = {
+    2: (Image.Transpose.FLIP_LEFT_RIGHT,),
+    3: (Image.Transpose.ROTATE_180,),
+    4: (Image.Transpose.FLIP_TOP_BOTTOM,),
+    5: (Image.Transpose.TRANSPOSE,),
+    6: (Image.Transpose.ROTATE_270,),
+    7: (Image.Transpose.TRANSVERSE,),
+    8: (Image.Transpose.ROTATE_90,),
+}
+
+
+def exif_orientation(img):
+    try:
+        return int(img.getexif().get(ORIENTATION_TAG, 1))
+    except Exception:
+        return 1
+
+
+def to_rgb(img):
+    """RGB copy of an image, transparent areas on a white background"""
+    if img.mode == 'RGB':
+        return img
+    if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
+        img = img.convert('RGBA')
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        background.paste(img, mask=img.getchannel('A'))
+        return background
+    return img.convert('RGB')
+
+
+def load_image(source, max_size):
+    """Open ``source`` (path or file object) decoded to fit in ``max_size``.
+
+    ``max_size`` is the (width, height) box of the upright image.
+    """
+    img = Image.open(source)
+    orientation = exif_orientation(img)
+
+    # Rotated photos are stored sideways: size the box in stored orientation
+    box = tuple(max_size)
+    if orientation in (5, 6, 7, 8):
+        box = (box[1], box[0])
+
+    # Target size with the aspect ratio kept (draft/reduce need both sides)
+    ratio = min(box[0] / img.width, box[1] / img.height)
+    if ratio < 1:
+        target = (max(1, round(img.width * ratio)), max(1, round(img.height * ratio)))
+
+        # 1. Scale-on-decode for JPEG
+        if img.format == 'JPEG':
+            img.draft('RGB', target)
+
+        # 2. Coarse integer reduction down to ~REDUCING_GAP x the target
+        factor = min(img.width // (target[0] * REDUCING_GAP), img.height // (target[1] * REDUCING_GAP))
+        if factor > 1:
+            img = img.reduce(factor)
+
+    # 3. Final high-quality resize (no-op when already small enough)
+    img = to_rgb(img)
+    img.thumbnail(box, Image.Resampling.LANCZOS, reducing_gap=None)
+
+    # 4. Make the (now small) image upright
+    for method in ORIENTATION_TRANSPOSE.get(orientation, ()):
+        img = img.transpose(method)
+    return img
@@ -0,0 +1,106 @@
+"""
+Content-addressed filesystem store for patient images.
+
+Images are written once under ``PATIENT_IMAGE_STORE`` and named by the
+SHA-256 of their bytes; the Patient row keeps only that hash
+(``PatientImageHash``). Identical uploads share one file and a stored file
+never changes, so the hash doubles as a strong ETag.
+
+Layout: ``<store>/ab/cd/abcd...ef`` (two fan-out levels keep directories small).
+
+Storing a hash that is already on disk reuses the file, so "store and
+reference" and "no reference left, delete" must not interleave for the same
+hash. Both run inside ``reference_lock(image_hash)``.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+from flask import current_app
+from sqlalchemy import text
+
+from models_main import db
+
+LOCK_TIMEOUT = 30
+_local_lock = threading.Lock()
+
+
+def store_root():
+    return current_app.config['PATIENT_IMAGE_STORE']
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def path_for(image_hash, root=None):
+    """Absolute path of a stored image (which may not exist)"""
+    root = root or store_root()
+    return os.path.join(root, image_hash[:2], image_hash[2:4], image_hash)
+
+
+def exists(image_hash, root=None):
+    return bool(image_hash) and os.path.exists(path_for(image_hash, root))
+
+
+@contextmanager
+def reference_lock(image_hash, timeout=LOCK_TIMEOUT):
+    """Serialise storing/referencing and releasing one image across workers.
+
+    On MySQL/MariaDB this is a named lock (GET_LOCK) taken on a connection of
+    its own: the lock belongs to the connection, so it must not ride on the
+    session's pooled one. Other databases fall back to a process-local lock.
+    """
+    if db.engine.dialect.name not in ('mysql', 'mariadb'):
+        with _local_lock:
+            yield
+        return
+
+    # Lock names are limited to 64 characters
+    name = f'his_image_{image_hash[:40]}'
+    with db.engine.connect() as conn:
+        acquired = conn.execute(text('SELECT GET_LOCK(:name, :timeout)'),
+                                {'name': name, 'timeout': timeout}).scalar()
+        if acquired != 1:
+            raise TimeoutError(f'Could not lock patient image {image_hash}')
+        try:
+            yield
+        finally:
+            conn.execute(text('SELECT RELEASE_LOCK(:name)'), {'name': name})
+
+
+def put(data, root=None):
+    """Store bytes and return their hash; writing the same content again is a no-op"""
+    image_hash = content_hash(data)
+    target = path_for(image_hash, root)
+    if os.path.exists(target):
+        return image_hash
+
+    directory = os.path.dirname(target)
+    os.makedirs(directory, exist_ok=True)
+    # Write to a temp file and rename, so readers never see a partial image
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.tmp_')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, target)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return image_hash
+
+
+def read(image_hash, root=None):
+    with open(path_for(image_hash, root), 'rb') as f:
+        return f.read()
+
+
+def delete(image_hash, root=None):
+    """Remove a stored image; callers check, under ``reference_lock``, that
+    no row references it any more"""
+    target = path_for(image_hash, root)
+    if os.path.exists(target):
+        os.remove(target)
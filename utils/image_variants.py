@@ -0,0 +1,122 @@
+"""
+Resized variants of patient images.
+
+Every stored patient image (utils/image_store.py) gets JPEG and WebP copies
+at ``VARIANT_SIZES`` pixels (longest side), written next to the original as
+``<hash>_<size>.jpg`` / ``<hash>_<size>.webp``. They are produced at upload
+time; images stored before variants existed get theirs on first request.
+
+``GET /api/patient/image/<id>?size=64`` picks the smallest variant at least
+that large, in WebP when the browser accepts it. List endpoints expose
+``PatientImageUrls`` (see ``urls()``); those URLs carry the content hash
+(``v=``), so browsers may cache them indefinitely.
+"""
+import io
+import os
+import tempfile
+
+from PIL import Image
+
+from utils import image_store, image_processing
+
+VARIANT_SIZES = (64, 200, 800)
+FORMATS = {
+    'jpeg': ('jpg', 'image/jpeg', {'quality': 82, 'optimize': True, 'progressive': True}),
+    'webp': ('webp', 'image/webp', {'quality': 80, 'method': 4}),
+}
+IMAGE_URL = '/api/patient/image'
+
+
+def variant_path(image_hash, size, image_format='jpeg', root=None):
+    extension = FORMATS[image_format][0]
+    return f"{image_store.path_for(image_hash, root)}_{size}.{extension}"
+
+
+def mimetype(image_format):
+    return FORMATS[image_format][1]
+
+
+def pick_size(requested):
+    """Smallest variant covering ``requested`` pixels; None for the original"""
+    try:
+        requested = int(requested)
+    except (TypeError, ValueError):
+        return None
+    for size in VARIANT_SIZES:
+        if size >= requested:
+            return size
+    return VARIANT_SIZES[-1]
+
+
+def pick_format(requested, accept_mimetypes):
+    """Explicit ``format=webp|jpeg`` wins, else WebP when the browser lists it.
+
+    Only an explicit ``image/webp`` counts; ``*/*`` alone gets JPEG.
+    """
+    if requested in FORMATS:
+        return requested
+    if any(value == 'image/webp' and quality > 0 for value, quality in accept_mimetypes):
+        return 'webp'
+    return 'jpeg'
+
+
+def _write(path, img, image_format):
+    buffer = io.BytesIO()
+    img.save(buffer, image_format.upper(), **FORMATS[image_format][2])
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp_')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(buffer.getvalue())
+    os.replace(temp_path, path)
+
+
+def generate(image_hash, image_data=None, root=None):
+    """Write any missing variants of a stored image (both formats, all sizes)"""
+    missing = [
+        (size, image_format)
+        for size in VARIANT_SIZES
+        for image_format in FORMATS
+        if not os.path.exists(variant_path(image_hash, size, image_format, root))
+    ]
+    if not missing:
+        return
+
+    if image_data is None:
+        image_data = image_store.read(image_hash, root)
+    largest = max(size for size, _ in missing)
+    source = image_processing.load_image(io.BytesIO(image_data), (largest, largest))
+
+    # Largest first, so each variant is resized from the previous one
+    current = source
+    for size in sorted({size for size, _ in missing}, reverse=True):
+        current = current.copy()
+        current.thumbnail((size, size), Image.Resampling.LANCZOS)
+        for image_format in FORMATS:
+            if (size, image_format) in missing:
+                _write(variant_path(image_hash, size, image_format, root), current, image_format)
+
+
+def ensure(image_hash, size, image_format='jpeg', root=None):
+    """Path of a variant, generating the variants first if needed"""
+    path = variant_path(image_hash, size, image_format, root)
+    if not os.path.exists(path):
+        generate(image_hash, root=root)
+    return path
+
+
+def delete(image_hash, root=None):
+    for size in VARIANT_SIZES:
+        for image_format in FORMATS:
+            path = variant_path(image_hash, size, image_format, root)
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def urls(patient_id, image_hash):
+    """Variant URLs for list payloads, keyed by size; None without an image"""
+    if not image_hash:
+        return None
+    version = image_hash[:16]
+    return {
+        str(size): f"{IMAGE_URL}/{patient_id}?size={size}&v={version}"
+        for size in VARIANT_SIZES
+    }
@@ -0,0 +1,202 @@
+"""
+Background job runner for Excel imports.
+
+The upload endpoint stores the file under ``IMPORT_JOB_FOLDER``, inserts a
+queued ``ImportJob`` row and returns its id at once. Worker threads poll the
+table, claim one queued job at a time with a conditional UPDATE (so several
+gunicorn workers can share the queue without running a job twice), run the
+import and record progress on the row after every written chunk. Clients
+poll ``GET /api/upload/jobs/<job_id>`` for progress and the final result.
+
+Jobs are run by ``tools/import_worker.py``, a separate process
+(``his-import-worker.service``), so imports never take threads or memory
+from the gunicorn web workers. ``IMPORT_WORKER_THREADS`` (default 0) can
+additionally run worker threads inside each web process, e.g. in
+development without the worker process; they start lazily on the first
+request of each process, because gunicorn ``--preload`` forks workers
+after the app is created.
+
+A job whose heartbeat (``UpdatedAt``) is older than
+``IMPORT_JOB_STALE_SECONDS`` is assumed to belong to a dead worker and is
+queued again; imports are upserts, so re-running one is safe.
+"""
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+from models_main import db
+
+DEFAULT_POLL_SECONDS = 5
+DEFAULT_STALE_SECONDS = 600
+MAX_ATTEMPTS = 2
+
+_runner = None
+_wakeup = threading.Event()
+_started_pid = None
+_start_lock = threading.Lock()
+
+
+def set_runner(runner):
+    """Register ``runner(table_name, file_path, sheet_name, progress) -> result``"""
+    global _runner
+    _runner = runner
+
+
+def job_folder(app):
+    folder = app.config['IMPORT_JOB_FOLDER']
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+def enqueue(table_name, file_path, file_name, sheet_name=None, job_id=None):
+    """Queue an uploaded file for import and return the new ImportJob"""
+    from models.ImportJob import ImportJob
+    job = ImportJob(
+        JobId=job_id or uuid.uuid4().hex,
+        TableName=table_name,
+        FileName=file_name,
+        FilePath=file_path,
+        SheetName=sheet_name,
+        Status='queued'
+    )
+    db.session.add(job)
+    db.session.commit()
+    # Wake a local worker thread instead of waiting for its next poll
+    _wakeup.set()
+    return job
+
+
+def _update_job(job_id, **values):
+    """Write job fields in their own short transaction.
+
+    Uses a separate connection so progress is visible to pollers while the
+    import itself is between chunk commits.
+    """
+    from models.ImportJob import ImportJob
+    values['UpdatedAt'] = datetime.now()
+    table = ImportJob.__table__
+    with db.engine.begin() as conn:
+        conn.execute(table.update().where(table.c.JobId == job_id).values(**values))
+
+
+def _requeue_stale_jobs(stale_seconds):
+    from models.ImportJob import ImportJob
+    cutoff = datetime.now() - timedelta(seconds=stale_seconds)
+    stale = ImportJob.query.filter(ImportJob.Status == 'running', ImportJob.UpdatedAt < cutoff)
+    stale.filter(ImportJob.Attempts >= MAX_ATTEMPTS).update(
+        {ImportJob.Status: 'failed', ImportJob.Error: 'Import worker stopped', ImportJob.FinishedAt: datetime.now()},
+        synchronize_session=False
+    )
+    stale.filter(ImportJob.Attempts < MAX_ATTEMPTS).update(
+        {ImportJob.Status: 'queued', ImportJob.WorkerId: None},
+        synchronize_session=False
+    )
+    db.session.commit()
+
+
+def claim_next_job(worker_id, stale_seconds=DEFAULT_STALE_SECONDS):
+    """Atomically take the oldest queued job; None when the queue is empty"""
+    from models.ImportJob import ImportJob
+    _requeue_stale_jobs(stale_seconds)
+
+    candidate = (
+        db.session.query(ImportJob.JobId)
+        .filter(ImportJob.Status == 'queued')
+        .order_by(ImportJob.CreatedAt, ImportJob.JobId)
+        .first()
+    )
+    if candidate is None:
+        return None
+
+    now = datetime.now()
+    claimed = ImportJob.query.filter_by(JobId=candidate.JobId, Status='queued').update({
+        ImportJob.Status: 'running',
+        ImportJob.WorkerId: worker_id,
+        ImportJob.Attempts: ImportJob.Attempts + 1,
+        ImportJob.StartedAt: now,
+        ImportJob.UpdatedAt: now
+    }, synchronize_session=False)
+    db.session.commit()
+    if not claimed:
+        # Another worker got there first
+        return None
+    return db.session.get(ImportJob, candidate.JobId)
+
+
+def run_job(job):
+    """Run a claimed job and record its outcome"""
+    job_id = job.JobId
+
+    def progress(processed_rows, total_rows, error_count):
+        _update_job(job_id, ProcessedRows=processed_rows, TotalRows=total_rows, ErrorCount=error_count)
+
+    try:
+        result = _runner(job.TableName, job.FilePath, job.SheetName or 0, progress)
+        if 'error' in result:
+            _update_job(job_id, Status='failed', Error=result['error'], Result=result,
+                        FinishedAt=datetime.now())
+        else:
+            _update_job(job_id, Status='done', Result=result,
+                        TotalRows=result['total_rows'], ProcessedRows=result['total_rows'],
+                        ErrorCount=len(result['errors']), FinishedAt=datetime.now())
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error running import job {job_id}: {e}")
+        _update_job(job_id, Status='failed', Error=str(e), FinishedAt=datetime.now())
+
+    try:
+        os.unlink(job.FilePath)
+    except OSError:
+        pass
+
+
+def run_forever(app, worker_id=None):
+    """Claim and run jobs until the process exits"""
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+    poll_seconds = app.config.get('IMPORT_JOB_POLL_SECONDS', DEFAULT_POLL_SECONDS)
+    stale_seconds = app.config.get('IMPORT_JOB_STALE_SECONDS', DEFAULT_STALE_SECONDS)
+
+    with app.app_context():
+        while True:
+            job = None
+            try:
+                job = claim_next_job(worker_id, stale_seconds)
+                if job is not None:
+                    run_job(job)
+            except Exception as e:
+                db.session.rollback()
+                print(f"Error in import worker {worker_id}: {e}")
+            finally:
+                db.session.remove()
+
+            if job is None:
+                _wakeup.wait(poll_seconds)
+                _wakeup.clear()
+
+
+def start_workers(app):
+    """Start this process's worker threads once"""
+    global _started_pid
+    with _start_lock:
+        if _started_pid == os.getpid():
+            return
+        _started_pid = os.getpid()
+
+    for i in range(app.config.get('IMPORT_WORKER_THREADS', 0)):
+        thread = threading.Thread(target=run_forever, args=(app,), name=f'import-worker-{i}', daemon=True)
+        thread.start()
+
+
+def init_app(app, runner):
+    """Register the import runner and, when ``IMPORT_WORKER_THREADS`` is
+    set, start worker threads on the first request"""
+    set_runner(runner)
+    if app.config.get('IMPORT_WORKER_THREADS', 0) <= 0:
+        return
+
+    @app.before_request
+    def _start_import_workers():
+        if _started_pid != os.getpid():
+            start_workers(app)
@@ -0,0 +1,363 @@
+"""
+Pool of LibreOffice workers converting Office documents to PDF.
+
+Shared by the patient and staff document blueprints (through
+utils/thumbnails.py). The pool is host-wide: ``OFFICE_POOL_SIZE`` slots live
+in ``OFFICE_WORK_DIR`` and every gunicorn worker (and thread) borrows one by
+taking the slot's ``flock`` lock, so at most that many conversions run on the
+host at once, however many workers gunicorn starts. Size it to the host's
+spare cores and memory (roughly 300 MB per warm instance), not per worker.
+
+Every slot owns a LibreOffice user profile of its own: concurrent instances
+never contend for one profile lock, and the profile is initialised once
+instead of on every call. When the ``uno`` bridge is importable the slot also
+keeps a long-lived ``soffice --accept=pipe,...`` instance (its pid in
+``soffice.pid``, reused by whichever worker holds the slot) and converts over
+UNO, so a job pays no start-up cost at all; otherwise each job runs
+``soffice --convert-to pdf`` against the slot's warm profile and ``init_app``
+logs a warning at start-up.
+
+Enabling UNO: the bridge ships with the distribution's LibreOffice
+(``apt install python3-uno``) and is only importable by the system python.
+Either create the venv with ``python3 -m venv --system-site-packages venv``
+so it sees ``uno``, or run gunicorn with the system python3 that has
+python3-uno. Check with ``venv/bin/python -c "import uno"``.
+
+Each job converts into a private temporary directory that is removed when
+the caller is done with the PDF, so files with the same name never collide.
+Jobs are killed after ``OFFICE_CONVERT_TIMEOUT`` seconds and a slot is
+recycled (instance stopped, profile wiped) after ``OFFICE_RECYCLE_AFTER``
+jobs or after any failure. Warm instances outlive the worker that started
+them; ``KillMode=mixed`` in his.service stops them with the service.
+
+Usage:
+    with office_converter.converted_pdf(file_path) as pdf_path:
+        if pdf_path:
+            ...
+"""
+import fcntl
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import current_app
+
+try:
+    import uno  # type: ignore
+    from com.sun.star.beans import PropertyValue  # type: ignore
+    _UNO_AVAILABLE = True
+except Exception:
+    uno = None  # type: ignore
+    _UNO_AVAILABLE = False
+
+DEFAULT_POOL_SIZE = 1
+DEFAULT_TIMEOUT = 30
+DEFAULT_RECYCLE_AFTER = 50
+CONNECT_TIMEOUT = 20
+ACQUIRE_INTERVAL = 0.2
+
+# PDF export filter per document kind (UNO mode)
+PDF_FILTERS = (
+    ('com.sun.star.sheet.SpreadsheetDocument', 'calc_pdf_Export'),
+    ('com.sun.star.presentation.PresentationDocument', 'impress_pdf_Export'),
+    ('com.sun.star.drawing.DrawingDocument', 'draw_pdf_Export'),
+)
+
+# UNO connections of this process, per slot index: (instance pid, desktop)
+_connections = {}
+# Instances started by this process, reaped once they exit
+_children = []
+_children_lock = threading.Lock()
+
+
+def init_app(app):
+    """Warn once at start-up when conversions fall back to the CLI"""
+    if 'office_converter' in app.extensions:
+        return
+    app.extensions['office_converter'] = True
+    if not _UNO_AVAILABLE:
+        app.logger.warning(
+            "python3-uno is not importable by %s; Office conversions start a fresh "
+            "soffice per job (see utils/office_converter.py to enable UNO)",
+            sys.executable)
+
+
+def _reap_children():
+    with _children_lock:
+        _children[:] = [process for process in _children if process.poll() is None]
+
+
+def _read_int(path):
+    try:
+        with open(path) as f:
+            return int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        return 0
+
+
+def _write_int(path, value):
+    with open(path, 'w') as f:
+        f.write(str(value))
+
+
+def _kill_group(pid):
+    """Kill a LibreOffice process and its children (own process group)"""
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except OSError:
+        pass
+
+
+def _kill(process):
+    if process is None or process.poll() is not None:
+        return
+    _kill_group(process.pid)
+    try:
+        process.wait(timeout=5)
+    except subprocess.TimeoutExpired:
+        pass
+
+
+class _Slot:
+    """One host-wide LibreOffice worker: private profile, optional warm instance.
+
+    Only used while the caller holds the slot's lock (see ``acquire``).
+    """
+
+    def __init__(self, index, config):
+        self.index = index
+        self.binary = config.get('OFFICE_BINARY', 'libreoffice')
+        self.timeout = config.get('OFFICE_CONVERT_TIMEOUT', DEFAULT_TIMEOUT)
+        self.recycle_after = config.get('OFFICE_RECYCLE_AFTER', DEFAULT_RECYCLE_AFTER)
+        base_dir = config.get('OFFICE_WORK_DIR') or os.path.join(tempfile.gettempdir(), 'his_office')
+        self.root = os.path.join(base_dir, f'slot_{index}')
+        self.lock_path = os.path.join(base_dir, f'slot_{index}.lock')
+        self.profile_dir = os.path.join(self.root, 'profile')
+        self.pid_path = os.path.join(self.root, 'soffice.pid')
+        self.jobs_path = os.path.join(self.root, 'jobs')
+        self.pipe_name = f'his_office_{index}'
+        self.lock_file = None
+        os.makedirs(self.root, exist_ok=True)
+
+    def acquire(self):
+        """Take the slot's lock without waiting; True when taken"""
+        lock_file = open(self.lock_path, 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self.lock_file = lock_file
+        return True
+
+    def release(self):
+        if self.lock_file is not None:
+            fcntl.flock(self.lock_file, fcntl.LOCK_UN)
+            self.lock_file.close()
+            self.lock_file = None
+
+    def _profile_arg(self):
+        return f"-env:UserInstallation=file://{self.profile_dir}"
+
+    # -- warm instance (UNO) ----------------------------------------------
+
+    def _instance_pid(self):
+        """Pid of the slot's running instance, or None.
+
+        The pid file may be stale after a reboot or crash, so the pid only
+        counts while its command line still names this slot's pipe.
+        """
+        pid = _read_int(self.pid_path)
+        if not pid:
+            return None
+        try:
+            with open(f'/proc/{pid}/cmdline', 'rb') as f:
+                cmdline = f.read()
+        except OSError:
+            return None
+        return pid if f'pipe,name={self.pipe_name};'.encode() in cmdline else None
+
+    def _start_instance(self):
+        process = subprocess.Popen([
+            self.binary, self._profile_arg(), '--headless', '--invisible',
+            '--nologo', '--norestore', '--nodefault',
+            f'--accept=pipe,name={self.pipe_name};urp;StarOffice.ComponentContext'
+        ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+        with _children_lock:
+            _children.append(process)
+        _write_int(self.pid_path, process.pid)
+        return process.pid
+
+    def _connect(self, pid):
+        local_context = uno.getComponentContext()
+        resolver = local_context.ServiceManager.createInstanceWithContext(
+            'com.sun.star.bridge.UnoUrlResolver', local_context)
+        deadline = time.monotonic() + CONNECT_TIMEOUT
+        while True:
+            try:
+                context = resolver.resolve(
+                    f'uno:pipe,name={self.pipe_name};urp;StarOffice.ComponentContext')
+                break
+            except Exception:
+                if time.monotonic() > deadline or self._instance_pid() != pid:
+                    raise RuntimeError('LibreOffice instance did not start')
+                time.sleep(0.25)
+        desktop = context.ServiceManager.createInstanceWithContext(
+            'com.sun.star.frame.Desktop', context)
+        _connections[self.index] = (pid, desktop)
+        return desktop
+
+    def _desktop(self):
+        """Desktop of the slot's instance, starting it or reconnecting when
+        another worker restarted it since this process last used the slot"""
+        pid = self._instance_pid()
+        if pid is None:
+            pid = self._start_instance()
+        connected_pid, desktop = _connections.get(self.index, (None, None))
+        if connected_pid == pid:
+            return desktop, pid
+        return self._connect(pid), pid
+
+    @staticmethod
+    def _property(name, value):
+        prop = PropertyValue()
+        prop.Name = name
+        prop.Value = value
+        return prop
+
+    def _convert_uno(self, file_path, pdf_path):
+        desktop, pid = self._desktop()
+
+        # A stuck conversion blocks inside UNO; killing the instance unblocks it
+        watchdog = threading.Timer(self.timeout, _kill_group, args=(pid,))
+        watchdog.start()
+        try:
+            document = desktop.loadComponentFromURL(
+                uno.systemPathToFileUrl(os.path.abspath(file_path)), '_blank', 0,
+                (self._property('Hidden', True), self._property('ReadOnly', True)))
+            try:
+                pdf_filter = 'writer_pdf_Export'
+                for service, export_filter in PDF_FILTERS:
+                    if document.supportsService(service):
+                        pdf_filter = export_filter
+                        break
+                document.storeToURL(
+                    uno.systemPathToFileUrl(pdf_path),
+                    (self._property('FilterName', pdf_filter),))
+            finally:
+                document.close(True)
+        finally:
+            watchdog.cancel()
+
+    # -- one-shot process against the warm profile --------------------------
+
+    def _convert_cli(self, file_path, work_dir):
+        process = subprocess.Popen([
+            self.binary, self._profile_arg(), '--headless', '--nologo', '--norestore',
+            '--convert-to', 'pdf', '--outdir', work_dir, file_path
+        ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+        try:
+            process.wait(timeout=self.timeout)
+        except subprocess.TimeoutExpired:
+            _kill(process)
+            raise
+        if process.returncode != 0:
+            raise RuntimeError(f'LibreOffice exited with code {process.returncode}')
+
+    # -- lifecycle ----------------------------------------------------------
+
+    def convert(self, file_path, work_dir):
+        """Convert into ``work_dir``; returns the PDF path or None"""
+        base_name = os.path.splitext(os.path.basename(file_path))[0]
+        pdf_path = os.path.join(work_dir, f'{base_name}.pdf')
+        try:
+            if _UNO_AVAILABLE:
+                self._convert_uno(file_path, pdf_path)
+            else:
+                self._convert_cli(file_path, work_dir)
+        except Exception:
+            self.recycle()
+            raise
+
+        # The job count is shared by every worker using the slot
+        jobs = _read_int(self.jobs_path) + 1
+        if jobs >= self.recycle_after:
+            self.recycle()
+        else:
+            _write_int(self.jobs_path, jobs)
+        return pdf_path if os.path.exists(pdf_path) else None
+
+    def stop(self):
+        pid = self._instance_pid()
+        connected_pid, desktop = _connections.pop(self.index, (None, None))
+        if desktop is not None and connected_pid == pid:
+            try:
+                desktop.terminate()
+            except Exception:
+                pass
+        if pid is not None:
+            _kill_group(pid)
+        try:
+            os.remove(self.pid_path)
+        except OSError:
+            pass
+        _reap_children()
+
+    def recycle(self):
+        """Stop the instance and start over with a fresh profile"""
+        self.stop()
+        shutil.rmtree(self.profile_dir, ignore_errors=True)
+        _write_int(self.jobs_path, 0)
+
+
+def _acquire_slot(config, wait_timeout):
+    """Lock a free host-wide slot, polling until ``wait_timeout`` seconds"""
+    size = max(1, config.get('OFFICE_POOL_SIZE', DEFAULT_POOL_SIZE))
+    # Start at a pid-dependent slot so workers do not all pile onto slot 0
+    offset = os.getpid() % size
+    deadline = time.monotonic() + wait_timeout
+    while True:
+        for i in range(size):
+            slot = _Slot((offset + i) % size, config)
+            if slot.acquire():
+                return slot
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(ACQUIRE_INTERVAL)
+
+
+@contextmanager
+def converted_pdf(file_path, wait_timeout=None):
+    """Convert an Office document to PDF in a private directory.
+
+    Yields the PDF path, or None when conversion failed or no slot became
+    free within ``wait_timeout`` seconds. The PDF is deleted on exit.
+    """
+    config = current_app.config
+    if wait_timeout is None:
+        wait_timeout = 4 * config.get('OFFICE_CONVERT_TIMEOUT', DEFAULT_TIMEOUT)
+
+    slot = _acquire_slot(config, wait_timeout)
+    if slot is None:
+        print(f"No LibreOffice worker free to convert {file_path}")
+        yield None
+        return
+
+    work_dir = tempfile.mkdtemp(prefix='job_', dir=slot.root)
+    try:
+        try:
+            pdf_path = slot.convert(file_path, work_dir)
+        except Exception as e:
+            print(f"Error converting {file_path} with LibreOffice: {e}")
+            pdf_path = None
+        finally:
+            slot.release()
+        yield pdf_path
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
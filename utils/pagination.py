@@ -0,0 +1,161 @@
+"""
+Keyset (cursor) pagination utilities for list endpoints.
+
+A cursor is an opaque, URL-safe token that encodes the sort key of the last
+row of the previous page. The next page is fetched with a WHERE clause on
+that key instead of OFFSET, so page N costs the same as page 1.
+
+Sort columns may be nullable. NULL sorts before every value, as MySQL,
+MariaDB and SQLite order it by default (first ascending, last
+descending), so sorting on the raw column keeps using its index; other
+dialects are told so explicitly. The WHERE clause has ``IS NULL`` branches
+for NULL keys, so rows with a NULL sort value are neither skipped nor
+repeated, and a page ending on one still has a next page.
+"""
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from flask import current_app, request
+from sqlalchemy import and_, false, or_
+
+DEFAULT_MAX_LIMIT = 1000
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor token cannot be decoded"""
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'$dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'$d': value.isoformat()}
+    if isinstance(value, Decimal):
+        return {'$dec': str(value)}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if '$dt' in value:
+            return datetime.fromisoformat(value['$dt'])
+        if '$d' in value:
+            return date.fromisoformat(value['$d'])
+        if '$dec' in value:
+            return Decimal(value['$dec'])
+    return value
+
+
+def encode_cursor(values):
+    """Encode a sequence of sort-key values into an opaque cursor token"""
+    payload = json.dumps([_encode_value(v) for v in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, expected_length=None):
+    """Decode a cursor token back into a list of sort-key values"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+        if not isinstance(values, list):
+            raise ValueError('cursor payload is not a list')
+        values = [_decode_value(v) for v in values]
+    except Exception:
+        raise InvalidCursor('Invalid cursor')
+    if expected_length is not None and len(values) != expected_length:
+        raise InvalidCursor('Invalid cursor: sort key length mismatch')
+    return values
+
+
+# Dialects sorting NULL before every value without being told
+NULLS_LOW_DIALECTS = ('mysql', 'mariadb', 'sqlite')
+
+
+def _equal(column, value):
+    return column.is_(None) if value is None else column == value
+
+
+def _after(column, value, descending):
+    """``column`` sorts after ``value`` (NULL being the lowest value)"""
+    if descending:
+        # NULLs come last: after any value, nothing after NULL
+        return false() if value is None else or_(column < value, column.is_(None))
+    return column.isnot(None) if value is None else column > value
+
+
+def _after_clause(sort_columns, values, descending):
+    """Build (c1 > v1) OR (c1 = v1 AND c2 > v2) OR ... for the given key.
+
+    The expanded form is used instead of a row-value comparison so that
+    MySQL/MariaDB can use a range scan on the leading index column. NULL
+    values compare as ``IS NULL`` / ``IS NOT NULL``.
+    """
+    clauses = []
+    for i, column in enumerate(sort_columns):
+        equal_prefix = [_equal(sort_columns[j], values[j]) for j in range(i)]
+        clauses.append(and_(*equal_prefix, _after(column, values[i], descending)))
+    return or_(*clauses)
+
+
+def _order_by(query, sort_columns, descending):
+    order = [c.desc() if descending else c.asc() for c in sort_columns]
+    dialect = query.session.get_bind().dialect.name
+    if dialect not in NULLS_LOW_DIALECTS:
+        order = [o.nulls_last() if descending else o.nulls_first() for o in order]
+    return order
+
+
+def get_page_args(default_limit=None, max_limit=DEFAULT_MAX_LIMIT):
+    """Read ``cursor`` and ``limit`` from the query string"""
+    if default_limit is None:
+        default_limit = current_app.config.get('ITEMS_PER_PAGE', 20)
+    limit = request.args.get('limit', default_limit, type=int)
+    limit = max(1, min(limit, max_limit))
+    return request.args.get('cursor') or None, limit
+
+
+def wants_pagination():
+    """True when the client asked for a page (``limit`` or ``cursor`` given).
+
+    Endpoints that historically returned the whole table keep doing so when
+    neither parameter is present, so existing pages keep working unchanged.
+    """
+    return 'limit' in request.args or 'cursor' in request.args
+
+
+def keyset_paginate(query, sort_columns, cursor=None, limit=20, descending=False, key_func=None):
+    """Apply keyset pagination to a query.
+
+    Args:
+        query: SQLAlchemy query, without ORDER BY/LIMIT
+        sort_columns: columns forming a unique sort key (last one should be
+            the primary key as tie-breaker); raw indexed columns, which may
+            be nullable, rather than expressions over them
+        cursor: token returned as ``next_cursor`` by the previous page
+        limit: page size
+        descending: sort all key columns descending instead of ascending
+        key_func: callable(row) -> sequence of sort-key values; defaults to
+            reading each column's ``key`` attribute from the row
+
+    Returns:
+        tuple: (rows, next_cursor) where next_cursor is None on the last page
+    """
+    if cursor:
+        values = decode_cursor(cursor, expected_length=len(sort_columns))
+        query = query.filter(_after_clause(sort_columns, values, descending))
+
+    rows = query.order_by(*_order_by(query, sort_columns, descending)).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        if key_func is not None:
+            key = key_func(last)
+        else:
+            key = [getattr(last, c.key) for c in sort_columns]
+        next_cursor = encode_cursor(key)
+
+    return rows, next_cursor
@@ -0,0 +1,366 @@
+"""
+Duplicate-patient detection.
+
+Comparing every patient with every other one is O(n²). Instead each patient
+gets a few blocking keys, stored in ``PatientBlockKey``:
+
+    cccd:<digits>                    citizen id
+    bhyt:<last 10 characters>        BHYT person number (the prefix is the
+                                     benefit category, which changes)
+    phone:<digits>                   +84 numbers rewritten to 0...
+    name:<name words>:<birth year>   accent-stripped full name
+    short:<family + given name>:<birth year>
+                                     catches typos in and omitted middle names
+
+and only patients sharing a key are compared (``similarity``: weighted name
+similarity, identifiers, birth year, gender, address; each patient's fields
+are normalized once, as a ``PatientProfile``). Blocks larger than
+``MAX_BLOCK_SIZE`` (a very common name, a clinic phone number) are skipped:
+they say nothing about a pair.
+
+The birth year comes from ``PatientAge``, which holds either a date / year
+of birth or an age; an age gives two candidate years (birthday passed or
+not).
+
+``find_duplicates`` checks one patient (or the details of a patient about to
+be registered) against the index; ``report`` scans every block for the
+offline report (tools/patient_duplicates.py). The Excel importer keeps the
+keys of the patients it writes up to date (``reindex_written``); ``rebuild``
+recomputes them all.
+"""
+import re
+from datetime import date
+from difflib import SequenceMatcher
+from itertools import combinations, groupby
+
+from sqlalchemy import func
+
+from models_main import db
+from utils.search_index import normalize, words
+
+MIN_SCORE = 0.55
+MAX_BLOCK_SIZE = 200
+KEY_LENGTH = 120
+ID_QUERY_SIZE = 1000
+
+NAME_WEIGHT = 0.5
+# field: (weight when equal, penalty when both present and different)
+IDENTIFIER_WEIGHTS = {
+    'PatientCCCD': (0.5, 0.5),
+    'PatientBHYT': (0.4, 0.2),
+    'PatientPhone': (0.15, 0.0),
+}
+BIRTH_YEAR_WEIGHT = 0.1
+BIRTH_YEAR_PENALTY = 0.3
+GENDER_PENALTY = 0.3
+ADDRESS_WEIGHT = 0.1
+
+_YEAR = re.compile(r'(?<!\d)(19\d\d|20\d\d)(?!\d)')
+_AGE = re.compile(r'\s*(\d{1,3})(?!\d)')
+_NON_DIGITS = re.compile(r'\D+')
+_NON_ALNUM = re.compile(r'[^0-9A-Z]+')
+
+
+def _patient_columns():
+    from models import Patient
+    return (
+        Patient.PatientId, Patient.PatientName, Patient.PatientGender, Patient.PatientAge,
+        Patient.PatientAddress, Patient.PatientPhone, Patient.PatientCCCD, Patient.PatientBHYT
+    )
+
+
+def _digits(value):
+    return _NON_DIGITS.sub('', str(value)) if value else ''
+
+
+def cccd(value):
+    """Normalized CCCD/CMND number, None when not plausible"""
+    digits = _digits(value)
+    return digits if len(digits) in (9, 12) else None
+
+
+def bhyt(value):
+    """Person part (last 10 characters) of a BHYT card number"""
+    compact = _NON_ALNUM.sub('', str(value).upper()) if value else ''
+    return compact[-10:] if len(compact) >= 10 else None
+
+
+def phone(value):
+    """Normalized phone number (+84 / 84 prefix rewritten to 0)"""
+    digits = _digits(value)
+    if digits.startswith('84') and len(digits) == 11:
+        digits = '0' + digits[2:]
+    return digits if len(digits) >= 9 else None
+
+
+IDENTIFIERS = {'PatientCCCD': cccd, 'PatientBHYT': bhyt, 'PatientPhone': phone}
+
+
+def birth_years(age, today=None):
+    """Possible birth years for a ``PatientAge`` value: the year itself when
+    it holds a date or year of birth, two years for an age"""
+    if age is None:
+        return ()
+    text = normalize(age).strip()
+    match = _YEAR.search(text)
+    if match:
+        return (int(match.group(1)),)
+    match = _AGE.match(text)
+    if not match:
+        return ()
+    value = int(match.group(1))
+    year = (today or date.today()).year
+    if 'thang' in text or 'month' in text:
+        year -= value // 12
+    elif value <= 130:
+        year -= value
+    else:
+        return ()
+    return (year - 1, year)
+
+
+class PatientProfile:
+    """Normalized comparison fields of a patient (any object with the
+    Patient columns), computed once per patient"""
+
+    __slots__ = ('name', 'identifiers', 'years', 'gender', 'address')
+
+    def __init__(self, patient):
+        self.name = words(getattr(patient, 'PatientName', None))
+        self.identifiers = {
+            field: normalize_value(getattr(patient, field, None))
+            for field, normalize_value in IDENTIFIERS.items()
+        }
+        self.years = birth_years(getattr(patient, 'PatientAge', None))
+        self.gender = getattr(patient, 'PatientGender', None)
+        self.address = ' '.join(words(getattr(patient, 'PatientAddress', None)))
+
+
+def _profile(patient):
+    return patient if isinstance(patient, PatientProfile) else PatientProfile(patient)
+
+
+def blocking_keys(patient):
+    """Blocking keys of a patient (or PatientProfile)"""
+    profile = _profile(patient)
+    keys = set()
+    for field, value in profile.identifiers.items():
+        if value:
+            keys.add(f"{field[len('Patient'):].lower()}:{value}")
+
+    if profile.name:
+        short = profile.name[0] if len(profile.name) == 1 else f"{profile.name[0]} {profile.name[-1]}"
+        for year in profile.years:
+            keys.add(f"name:{' '.join(profile.name)}:{year}")
+            keys.add(f"short:{short}:{year}")
+    return {key[:KEY_LENGTH] for key in keys}
+
+
+def _chunks(values, size=ID_QUERY_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _ratio(a, b):
+    return 1.0 if a == b else SequenceMatcher(None, a, b).ratio()
+
+
+def similarity(a, b):
+    """``(score, reasons)`` for two patients (or PatientProfiles); the score
+    is in [0, 1]"""
+    a = _profile(a)
+    b = _profile(b)
+    score = 0.0
+    reasons = []
+
+    if a.name and b.name:
+        ratio = _ratio(' '.join(a.name), ' '.join(b.name))
+        score += NAME_WEIGHT * ratio
+        if ratio == 1:
+            reasons.append('same name')
+        elif ratio >= 0.8:
+            reasons.append('similar name')
+
+    for field, (weight, penalty) in IDENTIFIER_WEIGHTS.items():
+        value_a = a.identifiers[field]
+        value_b = b.identifiers[field]
+        if value_a and value_b:
+            if value_a == value_b:
+                score += weight
+                reasons.append(f"same {field[len('Patient'):]}")
+            else:
+                score -= penalty
+
+    if a.years and b.years:
+        if set(a.years) & set(b.years):
+            score += BIRTH_YEAR_WEIGHT
+            reasons.append('same birth year')
+        elif min(abs(x - y) for x in a.years for y in b.years) > 1:
+            score -= BIRTH_YEAR_PENALTY
+
+    genders = {a.gender, b.gender}
+    if None not in genders and 'Khác' not in genders and len(genders) > 1:
+        score -= GENDER_PENALTY
+
+    if a.address and b.address and _ratio(a.address, b.address) >= 0.8:
+        score += ADDRESS_WEIGHT
+        reasons.append('similar address')
+
+    return round(min(max(score, 0.0), 1.0), 3), reasons
+
+
+def _load_patients(patient_ids):
+    """Rows of the given patients (Patient columns), keyed by PatientId"""
+    from models import Patient
+    patients = {}
+    for chunk in _chunks(patient_ids):
+        for row in db.session.query(*_patient_columns()).filter(Patient.PatientId.in_(chunk)):
+            patients[row.PatientId] = row
+    return patients
+
+
+def reindex(patient_ids):
+    """Recompute the blocking keys of the given patients in the caller's
+    transaction (patients that no longer exist lose theirs)"""
+    from models import Patient
+    from models.PatientBlockKey import PatientBlockKey
+
+    for chunk in _chunks({patient_id for patient_id in patient_ids if patient_id is not None}):
+        db.session.query(PatientBlockKey).filter(
+            PatientBlockKey.PatientId.in_(chunk)
+        ).delete(synchronize_session=False)
+        rows = db.session.query(*_patient_columns()).filter(Patient.PatientId.in_(chunk)).all()
+        keys = [
+            {'BlockKey': key, 'PatientId': row.PatientId}
+            for row in rows
+            for key in blocking_keys(row)
+        ]
+        if keys:
+            db.session.execute(PatientBlockKey.__table__.insert(), keys)
+
+
+def reindex_written(model, keys, generated_keys=False):
+    """Update the blocking keys of patients just written by a bulk import
+    (no-op for other tables; patients always carry their key)"""
+    if model.__name__ == 'Patient':
+        reindex(keys)
+
+
+def rebuild(batch_size=5000, progress=None):
+    """Recompute every patient's blocking keys batch by batch (one commit
+    per batch) and drop keys of deleted patients. Returns the number of
+    patients indexed."""
+    from models import Patient
+    from models.PatientBlockKey import PatientBlockKey
+
+    done = 0
+    last = None
+    while True:
+        batch = db.session.query(Patient.PatientId).order_by(Patient.PatientId)
+        if last is not None:
+            batch = batch.filter(Patient.PatientId > last)
+        ids = [row[0] for row in batch.limit(batch_size).all()]
+        if not ids:
+            break
+        reindex(ids)
+        db.session.commit()
+        done += len(ids)
+        last = ids[-1]
+        if progress is not None:
+            progress(done)
+
+    db.session.query(PatientBlockKey).filter(
+        ~PatientBlockKey.PatientId.in_(db.select(Patient.PatientId))
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return done
+
+
+def _match(patient, score, reasons):
+    match = {column.key: getattr(patient, column.key) for column in _patient_columns()}
+    match['Score'] = score
+    match['Reasons'] = reasons
+    return match
+
+
+def find_duplicates(patient, min_score=MIN_SCORE, limit=20):
+    """Likely duplicates of ``patient`` (a Patient, or a transient Patient
+    built from registration details), best first"""
+    from models.PatientBlockKey import PatientBlockKey
+
+    profile = PatientProfile(patient)
+    keys = blocking_keys(profile)
+    if not keys:
+        return []
+    usable = [
+        key for key, size in db.session.query(PatientBlockKey.BlockKey, func.count()).filter(
+            PatientBlockKey.BlockKey.in_(keys)
+        ).group_by(PatientBlockKey.BlockKey)
+        if size <= MAX_BLOCK_SIZE
+    ]
+    if not usable:
+        return []
+    candidate_ids = {
+        row[0] for row in db.session.query(PatientBlockKey.PatientId).filter(
+            PatientBlockKey.BlockKey.in_(usable)
+        )
+    }
+    candidate_ids.discard(getattr(patient, 'PatientId', None))
+
+    matches = []
+    for candidate in _load_patients(candidate_ids).values():
+        score, reasons = similarity(profile, candidate)
+        if score >= min_score:
+            matches.append(_match(candidate, score, reasons))
+    matches.sort(key=lambda match: (-match['Score'], match['PatientId']))
+    return matches[:limit]
+
+
+def candidate_pairs(max_block_size=MAX_BLOCK_SIZE):
+    """Pairs of patient ids sharing a usable block, each pair once"""
+    from models.PatientBlockKey import PatientBlockKey
+    from utils.streaming import iter_rows
+
+    shared = db.select(PatientBlockKey.BlockKey).group_by(PatientBlockKey.BlockKey).having(
+        func.count().between(2, max_block_size)
+    )
+    rows = db.session.query(PatientBlockKey.BlockKey, PatientBlockKey.PatientId).filter(
+        PatientBlockKey.BlockKey.in_(shared)
+    ).order_by(PatientBlockKey.BlockKey, PatientBlockKey.PatientId)
+
+    # Usable keys of each patient so far, in key order (a few per patient,
+    # where remembering the pairs would grow with every block)
+    keys_of = {}
+    for block_key, block in groupby(iter_rows(rows), key=lambda row: row[0]):
+        patient_ids = [row[1] for row in block]
+        for patient_id in patient_ids:
+            keys_of.setdefault(patient_id, []).append(block_key)
+        for id_a, id_b in combinations(patient_ids, 2):
+            # A pair is yielded in the first block the two patients share
+            if set(keys_of[id_a][:-1]).isdisjoint(keys_of[id_b][:-1]):
+                yield id_a, id_b
+
+
+def report(min_score=MIN_SCORE, batch_size=5000, progress=None):
+    """Every likely duplicate pair of the registry, best first:
+    ``(score, reasons, patient_a, patient_b)`` with Patient column rows"""
+    matches = []
+    pairs = candidate_pairs()
+    compared = 0
+    while True:
+        batch = [pair for _, pair in zip(range(batch_size), pairs)]
+        if not batch:
+            break
+        patients = _load_patients({patient_id for pair in batch for patient_id in pair})
+        profiles = {patient_id: PatientProfile(row) for patient_id, row in patients.items()}
+        for id_a, id_b in batch:
+            if id_a in patients and id_b in patients:
+                score, reasons = similarity(profiles[id_a], profiles[id_b])
+                if score >= min_score:
+                    matches.append((score, reasons, patients[id_a], patients[id_b]))
+        compared += len(batch)
+        if progress is not None:
+            progress(compared)
+    matches.sort(key=lambda match: (-match[0], match[2].PatientId, match[3].PatientId))
+    return matches
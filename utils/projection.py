@@ -0,0 +1,128 @@
+"""
+Sparse fieldsets (``?fields=``) for list endpoints.
+
+An endpoint declares the fields it can return once, as a ``FieldSet`` of
+column expressions. When the client sends ``fields=DrugId,DrugName`` the
+endpoint selects only those columns (``query.with_entities``, so no ORM
+entity is hydrated) and serializes each row with a serializer built for
+exactly that field list; dropdowns and typeaheads then fetch id + name
+instead of every column.
+
+    DRUG_FIELDS = FieldSet({
+        'DrugId': Drug.DrugId,
+        'DrugName': Drug.DrugName,
+        'DrugGenericName': Drug.DrugChemical,            # aliases share a column
+        'UploadDate': Field(Doc.UploadDate, format=fmt), # formatted value
+        'ImageUrls': Field(Patient.PatientId, Patient.PatientImageHash, format=urls),
+    })
+
+    names = DRUG_FIELDS.requested()          # None when fields= is absent
+    query = DRUG_FIELDS.project(query, names)
+    data = [DRUG_FIELDS.serializer(names)(row) for row in query.all()]
+
+Unknown field names raise ``InvalidFields`` (a ValueError), which
+endpoints turn into a 400.
+"""
+from flask import request
+
+
+class InvalidFields(ValueError):
+    """Raised when ``fields=`` names a field the endpoint does not have"""
+
+
+class Field:
+    """Output field computed from one or more columns.
+
+    ``format`` receives the column values (in order) and returns the JSON
+    value; without it the single column value is returned as is.
+    """
+
+    def __init__(self, *columns, format=None):
+        self.columns = columns
+        self.format = format
+
+
+class FieldSet:
+    """The fields an endpoint can return, keyed by output name (in output order)"""
+
+    def __init__(self, fields):
+        self.fields = {
+            name: field if isinstance(field, Field) else Field(field)
+            for name, field in fields.items()
+        }
+        self.names = list(self.fields)
+
+    def parse(self, value):
+        """Field names from a comma separated list, in declaration order.
+        Returns None for an empty value (all fields)."""
+        if value is None:
+            return None
+        requested = {name.strip() for name in value.split(',') if name.strip()}
+        if not requested:
+            return None
+        unknown = sorted(requested - set(self.fields))
+        if unknown:
+            raise InvalidFields(f"Unknown field(s): {', '.join(unknown)}. "
+                                f"Available: {', '.join(self.names)}")
+        return [name for name in self.names if name in requested]
+
+    def requested(self, arg='fields'):
+        """Field names requested in the query string, None when not given"""
+        return self.parse(request.args.get(arg, type=str))
+
+    def _plan(self, names):
+        """Distinct columns needed by ``names`` and, per field, their positions"""
+        columns = []
+        positions = {}
+        plan = []
+        for name in names or self.names:
+            field = self.fields[name]
+            indexes = []
+            for column in field.columns:
+                key = id(column)
+                if key not in positions:
+                    positions[key] = len(columns)
+                    columns.append(column)
+                indexes.append(positions[key])
+            plan.append((name, tuple(indexes), field.format))
+        return columns, plan
+
+    def project(self, query, names, keys=()):
+        """``query`` selecting only the columns of ``names``.
+
+        ``keys`` (e.g. keyset sort columns) are appended after them; read
+        them back with ``key_func(len(keys))``. Joins and filters of the
+        query are kept.
+        """
+        columns, _ = self._plan(names)
+        return query.with_entities(*columns, *keys)
+
+    def serializer(self, names):
+        """Function turning a row of ``project(query, names)`` into a dict"""
+        _, plan = self._plan(names)
+        simple = all(format is None and len(indexes) == 1 for _, indexes, format in plan)
+        if simple:
+            pairs = [(name, indexes[0]) for name, indexes, _ in plan]
+            return lambda row: {name: row[index] for name, index in pairs}
+
+        def serialize(row):
+            result = {}
+            for name, indexes, format in plan:
+                if format is None:
+                    result[name] = row[indexes[0]]
+                else:
+                    result[name] = format(*(row[index] for index in indexes))
+            return result
+        return serialize
+
+    @staticmethod
+    def key_func(key_count):
+        """keyset_paginate ``key_func`` reading the ``keys`` appended by ``project``"""
+        return lambda row: tuple(row[-key_count:])
+
+    @staticmethod
+    def pick(records, names):
+        """Project already serialized dicts (e.g. from the reference cache)"""
+        if not names:
+            return records
+        return [{name: record.get(name) for name in names} for record in records]
@@ -0,0 +1,166 @@
+"""
+In-process read-through cache for reference (catalog) tables.
+
+Catalog tables change only through their CRUD blueprints and the Excel
+importer. Each of those write paths calls ``bump_version(table)`` in the
+same transaction as the data change, which increments a row in the
+``CatalogVersion`` table. Every worker keeps its own cached copy of each
+catalog together with the versions it was built from; on the first cache
+access of a request it reads all version rows (one small query) and reloads
+only the entries whose versions moved.
+
+Usage:
+    @register('drugs', depends_on=('Drug', 'DrugGroup'))
+    def _load_drugs():
+        return [...]            # list of plain dicts, built once per version
+
+    rows = get('drugs')
+"""
+import threading
+
+from flask import g, has_request_context
+from models_main import db
+
+# Catalog tables that carry a version counter
+CATALOG_TABLES = (
+    'Drug', 'DrugGroup', 'ICD', 'Sign', 'BodySystem', 'BodyPart',
+    'BodySite', 'Department', 'DocumentType', 'StaffDocumentType',
+    'Test', 'Proc', 'SignTemplate', 'DrugTemplate'
+)
+
+_loaders = {}       # name -> (loader, depends_on)
+_entries = {}       # name -> (versions tuple, value)
+_lock = threading.RLock()
+
+
+def register(name, depends_on):
+    """Decorator registering a loader for a cached catalog view"""
+    unknown = [t for t in depends_on if t not in CATALOG_TABLES]
+    if unknown:
+        raise ValueError(f"Unknown catalog tables: {', '.join(unknown)}")
+
+    def decorator(loader):
+        _loaders[name] = (loader, tuple(depends_on))
+        return loader
+    return decorator
+
+
+def _read_versions():
+    """Read all version counters; None when the table is unavailable"""
+    from models.CatalogVersion import CatalogVersion
+    try:
+        rows = db.session.query(CatalogVersion.TableName, CatalogVersion.Version).all()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Reference cache disabled, cannot read CatalogVersion: {e}")
+        return None
+    return {table_name: version for table_name, version in rows}
+
+
+def current_versions():
+    """Version counters, read at most once per request"""
+    if has_request_context():
+        if '_catalog_versions' not in g:
+            g._catalog_versions = _read_versions()
+        return g._catalog_versions
+    return _read_versions()
+
+
+def get(name):
+    """Return the cached value for a registered catalog view, reloading if stale"""
+    loader, depends_on = _loaders[name]
+    versions = current_versions()
+    if versions is None:
+        # Version table missing: behave as an uncached read
+        return loader()
+
+    key = tuple(versions.get(t, 0) for t in depends_on)
+    entry = _entries.get(name)
+    if entry is not None and entry[0] == key:
+        return entry[1]
+
+    with _lock:
+        entry = _entries.get(name)
+        if entry is not None and entry[0] == key:
+            return entry[1]
+        value = loader()
+        _entries[name] = (key, value)
+        return value
+
+
+def invalidate(*table_names):
+    """Drop local entries depending on the given tables (all if none given)"""
+    with _lock:
+        for name, (_, depends_on) in _loaders.items():
+            if not table_names or set(depends_on) & set(table_names):
+                _entries.pop(name, None)
+    if has_request_context():
+        g.pop('_catalog_versions', None)
+
+
+def bump_version(*table_names):
+    """Increment the version of the given catalog tables.
+
+    Call before ``db.session.commit()`` of the write so the new version
+    becomes visible to other workers atomically with the data change. Runs
+    in a savepoint so a missing CatalogVersion table never fails the write.
+    """
+    from models.CatalogVersion import CatalogVersion
+    # Flush pending data changes first so their errors surface to the caller
+    db.session.flush()
+    try:
+        with db.session.begin_nested():
+            for table_name in table_names:
+                updated = db.session.query(CatalogVersion).filter_by(
+                    TableName=table_name
+                ).update(
+                    {CatalogVersion.Version: CatalogVersion.Version + 1},
+                    synchronize_session=False
+                )
+                if not updated:
+                    db.session.add(CatalogVersion(TableName=table_name, Version=1))
+    except Exception as e:
+        print(f"Error bumping catalog version for {', '.join(table_names)}: {e}")
+    invalidate(*table_names)
+
+
+def _model_loader(model, order_by):
+    def loader():
+        return [row.to_dict() for row in model.query.order_by(order_by).all()]
+    return loader
+
+
+def register_catalog_models():
+    """Register a plain ``to_dict`` view for every catalog table"""
+    from models import (Drug, DrugGroup, ICD, Sign, BodySystem, BodyPart,
+                        BodySite, Department, DocumentType, Test, Proc)
+    from models.StaffDocuments import StaffDocumentType
+
+    for model, order_by in (
+        (Drug, Drug.DrugId),
+        (DrugGroup, DrugGroup.DrugGroupId),
+        (ICD, ICD.ICDCode),
+        (Sign, Sign.SignId),
+        (BodySystem, BodySystem.SystemId),
+        (BodyPart, BodyPart.BodyPartId),
+        (BodySite, BodySite.SiteId),
+        (Department, Department.DepartmentId),
+        (DocumentType, DocumentType.DocumentTypeId),
+        (StaffDocumentType, StaffDocumentType.DocumentTypeId),
+        (Test, Test.TestId),
+        (Proc, Proc.ProcId),
+    ):
+        table_name = model.__tablename__
+        register(table_name, depends_on=(table_name,))(_model_loader(model, order_by))
+
+
+def catalog_rows(table_name):
+    """All rows of a catalog table as dicts, served from the cache"""
+    if table_name not in _loaders:
+        register_catalog_models()
+    return get(table_name)
+
+
+def catalog_keys(table_name, key):
+    """Set of primary-key values of a catalog table, served from the cache"""
+    return {row[key] for row in catalog_rows(table_name)}
@@ -0,0 +1,261 @@
+"""
+Diacritic-insensitive search index for patients, drugs and signs.
+
+Indexed text is normalized - Vietnamese accents stripped (``đ`` -> ``d``)
+and lowercased - and split into words; every word is a ``SearchToken`` row
+(Entity, Token, EntityId). Identifier fields (phone, CCCD, BHYT) are also
+indexed with separators removed, so ``0912345678`` matches
+``0912 345 678``.
+
+A query is normalized the same way and every word must match the start of
+a word of the entity: ``nguyen van`` finds ``Nguyễn Văn An``, ``par 500``
+finds ``Paracetamol 500mg``. The longest word is a key range scan of the
+primary key (``Token >= 'nguyen' AND Token < 'nguyeo'``); the others are joined through the (Entity, EntityId, Token)
+index, grouped per entity so ``LIMIT`` counts entities - no leading-wildcard
+LIKE, so the cost does not grow with the table.
+
+Writes keep the index in step inside their own transaction: the drug and
+sign endpoints call ``reindex`` before committing, and ``BulkImport``
+reindexes each chunk it writes (``reindex_written``). ``rebuild`` (used by
+tools/search_index.py) recomputes an entity from scratch.
+"""
+import re
+import unicodedata
+
+from sqlalchemy import String, and_, cast, exists, func
+from sqlalchemy.orm import aliased
+
+from models_main import db
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+MAX_QUERY_TOKENS = 5
+TOKEN_LENGTH = 64
+ID_QUERY_SIZE = 1000
+
+_WORD = re.compile(r'[0-9a-z]+')
+_SEPARATORS = re.compile(r'[^0-9a-z]+')
+
+
+class Entity:
+    """An indexed table: its key, the fields indexed as words and as
+    identifiers, and the columns returned by the search endpoint"""
+
+    def __init__(self, name, model_name, key, words=(), identifiers=(), columns=()):
+        self.name = name
+        self.model_name = model_name
+        self.key = key
+        self.words = words
+        self.identifiers = identifiers
+        self.columns = columns
+
+    @property
+    def model(self):
+        import models
+        return getattr(models, self.model_name)
+
+    def column(self, name):
+        return getattr(self.model, name)
+
+
+ENTITIES = {
+    'patient': Entity(
+        'patient', 'Patient', 'PatientId',
+        words=('PatientName',),
+        identifiers=('PatientId', 'PatientPhone', 'PatientCCCD', 'PatientBHYT'),
+        columns=('PatientId', 'PatientName', 'PatientGender', 'PatientAge', 'PatientAddress',
+                 'PatientPhone', 'PatientCCCD', 'PatientBHYT')
+    ),
+    'drug': Entity(
+        'drug', 'Drug', 'DrugId',
+        words=('DrugName', 'DrugChemical'),
+        identifiers=('DrugId',),
+        columns=('DrugId', 'DrugName', 'DrugChemical', 'DrugContent', 'DrugFormulation',
+                 'DrugAvailable')
+    ),
+    'sign': Entity(
+        'sign', 'Sign', 'SignId',
+        words=('SignDesc',),
+        columns=('SignId', 'SignDesc', 'SignType', 'SystemId', 'Speciality')
+    ),
+}
+
+
+def normalize(text):
+    """Lowercase ``text`` without Vietnamese diacritics"""
+    if text is None:
+        return ''
+    text = str(text).replace('đ', 'd').replace('Đ', 'D')
+    decomposed = unicodedata.normalize('NFD', text)
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def words(text):
+    """Normalized words of ``text``"""
+    return _WORD.findall(normalize(text))
+
+
+def compact(text):
+    """Normalized ``text`` without separators (identifiers, codes)"""
+    return _SEPARATORS.sub('', normalize(text))
+
+
+def _row_tokens(entity, row):
+    tokens = set()
+    for field in entity.words:
+        tokens.update(words(getattr(row, field)))
+    for field in entity.identifiers:
+        value = compact(getattr(row, field))
+        if value:
+            tokens.add(value)
+        tokens.update(words(getattr(row, field)))
+    return {token[:TOKEN_LENGTH] for token in tokens}
+
+
+def _chunks(values, size=ID_QUERY_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def reindex(entity_name, ids):
+    """Recompute the tokens of the given rows in the caller's transaction
+    (rows that no longer exist lose theirs)"""
+    from models.SearchToken import SearchToken
+
+    entity = ENTITIES[entity_name]
+    key = entity.column(entity.key)
+    fields = list(dict.fromkeys((entity.key,) + entity.words + entity.identifiers))
+    for chunk in _chunks({id_ for id_ in ids if id_ is not None}):
+        db.session.query(SearchToken).filter(
+            SearchToken.Entity == entity.name,
+            SearchToken.EntityId.in_([str(id_) for id_ in chunk])
+        ).delete(synchronize_session=False)
+        rows = db.session.query(*[entity.column(field) for field in fields]).filter(key.in_(chunk)).all()
+        tokens = [
+            {'Entity': entity.name, 'Token': token, 'EntityId': str(getattr(row, entity.key))}
+            for row in rows
+            for token in _row_tokens(entity, row)
+        ]
+        if tokens:
+            db.session.execute(SearchToken.__table__.insert(), tokens)
+
+
+def _unindexed_ids(entity):
+    """Keys of rows without any token (e.g. inserted with a generated key)"""
+    from models.SearchToken import SearchToken
+
+    key = entity.column(entity.key)
+    indexed = exists().where(and_(
+        SearchToken.Entity == entity.name,
+        SearchToken.EntityId == cast(key, String)
+    ))
+    return [row[0] for row in db.session.query(key).filter(~indexed).all()]
+
+
+def entity_for_model(model):
+    """Name of the entity indexing ``model``, None if it is not indexed"""
+    for name, entity in ENTITIES.items():
+        if entity.model_name == model.__name__:
+            return name
+    return None
+
+
+def reindex_written(model, keys, generated_keys=False):
+    """Index rows just written by a bulk import: ``keys`` of the keyed rows,
+    and every still unindexed row when some keys were generated by the
+    database. No-op for tables without a search index."""
+    entity_name = entity_for_model(model)
+    if entity_name is None:
+        return
+    ids = list(keys)
+    if generated_keys:
+        ids.extend(_unindexed_ids(ENTITIES[entity_name]))
+    reindex(entity_name, ids)
+
+
+def rebuild(entity_name, batch_size=5000, progress=None):
+    """Recompute the index of an entity batch by batch (one commit per
+    batch, so searches keep working meanwhile) and drop tokens of rows that
+    no longer exist. Returns the number of rows indexed."""
+    from models.SearchToken import SearchToken
+
+    entity = ENTITIES[entity_name]
+    key = entity.column(entity.key)
+    done = 0
+    last = None
+    while True:
+        # Keyset batches: no cursor stays open across the commits
+        batch = db.session.query(key).order_by(key)
+        if last is not None:
+            batch = batch.filter(key > last)
+        ids = [row[0] for row in batch.limit(batch_size).all()]
+        if not ids:
+            break
+        reindex(entity_name, ids)
+        db.session.commit()
+        done += len(ids)
+        last = ids[-1]
+        if progress is not None:
+            progress(done)
+
+    db.session.query(SearchToken).filter(
+        SearchToken.Entity == entity.name,
+        ~SearchToken.EntityId.in_(db.select(cast(key, String)))
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return done
+
+
+def _prefix(column, term):
+    """``column`` starts with ``term``, as a key range: tokens are [0-9a-z]
+    only, so ``abc%`` is ``>= 'abc' AND < 'abd'`` (LIKE may not use the index)"""
+    term = term[:TOKEN_LENGTH]
+    return and_(column >= term, column < term[:-1] + chr(ord(term[-1]) + 1))
+
+
+def search_ids(entity_name, query, limit=DEFAULT_LIMIT):
+    """Keys of up to ``limit`` rows whose words start with every word of
+    ``query``, best match (shortest, alphabetical first word) first"""
+    from models.SearchToken import SearchToken
+
+    entity = ENTITIES[entity_name]
+    terms = sorted(set(words(query)), key=len, reverse=True)[:MAX_QUERY_TOKENS]
+    if not terms:
+        return []
+
+    first = aliased(SearchToken)
+    rows = db.session.query(first.EntityId).filter(
+        first.Entity == entity.name,
+        _prefix(first.Token, terms[0])
+    )
+    for term in terms[1:]:
+        other = aliased(SearchToken)
+        rows = rows.join(other, and_(
+            other.Entity == first.Entity,
+            other.EntityId == first.EntityId,
+            _prefix(other.Token, term)
+        ))
+    # An entity appears once per matching word of its own: group them and
+    # rank each entity by its best word, so LIMIT counts entities
+    rows = rows.group_by(first.EntityId).order_by(
+        func.min(first.Token), first.EntityId
+    ).limit(limit)
+    return [entity_id for (entity_id,) in rows]
+
+
+def search(entity_name, query, limit=DEFAULT_LIMIT):
+    """Rows (dicts of the entity's columns) matching ``query``, best first"""
+    entity = ENTITIES[entity_name]
+    ids = search_ids(entity_name, query, limit)
+    if not ids:
+        return []
+
+    key = entity.column(entity.key)
+    # EntityId is text; convert back for integer keys
+    python_type = key.type.python_type
+    rows = db.session.query(*[entity.column(name) for name in entity.columns]).filter(
+        key.in_([python_type(id_) for id_ in ids])
+    ).all()
+    by_id = {str(getattr(row, entity.key)): dict(row._mapping) for row in rows}
+    return [by_id[id_] for id_ in ids if id_ in by_id]
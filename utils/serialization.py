@@ -0,0 +1,198 @@
+"""
+JSON serialization: compiled per-model serializers and a fast JSON provider.
+
+Values that are not JSON-native are encoded the same way everywhere
+(``to_json_value``), as Flask's default provider does:
+
+    datetime / date          HTTP date (``Tue, 01 Jan 2025 08:30:00 GMT``)
+    time                     ISO 8601 string
+    Decimal                  string, so no precision is lost
+    bytes                    UTF-8 text, base64 when not valid UTF-8
+    set / frozenset          list
+    UUID                     string
+
+``columns_to_dict(obj)`` turns a model instance into a dict of its mapped
+columns. The function doing it is generated once per model (and excluded
+column set) from the column metadata - one dict lookup per loaded column
+and a conversion only on columns whose type needs one - instead of walking
+``__table__.columns`` with ``getattr`` for every object. Temporal columns
+are left as they are (and so encoded as HTTP dates) unless the model's
+``to_dict`` formatted them as ISO 8601 already: ``isoformat=True``.
+
+``JSONProvider`` is registered as the app's JSON provider by
+``create_app``: ``jsonify`` encodes with orjson when it is installed (the
+stdlib ``json`` otherwise) and produces the same values as Flask's
+``DefaultJSONProvider``. ``dumps`` does the same for output written
+outside ``jsonify``, so NDJSON lines match the JSON responses.
+"""
+import base64
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+from uuid import UUID
+
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import http_date
+from sqlalchemy import inspect
+from sqlalchemy import types as sqltypes
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+# orjson writes datetimes as ISO 8601 itself; pass them to ``default``
+_ORJSON_OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME) if orjson else 0
+
+_serializers = {}
+
+
+def _isoformat(value):
+    # Drivers may hand back strings for some temporal columns (SQLite)
+    if value is None or isinstance(value, str):
+        return value
+    return value.isoformat()
+
+
+def _decimal(value):
+    return None if value is None else str(value)
+
+
+def _bytes(value):
+    if value is None:
+        return None
+    try:
+        return value.decode('utf-8')
+    except UnicodeDecodeError:
+        return base64.b64encode(value).decode('ascii')
+
+
+def to_json_value(value):
+    """JSON-native form of the non-JSON types this app stores"""
+    if isinstance(value, date):
+        return http_date(value)
+    if isinstance(value, time):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return _bytes(bytes(value))
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if isinstance(value, UUID):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(obj):
+    """Compact JSON text of ``obj`` (unsorted keys, non-ASCII kept), for
+    output written outside ``jsonify`` such as NDJSON lines and SSE data"""
+    if orjson is None:
+        return json.dumps(obj, ensure_ascii=False, default=to_json_value)
+    return orjson.dumps(obj, default=to_json_value, option=_ORJSON_OPTIONS).decode('utf-8')
+
+
+def _converter(column_type, isoformat=False):
+    """Conversion for a column type, None when the driver value is left to
+    the JSON encoder"""
+    if isinstance(column_type, (sqltypes.DateTime, sqltypes.Date, sqltypes.Time)):
+        return _isoformat if isoformat else None
+    if isinstance(column_type, sqltypes.Numeric) and column_type.asdecimal:
+        return _decimal
+    if isinstance(column_type, (sqltypes.LargeBinary, sqltypes.BINARY, sqltypes.VARBINARY)):
+        return _bytes
+    return None
+
+
+def compile_serializer(model, exclude=(), isoformat=False):
+    """Build ``obj -> dict`` for the mapped columns of ``model`` (keys are
+    column names, in table order), skipping ``exclude`` and deferred columns
+    (large objects that are loaded only on access). ``isoformat`` formats
+    temporal columns as ISO 8601 strings instead of leaving them to the
+    JSON encoder."""
+    mapper = inspect(model)
+    namespace = {'getattr': getattr}
+    fast_items = []
+    slow_items = []
+    for index, prop in enumerate(mapper.column_attrs):
+        column = prop.columns[0]
+        if prop.deferred or column.name in exclude or prop.key in exclude:
+            continue
+        fast = f"loaded[{prop.key!r}]"
+        slow = f"obj.{prop.key}" if prop.key.isidentifier() else f"getattr(obj, {prop.key!r})"
+        converter = _converter(column.type, isoformat)
+        if converter is not None:
+            namespace[f"_convert{index}"] = converter
+            fast = f"_convert{index}({fast})"
+            slow = f"_convert{index}({slow})"
+        fast_items.append(f"            {column.name!r}: {fast},")
+        slow_items.append(f"        {column.name!r}: {slow},")
+    # Loaded column values sit in the instance __dict__; reading them there
+    # skips the instrumented attribute. Expired or unloaded attributes are
+    # missing from it (KeyError) and are then read normally, which loads them.
+    source = (
+        "def serialize(obj):\n"
+        "    loaded = obj.__dict__\n"
+        "    try:\n"
+        "        return {\n" + "\n".join(fast_items) + "\n        }\n"
+        "    except KeyError:\n"
+        "        pass\n"
+        "    return {\n" + "\n".join(slow_items) + "\n    }\n"
+    )
+    exec(compile(source, f"<serializer {model.__name__}>", 'exec'), namespace)
+    return namespace['serialize']
+
+
+def model_serializer(model, exclude=(), isoformat=False):
+    """Compiled serializer of ``model``, built on first use"""
+    key = (model, frozenset(exclude), isoformat)
+    serializer = _serializers.get(key)
+    if serializer is None:
+        serializer = _serializers[key] = compile_serializer(model, exclude, isoformat)
+    return serializer
+
+
+def columns_to_dict(obj, exclude=(), isoformat=False):
+    """Dict of the mapped columns of a model instance, JSON-ready"""
+    return model_serializer(type(obj), exclude, isoformat)(obj)
+
+
+class JSONProvider(DefaultJSONProvider):
+    """Flask JSON provider using orjson when available.
+
+    Values are encoded as by Flask's default provider (dates as HTTP
+    dates); the output differs only in leaving non-ASCII characters
+    unescaped.
+    """
+
+    ensure_ascii = False
+
+    @staticmethod
+    def default(value):
+        return to_json_value(value)
+
+    def _orjson_options(self, kwargs):
+        options = _ORJSON_OPTIONS
+        if kwargs.get('sort_keys', self.sort_keys):
+            options |= orjson.OPT_SORT_KEYS
+        if kwargs.get('indent'):
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None:
+            kwargs.setdefault('default', self.default)
+            kwargs.setdefault('ensure_ascii', self.ensure_ascii)
+            kwargs.setdefault('sort_keys', self.sort_keys)
+            return json.dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self._orjson_options(kwargs)).decode('utf-8')
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        dump_args = {}
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            dump_args['indent'] = 2
+        body = orjson.dumps(obj, default=self.default, option=self._orjson_options(dump_args))
+        return self._app.response_class(body + b'\n', mimetype=self.mimetype)
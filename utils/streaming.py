@@ -0,0 +1,82 @@
+"""
+Streaming (NDJSON) responses for large list endpoints.
+
+A list endpoint normally builds every row in memory and ``jsonify``s the
+whole list. When the client sends ``Accept: application/x-ndjson`` or
+``?stream=1`` it can instead answer with one JSON object per line, written
+while the rows are still being read:
+
+    if wants_stream():
+        rows = iter_rows(query.order_by(Patient.PatientId))
+        return ndjson_response(to_dict(row) for row in rows)
+
+``iter_rows`` / ``iter_partitions`` read the query through a server-side
+cursor (``yield_per``, which turns on ``stream_results``) in batches, so
+memory stays bounded by the batch size whatever the table size, and the
+first bytes go out as soon as the first batch is read.
+
+The cursor runs on its own session: with an unbuffered MySQL cursor the
+connection cannot run another statement until the result is exhausted, and
+endpoints that look up related rows per batch do so on ``db.session``.
+"""
+from flask import Response, request, stream_with_context
+
+from models_main import db
+from utils.serialization import dumps
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+DEFAULT_BATCH_SIZE = 1000
+# Rows per response chunk handed to the WSGI server
+FLUSH_ROWS = 200
+
+
+def wants_stream():
+    """Whether the request asked for an NDJSON stream"""
+    if request.args.get('stream', type=str) in ('1', 'true'):
+        return True
+    # JSON first so that */* and missing Accept headers keep the JSON body
+    return request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+
+
+def iter_partitions(query, batch_size=DEFAULT_BATCH_SIZE):
+    """Lists of rows of ``query``, read ``batch_size`` at a time through a
+    server-side cursor on a dedicated session"""
+    session = db.session.session_factory()
+    try:
+        result = session.execute(query.statement, execution_options={'yield_per': batch_size})
+        for partition in result.partitions():
+            yield partition
+    finally:
+        session.close()
+
+
+def iter_rows(query, batch_size=DEFAULT_BATCH_SIZE):
+    """Rows of ``query`` one at a time (see ``iter_partitions``)"""
+    for partition in iter_partitions(query, batch_size):
+        yield from partition
+
+
+def ndjson_response(records):
+    """Response writing each dict of ``records`` as one JSON line.
+
+    The status is sent before the rows are read, so an error while
+    streaming is reported as a final ``{"error": ...}`` line.
+    """
+    def generate():
+        lines = []
+        try:
+            for record in records:
+                lines.append(dumps(record))
+                if len(lines) >= FLUSH_ROWS:
+                    yield '\n'.join(lines) + '\n'
+                    lines = []
+        except Exception as e:
+            print(f"Error while streaming {request.path}: {e}")
+            lines.append(dumps({'error': str(e)}))
+        if lines:
+            yield '\n'.join(lines) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE, headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
@@ -0,0 +1,229 @@
+"""
+Document thumbnail rendering and the background thumbnail queue.
+
+Uploads no longer render thumbnails inside the request. The blueprint saves
+the file, marks ``document_links['thumbnail_pending']`` and calls
+``submit()``; a bounded thread pool renders the thumbnail and writes
+``thumbnail_path``/``thumbnail_url`` back onto the document row. Until then
+the thumbnail endpoints serve ``placeholder_jpeg()``.
+
+Limits (per process):
+    THUMBNAIL_WORKERS        renderer threads
+    THUMBNAIL_QUEUE_LIMIT    queued jobs before new ones are left pending
+
+Office documents are converted by the shared LibreOffice pool in
+utils/office_converter.py (``OFFICE_POOL_SIZE`` conversions at a time per
+host).
+
+A document left pending by a restarted worker is submitted again by the
+thumbnail endpoint once ``PENDING_RETRY_SECONDS`` have passed.
+"""
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pdf2image
+from flask import send_file
+from PIL import Image
+
+from models_main import db
+from utils import office_converter, http_cache, image_processing
+
+THUMBNAIL_SIZE = (200, 200)
+PENDING_RETRY_SECONDS = 300
+OFFICE_TYPES = ['word', 'excel', 'powerpoint', 'document', 'sheet', 'presentation']
+
+_executor = None
+_executor_pid = None
+_queued = 0
+_lock = threading.Lock()
+_placeholder = None
+
+
+def init_app(app):
+    """Start-up checks of the renderers (called by the document blueprints)"""
+    office_converter.init_app(app)
+
+
+def is_image(file_type):
+    return bool(file_type) and file_type.startswith('image/')
+
+
+def is_pdf(file_type):
+    return bool(file_type) and 'pdf' in file_type.lower()
+
+
+def is_office(file_type):
+    return bool(file_type) and any(office_type in file_type.lower() for office_type in OFFICE_TYPES)
+
+
+def is_supported(file_type):
+    """True when a thumbnail can be rendered for this MIME type"""
+    return is_image(file_type) or is_pdf(file_type) or is_office(file_type)
+
+
+def _save_thumbnail(img, thumb_path):
+    # Convert to RGB if necessary (for PNG with transparency, etc.)
+    img = image_processing.to_rgb(img)
+    # Create thumbnail maintaining aspect ratio
+    img.thumbnail(THUMBNAIL_SIZE, Image.Resampling.LANCZOS)
+    img.save(thumb_path, 'JPEG', quality=85, optimize=True)
+
+
+def _render_pdf(pdf_path, thumb_path):
+    # Rasterize only page 1, straight at twice the thumbnail size
+    # (pdftoppm -scale-to) instead of the whole page at 150 dpi
+    pages = pdf2image.convert_from_path(
+        pdf_path, first_page=1, last_page=1,
+        size=max(THUMBNAIL_SIZE) * image_processing.REDUCING_GAP
+    )
+    if not pages:
+        return False
+    _save_thumbnail(pages[0], thumb_path)
+    return True
+
+
+def _render_office(file_path, thumb_path):
+    """Convert to PDF in the shared LibreOffice pool, then render page 1"""
+    with office_converter.converted_pdf(file_path) as pdf_path:
+        if not pdf_path:
+            return False
+        return _render_pdf(pdf_path, thumb_path)
+
+
+def render_thumbnail(file_path, file_type, thumbs_path):
+    """Render a thumbnail into ``thumbs_path``.
+
+    Returns the path relative to the documents directory
+    (``thumbnails/<name>_thumb.jpg``) or None if unsupported or failed.
+    Office documents need an application context (pool configuration).
+    """
+    os.makedirs(thumbs_path, exist_ok=True)
+
+    # Generate thumbnail filename
+    base_name = os.path.splitext(os.path.basename(file_path))[0]
+    thumb_filename = f"{base_name}_thumb.jpg"
+    thumb_path = os.path.join(thumbs_path, thumb_filename)
+
+    try:
+        if is_image(file_type):
+            # Scale-on-decode and EXIF orientation (utils/image_processing.py)
+            image_processing.load_image(file_path, THUMBNAIL_SIZE).save(
+                thumb_path, 'JPEG', quality=85, optimize=True)
+            rendered = True
+        elif is_pdf(file_type):
+            rendered = _render_pdf(file_path, thumb_path)
+        elif is_office(file_type):
+            rendered = _render_office(file_path, thumb_path)
+        else:
+            rendered = False
+    except Exception as e:
+        print(f"Error generating thumbnail for {file_path}: {e}")
+        rendered = False
+
+    return f"thumbnails/{thumb_filename}" if rendered else None
+
+
+def placeholder_jpeg():
+    """Neutral JPEG served while a thumbnail is being rendered"""
+    global _placeholder
+    if _placeholder is None:
+        buffer = io.BytesIO()
+        Image.new('RGB', THUMBNAIL_SIZE, (233, 236, 239)).save(buffer, 'JPEG', quality=70)
+        _placeholder = buffer.getvalue()
+    return _placeholder
+
+
+def placeholder_response():
+    """Placeholder image response; never cached so the real thumbnail shows up"""
+    response = send_file(io.BytesIO(placeholder_jpeg()), mimetype='image/jpeg')
+    response.headers['Cache-Control'] = 'no-store'
+    response.headers['X-Thumbnail-Pending'] = '1'
+    return response
+
+
+def mark_pending(document_links):
+    """Copy of document_links flagged as waiting for a thumbnail"""
+    links = dict(document_links or {})
+    links['thumbnail_pending'] = True
+    links['thumbnail_requested_at'] = datetime.now().isoformat()
+    return links
+
+
+def is_pending(document_links):
+    return bool(document_links) and bool(document_links.get('thumbnail_pending'))
+
+
+def pending_is_stale(document_links):
+    """True when a pending thumbnail has waited long enough to be resubmitted"""
+    requested_at = (document_links or {}).get('thumbnail_requested_at')
+    if not requested_at:
+        return True
+    try:
+        waited = datetime.now() - datetime.fromisoformat(requested_at)
+    except ValueError:
+        return True
+    return waited.total_seconds() > PENDING_RETRY_SECONDS
+
+
+def _get_executor(app):
+    """Per-process pool, created lazily (gunicorn forks after --preload)"""
+    global _executor, _executor_pid, _queued
+    with _lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(
+                max_workers=app.config.get('THUMBNAIL_WORKERS', 2),
+                thread_name_prefix='thumbnail'
+            )
+            _executor_pid = os.getpid()
+            _queued = 0
+        return _executor
+
+
+def _run(app, model, document_id, file_path, file_type, thumbs_path, url_prefix):
+    global _queued
+    try:
+        with app.app_context():
+            thumbnail_path = render_thumbnail(file_path, file_type, thumbs_path)
+            try:
+                document = db.session.get(model, document_id)
+                if document is None:
+                    return
+                links = dict(document.document_links or {})
+                links.pop('thumbnail_pending', None)
+                links.pop('thumbnail_requested_at', None)
+                if thumbnail_path:
+                    links['thumbnail_path'] = thumbnail_path
+                    links['thumbnail_url'] = f"{url_prefix}/{thumbnail_path}"
+                    links['thumbnail_sha256'] = http_cache.sha256_file(
+                        os.path.join(os.path.dirname(thumbs_path), thumbnail_path))
+                else:
+                    links['thumbnail_unavailable'] = True
+                document.document_links = links
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                print(f"Error saving thumbnail for document {document_id}: {e}")
+            finally:
+                db.session.remove()
+    finally:
+        with _lock:
+            _queued -= 1
+
+
+def submit(app, model, document_id, file_path, file_type, thumbs_path, url_prefix):
+    """Queue thumbnail rendering for a document; False when the queue is full.
+
+    A document that could not be queued stays pending and is resubmitted by
+    the thumbnail endpoint later.
+    """
+    global _queued
+    executor = _get_executor(app)
+    with _lock:
+        if _queued >= app.config.get('THUMBNAIL_QUEUE_LIMIT', 100):
+            return False
+        _queued += 1
+    executor.submit(_run, app, model, document_id, file_path, file_type, thumbs_path, url_prefix)
+    return True